@@ -0,0 +1,67 @@
+"""
+Benchmark of the graph engines: building the FWG, extracting its flood waves
+and collecting its edges with every engine, on a random graph of DifferentialChecker.
+The engines are checked against each other on the same graph first.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_graph_engines
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.graph_cache import GraphCache
+from src.graph_engine.differential_checker import DifferentialChecker
+from src.graph_engine.engine_registry import EngineRegistry
+
+
+def measure(function) -> tuple:
+    """
+    Returns the result and the wall time of a function in milliseconds.
+    :param function: the function to measure
+    :return tuple: the result and the time
+    """
+    start = time.perf_counter()
+    result = function()
+
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--gauges', type=int, default=10)
+    parser.add_argument('--peaks', type=int, default=3000)
+    parser.add_argument('--beta', type=int, default=3)
+    args = parser.parse_args()
+
+    checker = DifferentialChecker(
+        engine='numpy',
+        gauge_count=args.gauges,
+        peak_count=args.peaks,
+        beta=args.beta,
+        seed=0
+    )
+    edges = checker.get_random_edges(rng=np.random.default_rng(seed=0))
+    mismatches = checker.get_mismatches(edges=edges)
+    print(f'edges: {len(edges)}, mismatches: {mismatches or "none"}')
+
+    for name in EngineRegistry.ENGINES:
+        engine = EngineRegistry.get_engine(engine=name)
+        fwg, build_time = measure(lambda: engine.build_graph(edges=edges))
+        # the data of a frozen graph is calculated once and reused
+        fwg = GraphCache.freeze(fwg=fwg)
+        ComponentTracker.get_components(fwg=fwg)
+
+        _, edge_time = measure(lambda: engine.get_edge_arrays(fwg=fwg))
+        waves, equivalence_time = measure(lambda: engine.get_flood_waves(fwg=fwg, with_equivalence=True))
+        all_waves, all_paths_time = measure(lambda: engine.get_flood_waves(fwg=fwg, with_equivalence=False))
+
+        print(f'{name:>8}: build {build_time:8.1f} ms, edge arrays {edge_time:7.1f} ms, '
+              f'waves with equivalence {equivalence_time:8.1f} ms ({len(waves)}), '
+              f'without {all_paths_time:8.1f} ms ({len(all_waves)})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark of the start-up time of the command-line entry point.
+Every measurement runs in a fresh interpreter, so module caches do not help.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_import_time
+"""
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+
+from src import ROOT_DIR
+
+
+def run(arguments: list, repeat: int) -> tuple:
+    """
+    Runs a Python command in a new interpreter, and returns its best wall time.
+    :param list arguments: the arguments of the interpreter
+    :param int repeat: number of repetitions
+    :return tuple: the best time in milliseconds and the standard error of the last run
+    """
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable] + arguments,
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        times.append(time.perf_counter() - start)
+
+    return min(times) * 1000, completed.stderr
+
+
+def get_imported_modules(module: str) -> dict:
+    """
+    Imports a module in a new interpreter with -X importtime.
+    :param str module: the module to import
+    :return dict: cumulative import time (microseconds) of every imported module
+    """
+    _, stderr = run(arguments=['-X', 'importtime', '-c', f'import {module}'], repeat=1)
+
+    modules = dict()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+
+    return modules
+
+
+def save_cached_waves(data_folder: str, event_count: int):
+    """
+    Saves a graph of extracted flood waves, like `python -m src extract` does.
+    :param str data_folder: the data folder
+    :param int event_count: number of disjoint events
+    """
+    from benchmarks.benchmark_wave_graph import get_overlapping_graph
+    from src.data.generated_data_loader import GeneratedDataLoader
+    from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
+
+    fwg = get_overlapping_graph(gauge_count=4, width=2, event_count=event_count)
+    flood_wave_interface = FloodWaveExtractor(fwg=fwg)(with_equivalence=True)
+
+    GeneratedDataLoader.save_pickle(
+        folder_path=data_folder,
+        file_name='flood_waves',
+        graph=flood_wave_interface.extracted_graph,
+        vertex_interface=None
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    downloader_modules = get_imported_modules(module='src.data.data_downloader')
+    print(f"gdown imported with the downloader: {'gdown' in downloader_modules}, "
+          f"import time: {downloader_modules['src.data.data_downloader'] / 1000:.1f} ms")
+
+    results = {
+        'interpreter': run(arguments=['-c', 'pass'], repeat=args.repeat)[0],
+        'python -m src --help': run(arguments=['-m', 'src', '--help'], repeat=args.repeat)[0],
+        'analysis imports': run(
+            arguments=['-c', 'import src.analysis.statistical_analysis.statistical_analyzer'],
+            repeat=args.repeat
+        )[0]
+    }
+
+    with tempfile.TemporaryDirectory() as data_folder:
+        save_cached_waves(data_folder=data_folder, event_count=args.events)
+        results['cached analysis'] = run(
+            arguments=['-m', 'src', '--data-folder', data_folder, 'analyze', 'propagation-time',
+                       '--statistic', 'median', '--frequencies', 'monthly'],
+            repeat=args.repeat
+        )[0]
+
+    for name, milliseconds in results.items():
+        print(f'{name:>22}: {milliseconds:10.2f} ms')
+
+    work = results['cached analysis'] - results['analysis imports']
+    print(f"{'real work':>22}: {work:10.2f} ms "
+          f"({work / results['cached analysis']:.0%} of the cached analysis)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark of finding delta-peaks with several processes over shared memory.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_parallel_peaks --workers 1 2 4
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.benchmark_wave_graph import measure
+from src.data.data_handler import DataHandler
+from src.data.interfaces.data_interface import DataInterface
+from src.graph_building.delta_peak_finder import DeltaPeakFinder
+from src.graph_building.parallel_delta_peak_finder import ParallelDeltaPeakFinder
+
+
+def get_data_interface(gauge_count: int, day_count: int, storage: str) -> DataInterface:
+    """
+    Builds random walk water levels for the given number of gauges and days.
+    :param int gauge_count: number of gauges
+    :param int day_count: number of days
+    :param str storage: 'dense' or 'ragged'
+    :return DataInterface: the data
+    """
+    rng = np.random.default_rng(seed=0)
+    gauges = [f'{float(km)}' for km in range(gauge_count, 0, -1)]
+    dates = pd.date_range('1876-01-01', periods=day_count).strftime('%Y-%m-%d')
+
+    time_series = pd.DataFrame(
+        data=np.cumsum(rng.normal(size=(day_count, gauge_count)), axis=0).astype(np.float32),
+        index=dates,
+        columns=gauges
+    )
+    station_info = {
+        gauge: {
+            'life_interval': {'start': dates[0], 'end': dates[-1]},
+            'null_point': 0.0,
+            'level_group': 0.0
+        }
+        for gauge in gauges
+    }
+
+    data = {
+        'meta': pd.DataFrame(data={'river_km': list(map(float, gauges))}),
+        'gauges': gauges,
+        'station_info': station_info
+    }
+    if storage == 'ragged':
+        data['ragged_series'] = DataHandler.get_ragged_series(
+            time_series=time_series,
+            station_info=station_info,
+            gauges=gauges
+        )
+    else:
+        data['time_series'] = time_series
+
+    return DataInterface(data=data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--gauges', type=int, default=64)
+    parser.add_argument('--days', type=int, default=100000)
+    parser.add_argument('--delta', type=int, default=5)
+    parser.add_argument('--storage', choices=DataHandler.STORAGE_MODES, default='ragged')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data_interface = get_data_interface(
+        gauge_count=args.gauges,
+        day_count=args.days,
+        storage=args.storage
+    )
+
+    results = {
+        'DeltaPeakFinder': measure(
+            DeltaPeakFinder(data_interface=data_interface, delta=args.delta).run,
+            repeat=args.repeat
+        )
+    }
+    for workers in args.workers:
+        peak_finder = ParallelDeltaPeakFinder(
+            data_interface=data_interface,
+            delta=args.delta,
+            workers=workers
+        )
+        results[f'{workers} worker(s)'] = measure(peak_finder.run, repeat=args.repeat)
+
+    for name, milliseconds in results.items():
+        print(f'{name:>20}: {milliseconds:10.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark of the query service against loading the flood waves for every query
+(what one `python -m src analyze` call does after the interpreter started).
+Clients keep their connections alive and send a mix of queries,
+so identical queries are often in flight at the same time.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_query_service
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks.benchmark_import_time import save_cached_waves
+from src.__main__ import get_analysis_result, get_statistical_analyzer
+from src.service.query_service import QueryService
+
+QUERIES = (
+    {'analysis': 'flood-wave-count'},
+    {'analysis': 'propagation-time', 'statistic': 'mean'},
+    {'analysis': 'propagation-time', 'statistic': 'median', 'frequencies': 'monthly'},
+    {'analysis': 'propagation-time', 'lower_station': 1.0, 'upper_station': 3.0},
+    {'analysis': 'slope-distribution'},
+    {'analysis': 'slope-error-ratios', 'frequencies': 'yearly'}
+)
+
+
+def get_target(query: dict) -> str:
+    """
+    Returns the URL target of a query.
+    :param dict query: the query
+    :return str: path and query string
+    """
+    return '/query?' + '&'.join(f'{name}={value}' for name, value in query.items())
+
+
+def get_args(data_folder: str, query: dict) -> SimpleNamespace:
+    """
+    Returns the arguments of `python -m src analyze` for a query.
+    :param str data_folder: the data folder
+    :param dict query: the query
+    :return SimpleNamespace: the parsed arguments
+    """
+    return SimpleNamespace(data_folder=data_folder, input='flood_waves', **QueryService.get_query(params=query))
+
+
+async def run_client(port: int, targets: list) -> list:
+    """
+    Sends requests one after the other on a kept-alive connection.
+    :param int port: the port of the service
+    :param list targets: the targets of the requests
+    :return list: latencies in seconds
+    """
+    reader, writer = await asyncio.open_connection(host='127.0.0.1', port=port)
+    latencies = list()
+    for target in targets:
+        start = time.perf_counter()
+        writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        await writer.drain()
+
+        content_length = 0
+        await reader.readline()
+        while (line := await reader.readline()) != b'\r\n':
+            name, _, value = line.decode().partition(':')
+            if name.lower() == 'content-length':
+                content_length = int(value)
+        await reader.readexactly(content_length)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+    return latencies
+
+
+async def run_load(query_service: QueryService, clients: int, requests: int) -> tuple:
+    """
+    Runs concurrent clients against the service.
+    :param QueryService query_service: the service
+    :param int clients: number of concurrent clients
+    :param int requests: number of requests per client
+    :return tuple: the latencies in seconds and the wall time
+    """
+    rng = np.random.default_rng(seed=0)
+    server = await query_service.start_server(port=0)
+    port = server.sockets[0].getsockname()[1]
+
+    async with server:
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*[
+            run_client(
+                port=port,
+                targets=[get_target(query=QUERIES[i]) for i in rng.integers(len(QUERIES), size=requests)]
+            )
+            for _ in range(clients)
+        ])
+        wall_time = time.perf_counter() - start
+
+    return np.concatenate(latencies), wall_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=50, help='requests per client')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_folder:
+        save_cached_waves(data_folder=data_folder, event_count=args.events)
+
+        one_shot = list()
+        for query in QUERIES:
+            start = time.perf_counter()
+            query_args = get_args(data_folder=data_folder, query=query)
+            get_analysis_result(args=query_args, stat_analyzer=get_statistical_analyzer(args=query_args))
+            one_shot.append(time.perf_counter() - start)
+        print(f'load and analyze per query: {np.mean(one_shot) * 1000:10.2f} ms on average')
+
+        start = time.perf_counter()
+        stat_analyzer = get_statistical_analyzer(args=get_args(data_folder=data_folder, query=QUERIES[0]))
+        print(f'service start-up (loading once): {(time.perf_counter() - start) * 1000:10.2f} ms')
+
+    for clients in args.clients:
+        query_service = QueryService(stat_analyzer=stat_analyzer, workers=args.workers)
+        latencies, wall_time = asyncio.run(run_load(
+            query_service=query_service,
+            clients=clients,
+            requests=args.requests
+        ))
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+        print(f'{clients:>3} clients: p50 {p50:8.2f} ms, p95 {p95:8.2f} ms, '
+              f'{len(latencies) / wall_time:9.1f} queries/s, '
+              f"{query_service.counts['merged']} of {query_service.counts['queries']} merged")
+
+
+if __name__ == '__main__':
+    main()
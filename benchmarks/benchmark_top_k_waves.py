@@ -0,0 +1,95 @@
+"""
+Benchmark of the top-k flood wave queries against extracting all waves and sorting them.
+Events cover a random range of gauges and have random levels,
+so the bounds of their components differ.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_top_k_waves
+"""
+import argparse
+import time
+
+import networkx as nx
+import numpy as np
+
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.graph_cache import GraphCache
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
+from src.graph_manipulation.flood_wave_ranker import FloodWaveRanker
+
+
+def get_event_graph(gauge_count: int, event_count: int) -> tuple:
+    """
+    Builds an FWG of disjoint events with random reaches, widths and levels.
+    :param int gauge_count: number of gauges
+    :param int event_count: number of events
+    :return tuple: the graph (with its components) and the vertex data
+    """
+    rng = np.random.default_rng(seed=0)
+    gauges = [f'{float(km)}' for km in range(gauge_count, 0, -1)]
+
+    fwg = nx.DiGraph()
+    vertices = {gauge: dict() for gauge in gauges}
+    for event in range(event_count):
+        start = np.datetime64('1900-01-01') + 20 * event
+        first = int(rng.integers(0, gauge_count - 1))
+        length = int(rng.integers(2, gauge_count - first + 1))
+        width = int(rng.integers(1, 4))
+
+        layers = [
+            [(gauges[first + level], str(start + level + offset)) for offset in range(width)]
+            for level in range(length)
+        ]
+        for gauge, date in (node for layer in layers for node in layer):
+            vertices[gauge][date] = {'value': float(rng.integers(0, 1000)), 'color': 'red'}
+        fwg.add_edges_from(
+            (u, v, {'slope': 1.0})
+            for upper, lower in zip(layers[:-1], layers[1:])
+            for u in upper
+            for v in lower
+        )
+
+    # the graph is frozen, so its components are found once and reused
+    fwg = GraphCache.freeze(fwg=fwg)
+    ComponentTracker.get_components(fwg=fwg)
+
+    return fwg, VertexDataInterface(data={'vertices': vertices, 'river_kms': []})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--gauges', type=int, default=10)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args()
+
+    fwg, vertex_interface = get_event_graph(gauge_count=args.gauges, event_count=args.events)
+    target_station = float(args.gauges // 2)
+    ranker = FloodWaveRanker(fwg=fwg, vertex_interface=vertex_interface)
+
+    start = time.perf_counter()
+    flood_waves = FloodWaveExtractor(fwg=fwg).get_flood_waves(with_equivalence=True)
+    extraction_time = time.perf_counter() - start
+    print(f'components: {len(ComponentTracker.get_components(fwg=fwg).members)}, '
+          f'waves: {len(flood_waves)}, full extraction: {extraction_time * 1000:.1f} ms')
+
+    for criterion in FloodWaveRanker.CRITERIA:
+        target_gauge = str(target_station)
+        start = time.perf_counter()
+        scores = [ranker.get_score(wave=wave, criterion=criterion, target_gauge=target_gauge) for wave in flood_waves]
+        sorted(filter(lambda score: score is not None, scores), reverse=True)
+        sort_time = extraction_time + time.perf_counter() - start
+
+        for k in args.k:
+            start = time.perf_counter()
+            ranker.get_top_waves(k=k, criterion=criterion, target_station=target_station)
+            top_k_time = time.perf_counter() - start
+
+            print(f'{criterion:>10}, k={k:<4}: extract and sort {sort_time * 1000:9.1f} ms, '
+                  f'top-k {top_k_time * 1000:8.1f} ms '
+                  f'({ranker.extracted_component_count} components extracted)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark of the travel time lookup table against running FloodWaveAnalyzer
+with new station bounds for every query, on the event graph of benchmark_top_k_waves.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_travel_time_table
+"""
+import argparse
+import time
+import timeit
+
+from benchmarks.benchmark_top_k_waves import get_event_graph
+from src.analysis.statistical_analysis.statistical_analyzer import StatisticalAnalyzer
+from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--gauges', type=int, default=10)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=100000)
+    args = parser.parse_args()
+
+    fwg, vertex_interface = get_event_graph(gauge_count=args.gauges, event_count=args.events)
+    flood_wave_interface = FloodWaveExtractor(fwg=fwg)(with_equivalence=True)
+    stat_analyzer = StatisticalAnalyzer(flood_wave_interface=flood_wave_interface, vertex_interface=vertex_interface)
+
+    start = time.perf_counter()
+    table = stat_analyzer.get_travel_time_table()
+    print(f'waves: {len(flood_wave_interface.flood_waves)}, groups: {len(table.pair_counts)}, '
+          f'table built in {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    source, target = float(args.gauges), 1.0
+    start = time.perf_counter()
+    stat_analyzer.get_flood_wave_analyzer(
+        lower_station=target,
+        upper_station=source
+    ).get_propagation_time_stat(statistic='mean')
+    print(f'FloodWaveAnalyzer: {(time.perf_counter() - start) * 1000:.1f} ms per query')
+
+    for name, query in (
+            ('lag histogram', lambda: table.get_lag_histogram(source_station=source, target_station=target)),
+            ('level change quantiles', lambda: table.get_level_change_quantiles(
+                source_station=source, target_station=target, band='red'
+            ))
+    ):
+        query_time = timeit.timeit(query, number=args.queries) / args.queries
+        print(f'{name}: {query_time * 1e6:.2f} us per query')
+
+    query_time = timeit.timeit(lambda: table.get_arrivals(source_station=source), number=1000) / 1000
+    print(f'arrivals at every gauge: {query_time * 1e6:.1f} us per query')
+
+
+if __name__ == '__main__':
+    main()
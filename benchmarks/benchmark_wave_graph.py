@@ -0,0 +1,119 @@
+"""
+Benchmark of building the graph of extracted flood waves when many waves overlap.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_wave_graph
+"""
+import argparse
+import time
+
+import networkx as nx
+import numpy as np
+
+from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
+
+
+def get_overlapping_graph(gauge_count: int, width: int, event_count: int) -> nx.DiGraph:
+    """
+    Builds an FWG where every event is a complete layered graph,
+    so every path shares most of its edges with other paths.
+    :param int gauge_count: number of gauges (layers)
+    :param int width: number of peaks per gauge in each event
+    :param int event_count: number of disjoint events
+    :return nx.DiGraph: the graph
+    """
+    rng = np.random.default_rng(seed=0)
+    gauges = [f'{float(km)}' for km in range(gauge_count, 0, -1)]
+
+    fwg = nx.DiGraph()
+    for event in range(event_count):
+        start = np.datetime64('1900-01-01') + 30 * event
+        layers = [
+            [(gauge, str(start + level + offset)) for offset in range(width)]
+            for level, gauge in enumerate(gauges)
+        ]
+        fwg.add_edges_from(
+            (u, v, {'slope': float(rng.normal())})
+            for upper, lower in zip(layers[:-1], layers[1:])
+            for u in upper
+            for v in lower
+        )
+
+    return fwg
+
+
+def build_wave_graph_per_edge(fwg: nx.DiGraph, flood_waves: list) -> nx.DiGraph:
+    """
+    The previous implementation: one lookup and one insertion for every wave edge.
+    :param nx.DiGraph fwg: the graph
+    :param list flood_waves: extracted waves
+    :return nx.DiGraph: graph of the waves
+    """
+    extracted_graph = nx.DiGraph()
+    for wave in flood_waves:
+        for u, v in zip(wave[:-1], wave[1:]):
+            edge_data = fwg.get_edge_data(u, v)
+            extracted_graph.add_edge(u, v, **edge_data)
+
+    return extracted_graph
+
+
+def measure(function, repeat: int) -> float:
+    """
+    Returns the best wall time of a function in milliseconds.
+    :param function: the function to measure
+    :param int repeat: number of repetitions
+    :return float: the best time
+    """
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--gauges', type=int, default=6)
+    parser.add_argument('--width', type=int, default=4)
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    fwg = get_overlapping_graph(
+        gauge_count=args.gauges,
+        width=args.width,
+        event_count=args.events
+    )
+    extractor = FloodWaveExtractor(fwg=fwg)
+    flood_waves = extractor.get_flood_waves(with_equivalence=False)
+
+    wave_edge_count = sum(len(wave) - 1 for wave in flood_waves)
+    distinct_edge_count = len(FloodWaveExtractor.get_wave_edges(flood_waves=flood_waves))
+
+    print(f'waves: {len(flood_waves)}, wave edges: {wave_edge_count}, '
+          f'distinct edges: {distinct_edge_count}')
+
+    results = {
+        'per-edge insertion': measure(
+            lambda: build_wave_graph_per_edge(fwg=fwg, flood_waves=flood_waves),
+            repeat=args.repeat
+        ),
+        'bulk assembly': measure(
+            lambda: extractor.build_wave_graph(flood_waves=flood_waves),
+            repeat=args.repeat
+        ),
+        'edge-induced view': measure(
+            lambda: extractor.get_wave_subgraph_view(flood_waves=flood_waves),
+            repeat=args.repeat
+        )
+    }
+
+    for name, milliseconds in results.items():
+        print(f'{name:>20}: {milliseconds:10.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
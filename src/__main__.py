@@ -0,0 +1,473 @@
+"""
+Command-line entry point of the flood wave graph pipeline.
+
+    python -m src build    builds the FWG from the measurements
+    python -m src extract  extracts the flood waves from a built FWG
+    python -m src analyze  calculates statistics of the extracted flood waves
+    python -m src run      runs all steps with cached intermediate results
+    python -m src serve    answers queries about the extracted flood waves over HTTP
+    python -m src export   writes the flood waves or the edges of a graph as columnar records
+    python -m src diff     compares two saved graphs by their fingerprints
+
+The modules of the pipeline (and pandas, networkx) are imported by the commands,
+so the parser itself starts fast.
+"""
+import argparse
+import os
+import sys
+
+from src import ROOT_DIR
+
+FOLDER_LINK = 'https://drive.google.com/drive/folders/12pkrhybv52KpmeNYsHZRSkL9nfF3May2?usp=sharing'
+# the analyses of QueryService, repeated so that the parser imports nothing
+ANALYSES = (
+    'flood-wave-count',
+    'propagation-time',
+    'red-wave-count',
+    'red-propagation-time',
+    'slope-distribution',
+    'slope-error-ratios'
+)
+# the engines of EngineRegistry
+GRAPH_ENGINES = ('networkx', 'numpy')
+
+
+def get_data_folder(args: argparse.Namespace) -> str:
+    """
+    Returns the data folder of the pipeline.
+    :param argparse.Namespace args: the parsed arguments
+    :return str: path of the data folder
+    """
+    return args.data_folder or os.path.join(ROOT_DIR, 'data')
+
+
+def read_generated(args: argparse.Namespace) -> dict:
+    """
+    Reads the output of a previous command.
+    :param argparse.Namespace args: the parsed arguments
+    :return dict: the loaded graph and vertex data
+    """
+    from src.data.generated_data_loader import GeneratedDataLoader
+
+    return GeneratedDataLoader.read_pickle(
+        folder_path=os.path.join(get_data_folder(args=args), 'generated'),
+        file_name=args.input
+    )
+
+
+def build(args: argparse.Namespace):
+    """
+    Builds the FWG and saves it with the vertex data.
+    :param argparse.Namespace args: the parsed arguments
+    """
+    from src.data.data_downloader import DataDownloader
+    from src.data.data_downloader_base import DataDownloaderBase
+    from src.data.data_handler import DataHandler
+    from src.data.data_loader import DataLoader
+    from src.data.generated_data_loader import GeneratedDataLoader
+    from src.graph_building.chunked_graph_builder import ChunkedGraphBuilder
+    from src.graph_building.graph_builder import GraphBuilder
+
+    if args.data_folder is None:
+        data_downloader = DataDownloader(folder_link=args.folder_link)
+    else:
+        # the data must already be in the given folder
+        data_downloader = DataDownloaderBase(folder_link=args.folder_link, data_folder_path=args.data_folder)
+
+    data_loader = DataLoader(
+        data_downloader=data_downloader,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        load_measurements=args.storage == 'dense' and args.chunk_days is None
+    )
+
+    if args.chunk_days is None:
+        graph_builder = GraphBuilder(
+            data_interface=DataHandler(data_loader=data_loader, storage=args.storage).data_if,
+            delta=args.delta,
+            beta=args.beta,
+            alpha=args.alpha,
+            workers=args.workers
+        )
+        graph_builder.run()
+        vertex_interface = graph_builder.delta_peak_finder.vertex_interface
+    else:
+        # the measurements are read chunk by chunk by the builder, only the metadata is handled here
+        graph_builder = ChunkedGraphBuilder(
+            data_interface=DataHandler(data_loader=data_loader).data_if,
+            delta=args.delta,
+            beta=args.beta,
+            alpha=args.alpha,
+            chunk_days=args.chunk_days,
+            data_loader=data_loader
+        )
+        graph_builder.run()
+        vertex_interface = graph_builder.vertex_interface
+
+    GeneratedDataLoader.save_pickle(
+        folder_path=get_data_folder(args=args),
+        file_name=args.output,
+        graph=graph_builder.fwg_interface.fwg,
+        vertex_interface=vertex_interface,
+        components=graph_builder.fwg_interface.components
+    )
+
+
+def extract(args: argparse.Namespace):
+    """
+    Extracts the flood waves of a section of the FWG and saves their graph with the vertex data,
+    and their index next to it.
+    :param argparse.Namespace args: the parsed arguments
+    """
+    from src.data.generated_data_loader import GeneratedDataLoader
+    from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
+    from src.graph_manipulation.fwg_filter import FWGFilter
+
+    data = read_generated(args=args)
+
+    # the components tracked while building (or of the sections) are passed on
+    # instead of being searched again
+    fwg, components = FWGFilter.get_station_section(
+        fwg=data['graph'],
+        lower_station=args.lower_station,
+        upper_station=args.upper_station,
+        components=data.get('components')
+    )
+    fwg, components = FWGFilter.get_date_section(
+        fwg=fwg,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        components=components
+    )
+
+    flood_wave_interface = FloodWaveExtractor(
+        fwg=fwg,
+        components=components
+    )(with_equivalence=args.with_equivalence)
+
+    GeneratedDataLoader.save_pickle(
+        folder_path=get_data_folder(args=args),
+        file_name=args.output,
+        graph=flood_wave_interface.extracted_graph,
+        vertex_interface=data['vertex_interface']
+    )
+    GeneratedDataLoader.save_wave_index(
+        folder_path=get_data_folder(args=args),
+        file_name=args.output,
+        wave_index=flood_wave_interface.get_wave_index()
+    )
+
+
+def export(args: argparse.Namespace):
+    """
+    Writes the flood waves of a saved graph (or its edges) as columnar records in chunks,
+    the waves are found one component at a time, so the memory use does not grow with the output.
+    :param argparse.Namespace args: the parsed arguments
+    """
+    from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
+    from src.graph_manipulation.record_exporter import RecordExporter
+
+    data = read_generated(args=args)
+    exporter = RecordExporter(chunk_size=args.chunk_size)
+
+    if args.edges:
+        record_count = exporter.export_edges(
+            fwg=data['graph'],
+            file_path=args.output_file,
+            file_format=args.format
+        )
+    else:
+        record_count = exporter.export_waves(
+            flood_waves=FloodWaveExtractor(fwg=data['graph']).iter_flood_waves(
+                with_equivalence=args.with_equivalence
+            ),
+            file_path=args.output_file,
+            extracted_graph=data['graph'],
+            vertex_interface=data['vertex_interface'],
+            file_format=args.format
+        )
+    print(f'{record_count} records written to {args.output_file}')
+
+
+def diff(args: argparse.Namespace):
+    """
+    Compares a saved graph with another one (e.g. built with other parameters or corrected data),
+    and prints their digests and the numbers of added, removed and changed nodes, edges and components.
+    :param argparse.Namespace args: the parsed arguments
+    """
+    from src.data.generated_data_loader import GeneratedDataLoader
+    from src.graph_building.graph_fingerprinter import GraphFingerprinter
+
+    fingerprints = []
+    for file_name in (args.input, args.other):
+        data = GeneratedDataLoader.read_pickle(
+            folder_path=os.path.join(get_data_folder(args=args), 'generated'),
+            file_name=file_name
+        )
+        fingerprints.append(GraphFingerprinter.get_fingerprint(
+            fwg=data['graph'],
+            vertex_interface=data['vertex_interface']
+        ))
+        print(f'{file_name}: {fingerprints[-1].digest}')
+
+    graph_diff = GraphFingerprinter.diff(old=fingerprints[0], new=fingerprints[1])
+    if graph_diff.is_identical:
+        print('identical')
+        return
+
+    print('          added  removed  changed')
+    for name in ('nodes', 'edges'):
+        print(f'{name:<10}{len(getattr(graph_diff, f"added_{name}")):>5}'
+              f'{len(getattr(graph_diff, f"removed_{name}")):>9}'
+              f'{len(getattr(graph_diff, f"changed_{name}")):>9}')
+    print(f'{"components":<10}{len(graph_diff.added_component_ids):>5}'
+          f'{len(graph_diff.removed_component_ids):>9}'
+          f'{len(graph_diff.changed_component_ids):>9}')
+
+
+def get_statistical_analyzer(args: argparse.Namespace):
+    """
+    Reads the extracted flood waves of a previous command, and finds the waves in their graph.
+    :param argparse.Namespace args: the parsed arguments
+    :return StatisticalAnalyzer: analyzer of the flood waves
+    """
+    from src.analysis.statistical_analysis.statistical_analyzer import StatisticalAnalyzer
+    from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
+    from src.graph_manipulation.interfaces.flood_wave_interface import FloodWaveInterface
+
+    data = read_generated(args=args)
+    extracted_graph = data['graph']
+
+    flood_waves = FloodWaveExtractor(fwg=extracted_graph).get_flood_waves(
+        with_equivalence=args.with_equivalence
+    )
+
+    return StatisticalAnalyzer(
+        flood_wave_interface=FloodWaveInterface(data={
+            'flood_waves': flood_waves,
+            'extracted_graph': extracted_graph,
+            'vertex_interface': data['vertex_interface']
+        }),
+        vertex_interface=data['vertex_interface']
+    )
+
+
+def analyze(args: argparse.Namespace):
+    """
+    Calculates a statistic of the extracted flood waves, and prints it as CSV
+    (or writes one CSV file for each frequency into the output folder).
+    :param argparse.Namespace args: the parsed arguments
+    """
+    write_result(
+        result=get_analysis_result(args=args, stat_analyzer=get_statistical_analyzer(args=args)),
+        name=args.analysis,
+        output_folder=args.output_folder
+    )
+
+
+def serve(args: argparse.Namespace):
+    """
+    Loads the extracted flood waves once, and answers queries about them
+    until interrupted (see QueryService).
+    :param argparse.Namespace args: the parsed arguments
+    """
+    import asyncio
+
+    from src.service.query_service import QueryService
+
+    query_service = QueryService(stat_analyzer=get_statistical_analyzer(args=args), workers=args.workers)
+    address = args.unix_socket or f'http://{args.host}:{args.port}'
+    print(f'Serving queries on {address}', file=sys.stderr)
+
+    try:
+        asyncio.run(query_service.serve(host=args.host, port=args.port, unix_path=args.unix_socket))
+    except KeyboardInterrupt:
+        pass
+
+
+def run(args: argparse.Namespace):
+    """
+    Runs the whole pipeline with the stages cached (see PipelineRunner),
+    and writes the result of the analysis.
+    :param argparse.Namespace args: the parsed arguments
+    """
+    from src.pipeline.pipeline_runner import PipelineRunner
+    from src.pipeline.stage_cache import StageCache
+
+    stage_cache = StageCache(
+        cache_folder=args.cache_folder or os.path.join(get_data_folder(args=args), 'cache'),
+        max_size=None if args.max_cache_size is None else int(args.max_cache_size * 2 ** 20),
+        max_age=None if args.max_cache_age is None else args.max_cache_age * 86400
+    )
+    pipeline_runner = PipelineRunner(
+        data_folder=get_data_folder(args=args),
+        stage_cache=stage_cache,
+        delta=args.delta,
+        beta=args.beta,
+        alpha=args.alpha,
+        storage=args.storage,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        lower_station=args.lower_station,
+        upper_station=args.upper_station,
+        with_equivalence=args.with_equivalence
+    )
+    stat_analyzer = pipeline_runner.get_statistical_analyzer()
+
+    for stage, is_cached in pipeline_runner.cached.items():
+        print(f"{stage}: {'cached' if is_cached else 'computed'}", file=sys.stderr)
+
+    write_result(
+        result=get_analysis_result(args=args, stat_analyzer=stat_analyzer),
+        name=args.analysis,
+        output_folder=args.output_folder
+    )
+
+
+def get_analysis_result(args: argparse.Namespace, stat_analyzer) -> dict:
+    """
+    Calculates the selected statistic.
+    :param argparse.Namespace args: the parsed arguments
+    :param StatisticalAnalyzer stat_analyzer: analyzer of the extracted flood waves
+    :return dict: keys are frequencies, values are the respective data
+    """
+    from src.service.query_service import QueryService
+
+    query = QueryService.get_query(params={
+        'analysis': args.analysis,
+        'statistic': args.statistic,
+        'frequencies': args.frequencies,
+        'lower_station': args.lower_station,
+        'upper_station': args.upper_station,
+        'with_equivalence': args.with_equivalence,
+        'target_station': args.target_station,
+        'full_wave': args.full_wave
+    })
+
+    return QueryService(stat_analyzer=stat_analyzer, workers=1).compute(query=query)
+
+
+def write_result(result: dict, name: str, output_folder: str = None):
+    """
+    Writes the frames of a result as CSV.
+    :param dict result: keys are frequencies, values are the respective data
+    :param str name: name of the analysis
+    :param str output_folder: the folder of the CSV files, the standard output if None
+    """
+    if output_folder is not None:
+        os.makedirs(output_folder, exist_ok=True)
+
+    for frequency, df in result.items():
+        if output_folder is None:
+            print(f'# {name} ({frequency})')
+            df.to_csv(sys.stdout)
+        else:
+            df.to_csv(os.path.join(output_folder, f'{name}_{frequency}.csv'))
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """
+    Creates the parser of the command-line arguments.
+    :return argparse.ArgumentParser: the parser
+    """
+    parser = argparse.ArgumentParser(prog='python -m src', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-folder', default=None,
+                        help='folder of the input data and of the generated files '
+                             '(the data is downloaded into the default folder if missing)')
+    parser.add_argument('--graph-engine', choices=GRAPH_ENGINES, default=None,
+                        help='engine of the graph algorithms (networkx by default)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='build the FWG')
+    build_parser.set_defaults(function=build)
+    build_parser.add_argument('--folder-link', default=FOLDER_LINK)
+    build_parser.add_argument('--output', default='fwg')
+    build_parser.add_argument('--workers', type=int, default=1)
+    build_parser.add_argument('--chunk-days', type=int, default=None,
+                              help='build the graph in time chunks of this many days')
+
+    extract_parser = subparsers.add_parser('extract', help='extract the flood waves of the FWG')
+    extract_parser.set_defaults(function=extract)
+    extract_parser.add_argument('--input', default='fwg')
+    extract_parser.add_argument('--output', default='flood_waves')
+
+    analyze_parser = subparsers.add_parser('analyze', help='calculate statistics of the flood waves')
+    analyze_parser.set_defaults(function=analyze)
+    analyze_parser.add_argument('--input', default='flood_waves')
+
+    run_parser = subparsers.add_parser('run', help='run all steps with cached intermediate results')
+    run_parser.set_defaults(function=run)
+    run_parser.add_argument('--cache-folder', default=None,
+                            help='folder of the cached results (the cache folder of the data folder by default)')
+    run_parser.add_argument('--max-cache-size', type=float, default=None, help='in megabytes')
+    run_parser.add_argument('--max-cache-age', type=float, default=None, help='in days')
+
+    serve_parser = subparsers.add_parser('serve', help='answer queries about the flood waves over HTTP')
+    serve_parser.set_defaults(function=serve)
+    serve_parser.add_argument('--input', default='flood_waves')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--unix-socket', default=None, help='serve on this Unix socket instead of TCP')
+    serve_parser.add_argument('--workers', type=int, default=None, help='number of computing threads')
+    serve_parser.add_argument('--without-equivalence', dest='with_equivalence', action='store_false')
+
+    export_parser = subparsers.add_parser('export', help='write the flood waves or the edges as columnar records')
+    export_parser.set_defaults(function=export)
+    export_parser.add_argument('output_file', help='path of the output file (.csv, .npz or .parquet)')
+    export_parser.add_argument('--input', default='flood_waves')
+    export_parser.add_argument('--edges', action='store_true',
+                               help='write the edges of the input graph instead of its flood waves')
+    export_parser.add_argument('--format', choices=('csv', 'npz', 'parquet'), default=None,
+                               help='format of the output file (by its extension by default)')
+    export_parser.add_argument('--chunk-size', type=int, default=100000, help='number of records in a chunk')
+    export_parser.add_argument('--without-equivalence', dest='with_equivalence', action='store_false')
+
+    diff_parser = subparsers.add_parser('diff', help='compare two saved graphs')
+    diff_parser.set_defaults(function=diff)
+    diff_parser.add_argument('other', help='name of the graph compared with the input graph')
+    diff_parser.add_argument('--input', default='fwg')
+
+    for subparser in (build_parser, run_parser):
+        subparser.add_argument('--delta', type=int, default=2)
+        subparser.add_argument('--beta', type=int, default=2)
+        subparser.add_argument('--alpha', type=int, default=1)
+        subparser.add_argument('--storage', choices=('dense', 'ragged'), default='dense')
+
+    for subparser in (build_parser, extract_parser, run_parser):
+        subparser.add_argument('--start-date', default=None)
+        subparser.add_argument('--end-date', default=None)
+
+    for subparser in (extract_parser, analyze_parser, run_parser):
+        subparser.add_argument('--lower-station', type=float, default=None)
+        subparser.add_argument('--upper-station', type=float, default=None)
+        subparser.add_argument('--without-equivalence', dest='with_equivalence', action='store_false')
+
+    for subparser in (analyze_parser, run_parser):
+        subparser.add_argument('analysis', choices=ANALYSES)
+        subparser.add_argument('--statistic', default='mean')
+        subparser.add_argument('--frequencies', nargs='+', default=['yearly', 'quarterly'],
+                               choices=('yearly', 'quarterly', 'monthly', 'seasonal', 'hydrological'))
+        subparser.add_argument('--target-station', type=float, default=None)
+        subparser.add_argument('--full-wave', action='store_true',
+                               help='require the whole wave to be red')
+        subparser.add_argument('--output-folder', default=None)
+
+    return parser
+
+
+def main(argv: list = None):
+    """
+    Parses the command-line arguments and runs the selected command.
+    :param list argv: the command-line arguments, sys.argv[1:] if None
+    """
+    args = get_parser().parse_args(argv)
+    if args.graph_engine is not None:
+        from src.graph_engine.engine_registry import EngineRegistry
+
+        EngineRegistry.set_default_engine(engine=args.graph_engine)
+    args.function(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+class FenwickTree:
+    """
+    Binary indexed tree of counts. Counts are updated and prefix sums are queried
+    in logarithmic time, and the k-th smallest counted index is found
+    by descending the tree, so it can hold a sliding multiset of ranks.
+    """
+    def __init__(self, size: int):
+        """
+        Constructor.
+        :param int size: the number of indices (ranks)
+        """
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self.total = 0
+
+        self.top_step = 1
+        while self.top_step * 2 <= size:
+            self.top_step *= 2
+
+    def add(self, index: int, count: int):
+        """
+        Adds to the count of an index (removes if negative).
+        :param int index: the index (0-based)
+        :param int count: the change of its count
+        """
+        self.total += count
+        index += 1
+        while index <= self.size:
+            self.tree[index] += count
+            index += index & -index
+
+    def get_prefix_count(self, end: int) -> int:
+        """
+        Returns the total count of the indices before an index.
+        :param int end: the first index not counted
+        :return int: the count
+        """
+        count = 0
+        while end > 0:
+            count += self.tree[end]
+            end -= end & -end
+
+        return count
+
+    def find_kth(self, k: int) -> int:
+        """
+        Returns the index of the k-th smallest counted element.
+        :param int k: the position of the element among the counted ones (0-based)
+        :return int: the index
+        """
+        if not 0 <= k < self.total:
+            raise ValueError('k must be smaller than the total count')
+
+        index = 0
+        step = self.top_step
+        while step:
+            if index + step <= self.size and self.tree[index + step] <= k:
+                index += step
+                k -= self.tree[index]
+            step //= 2
+
+        return index
@@ -1,7 +1,12 @@
 import networkx as nx
 
+from src.analysis.statistical_analysis.period_engine import PeriodEngine
 from src.analysis.statistical_analysis.stat_calculator import StatCalculator
+from src.analysis.statistical_analysis.streaming_stat_calculator import StreamingStatCalculator
+from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
 from src.graph_manipulation.flood_wave_filter import FloodWaveFilter
+from src.graph_manipulation.fwg_filter import FWGFilter
+from src.graph_manipulation.interfaces.flood_wave_interface import FloodWaveInterface
 
 
 class FloodWaveAnalyzer:
@@ -26,40 +31,169 @@ class FloodWaveAnalyzer:
         self.upper_station = upper_station
         self.with_equivalence = with_equivalence
 
-    def get_flood_wave_count(self) -> dict:
+        self.flood_wave_interface: FloodWaveInterface = None
+        self.period_engine: PeriodEngine = None
+
+    def get_flood_wave_interface(self) -> FloodWaveInterface:
+        """
+        Finds the flood waves between the two stations on first use.
+        :return FloodWaveInterface: interface with the filtered waves
+        """
+        if self.flood_wave_interface is None:
+            self.flood_wave_interface = FloodWaveFilter.get_filtered_wave_interface(
+                extracted_graph=self.extracted_graph,
+                lower_station=self.lower_station,
+                upper_station=self.upper_station,
+                with_equivalence=self.with_equivalence
+            )
+
+        return self.flood_wave_interface
+
+    def get_period_engine(self) -> PeriodEngine:
+        """
+        Maps the start dates of the flood waves to period codes on first use.
+        :return PeriodEngine: the engine of the flood waves
+        """
+        if self.period_engine is None:
+            wave_features = self.get_flood_wave_interface().get_wave_features()
+            self.period_engine = PeriodEngine(days=wave_features['start_day'].to_numpy())
+
+        return self.period_engine
+
+    def get_flood_wave_count(self, frequencies: tuple = None) -> dict:
         """
         Calculates the number of flood waves between the two stations.
-        Data is aggregated yearly and quarterly.
+        Data is aggregated yearly and quarterly (or by the given frequencies).
+        :param tuple frequencies: the frequencies (see PeriodEngine.FREQUENCIES)
         :return dict: keys are frequencies, values are the respective data
         """
-        flood_waves = FloodWaveFilter.get_filtered_waves(
-            extracted_graph=self.extracted_graph,
-            lower_station=self.lower_station,
-            upper_station=self.upper_station,
-            with_equivalence=self.with_equivalence
-        )
         return StatCalculator.get_flood_wave_count(
-            flood_waves=flood_waves
+            wave_features=self.get_flood_wave_interface().get_wave_features(),
+            frequencies=frequencies,
+            period_engine=self.get_period_engine()
         )
 
     def get_propagation_time_stat(self, statistic: str = 'mean',
-                                  is_aggregated: bool = True) -> dict:
+                                  is_aggregated: bool = True,
+                                  frequencies: tuple = None) -> dict:
         """
         Calculates the selected statistic of flood wave
         propagation times between the two stations.
-        Data is aggregated yearly and quarterly.
+        Data is aggregated yearly and quarterly (or by the given frequencies).
         :param str statistic: the statistic to calculate
         :param bool is_aggregated: whether to aggregate by the statistic
+        :param tuple frequencies: the frequencies (see PeriodEngine.FREQUENCIES)
         :return dict: keys are frequencies, values are the respective data
         """
-        flood_waves = FloodWaveFilter.get_filtered_waves(
-            extracted_graph=self.extracted_graph,
-            lower_station=self.lower_station,
-            upper_station=self.upper_station,
-            with_equivalence=self.with_equivalence
-        )
         return StatCalculator.get_propagation_time_stat(
-            flood_waves=flood_waves,
+            wave_features=self.get_flood_wave_interface().get_wave_features(),
+            statistic=statistic,
+            is_aggregated=is_aggregated,
+            frequencies=frequencies,
+            period_engine=self.get_period_engine()
+        )
+
+    def get_rolling_flood_wave_count(self,
+                                     window: int,
+                                     frequency: str = 'yearly',
+                                     min_periods: int = None
+                                     ) -> dict:
+        """
+        Calculates the number of flood waves between the two stations
+        in the windows of periods ending in every period (e.g. of the last 5 years for every year).
+        :param int window: the number of periods in a window
+        :param str frequency: the frequency of the periods (see PeriodEngine.FREQUENCIES)
+        :param int min_periods: the number of periods of a window needed after the first period
+                                (the window by default, see PeriodRolling)
+        :return dict: the key is the frequency, the value is the respective data
+        """
+        return StatCalculator.get_rolling_flood_wave_count(
+            wave_features=self.get_flood_wave_interface().get_wave_features(),
+            window=window,
+            frequency=frequency,
+            min_periods=min_periods,
+            period_engine=self.get_period_engine()
+        )
+
+    def get_rolling_propagation_time_stat(self,
+                                          statistic: str = 'mean',
+                                          window: int = 10,
+                                          frequency: str = 'yearly',
+                                          min_periods: int = None
+                                          ) -> dict:
+        """
+        Calculates the selected statistic of the propagation times of flood waves
+        between the two stations in the windows of periods ending in every period
+        (e.g. the mean of the last 10 years for every year).
+        :param str statistic: the statistic to calculate (see PeriodRolling.STATISTICS)
+        :param int window: the number of periods in a window
+        :param str frequency: the frequency of the periods (see PeriodEngine.FREQUENCIES)
+        :param int min_periods: the number of periods of a window needed after the first period
+                                (the window by default, see PeriodRolling)
+        :return dict: the key is the frequency, the value is the respective data
+        """
+        return StatCalculator.get_rolling_propagation_time_stat(
+            wave_features=self.get_flood_wave_interface().get_wave_features(),
+            statistic=statistic,
+            window=window,
+            frequency=frequency,
+            min_periods=min_periods,
+            period_engine=self.get_period_engine()
+        )
+
+    def get_propagation_time_intervals(self,
+                                       statistic: str = 'mean',
+                                       frequencies: tuple = None,
+                                       replicates: int = 1000,
+                                       confidence: float = 0.95,
+                                       seed: int = None
+                                       ) -> dict:
+        """
+        Calculates the selected statistic of flood wave propagation times between
+        the two stations with bootstrap confidence intervals.
+        Data is aggregated yearly and quarterly (or by the given frequencies).
+        :param str statistic: the statistic to calculate (see PeriodBootstrap.STATISTICS)
+        :param tuple frequencies: the frequencies (see PeriodEngine.FREQUENCIES)
+        :param int replicates: the number of bootstrap replicates
+        :param float confidence: the confidence level of the intervals
+        :param int seed: seed of the resampling
+        :return dict: keys are frequencies, values are the respective data
+        """
+        return StatCalculator.get_propagation_time_intervals(
+            wave_features=self.get_flood_wave_interface().get_wave_features(),
             statistic=statistic,
-            is_aggregated=is_aggregated
+            frequencies=frequencies,
+            period_engine=self.get_period_engine(),
+            replicates=replicates,
+            confidence=confidence,
+            seed=seed
         )
+
+    def get_streaming_propagation_time_stat(self,
+                                            statistic: str = 'median',
+                                            q: float = None,
+                                            relative_accuracy: float = 0.01
+                                            ) -> dict:
+        """
+        Calculates the selected statistic of flood wave propagation times between
+        the two stations while the waves are extracted, without storing them.
+        Quantiles (median, quantile) are estimated within the given relative accuracy.
+        Data is aggregated yearly and quarterly.
+        :param str statistic: count, sum, mean, min, max, median or quantile
+        :param float q: the quantile to estimate if statistic is 'quantile'
+        :param float relative_accuracy: the maximal relative error of the quantiles
+        :return dict: keys are frequencies, values are the respective data
+        """
+        graph_section = FWGFilter.filter_stations(
+            fwg=self.extracted_graph,
+            lower_station=self.lower_station,
+            upper_station=self.upper_station
+        )
+        extractor = FloodWaveExtractor(fwg=graph_section)
+
+        calculator = StreamingStatCalculator(relative_accuracy=relative_accuracy)
+        calculator.consume(
+            flood_waves=extractor.iter_flood_waves(with_equivalence=self.with_equivalence)
+        )
+
+        return calculator.get_stats(statistic=statistic, q=q)
@@ -1,6 +1,10 @@
+import pandas as pd
+
+from src.analysis.statistical_analysis.period_engine import PeriodEngine
 from src.analysis.statistical_analysis.stat_calculator import StatCalculator
 from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
 from src.graph_manipulation.flood_wave_filter import FloodWaveFilter
+from src.graph_manipulation.interfaces.flood_wave_interface import FloodWaveInterface
 
 
 class HighWaterLevelAnalyzer:
@@ -8,62 +12,168 @@ class HighWaterLevelAnalyzer:
     This class gets statistics of high water level flood waves.
     """
     def __init__(self,
-                 flood_waves: list,
+                 flood_waves: list | FloodWaveInterface,
                  vertex_interface: VertexDataInterface,
                  target_station: float,
                  is_full_wave_considered: bool = False
                  ):
         """
         Constructor.
-        :param list flood_waves: list of flood waves to analyze
+        :param list | FloodWaveInterface flood_waves: list of flood waves to analyze,
+                                                      or an interface with a cached feature table
         :param VertexDataInterface vertex_interface: interface containing necessary
                                                      vertex data (colors)
         :param float target_station: the station to filter for
         :param bool is_full_wave_considered: True if we require all nodes in the wave to be red,
                                              False if we only consider the one at the target station
         """
-        self.flood_waves = flood_waves
+        if isinstance(flood_waves, FloodWaveInterface):
+            self.flood_wave_interface = flood_waves
+        else:
+            self.flood_wave_interface = FloodWaveInterface(data={'flood_waves': flood_waves})
+        self.flood_waves = self.flood_wave_interface.flood_waves
         self.vertex_interface = vertex_interface
         self.target_station = str(target_station)
         self.is_full_wave_considered = is_full_wave_considered
 
-    def get_red_wave_count_at_station(self) -> dict:
+        self.red_wave_features: pd.DataFrame = None
+        self.period_engine: PeriodEngine = None
+
+    def get_red_wave_features(self) -> pd.DataFrame:
+        """
+        Selects the red waves at the target station from the wave feature table on first use.
+        :return pd.DataFrame: the features of the red waves
+        """
+        if self.red_wave_features is None:
+            self.red_wave_features = FloodWaveFilter.get_red_wave_features(
+                flood_wave_interface=self.flood_wave_interface,
+                vertex_interface=self.vertex_interface,
+                target_station=self.target_station,
+                is_full_wave_considered=self.is_full_wave_considered
+            )
+
+        return self.red_wave_features
+
+    def get_period_engine(self) -> PeriodEngine:
+        """
+        Maps the start dates of the red flood waves to period codes on first use.
+        :return PeriodEngine: the engine of the red flood waves
+        """
+        if self.period_engine is None:
+            self.period_engine = PeriodEngine(
+                days=self.get_red_wave_features()['start_day'].to_numpy()
+            )
+
+        return self.period_engine
+
+    def get_red_wave_count_at_station(self, frequencies: tuple = None) -> dict:
         """
         Calculates the number of red flood waves that impacted the target station.
         A flood wave is considered red if it had a high water level
         at the target station (or throughout).
-        Data is aggregated yearly and quarterly.
+        Data is aggregated yearly and quarterly (or by the given frequencies).
+        :param tuple frequencies: the frequencies (see PeriodEngine.FREQUENCIES)
         :return dict: keys are frequencies, values are the respective data
         """
-        red_waves = FloodWaveFilter.get_red_waves(
-            flood_waves=self.flood_waves,
-            vertex_interface=self.vertex_interface,
-            target_station=self.target_station,
-            is_full_wave_considered=self.is_full_wave_considered
-        )
         return StatCalculator.get_flood_wave_count(
-            flood_waves=red_waves
+            wave_features=self.get_red_wave_features(),
+            frequencies=frequencies,
+            period_engine=self.get_period_engine()
         )
 
     def get_red_wave_propagation_time_stat(self,
                                            statistic: str = 'mean',
+                                           frequencies: tuple = None
                                            ) -> dict:
         """
         Calculates the chosen statistic for the propagation times of red flood waves
         that impacted the target station.
         A flood wave is considered red if it had a high water level
         at the target station (or throughout).
-        Data is aggregated yearly and quarterly.
+        Data is aggregated yearly and quarterly (or by the given frequencies).
         :param str statistic: the statistic to calculate (mean, median, etc.)
+        :param tuple frequencies: the frequencies (see PeriodEngine.FREQUENCIES)
         :return dict: keys are frequencies, values are the respective data
         """
-        red_waves = FloodWaveFilter.get_red_waves(
-            flood_waves=self.flood_waves,
-            vertex_interface=self.vertex_interface,
-            target_station=self.target_station,
-            is_full_wave_considered=self.is_full_wave_considered
-        )
         return StatCalculator.get_propagation_time_stat(
-            flood_waves=red_waves,
-            statistic=statistic
+            wave_features=self.get_red_wave_features(),
+            statistic=statistic,
+            frequencies=frequencies,
+            period_engine=self.get_period_engine()
+        )
+
+    def get_rolling_red_wave_count(self,
+                                   window: int,
+                                   frequency: str = 'yearly',
+                                   min_periods: int = None
+                                   ) -> dict:
+        """
+        Calculates the number of red flood waves at the target station
+        in the windows of periods ending in every period (e.g. of the last 5 years for every year).
+        :param int window: the number of periods in a window
+        :param str frequency: the frequency of the periods (see PeriodEngine.FREQUENCIES)
+        :param int min_periods: the number of periods of a window needed after the first period
+                                (the window by default, see PeriodRolling)
+        :return dict: the key is the frequency, the value is the respective data
+        """
+        return StatCalculator.get_rolling_flood_wave_count(
+            wave_features=self.get_red_wave_features(),
+            window=window,
+            frequency=frequency,
+            min_periods=min_periods,
+            period_engine=self.get_period_engine()
+        )
+
+    def get_rolling_red_wave_propagation_time_stat(self,
+                                                   statistic: str = 'mean',
+                                                   window: int = 10,
+                                                   frequency: str = 'yearly',
+                                                   min_periods: int = None
+                                                   ) -> dict:
+        """
+        Calculates the selected statistic of the propagation times of red flood waves
+        at the target station in the windows of periods ending in every period
+        (e.g. the mean of the last 10 years for every year).
+        :param str statistic: the statistic to calculate (see PeriodRolling.STATISTICS)
+        :param int window: the number of periods in a window
+        :param str frequency: the frequency of the periods (see PeriodEngine.FREQUENCIES)
+        :param int min_periods: the number of periods of a window needed after the first period
+                                (the window by default, see PeriodRolling)
+        :return dict: the key is the frequency, the value is the respective data
+        """
+        return StatCalculator.get_rolling_propagation_time_stat(
+            wave_features=self.get_red_wave_features(),
+            statistic=statistic,
+            window=window,
+            frequency=frequency,
+            min_periods=min_periods,
+            period_engine=self.get_period_engine()
+        )
+
+    def get_red_wave_propagation_time_intervals(self,
+                                                statistic: str = 'mean',
+                                                frequencies: tuple = None,
+                                                replicates: int = 1000,
+                                                confidence: float = 0.95,
+                                                seed: int = None
+                                                ) -> dict:
+        """
+        Calculates the chosen statistic for the propagation times of red flood waves
+        that impacted the target station, with bootstrap confidence intervals.
+        Data is aggregated yearly and quarterly (or by the given frequencies).
+        :param str statistic: the statistic to calculate (see PeriodBootstrap.STATISTICS)
+        :param tuple frequencies: the frequencies (see PeriodEngine.FREQUENCIES)
+        :param int replicates: the number of bootstrap replicates
+        :param float confidence: the confidence level of the intervals
+        :param int seed: seed of the resampling
+        :return dict: keys are frequencies, values are the respective data
+        """
+        return StatCalculator.get_propagation_time_intervals(
+            wave_features=self.get_red_wave_features(),
+            statistic=statistic,
+            frequencies=frequencies,
+            period_engine=self.get_period_engine(),
+            replicates=replicates,
+            confidence=confidence,
+            seed=seed
         )
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+from src.analysis.statistical_analysis.period_engine import PeriodEngine
+
+
+class PeriodBootstrap:
+    """
+    This class calculates bootstrap confidence intervals of period statistics.
+    The records of every period are resampled with replacement within the period.
+    The values are sorted by (period, value) once, and a replicate is a matrix row
+    of positions into the sorted values, drawn for all periods at once. Positions
+    stay inside the segment of their period, so sorting a row sorts every period,
+    and the statistics of all replicates are reduced along the rows per segment.
+    Replicates are drawn in blocks to bound the memory, from one seeded stream,
+    so the result does not depend on the block size.
+    """
+    STATISTICS = ('count', 'sum', 'mean', 'min', 'max', 'median', 'var', 'std')
+
+    def __init__(self,
+                 period_engine: PeriodEngine,
+                 replicates: int = 1000,
+                 confidence: float = 0.95,
+                 seed: int = None,
+                 max_block_size: int = 1 << 20
+                 ):
+        """
+        Constructor.
+        :param PeriodEngine period_engine: engine with the period codes of the records
+        :param int replicates: the number of bootstrap replicates
+        :param float confidence: the confidence level of the intervals
+        :param int seed: seed of the random generator (not reproducible if None)
+        :param int max_block_size: the maximal number of resampled values held at once
+        """
+        if replicates < 1:
+            raise ValueError('At least one replicate is needed')
+        if not 0 < confidence < 1:
+            raise ValueError('Confidence must be between 0 and 1')
+
+        self.period_engine = period_engine
+        self.replicates = replicates
+        self.confidence = confidence
+        self.seed = seed
+        self.max_block_size = max_block_size
+
+    def get_intervals(self,
+                      df: pd.DataFrame,
+                      statistic: str,
+                      frequencies: tuple = None
+                      ) -> dict:
+        """
+        We calculate the statistic of every column by period with its percentile interval.
+        The rows of the data must belong to the records of the engine.
+        :param pd.DataFrame df: data to aggregate
+        :param str statistic: statistic to calculate (see STATISTICS)
+        :param tuple frequencies: the frequencies (see PeriodEngine.FREQUENCIES)
+        :return dict: keys are frequencies, values are the respective data (PeriodIndex);
+                      every column is followed by its '... lower' and '... upper' bounds
+        """
+        if frequencies is None:
+            frequencies = PeriodEngine.DEFAULT_FREQUENCIES
+
+        estimates = self.period_engine.aggregate(df=df, statistic=statistic, frequencies=frequencies)
+        tail = (1 - self.confidence) / 2
+
+        frames = dict()
+        for frequency in frequencies:
+            columns = dict()
+            for column in df.columns:
+                replicate_stats = self.get_replicate_stats(
+                    values=df[column].to_numpy(),
+                    statistic=statistic,
+                    frequency=frequency
+                )
+                lower, upper = np.quantile(replicate_stats, [tail, 1 - tail], axis=0)
+
+                columns[column] = estimates[frequency][column].to_numpy()
+                columns[f'{column} lower'] = lower
+                columns[f'{column} upper'] = upper
+
+            frames[frequency] = pd.DataFrame(data=columns, index=estimates[frequency].index)
+
+        return frames
+
+    def get_replicate_stats(self,
+                            values: np.ndarray,
+                            statistic: str,
+                            frequency: str
+                            ) -> np.ndarray:
+        """
+        We calculate the statistic of every period in every replicate.
+        Missing values are skipped, periods without values are NaN.
+        :param np.ndarray values: the values of the records
+        :param str statistic: statistic to calculate (see STATISTICS)
+        :param str frequency: the frequency
+        :return np.ndarray: replicates in rows, periods (see PeriodEngine.get_period_range) in columns
+        """
+        if statistic not in self.STATISTICS:
+            raise ValueError(f'Statistic must be one of {self.STATISTICS}')
+
+        period_count = self.period_engine.get_period_range(frequency=frequency).size
+
+        values = np.asarray(values, dtype=np.float64)
+        is_valid = ~np.isnan(values) & self.period_engine.is_dated
+        positions = self.period_engine.get_positions(frequency=frequency, is_valid=is_valid)
+        values = values[is_valid]
+
+        order = np.lexsort((values, positions))
+        sorted_values = values[order]
+        sorted_positions = positions[order]
+
+        counts = np.bincount(positions, minlength=period_count)
+        starts = np.cumsum(counts) - counts
+        has_values = counts > 0
+
+        replicate_stats = np.full((self.replicates, period_count), np.nan)
+        if not values.size:
+            return replicate_stats
+
+        # the segment of each column of a replicate
+        column_starts = starts[sorted_positions]
+        column_counts = counts[sorted_positions]
+
+        rng = np.random.default_rng(seed=self.seed)
+        block_replicates = max(1, self.max_block_size // values.size)
+        for first in range(0, self.replicates, block_replicates):
+            block_size = min(block_replicates, self.replicates - first)
+            resampled = column_starts + (rng.random((block_size, values.size)) * column_counts).astype(np.int64)
+
+            replicate_stats[first:first + block_size, has_values] = self.get_segment_stats(
+                sorted_values=sorted_values,
+                resampled=resampled,
+                starts=starts[has_values],
+                counts=counts[has_values],
+                statistic=statistic
+            )
+
+        return replicate_stats
+
+    @staticmethod
+    def get_segment_stats(sorted_values: np.ndarray,
+                          resampled: np.ndarray,
+                          starts: np.ndarray,
+                          counts: np.ndarray,
+                          statistic: str
+                          ) -> np.ndarray:
+        """
+        We reduce a block of replicates segment by segment.
+        :param np.ndarray sorted_values: the values sorted by period and value
+        :param np.ndarray resampled: positions in the sorted values, replicates in rows
+        :param np.ndarray starts: the first column of every (non-empty) segment
+        :param np.ndarray counts: the number of columns of every segment
+        :param str statistic: statistic to calculate
+        :return np.ndarray: replicates in rows, segments in columns
+        """
+        if statistic == 'count':
+            return np.broadcast_to(counts.astype(np.float64), (len(resampled), len(counts)))
+
+        if statistic in ('min', 'max', 'median'):
+            # positions of a segment are sorted like its values
+            values = sorted_values[np.sort(resampled, axis=1)]
+            if statistic == 'min':
+                return values[:, starts]
+            if statistic == 'max':
+                return values[:, starts + counts - 1]
+            return (values[:, starts + (counts - 1) // 2] + values[:, starts + counts // 2]) / 2
+
+        values = sorted_values[resampled]
+        sums = np.add.reduceat(values, starts, axis=1)
+        if statistic == 'sum':
+            return sums
+        means = sums / counts
+        if statistic == 'mean':
+            return means
+
+        deviations = values - np.repeat(means, counts, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variances = np.where(
+                counts > 1,
+                np.add.reduceat(deviations ** 2, starts, axis=1) / (counts - 1),
+                np.nan
+            )
+
+        return variances if statistic == 'var' else np.sqrt(variances)
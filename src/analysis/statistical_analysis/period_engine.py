@@ -0,0 +1,315 @@
+import numpy as np
+import pandas as pd
+
+
+class PeriodEngine:
+    """
+    This class aggregates data by periods using integer period codes.
+    Day ordinals are mapped to month ordinals once. Every supported frequency
+    is a union of months, so decomposable statistics are calculated for each month
+    in one pass over the data, then rolled up to the requested frequencies.
+    Records without a date (NaT) belong to no period, they are skipped like in resample.
+    """
+    # frequency: (pandas period frequency, months per period, month shift)
+    # the period ordinal of a month ordinal m is (m + shift) // months per period
+    FREQUENCIES = {
+        'yearly': ('Y', 12, 0),
+        'quarterly': ('Q', 3, 0),
+        'monthly': ('M', 1, 0),
+        'seasonal': ('Q-NOV', 3, 1),
+        'hydrological': ('Y-OCT', 12, 2)
+    }
+    DEFAULT_FREQUENCIES = ('yearly', 'quarterly')
+    DECOMPOSABLE_STATISTICS = ('count', 'sum', 'mean', 'min', 'max', 'var', 'std')
+    # statistics counting records, their results are integers
+    COUNT_STATISTICS = ('count', 'nunique', 'size')
+    # the statistics of empty periods in resample, NaN for other statistics
+    EMPTY_PERIOD_VALUES = {'count': 0, 'nunique': 0, 'size': 0, 'sum': 0, 'prod': 1}
+
+    def __init__(self, days: np.ndarray):
+        """
+        Constructor.
+        :param np.ndarray days: the dates of the records (datetime64)
+        """
+        self.days = np.asarray(days)
+        months = self.days.astype('datetime64[M]')
+        # NaT months are replaced, so they do not overflow the period arithmetic
+        self.is_dated = ~np.isnat(months)
+        self.months = np.where(self.is_dated, months.astype(np.int64), 0)
+        self.codes = dict()
+
+    def get_codes(self, frequency: str) -> np.ndarray:
+        """
+        Returns the period ordinals of the records for a frequency (calculated once).
+        :param str frequency: the frequency (see FREQUENCIES)
+        :return np.ndarray: the period ordinals
+        """
+        if frequency not in self.FREQUENCIES:
+            raise ValueError(f'Frequency must be one of {tuple(self.FREQUENCIES)}')
+
+        if frequency not in self.codes:
+            _, months_per_period, shift = self.FREQUENCIES[frequency]
+            self.codes[frequency] = (self.months + shift) // months_per_period
+
+        return self.codes[frequency]
+
+    def select(self, positions: np.ndarray) -> 'PeriodEngine':
+        """
+        Returns an engine for a subset of the records, reusing the calculated codes.
+        :param np.ndarray positions: positions (or boolean mask) of the selected records
+        :return PeriodEngine: the engine of the subset
+        """
+        engine = PeriodEngine(days=np.zeros(0, dtype='datetime64[M]'))
+        engine.days = self.days[positions]
+        engine.months = self.months[positions]
+        engine.is_dated = self.is_dated[positions]
+        engine.codes = {frequency: codes[positions] for frequency, codes in self.codes.items()}
+
+        return engine
+
+    def aggregate(self,
+                  df: pd.DataFrame,
+                  statistic: str,
+                  frequencies: tuple = None
+                  ) -> dict:
+        """
+        We aggregate every column of the data by period.
+        The rows of the data must belong to the records of the engine.
+        Empty periods between the first and the last one are included, like in resample.
+        :param pd.DataFrame df: data to aggregate
+        :param str statistic: statistic to calculate
+        :param tuple frequencies: the frequencies (see FREQUENCIES)
+        :return dict: keys are frequencies, values are the respective data (PeriodIndex)
+        """
+        if frequencies is None:
+            frequencies = self.DEFAULT_FREQUENCIES
+
+        index_name = df.index.name
+        result = {frequency: dict() for frequency in frequencies}
+        for column in df.columns:
+            values = df[column].to_numpy()
+            for frequency, aggregated in self.aggregate_values(
+                values=values,
+                statistic=statistic,
+                frequencies=frequencies
+            ).items():
+                result[frequency][column] = aggregated
+
+        frames = dict()
+        for frequency in frequencies:
+            period_frequency = self.FREQUENCIES[frequency][0]
+            ordinals = self.get_period_range(frequency=frequency)
+
+            frames[frequency] = pd.DataFrame(
+                data=result[frequency],
+                index=pd.PeriodIndex.from_ordinals(ordinals, freq=period_frequency, name=index_name),
+                columns=df.columns
+            )
+
+        return frames
+
+    def get_period_range(self, frequency: str) -> np.ndarray:
+        """
+        Returns all period ordinals between the first and the last dated record.
+        :param str frequency: the frequency
+        :return np.ndarray: the period ordinals
+        """
+        codes = self.get_codes(frequency=frequency)[self.is_dated]
+        if not codes.size:
+            return np.zeros(0, dtype=np.int64)
+
+        return np.arange(codes.min(), codes.max() + 1)
+
+    def get_positions(self, frequency: str, is_valid: np.ndarray) -> np.ndarray:
+        """
+        Returns the positions of the periods of the selected records in get_period_range.
+        :param str frequency: the frequency
+        :param np.ndarray is_valid: boolean mask of the selected records (only dated ones, see is_dated)
+        :return np.ndarray: the period positions of the selected records
+        """
+        codes = self.get_codes(frequency=frequency)[is_valid]
+        ordinals = self.get_period_range(frequency=frequency)
+
+        return codes - ordinals[0] if ordinals.size else codes
+
+    def aggregate_values(self,
+                         values: np.ndarray,
+                         statistic: str,
+                         frequencies: tuple
+                         ) -> dict:
+        """
+        We aggregate one column for several frequencies.
+        :param np.ndarray values: the values of the records
+        :param str statistic: statistic to calculate
+        :param tuple frequencies: the frequencies
+        :return dict: keys are frequencies, values are the aggregated arrays
+        """
+        is_integer = values.dtype.kind in 'biu'
+        values = values.astype(np.float64)
+
+        if statistic in self.DECOMPOSABLE_STATISTICS:
+            aggregated = self.aggregate_decomposable(
+                values=values,
+                statistic=statistic,
+                frequencies=frequencies
+            )
+        elif statistic == 'median':
+            aggregated = {
+                frequency: self.get_medians(values=values, frequency=frequency)
+                for frequency in frequencies
+            }
+        else:
+            aggregated = {
+                frequency: self.aggregate_with_pandas(
+                    values=values,
+                    statistic=statistic,
+                    frequency=frequency
+                )
+                for frequency in frequencies
+            }
+
+        # keep integer types where resample would keep them
+        for frequency, array in aggregated.items():
+            if statistic in self.COUNT_STATISTICS or \
+                    is_integer and statistic in ('sum', 'min', 'max') and not np.isnan(array).any():
+                aggregated[frequency] = array.astype(np.int64)
+
+        return aggregated
+
+    def aggregate_decomposable(self,
+                               values: np.ndarray,
+                               statistic: str,
+                               frequencies: tuple
+                               ) -> dict:
+        """
+        We calculate count, sum, minimum, maximum and squared deviations for every month,
+        and combine them for each frequency. Missing values are skipped.
+        :param np.ndarray values: the values of the records
+        :param str statistic: statistic to calculate
+        :param tuple frequencies: the frequencies
+        :return dict: keys are frequencies, values are the aggregated arrays
+        """
+        is_valid = ~np.isnan(values) & self.is_dated
+        months = self.months[is_valid]
+        values = values[is_valid]
+
+        dated_months = self.months[self.is_dated]
+        first_month = dated_months.min() if dated_months.size else 0
+        month_count = dated_months.max() + 1 - first_month if dated_months.size else 0
+        month_positions = months - first_month
+
+        counts = np.bincount(month_positions, minlength=month_count)
+        sums = np.bincount(month_positions, weights=values, minlength=month_count)
+        minimums = np.full(month_count, np.inf)
+        np.minimum.at(minimums, month_positions, values)
+        maximums = np.full(month_count, -np.inf)
+        np.maximum.at(maximums, month_positions, values)
+
+        squared_deviations = np.zeros(month_count)
+        if statistic in ('var', 'std'):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                month_means = sums / counts
+            squared_deviations = np.bincount(
+                month_positions,
+                weights=(values - month_means[month_positions]) ** 2,
+                minlength=month_count
+            )
+
+        month_ordinals = np.arange(first_month, first_month + month_count)
+
+        aggregated = dict()
+        for frequency in frequencies:
+            _, months_per_period, shift = self.FREQUENCIES[frequency]
+            period_codes = (month_ordinals + shift) // months_per_period
+            period_positions = period_codes - period_codes.min() if period_codes.size else period_codes
+            period_count = self.get_period_range(frequency=frequency).size
+
+            period_counts = np.bincount(period_positions, weights=counts, minlength=period_count)
+            period_sums = np.bincount(period_positions, weights=sums, minlength=period_count)
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                if statistic == 'count':
+                    array = period_counts
+                elif statistic == 'sum':
+                    array = period_sums
+                elif statistic == 'mean':
+                    array = np.where(period_counts > 0, period_sums / period_counts, np.nan)
+                elif statistic in ('min', 'max'):
+                    array = np.full(period_count, np.inf if statistic == 'min' else -np.inf)
+                    ufunc = np.minimum if statistic == 'min' else np.maximum
+                    ufunc.at(array, period_positions, minimums if statistic == 'min' else maximums)
+                    array[period_counts == 0] = np.nan
+                else:
+                    # parallel variance: within-month deviations + between-month deviations
+                    period_means = period_sums / period_counts
+                    month_means = np.where(counts > 0, sums / counts, 0)
+                    between = counts * (month_means - period_means[period_positions]) ** 2
+                    deviations = np.bincount(
+                        period_positions,
+                        weights=squared_deviations + np.where(counts > 0, between, 0),
+                        minlength=period_count
+                    )
+                    array = np.where(period_counts > 1, deviations / (period_counts - 1), np.nan)
+                    if statistic == 'std':
+                        array = np.sqrt(array)
+
+            aggregated[frequency] = array
+
+        return aggregated
+
+    def get_medians(self, values: np.ndarray, frequency: str) -> np.ndarray:
+        """
+        We calculate the median of every period from values grouped by period and sorted.
+        :param np.ndarray values: the values of the records
+        :param str frequency: the frequency
+        :return np.ndarray: the medians (NaN for empty periods)
+        """
+        period_count = self.get_period_range(frequency=frequency).size
+
+        is_valid = ~np.isnan(values) & self.is_dated
+        positions = self.get_positions(frequency=frequency, is_valid=is_valid)
+        values = values[is_valid]
+
+        order = np.lexsort((values, positions))
+        sorted_values = values[order]
+
+        counts = np.bincount(positions, minlength=period_count)
+        starts = np.cumsum(counts) - counts
+
+        medians = np.full(period_count, np.nan)
+        has_values = counts > 0
+        lower = starts[has_values] + (counts[has_values] - 1) // 2
+        upper = starts[has_values] + counts[has_values] // 2
+        medians[has_values] = (sorted_values[lower] + sorted_values[upper]) / 2
+
+        return medians
+
+    def aggregate_with_pandas(self,
+                              values: np.ndarray,
+                              statistic: str,
+                              frequency: str
+                              ) -> np.ndarray:
+        """
+        Fallback for statistics without a vectorized implementation:
+        we group by the period codes with pandas. Like in resample, the records are
+        ordered by date (e.g. for 'first' and 'last'), and empty periods get
+        the statistic of no records (see EMPTY_PERIOD_VALUES).
+        :param np.ndarray values: the values of the records
+        :param str statistic: statistic to calculate
+        :param str frequency: the frequency
+        :return np.ndarray: the aggregated values
+        """
+        codes = self.get_codes(frequency=frequency)[self.is_dated]
+        values = values[self.is_dated]
+        order = np.argsort(self.days[self.is_dated], kind='stable')
+        grouped = pd.Series(values[order]).groupby(codes[order])
+
+        try:
+            aggregated = getattr(grouped, statistic)()
+        except AttributeError:
+            raise ValueError('Invalid statistic')
+
+        return aggregated.reindex(
+            self.get_period_range(frequency=frequency),
+            fill_value=self.EMPTY_PERIOD_VALUES.get(statistic, np.nan)
+        ).to_numpy(dtype=np.float64)
@@ -0,0 +1,273 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.statistical_analysis.fenwick_tree import FenwickTree
+from src.analysis.statistical_analysis.period_engine import PeriodEngine
+
+
+class PeriodRolling:
+    """
+    This class calculates statistics over trailing windows of periods
+    (e.g. the mean of the last 10 years, for every year).
+    Counts and sums are calculated per period once, and the windows are
+    differences of their prefix sums. Minimums and maximums slide with a monotonic queue,
+    and order statistics with a Fenwick tree of value ranks: the values of a period
+    are added when it enters the window and removed when it leaves.
+    So the cost is linear in the number of records and periods, not in the number of windows.
+    Variances are combined from the means and squared deviations of the periods
+    (like in PeriodEngine.aggregate_decomposable), which costs the number of periods
+    times the window size, but does not lose precision to cancellation.
+    """
+    STATISTICS = ('count', 'sum', 'mean', 'min', 'max', 'median', 'quantile', 'var', 'std')
+
+    def __init__(self,
+                 period_engine: PeriodEngine,
+                 window: int,
+                 frequency: str = 'yearly',
+                 min_periods: int = None
+                 ):
+        """
+        Constructor.
+        :param PeriodEngine period_engine: engine with the period codes of the records
+        :param int window: the number of periods in a window
+        :param str frequency: the frequency of the periods (see PeriodEngine.FREQUENCIES)
+        :param int min_periods: the number of periods of a window that must be
+                                after the first period of the data (the window by default),
+                                the statistic of windows reaching further back is NaN
+        """
+        if window < 1:
+            raise ValueError('A window must contain at least one period')
+        if frequency not in PeriodEngine.FREQUENCIES:
+            raise ValueError(f'Frequency must be one of {tuple(PeriodEngine.FREQUENCIES)}')
+
+        self.period_engine = period_engine
+        self.window = window
+        self.frequency = frequency
+        self.min_periods = window if min_periods is None else min_periods
+
+    def aggregate(self, df: pd.DataFrame, statistic: str, q: float = None) -> pd.DataFrame:
+        """
+        We calculate the statistic of every column over the windows ending in each period.
+        The rows of the data must belong to the records of the engine.
+        :param pd.DataFrame df: data to aggregate
+        :param str statistic: statistic to calculate (see STATISTICS)
+        :param float q: the quantile to calculate if statistic is 'quantile'
+        :return pd.DataFrame: the statistics indexed by the last period of the windows
+        """
+        ordinals = self.period_engine.get_period_range(frequency=self.frequency)
+
+        return pd.DataFrame(
+            data={
+                column: self.aggregate_values(values=df[column].to_numpy(), statistic=statistic, q=q)
+                for column in df.columns
+            },
+            index=pd.PeriodIndex.from_ordinals(
+                ordinals,
+                freq=PeriodEngine.FREQUENCIES[self.frequency][0],
+                name=df.index.name
+            ),
+            columns=df.columns
+        )
+
+    def aggregate_values(self, values: np.ndarray, statistic: str, q: float = None) -> np.ndarray:
+        """
+        We calculate the statistic of one column over the windows. Missing values are skipped.
+        :param np.ndarray values: the values of the records
+        :param str statistic: statistic to calculate
+        :param float q: the quantile to calculate if statistic is 'quantile'
+        :return np.ndarray: the statistic of the window ending in each period
+        """
+        if statistic not in self.STATISTICS:
+            raise ValueError(f'Statistic must be one of {self.STATISTICS}')
+        if statistic == 'quantile' and (q is None or not 0 <= q <= 1):
+            raise ValueError('A quantile between 0 and 1 must be given')
+
+        period_count = self.period_engine.get_period_range(frequency=self.frequency).size
+
+        is_integer = values.dtype.kind in 'biu'
+        values = values.astype(np.float64)
+        is_valid = ~np.isnan(values) & self.period_engine.is_dated
+        positions = self.period_engine.get_positions(frequency=self.frequency, is_valid=is_valid)
+        values = values[is_valid]
+
+        window_counts = self.get_window_sums(array=np.bincount(positions, minlength=period_count))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if statistic == 'count':
+                result = window_counts
+            elif statistic in ('sum', 'mean', 'var', 'std'):
+                result = self.get_moments(
+                    values=values,
+                    positions=positions,
+                    window_counts=window_counts,
+                    statistic=statistic
+                )
+            elif statistic in ('min', 'max'):
+                result = self.get_extremes(
+                    values=values,
+                    positions=positions,
+                    period_count=period_count,
+                    statistic=statistic
+                )
+            else:
+                result = self.get_quantiles(
+                    values=values,
+                    positions=positions,
+                    period_count=period_count,
+                    q=0.5 if statistic == 'median' else q
+                )
+
+        # windows reaching before the data
+        periods_in_window = np.minimum(np.arange(1, period_count + 1), self.window)
+        is_complete = periods_in_window >= self.min_periods
+
+        result = np.where(is_complete, result, np.nan)
+
+        # keep integer types where resample would keep them
+        if is_complete.all() and (statistic == 'count' or
+                                  is_integer and statistic in ('sum', 'min', 'max') and
+                                  not np.isnan(result).any()):
+            result = result.astype(np.int64)
+
+        return result
+
+    def get_window_sums(self, array: np.ndarray) -> np.ndarray:
+        """
+        Sums an array of periods over the windows with prefix sums.
+        :param np.ndarray array: a value for every period
+        :return np.ndarray: the sum of the window ending in each period
+        """
+        prefix_sums = np.concatenate(([0], np.cumsum(array)))
+        ends = np.arange(1, len(array) + 1)
+
+        return prefix_sums[ends] - prefix_sums[np.maximum(ends - self.window, 0)]
+
+    def get_moments(self,
+                    values: np.ndarray,
+                    positions: np.ndarray,
+                    window_counts: np.ndarray,
+                    statistic: str
+                    ) -> np.ndarray:
+        """
+        We calculate sums and means of the windows from the sums of the periods.
+        Variances are combined from the counts, means and squared deviations of the periods:
+        within-period deviations + between-period deviations from the mean of the window.
+        :param np.ndarray values: the valid values
+        :param np.ndarray positions: the periods of the values
+        :param np.ndarray window_counts: the number of values in each window
+        :param str statistic: 'sum', 'mean', 'var' or 'std'
+        :return np.ndarray: the statistic of each window
+        """
+        period_count = len(window_counts)
+        if statistic in ('sum', 'mean'):
+            window_sums = self.get_window_sums(
+                array=np.bincount(positions, weights=values, minlength=period_count)
+            )
+            if statistic == 'sum':
+                return window_sums
+            return np.where(window_counts > 0, window_sums / window_counts, np.nan)
+
+        counts = np.bincount(positions, minlength=period_count)
+        sums = np.bincount(positions, weights=values, minlength=period_count)
+        means = np.where(counts > 0, sums / counts, 0)
+        squared_deviations = np.bincount(
+            positions,
+            weights=(values - means[positions]) ** 2,
+            minlength=period_count
+        )
+
+        # the sums of the windows are added up period by period, not from prefix sums,
+        # so the mean of a constant window is exact
+        window_sums = np.zeros(period_count)
+        for shift in range(min(self.window, period_count)):
+            window_sums[shift:] += sums[:period_count - shift]
+        window_means = np.where(window_counts > 0, window_sums / window_counts, 0)
+
+        deviations = np.zeros(period_count)
+        for shift in range(min(self.window, period_count)):
+            deviations[shift:] += squared_deviations[:period_count - shift] + \
+                counts[:period_count - shift] * (means[:period_count - shift] - window_means[shift:]) ** 2
+
+        variances = np.where(window_counts > 1, deviations / (window_counts - 1), np.nan)
+
+        return variances if statistic == 'var' else np.sqrt(variances)
+
+    def get_extremes(self,
+                     values: np.ndarray,
+                     positions: np.ndarray,
+                     period_count: int,
+                     statistic: str
+                     ) -> np.ndarray:
+        """
+        We slide the extremes of the periods over the windows with a monotonic queue.
+        :param np.ndarray values: the valid values
+        :param np.ndarray positions: the periods of the values
+        :param int period_count: the number of periods
+        :param str statistic: 'min' or 'max'
+        :return np.ndarray: the statistic of each window
+        """
+        # maximums are the minimums of the negated values
+        sign = 1 if statistic == 'min' else -1
+        extremes = np.full(period_count, np.inf)
+        np.minimum.at(extremes, positions, sign * values)
+        extremes = extremes.tolist()
+
+        result = np.full(period_count, np.nan)
+        # periods with increasing extremes, the first one is the extreme of the window
+        queue = deque()
+        for period, extreme in enumerate(extremes):
+            while queue and extremes[queue[-1]] >= extreme:
+                queue.pop()
+            queue.append(period)
+            if queue[0] <= period - self.window:
+                queue.popleft()
+            if extremes[queue[0]] != np.inf:
+                result[period] = sign * extremes[queue[0]]
+
+        return result
+
+    def get_quantiles(self,
+                      values: np.ndarray,
+                      positions: np.ndarray,
+                      period_count: int,
+                      q: float
+                      ) -> np.ndarray:
+        """
+        We keep the ranks of the values in the window in a Fenwick tree,
+        and find the quantiles (interpolated linearly, like pandas) by their ranks.
+        Equal values of a period are added and removed at once.
+        :param np.ndarray values: the valid values
+        :param np.ndarray positions: the periods of the values
+        :param int period_count: the number of periods
+        :param float q: the quantile
+        :return np.ndarray: the quantile of each window
+        """
+        unique_values, ranks = np.unique(values, return_inverse=True)
+        # (period, rank) pairs with their counts, ordered by period
+        pairs, pair_counts = np.unique(positions * len(unique_values) + ranks.reshape(-1), return_counts=True)
+        pair_periods, pair_ranks = np.divmod(pairs, max(len(unique_values), 1))
+        pair_starts = np.searchsorted(pair_periods, np.arange(period_count + 1)).tolist()
+        pair_ranks = pair_ranks.tolist()
+        pair_counts = pair_counts.tolist()
+        unique_values = unique_values.tolist()
+
+        tree = FenwickTree(size=len(unique_values))
+        result = np.full(period_count, np.nan)
+        for period in range(period_count):
+            for i in range(pair_starts[period], pair_starts[period + 1]):
+                tree.add(index=pair_ranks[i], count=pair_counts[i])
+            leaving = period - self.window
+            if leaving >= 0:
+                for i in range(pair_starts[leaving], pair_starts[leaving + 1]):
+                    tree.add(index=pair_ranks[i], count=-pair_counts[i])
+
+            if tree.total:
+                position = (tree.total - 1) * q
+                lower = int(np.floor(position))
+                lower_value = unique_values[tree.find_kth(k=lower)]
+                upper_value = unique_values[tree.find_kth(k=min(lower + 1, tree.total - 1))]
+                result[period] = lower_value + (position - lower) * (upper_value - lower_value)
+
+        return result
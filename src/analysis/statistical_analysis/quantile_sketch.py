@@ -0,0 +1,111 @@
+import math
+
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative error guarantee (DDSketch).
+    Values are counted in logarithmic buckets, so memory depends on
+    the range of the values, not on their number.
+    """
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-9):
+        """
+        Constructor.
+        :param float relative_accuracy: the maximal relative error of the quantiles
+        :param float min_value: absolute values below this are counted as zero
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('Relative accuracy must be between 0 and 1')
+
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+
+        self.positive = dict()
+        self.negative = dict()
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, values: np.ndarray):
+        """
+        Adds values to the sketch.
+        :param np.ndarray values: the values to add (NaN values are skipped)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+
+        is_zero = np.abs(values) < self.min_value
+        self.zero_count += int(is_zero.sum())
+        self.count += len(values)
+
+        for store, selected in ((self.positive, values[~is_zero & (values > 0)]),
+                                (self.negative, -values[~is_zero & (values < 0)])):
+            if not selected.size:
+                continue
+            keys, counts = np.unique(
+                np.ceil(np.log(selected) / self.log_gamma).astype(np.int64),
+                return_counts=True
+            )
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                store[key] = store.get(key, 0) + count
+
+    def merge(self, other: 'QuantileSketch'):
+        """
+        Adds the values of another sketch with the same accuracy to this one.
+        :param QuantileSketch other: the other sketch
+        """
+        if other.gamma != self.gamma:
+            raise ValueError('Only sketches with the same accuracy can be merged')
+
+        for store, other_store in ((self.positive, other.positive),
+                                   (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def get_value(self, rank: int) -> float:
+        """
+        Estimates the value with the given rank (0-based, in increasing order).
+        :param int rank: the rank of the value
+        :return float: the estimated value
+        """
+        for key in sorted(self.negative, reverse=True):
+            rank -= self.negative[key]
+            if rank < 0:
+                return -2 * self.gamma ** key / (self.gamma + 1)
+
+        rank -= self.zero_count
+        if rank < 0:
+            return 0.0
+
+        for key in sorted(self.positive):
+            rank -= self.positive[key]
+            if rank < 0:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+
+        raise IndexError('Rank is out of range')
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile with linear interpolation between the neighbouring ranks
+        (like pandas). The error is at most relative_accuracy times the interpolated
+        absolute values of the neighbouring ranks.
+        :param float q: the quantile (between 0 and 1)
+        :return float: the estimated quantile, NaN if the sketch is empty
+        """
+        if not self.count:
+            return np.nan
+
+        position = q * (self.count - 1)
+        lower_rank = math.floor(position)
+        lower_value = self.get_value(rank=lower_rank)
+        if position == lower_rank:
+            return lower_value
+
+        upper_value = self.get_value(rank=lower_rank + 1)
+
+        return lower_value + (position - lower_rank) * (upper_value - lower_value)
@@ -2,76 +2,281 @@ import networkx as nx
 import numpy as np
 import pandas as pd
 
+from src.analysis.statistical_analysis.period_engine import PeriodEngine
+from src.graph_building.interfaces.edge_array_interface import EdgeArrayInterface
+from src.graph_engine.engine_registry import EngineRegistry
+from src.graph_engine.graph_engine import GraphEngine
 from src.graph_manipulation.fwg_filter import FWGFilter
 
 
 class SlopeAnalyzer:
     """
     This class is responsible for the analysis of slope values.
+    The edges of the graph are collected into arrays once (see EdgeArrayCollector),
+    every statistic is calculated from these arrays.
     """
-    def __init__(self, fwg: nx.DiGraph):
+    def __init__(self, fwg: nx.DiGraph, engine: GraphEngine | str = None):
         """
         Constructor.
         :param nx.DiGraph fwg: the flood wave graph to analyze
+        :param GraphEngine | str engine: the graph engine collecting the edges (see EngineRegistry)
         """
         self.fwg = fwg
+        self.engine = EngineRegistry.get_engine(engine=engine)
+        self.period_engine: PeriodEngine = None
+        self.period_engine_edges: EdgeArrayInterface = None
+
+    def get_edge_arrays(self) -> EdgeArrayInterface:
+        """
+        Returns the edge arrays of the graph. They are collected again for a mutable graph,
+        so every statistic collects them once and passes them on.
+        :return EdgeArrayInterface: the edge arrays
+        """
+        return self.engine.get_edge_arrays(fwg=self.fwg)
+
+    def get_period_engine(self, edge_arrays: EdgeArrayInterface = None) -> PeriodEngine:
+        """
+        Maps the dates of the edges to period codes, once for the same edge arrays.
+        :param EdgeArrayInterface edge_arrays: the edge arrays (collected if None)
+        :return PeriodEngine: the engine of all edges
+        """
+        if edge_arrays is None:
+            edge_arrays = self.get_edge_arrays()
+        if self.period_engine_edges is not edge_arrays:
+            self.period_engine = PeriodEngine(days=edge_arrays.days)
+            self.period_engine_edges = edge_arrays
+
+        return self.period_engine
+
+    def get_edge_mask(self,
+                      lower_station: float = None,
+                      upper_station: float = None,
+                      edge_arrays: EdgeArrayInterface = None
+                      ) -> np.ndarray:
+        """
+        Selects the edges between two stations, like FWGFilter.filter_stations does.
+        :param float lower_station: the downstream station
+        :param float upper_station: the upstream station
+        :param EdgeArrayInterface edge_arrays: the edge arrays (collected if None)
+        :return np.ndarray: mask of the selected edges
+        """
+        if edge_arrays is None:
+            edge_arrays = self.get_edge_arrays()
+        config = FWGFilter.load_config()
+
+        if lower_station is None:
+            lower_station = config['lower_station']
+        if upper_station is None:
+            upper_station = config['upper_station']
+
+        if lower_station == config['lower_station'] and upper_station == config['upper_station']:
+            return np.ones(edge_arrays.edge_count, dtype=bool)
+
+        if upper_station < lower_station:
+            raise ValueError('Upper station must be upstream from the lower station')
+
+        is_gauge_inside = (edge_arrays.gauges >= lower_station) & (edge_arrays.gauges <= upper_station)
+
+        return is_gauge_inside[edge_arrays.upstream_ids] & is_gauge_inside[edge_arrays.downstream_ids]
+
+    def get_station_pairs(self, mask: np.ndarray = None, edge_arrays: EdgeArrayInterface = None) -> tuple:
+        """
+        Numbers the (upstream, downstream) station pairs of the edges.
+        :param np.ndarray mask: mask of the edges to consider
+        :param EdgeArrayInterface edge_arrays: the edge arrays (collected if None)
+        :return tuple: the pair index ((upper station, lower station), sorted)
+                       and the pair id of every selected edge
+        """
+        if edge_arrays is None:
+            edge_arrays = self.get_edge_arrays()
+        upstream_ids = edge_arrays.upstream_ids
+        downstream_ids = edge_arrays.downstream_ids
+        if mask is not None:
+            upstream_ids = upstream_ids[mask]
+            downstream_ids = downstream_ids[mask]
+
+        pair_codes, pair_ids = np.unique(
+            upstream_ids * len(edge_arrays.gauges) + downstream_ids,
+            return_inverse=True
+        )
+        pair_index = pd.MultiIndex.from_arrays(
+            arrays=[
+                edge_arrays.gauges[pair_codes // len(edge_arrays.gauges)],
+                edge_arrays.gauges[pair_codes % len(edge_arrays.gauges)]
+            ],
+            names=['upper station', 'lower station']
+        )
+
+        return pair_index, pair_ids.reshape(-1)
 
     def get_slope_distribution(self) -> dict:
         """
         Count the ratio of edges with positive/zero/negative slopes.
         :return dict: ratios {'positive': x, 'zero': y, 'negative': z}
         """
-        slopes = [data.get('slope') for _, _, data in self.fwg.edges(data=True)]
-        if not slopes:
+        slopes = self.get_edge_arrays().slopes
+        if not slopes.size:
             return {'positive': 0.0, 'zero': 0.0, 'negative': 0.0}
 
-        df = pd.DataFrame({'slope': slopes})
-        df['category'] = np.select(
-            condlist=[df['slope'] > 0, df['slope'] == 0, df['slope'] < 0],
-            choicelist=['positive', 'zero', 'negative'],
-            default='unknown'
-        )
-
-        dist = df.groupby('category')\
-            .size()\
-            .div(len(df))\
-            .reindex(index=['positive', 'zero', 'negative'], fill_value=0.0)\
-            .to_dict()
-
-        return dist
+        # missing slopes are counted in the total, but in none of the categories
+        return {
+            'positive': float(np.count_nonzero(slopes > 0) / slopes.size),
+            'zero': float(np.count_nonzero(slopes == 0) / slopes.size),
+            'negative': float(np.count_nonzero(slopes < 0) / slopes.size)
+        }
 
     def get_slope_error_ratios_between_stations(self,
                                                 lower_station: float = None,
-                                                upper_station: float = None
+                                                upper_station: float = None,
+                                                frequencies: tuple = None
                                                 ) -> dict:
         """
         For a station pair, compute error ratios (zero/negative slopes).
-        Data is aggregated yearly and quarterly.
+        Data is aggregated yearly and quarterly (or by the given frequencies).
         :param float lower_station: the downstream station
         :param float upper_station: the upstream station
+        :param tuple frequencies: the frequencies (see PeriodEngine.FREQUENCIES)
         :return dict: keys are frequencies, values are the respective data
         """
-        filtered_graph = FWGFilter.filter_stations(
-            fwg=self.fwg,
-            lower_station=lower_station,
-            upper_station=upper_station
-        )
+        if frequencies is None:
+            frequencies = PeriodEngine.DEFAULT_FREQUENCIES
 
-        edges_data = [
-            (pd.to_datetime(u[1]), data.get('slope'))
-            for u, v, data in filtered_graph.edges(data=True)
-        ]
-        if not edges_data:
+        edge_arrays = self.get_edge_arrays()
+        mask = self.get_edge_mask(lower_station=lower_station, upper_station=upper_station, edge_arrays=edge_arrays)
+        if not mask.any():
             empty = pd.DataFrame(columns=['error ratio'])
-            return {'yearly': empty, 'quarterly': empty}
+            return {frequency: empty for frequency in frequencies}
+
+        df = pd.DataFrame(
+            data={'error ratio': edge_arrays.slopes[mask] <= 0},
+            index=pd.Index(edge_arrays.days[mask], name='date')
+        )
+
+        return self.get_period_engine(edge_arrays=edge_arrays).select(positions=mask).aggregate(
+            df=df,
+            statistic='mean',
+            frequencies=frequencies
+        )
+
+    def get_slope_error_ratios_by_station_pair(self, frequencies: tuple = None) -> dict:
+        """
+        Computes error ratios (zero/negative slopes) of all adjacent station pairs at once.
+        Data is aggregated yearly and quarterly (or by the given frequencies).
+        :param tuple frequencies: the frequencies (see PeriodEngine.FREQUENCIES)
+        :return dict: keys are frequencies, values are the respective data
+                      (periods in rows, (upper station, lower station) pairs in columns,
+                      NaN if a pair has no edges in a period)
+        """
+        if frequencies is None:
+            frequencies = PeriodEngine.DEFAULT_FREQUENCIES
+
+        edge_arrays = self.get_edge_arrays()
+        pair_index, pair_ids = self.get_station_pairs(edge_arrays=edge_arrays)
+        period_engine = self.get_period_engine(edge_arrays=edge_arrays)
+        is_error = edge_arrays.slopes <= 0
 
-        df = pd.DataFrame(data=edges_data, columns=['date', 'slope']).set_index('date')
-        df['is_error'] = df['slope'] <= 0
+        error_ratios = dict()
+        for frequency in frequencies:
+            ordinals = period_engine.get_period_range(frequency=frequency)
+            is_dated = period_engine.is_dated
+            positions = period_engine.get_positions(frequency=frequency, is_valid=is_dated) * len(pair_index) \
+                + pair_ids[is_dated]
 
-        yearly = df.resample('YE')['is_error'].mean().to_frame(name='error ratio')
-        yearly.index = yearly.index.to_period('Y')
+            counts = np.bincount(positions, minlength=ordinals.size * len(pair_index))
+            errors = np.bincount(
+                positions,
+                weights=is_error[is_dated],
+                minlength=ordinals.size * len(pair_index)
+            )
+            with np.errstate(invalid='ignore', divide='ignore'):
+                ratios = np.where(counts > 0, errors / counts, np.nan)
+
+            error_ratios[frequency] = pd.DataFrame(
+                data=ratios.reshape(ordinals.size, len(pair_index)),
+                index=pd.PeriodIndex.from_ordinals(
+                    ordinals, freq=PeriodEngine.FREQUENCIES[frequency][0], name='date'
+                ),
+                columns=pair_index
+            )
+
+        return error_ratios
+
+    def get_slope_histogram(self,
+                            bins=10,
+                            lower_station: float = None,
+                            upper_station: float = None
+                            ) -> pd.DataFrame:
+        """
+        Counts the slopes of every adjacent station pair in common bins.
+        Missing slopes are skipped.
+        :param bins: number of bins or bin edges (see np.histogram_bin_edges)
+        :param float lower_station: the downstream station
+        :param float upper_station: the upstream station
+        :return pd.DataFrame: station pairs in rows, bins (intervals) in columns
+        """
+        edge_arrays = self.get_edge_arrays()
+        mask = self.get_edge_mask(lower_station=lower_station, upper_station=upper_station, edge_arrays=edge_arrays)
+        pair_index, pair_ids = self.get_station_pairs(mask=mask, edge_arrays=edge_arrays)
+        slopes = edge_arrays.slopes[mask]
 
-        quarterly = df.resample('QE')['is_error'].mean().to_frame(name='error ratio')
-        quarterly.index = quarterly.index.to_period('Q')
+        is_valid = ~np.isnan(slopes)
+        slopes, pair_ids = slopes[is_valid], pair_ids[is_valid]
 
-        return {'yearly': yearly, 'quarterly': quarterly}
+        bin_edges = np.histogram_bin_edges(slopes, bins=bins)
+        # the last bin is closed, like in np.histogram
+        bin_ids = np.clip(np.searchsorted(bin_edges, slopes, side='right') - 1, 0, len(bin_edges) - 2)
+        is_inside = (slopes >= bin_edges[0]) & (slopes <= bin_edges[-1])
+
+        bin_count = len(bin_edges) - 1
+        counts = np.bincount(
+            pair_ids[is_inside] * bin_count + bin_ids[is_inside],
+            minlength=len(pair_index) * bin_count
+        )
+
+        return pd.DataFrame(
+            data=counts.reshape(len(pair_index), bin_count),
+            index=pair_index,
+            columns=pd.IntervalIndex.from_breaks(bin_edges, closed='left', name='slope')
+        )
+
+    def get_slope_quantiles(self,
+                            q=(0.25, 0.5, 0.75),
+                            lower_station: float = None,
+                            upper_station: float = None
+                            ) -> pd.DataFrame:
+        """
+        Calculates slope quantiles of every adjacent station pair at once,
+        with linear interpolation like pandas. Missing slopes are skipped.
+        :param q: the quantiles (between 0 and 1)
+        :param float lower_station: the downstream station
+        :param float upper_station: the upstream station
+        :return pd.DataFrame: station pairs in rows, quantiles in columns
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        edge_arrays = self.get_edge_arrays()
+        mask = self.get_edge_mask(lower_station=lower_station, upper_station=upper_station, edge_arrays=edge_arrays)
+        pair_index, pair_ids = self.get_station_pairs(mask=mask, edge_arrays=edge_arrays)
+        slopes = edge_arrays.slopes[mask]
+
+        is_valid = ~np.isnan(slopes)
+        slopes, pair_ids = slopes[is_valid], pair_ids[is_valid]
+
+        order = np.lexsort((slopes, pair_ids))
+        sorted_slopes = slopes[order]
+        counts = np.bincount(pair_ids, minlength=len(pair_index))
+        starts = np.cumsum(counts) - counts
+
+        quantiles = np.full((len(pair_index), len(q)), np.nan)
+        has_slopes = counts > 0
+        positions = q[np.newaxis, :] * (counts[has_slopes, np.newaxis] - 1)
+        lower = np.floor(positions).astype(np.int64)
+        upper = np.ceil(positions).astype(np.int64)
+        lower_values = sorted_slopes[starts[has_slopes, np.newaxis] + lower]
+        upper_values = sorted_slopes[starts[has_slopes, np.newaxis] + upper]
+        quantiles[has_slopes] = lower_values + (positions - lower) * (upper_values - lower_values)
+
+        return pd.DataFrame(
+            data=quantiles,
+            index=pair_index,
+            columns=pd.Index(q, name='quantile')
+        )
@@ -1,76 +1,248 @@
 import pandas as pd
 
+from src.analysis.statistical_analysis.period_bootstrap import PeriodBootstrap
+from src.analysis.statistical_analysis.period_engine import PeriodEngine
+from src.analysis.statistical_analysis.period_rolling import PeriodRolling
+from src.graph_manipulation.wave_feature_calculator import WaveFeatureCalculator
+
 
 class StatCalculator:
     """
     This class calculates statistics of aggregated data.
     """
     @staticmethod
-    def get_period_stats(df: pd.DataFrame, statistic: str) -> dict:
+    def get_period_stats(df: pd.DataFrame,
+                         statistic: str,
+                         frequencies: tuple = None,
+                         period_engine: PeriodEngine = None
+                         ) -> dict:
         """
         We group data by period and return a dictionary with period statistics.
-        :param pd.DataFrame df: data to resample
+        :param pd.DataFrame df: data to aggregate, indexed by dates
         :param str statistic: statistic to calculate
+        :param tuple frequencies: the frequencies (yearly and quarterly by default,
+                                  see PeriodEngine.FREQUENCIES)
+        :param PeriodEngine period_engine: engine with the period codes of the rows,
+                                           built from the index if None
         :return dict: keys are frequencies, values are the respective data
         """
-        try:
-            yearly = getattr(df.resample('YE'), statistic)()
-            quarterly = getattr(df.resample('QE'), statistic)()
-        except AttributeError:
-            raise ValueError('Invalid statistic')
+        if period_engine is None:
+            period_engine = PeriodEngine(days=df.index.to_numpy())
+
+        return period_engine.aggregate(
+            df=df,
+            statistic=statistic,
+            frequencies=frequencies
+        )
+
+    @staticmethod
+    def get_rolling_period_stats(df: pd.DataFrame,
+                                 statistic: str,
+                                 window: int,
+                                 frequency: str = 'yearly',
+                                 min_periods: int = None,
+                                 period_engine: PeriodEngine = None
+                                 ) -> dict:
+        """
+        We calculate a statistic over the trailing windows of periods ending in every period.
+        :param pd.DataFrame df: data to aggregate, indexed by dates
+        :param str statistic: statistic to calculate (see PeriodRolling.STATISTICS)
+        :param int window: the number of periods in a window
+        :param str frequency: the frequency of the periods
+        :param int min_periods: the number of periods of a window needed after the first period
+                                (see PeriodRolling)
+        :param PeriodEngine period_engine: engine with the period codes of the rows,
+                                           built from the index if None
+        :return dict: the key is the frequency, the value is the respective data
+        """
+        if period_engine is None:
+            period_engine = PeriodEngine(days=df.index.to_numpy())
 
-        yearly.index = yearly.index.to_period('Y')
-        quarterly.index = quarterly.index.to_period('Q')
+        rolling = PeriodRolling(
+            period_engine=period_engine,
+            window=window,
+            frequency=frequency,
+            min_periods=min_periods
+        )
 
-        return {'yearly': yearly, 'quarterly': quarterly}
+        return {frequency: rolling.aggregate(df=df, statistic=statistic)}
 
     @staticmethod
-    def get_flood_wave_count(flood_waves: list) -> dict:
+    def get_wave_features(flood_waves: list = None, wave_features: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Returns the given feature table, or calculates the one of the flood waves
+        (see WaveFeatureCalculator.get_wave_tables).
+        :param list flood_waves: list of flood waves (node lists)
+        :param pd.DataFrame wave_features: feature table of the flood waves, if it is already calculated
+        :return pd.DataFrame: the feature table
+        """
+        if wave_features is not None:
+            return wave_features
+        if flood_waves is None:
+            raise ValueError('Either the flood waves or their features are needed')
+
+        return WaveFeatureCalculator.get_wave_tables(flood_waves=flood_waves)[0]
+
+    @staticmethod
+    def get_flood_wave_count(flood_waves: list = None,
+                             frequencies: tuple = None,
+                             period_engine: PeriodEngine = None,
+                             wave_features: pd.DataFrame = None
+                             ) -> dict:
         """
         Calculates the number of flood waves from a given list,
-        aggregated yearly and quarterly.
+        aggregated yearly and quarterly (or by the given frequencies).
         :param list flood_waves: list of flood waves to analyze
+        :param tuple frequencies: the frequencies
+        :param PeriodEngine period_engine: engine with the period codes of the waves
+        :param pd.DataFrame wave_features: feature table of the flood waves
+                                           (used instead of the list if given)
         :return dict: keys are frequencies, values are the respective data
         """
-        wave_dates = [wave[0][1] for wave in flood_waves]
-
+        wave_features = StatCalculator.get_wave_features(flood_waves=flood_waves, wave_features=wave_features)
         df = pd.DataFrame({
-            'date': pd.to_datetime(wave_dates),
+            'date': wave_features['start_day'].to_numpy(),
             'flood wave count': 1
         }).set_index('date')
 
         return StatCalculator.get_period_stats(
             df=df,
-            statistic='sum'
+            statistic='sum',
+            frequencies=frequencies,
+            period_engine=period_engine
         )
 
     @staticmethod
-    def get_propagation_time_stat(flood_waves: list, statistic: str = 'mean',
-                                  is_aggregated: bool = True) -> dict:
+    def get_propagation_time_stat(flood_waves: list = None, statistic: str = 'mean',
+                                  is_aggregated: bool = True, frequencies: tuple = None,
+                                  period_engine: PeriodEngine = None,
+                                  wave_features: pd.DataFrame = None) -> dict:
         """
         Calculates selected statistic of wave propagation times from a given list,
-        aggregated yearly and quarterly.
+        aggregated yearly and quarterly (or by the given frequencies).
         :param list flood_waves: list of flood waves to analyze
         :param str statistic: the statistic to calculate (mean, median, etc.)
         :param bool is_aggregated: whether to aggregate by the statistic
+        :param tuple frequencies: the frequencies
+        :param PeriodEngine period_engine: engine with the period codes of the waves
+        :param pd.DataFrame wave_features: feature table of the flood waves
+                                           (used instead of the list if given)
         :return dict: keys are frequencies, values are the respective data
         """
-        start_dates, propagation_times = zip(*map(
-            lambda wave:
-            (pd.to_datetime(wave[0][1]),
-             (pd.to_datetime(wave[-1][1]) - pd.to_datetime(wave[0][1])).days),
-            flood_waves
-        ))
-
+        wave_features = StatCalculator.get_wave_features(flood_waves=flood_waves, wave_features=wave_features)
         df = pd.DataFrame({
-            'date': start_dates,
-            f'{statistic} propagation time': propagation_times
+            'date': wave_features['start_day'].to_numpy(),
+            f'{statistic} propagation time': wave_features['propagation_days'].to_numpy()
         }).set_index('date')
 
         if is_aggregated:
             return StatCalculator.get_period_stats(
                 df=df,
-                statistic=statistic
+                statistic=statistic,
+                frequencies=frequencies,
+                period_engine=period_engine
             )
         else:
             return {"total": df}
+
+    @staticmethod
+    def get_rolling_flood_wave_count(wave_features: pd.DataFrame,
+                                     window: int,
+                                     frequency: str = 'yearly',
+                                     min_periods: int = None,
+                                     period_engine: PeriodEngine = None
+                                     ) -> dict:
+        """
+        Calculates the number of flood waves in the windows of periods ending in every period.
+        :param pd.DataFrame wave_features: feature table of the flood waves to analyze
+        :param int window: the number of periods in a window
+        :param str frequency: the frequency of the periods
+        :param int min_periods: the number of periods of a window needed after the first period
+        :param PeriodEngine period_engine: engine with the period codes of the waves
+        :return dict: the key is the frequency, the value is the respective data
+        """
+        df = pd.DataFrame({
+            'date': wave_features['start_day'].to_numpy(),
+            'flood wave count': 1
+        }).set_index('date')
+
+        return StatCalculator.get_rolling_period_stats(
+            df=df,
+            statistic='sum',
+            window=window,
+            frequency=frequency,
+            min_periods=min_periods,
+            period_engine=period_engine
+        )
+
+    @staticmethod
+    def get_rolling_propagation_time_stat(wave_features: pd.DataFrame,
+                                          statistic: str,
+                                          window: int,
+                                          frequency: str = 'yearly',
+                                          min_periods: int = None,
+                                          period_engine: PeriodEngine = None
+                                          ) -> dict:
+        """
+        Calculates selected statistic of wave propagation times
+        in the windows of periods ending in every period.
+        :param pd.DataFrame wave_features: feature table of the flood waves to analyze
+        :param str statistic: the statistic to calculate (see PeriodRolling.STATISTICS)
+        :param int window: the number of periods in a window
+        :param str frequency: the frequency of the periods
+        :param int min_periods: the number of periods of a window needed after the first period
+        :param PeriodEngine period_engine: engine with the period codes of the waves
+        :return dict: the key is the frequency, the value is the respective data
+        """
+        df = pd.DataFrame({
+            'date': wave_features['start_day'].to_numpy(),
+            f'{statistic} propagation time': wave_features['propagation_days'].to_numpy()
+        }).set_index('date')
+
+        return StatCalculator.get_rolling_period_stats(
+            df=df,
+            statistic=statistic,
+            window=window,
+            frequency=frequency,
+            min_periods=min_periods,
+            period_engine=period_engine
+        )
+
+    @staticmethod
+    def get_propagation_time_intervals(wave_features: pd.DataFrame,
+                                       statistic: str = 'mean',
+                                       frequencies: tuple = None,
+                                       period_engine: PeriodEngine = None,
+                                       replicates: int = 1000,
+                                       confidence: float = 0.95,
+                                       seed: int = None
+                                       ) -> dict:
+        """
+        Calculates selected statistic of wave propagation times with bootstrap
+        confidence intervals, aggregated yearly and quarterly (or by the given frequencies).
+        :param pd.DataFrame wave_features: feature table of the flood waves to analyze
+        :param str statistic: the statistic to calculate (see PeriodBootstrap.STATISTICS)
+        :param tuple frequencies: the frequencies
+        :param PeriodEngine period_engine: engine with the period codes of the waves
+        :param int replicates: the number of bootstrap replicates
+        :param float confidence: the confidence level of the intervals
+        :param int seed: seed of the resampling
+        :return dict: keys are frequencies, values are the respective data
+                      with lower and upper bounds
+        """
+        df = pd.DataFrame({
+            'date': wave_features['start_day'].to_numpy(),
+            f'{statistic} propagation time': wave_features['propagation_days'].to_numpy()
+        }).set_index('date')
+
+        if period_engine is None:
+            period_engine = PeriodEngine(days=df.index.to_numpy())
+
+        bootstrap = PeriodBootstrap(
+            period_engine=period_engine,
+            replicates=replicates,
+            confidence=confidence,
+            seed=seed
+        )
+
+        return bootstrap.get_intervals(df=df, statistic=statistic, frequencies=frequencies)
@@ -1,9 +1,14 @@
+from collections.abc import Hashable
+from concurrent.futures import ThreadPoolExecutor
+
 import networkx as nx
 
 from src.analysis.statistical_analysis.flood_wave_analyzer import FloodWaveAnalyzer
 from src.analysis.statistical_analysis.high_water_level_analyzer import HighWaterLevelAnalyzer
 from src.analysis.statistical_analysis.slope_analyzer import SlopeAnalyzer
+from src.analysis.statistical_analysis.travel_time_table import TravelTimeTable
 from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+from src.graph_manipulation.graph_snapshot import GraphSnapshot
 from src.graph_manipulation.interfaces.flood_wave_interface import FloodWaveInterface
 
 
@@ -11,6 +16,12 @@ class StatisticalAnalyzer:
     """
     This class calculates and stores data in appropriate format.
     """
+    ANALYZERS = {
+        'flood_wave': FloodWaveAnalyzer,
+        'high_water_level': HighWaterLevelAnalyzer,
+        'slope': SlopeAnalyzer
+    }
+
     def __init__(self,
                  flood_wave_interface: FloodWaveInterface,
                  vertex_interface: VertexDataInterface
@@ -24,6 +35,8 @@ class StatisticalAnalyzer:
         self.flood_wave_interface = flood_wave_interface
         self.vertex_interface = vertex_interface
 
+        self.snapshot: GraphSnapshot = None
+
     def get_flood_wave_analyzer(self,
                                 lower_station: float = None,
                                 upper_station: float = None,
@@ -56,6 +69,10 @@ class StatisticalAnalyzer:
                                              False if we only consider the one at the target station
         :return HighWaterLevelAnalyzer: the HighWaterLevelAnalyzer instance
         """
+        # the feature table of all waves is shared by the analyzers
+        if flood_waves is self.flood_wave_interface.flood_waves:
+            flood_waves = self.flood_wave_interface
+
         return HighWaterLevelAnalyzer(
             flood_waves=flood_waves,
             vertex_interface=self.vertex_interface,
@@ -73,3 +90,100 @@ class StatisticalAnalyzer:
             fwg = self.flood_wave_interface.extracted_graph
 
         return SlopeAnalyzer(fwg=fwg)
+
+    def get_travel_time_table(self, quantiles: tuple = TravelTimeTable.QUANTILES) -> TravelTimeTable:
+        """
+        Returns the travel time lookup table of all flood waves.
+        :param tuple quantiles: the quantile levels of the level changes
+        :return TravelTimeTable: the table
+        """
+        return TravelTimeTable.from_flood_wave_interface(
+            flood_wave_interface=self.flood_wave_interface,
+            vertex_interface=self.vertex_interface,
+            quantiles=quantiles
+        )
+
+    def get_analyzer(self, kind: str, **params):
+        """
+        Returns an analyzer of the given kind configured with the given parameters.
+        The waves of a high water level analyzer are all flood waves by default.
+        :param str kind: 'flood_wave', 'high_water_level' or 'slope'
+        :param params: the parameters of the analyzer (see get_flood_wave_analyzer etc.)
+        :return: the analyzer
+        """
+        if kind == 'flood_wave':
+            return self.get_flood_wave_analyzer(**params)
+        if kind == 'high_water_level':
+            return self.get_high_water_level_analyzer(
+                **dict({'flood_waves': self.flood_wave_interface.flood_waves}, **params)
+            )
+        if kind == 'slope':
+            return self.get_slope_analyzer(**params)
+
+        raise ValueError(f'Analyzer must be one of {tuple(self.ANALYZERS)}')
+
+    def get_snapshot(self) -> GraphSnapshot:
+        """
+        Returns the read-only snapshot of the flood waves, created on first use.
+        :return GraphSnapshot: the snapshot
+        """
+        if self.snapshot is None:
+            self.snapshot = GraphSnapshot(
+                flood_wave_interface=self.flood_wave_interface,
+                vertex_interface=self.vertex_interface
+            )
+
+        return self.snapshot
+
+    def run_batch(self, specs: list, workers: int = None) -> list:
+        """
+        Runs analyses concurrently on the snapshot of the flood waves (see GraphSnapshot).
+        A spec is a dictionary with the keys:
+        - 'analyzer': 'flood_wave', 'high_water_level' or 'slope'
+        - 'analyzer_params': the parameters of the analyzer (optional, see get_analyzer)
+        - 'method': the method of the analyzer to call (e.g. 'get_flood_wave_count')
+        - 'params': the parameters of the method (optional)
+        Specs of the same analyzer run one after the other on one analyzer, so its cached tables
+        are built once, and different analyzers run in a thread pool.
+        :param list specs: the analyses
+        :param int workers: the number of threads (see ThreadPoolExecutor)
+        :return list: the results in the order of the specs
+        """
+        groups = dict()
+        for i, spec in enumerate(specs):
+            analyzer_class = self.ANALYZERS.get(spec.get('analyzer'))
+            if analyzer_class is None:
+                raise ValueError(f'Analyzer must be one of {tuple(self.ANALYZERS)}')
+            if not spec.get('method', '').startswith('get_') or not hasattr(analyzer_class, spec['method']):
+                raise ValueError(f'Unknown method of {analyzer_class.__name__}: {spec.get("method")}')
+
+            # parameters such as lists of waves are compared by identity
+            key = (spec['analyzer'], ) + tuple(
+                (name, value if isinstance(value, Hashable) else id(value))
+                for name, value in sorted(spec.get('analyzer_params', dict()).items())
+            )
+            groups.setdefault(key, []).append(i)
+
+        snapshot = self.get_snapshot()
+        snapshot_analyzer = StatisticalAnalyzer(
+            flood_wave_interface=snapshot.flood_wave_interface,
+            vertex_interface=snapshot.vertex_interface
+        )
+
+        def run_group(spec_ids: list) -> list:
+            analyzer = snapshot_analyzer.get_analyzer(
+                kind=specs[spec_ids[0]]['analyzer'],
+                **specs[spec_ids[0]].get('analyzer_params', dict())
+            )
+            return [
+                getattr(analyzer, specs[i]['method'])(**specs[i].get('params', dict()))
+                for i in spec_ids
+            ]
+
+        results = [None] * len(specs)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for spec_ids, group_results in zip(groups.values(), executor.map(run_group, groups.values())):
+                for i, result in zip(spec_ids, group_results):
+                    results[i] = result
+
+        return results
@@ -0,0 +1,175 @@
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.statistical_analysis.quantile_sketch import QuantileSketch
+
+
+class StreamingStatCalculator:
+    """
+    This class aggregates propagation times of flood waves per period while the waves
+    are produced, without keeping the waves in memory.
+    Counts, sums, means, minimums and maximums are exact,
+    quantiles are estimated with mergeable sketches.
+    """
+    FREQUENCIES = {
+        'yearly': ('Y', 12),
+        'quarterly': ('Q', 3)
+    }
+    EXACT_STATISTICS = ('count', 'sum', 'mean', 'min', 'max')
+
+    def __init__(self,
+                 relative_accuracy: float = 0.01,
+                 batch_size: int = 10000
+                 ):
+        """
+        Constructor.
+        :param float relative_accuracy: the maximal relative error of the quantiles
+        :param int batch_size: the number of waves aggregated at once
+        """
+        self.relative_accuracy = relative_accuracy
+        self.batch_size = batch_size
+
+        # frequency -> period ordinal -> [count, sum, min, max, sketch]
+        self.aggregates = {frequency: dict() for frequency in self.FREQUENCIES}
+
+    def consume(self, flood_waves):
+        """
+        Aggregates flood waves from any iterable (e.g. a generator of an extractor).
+        Only one batch of waves is held in memory at a time.
+        :param flood_waves: iterable of flood waves (node lists)
+        """
+        flood_waves = iter(flood_waves)
+        while True:
+            batch = list(islice(flood_waves, self.batch_size))
+            if not batch:
+                break
+
+            start_days = np.array([wave[0][1] for wave in batch], dtype='datetime64[D]')
+            end_days = np.array([wave[-1][1] for wave in batch], dtype='datetime64[D]')
+
+            self.add(
+                start_days=start_days,
+                propagation_times=(end_days - start_days).astype(np.int64)
+            )
+
+    def add(self, start_days: np.ndarray, propagation_times: np.ndarray):
+        """
+        Aggregates the propagation times of a batch of waves.
+        :param np.ndarray start_days: the start days of the waves as datetime64[D]
+        :param np.ndarray propagation_times: the propagation times of the waves (days)
+        """
+        months = start_days.astype('datetime64[M]').astype(np.int64)
+        propagation_times = np.asarray(propagation_times)
+
+        for frequency, (_, period_months) in self.FREQUENCIES.items():
+            ordinals, inverse = np.unique(months // period_months, return_inverse=True)
+
+            counts = np.bincount(inverse, minlength=len(ordinals))
+            sums = np.bincount(inverse, weights=propagation_times, minlength=len(ordinals))
+            minimums = np.full(len(ordinals), np.inf)
+            np.minimum.at(minimums, inverse, propagation_times)
+            maximums = np.full(len(ordinals), -np.inf)
+            np.maximum.at(maximums, inverse, propagation_times)
+
+            order = np.argsort(inverse, kind='stable')
+            groups = np.split(propagation_times[order], np.cumsum(counts)[:-1])
+
+            aggregates = self.aggregates[frequency]
+            for i, ordinal in enumerate(ordinals.tolist()):
+                aggregate = aggregates.get(ordinal)
+                if aggregate is None:
+                    aggregate = aggregates[ordinal] = [
+                        0, 0, np.inf, -np.inf, QuantileSketch(relative_accuracy=self.relative_accuracy)
+                    ]
+
+                aggregate[0] += int(counts[i])
+                aggregate[1] += sums[i]
+                aggregate[2] = min(aggregate[2], minimums[i])
+                aggregate[3] = max(aggregate[3], maximums[i])
+                aggregate[4].add(values=groups[i])
+
+    def merge(self, other: 'StreamingStatCalculator'):
+        """
+        Adds the aggregates of another calculator (e.g. of another worker) to this one.
+        :param StreamingStatCalculator other: the other calculator
+        """
+        for frequency, other_aggregates in other.aggregates.items():
+            aggregates = self.aggregates[frequency]
+            for ordinal, (count, total, minimum, maximum, sketch) in other_aggregates.items():
+                aggregate = aggregates.get(ordinal)
+                if aggregate is None:
+                    aggregate = aggregates[ordinal] = [
+                        0, 0, np.inf, -np.inf, QuantileSketch(relative_accuracy=self.relative_accuracy)
+                    ]
+
+                aggregate[0] += count
+                aggregate[1] += total
+                aggregate[2] = min(aggregate[2], minimum)
+                aggregate[3] = max(aggregate[3], maximum)
+                aggregate[4].merge(other=sketch)
+
+    def get_stats(self, statistic: str = 'mean', q: float = None) -> dict:
+        """
+        Returns the aggregated statistic in the format of StatCalculator.get_period_stats.
+        Empty periods between the first and the last one are included.
+        :param str statistic: count, sum, mean, min, max, median or quantile
+        :param float q: the quantile to estimate if statistic is 'quantile'
+        :return dict: keys are frequencies, values are the respective data
+        """
+        if statistic == 'median':
+            q = 0.5
+        elif statistic == 'quantile':
+            if q is None:
+                raise ValueError('The quantile must be given')
+        elif statistic not in self.EXACT_STATISTICS:
+            raise ValueError('Invalid statistic')
+
+        result = dict()
+        for frequency, (period_frequency, _) in self.FREQUENCIES.items():
+            aggregates = self.aggregates[frequency]
+
+            if aggregates:
+                ordinals = np.arange(min(aggregates), max(aggregates) + 1)
+            else:
+                ordinals = np.zeros(0, dtype=np.int64)
+
+            values = [
+                self.get_value(aggregate=aggregates.get(ordinal), statistic=statistic, q=q)
+                for ordinal in ordinals.tolist()
+            ]
+            dtype = np.int64 if statistic in ('count', 'sum') else np.float64
+
+            result[frequency] = pd.DataFrame(
+                data={f'{statistic} propagation time': np.array(values, dtype=dtype)},
+                index=pd.PeriodIndex.from_ordinals(ordinals, freq=period_frequency, name='date')
+            )
+
+        return result
+
+    @staticmethod
+    def get_value(aggregate: list, statistic: str, q: float) -> float:
+        """
+        Calculates a statistic of a single period.
+        :param list aggregate: [count, sum, min, max, sketch] of the period, None if empty
+        :param str statistic: the statistic to calculate
+        :param float q: the quantile to estimate
+        :return float: the statistic (0 for empty counts and sums, NaN otherwise)
+        """
+        if aggregate is None:
+            return 0 if statistic in ('count', 'sum') else np.nan
+
+        count, total, minimum, maximum, sketch = aggregate
+        if statistic == 'count':
+            return count
+        if statistic == 'sum':
+            return total
+        if statistic == 'mean':
+            return total / count
+        if statistic == 'min':
+            return minimum
+        if statistic == 'max':
+            return maximum
+
+        return sketch.quantile(q=q)
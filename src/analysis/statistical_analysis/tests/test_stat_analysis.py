@@ -1,10 +1,20 @@
 import networkx as nx
 import pytest
 
+import numpy as np
 import pandas as pd
 
+from src.analysis.statistical_analysis.high_water_level_analyzer import HighWaterLevelAnalyzer
+from src.analysis.statistical_analysis.period_bootstrap import PeriodBootstrap
+from src.analysis.statistical_analysis.period_engine import PeriodEngine
+from src.analysis.statistical_analysis.period_rolling import PeriodRolling
+from src.analysis.statistical_analysis.stat_calculator import StatCalculator
 from src.analysis.statistical_analysis.statistical_analyzer import StatisticalAnalyzer
+from src.analysis.statistical_analysis.travel_time_table import TravelTimeTable
+from src.graph_building.graph_cache import GraphCache
 from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
+from src.graph_manipulation.flood_wave_filter import FloodWaveFilter
 from src.graph_manipulation.interfaces.flood_wave_interface import FloodWaveInterface
 
 
@@ -123,6 +133,20 @@ def test_flood_wave_analyzer(stat_analyzer: StatisticalAnalyzer):
         expected_prop_stat['quarterly']
     )
 
+    # the calculator also takes the list of the flood waves
+    flood_waves = flood_wave_analyzer.get_flood_wave_interface().flood_waves
+    for frequency in ('yearly', 'quarterly'):
+        pd.testing.assert_frame_equal(
+            StatCalculator.get_flood_wave_count(flood_waves)[frequency],
+            expected_f_w_count[frequency]
+        )
+        pd.testing.assert_frame_equal(
+            StatCalculator.get_propagation_time_stat(flood_waves=flood_waves, statistic='mean')[frequency],
+            expected_prop_stat[frequency]
+        )
+    with pytest.raises(ValueError):
+        StatCalculator.get_flood_wave_count()
+
 
 @pytest.mark.parametrize('is_full_wave_considered, expected_f_w_count, expected_prop_stat', [
     (False, {
@@ -200,6 +224,31 @@ def test_high_water_level_analyzer(stat_analyzer: StatisticalAnalyzer,
     )
 
 
+@pytest.mark.parametrize('is_full_wave_considered', [False, True])
+def test_high_water_level_analyzer_without_waves(mock_vertex_interface: VertexDataInterface,
+                                                 is_full_wave_considered: bool
+                                                 ):
+    assert FloodWaveFilter.get_red_waves(
+        flood_waves=[],
+        vertex_interface=mock_vertex_interface,
+        target_station='1.0',
+        is_full_wave_considered=is_full_wave_considered
+    ) == []
+
+    red_analyzer = HighWaterLevelAnalyzer(
+        flood_waves=[],
+        vertex_interface=mock_vertex_interface,
+        target_station=1.0,
+        is_full_wave_considered=is_full_wave_considered
+    )
+
+    red_wave_count = red_analyzer.get_red_wave_count_at_station()
+    red_wave_prop_stat = red_analyzer.get_red_wave_propagation_time_stat(statistic='mean')
+    for frequency in ('yearly', 'quarterly'):
+        assert red_wave_count[frequency].empty
+        assert red_wave_prop_stat[frequency].empty
+
+
 def test_slope_analyzer(stat_analyzer: StatisticalAnalyzer):
     slope_analyzer = stat_analyzer.get_slope_analyzer()
 
@@ -234,3 +283,314 @@ def test_slope_analyzer(stat_analyzer: StatisticalAnalyzer):
         slope_error_ratios['quarterly'],
         expected_quarterly
     )
+
+
+def test_slope_pair_statistics(stat_analyzer: StatisticalAnalyzer):
+    slope_analyzer = stat_analyzer.get_slope_analyzer()
+
+    error_ratios = slope_analyzer.get_slope_error_ratios_by_station_pair()
+    assert error_ratios['yearly'][(1.0, 2.0)].tolist() == [3 / 6]
+    assert error_ratios['quarterly'][(1.0, 2.0)].tolist() == [1 / 4, 2 / 2]
+
+    quantiles = slope_analyzer.get_slope_quantiles(q=[0, 0.5, 1])
+    assert quantiles.loc[(1.0, 2.0)].tolist() == [-4, 1, 6]
+
+    histogram = slope_analyzer.get_slope_histogram(bins=[-4, 0, 6])
+    assert histogram.loc[(1.0, 2.0)].tolist() == [2, 4]
+
+    # slopes edited in place are seen by the analyzer of a mutable graph
+    fwg = stat_analyzer.flood_wave_interface.extracted_graph
+    fwg.edges[('1.0', '2000-01-01'), ('2.0', '2000-01-04')]['slope'] = 5
+    assert slope_analyzer.get_slope_distribution()['positive'] == 4 / 6
+    assert slope_analyzer.get_slope_error_ratios_by_station_pair()['yearly'][(1.0, 2.0)].tolist() == [2 / 6]
+
+    # the arrays of a frozen graph are collected once, until they are invalidated
+    frozen_analyzer = stat_analyzer.get_slope_analyzer(fwg=GraphCache.freeze(fwg=fwg.copy()))
+    assert frozen_analyzer.get_edge_arrays() is frozen_analyzer.get_edge_arrays()
+    frozen_analyzer.fwg.edges[('1.0', '2000-01-01'), ('2.0', '2000-01-04')]['slope'] = -2
+    GraphCache.invalidate(fwg=frozen_analyzer.fwg)
+    assert frozen_analyzer.get_slope_distribution()['positive'] == 3 / 6
+
+    # the graph of extracted waves is frozen, so its arrays are collected once by default
+    extracted_analyzer = StatisticalAnalyzer(
+        flood_wave_interface=FloodWaveExtractor(fwg=fwg)(with_equivalence=False),
+        vertex_interface=stat_analyzer.vertex_interface
+    ).get_slope_analyzer()
+    assert nx.is_frozen(extracted_analyzer.fwg)
+    assert extracted_analyzer.get_edge_arrays() is extracted_analyzer.get_edge_arrays()
+    assert extracted_analyzer.get_slope_distribution()['positive'] == 4 / 6
+
+
+def test_wave_feature_table(mock_flood_wave_interface: FloodWaveInterface,
+                            mock_vertex_interface: VertexDataInterface
+                            ):
+    wave_features = mock_flood_wave_interface.get_wave_features(
+        vertex_interface=mock_vertex_interface
+    )
+
+    assert wave_features['propagation_days'].tolist() == [0, 1, 2, 3, 1, 2]
+    assert wave_features['start_station'].tolist() == [1.0] * 6
+    assert wave_features['end_station'].tolist() == [2.0] * 6
+    assert wave_features['node_count'].tolist() == [2] * 6
+    assert wave_features['start_level'].tolist() == [8, 8, 8, 8, 6, 6]
+    assert wave_features['end_level'].tolist() == [6, 6, 2, 10, 6, 10]
+    assert wave_features['attenuation'].tolist() == [2, 2, 6, -2, 0, -4]
+    assert wave_features['mean_slope'].tolist() == [2, 2, 6, -2, 0, -4]
+    assert wave_features['red_node_count'].tolist() == [1, 1, 1, 2, 0, 1]
+
+    assert mock_flood_wave_interface.get_wave_features() is wave_features
+
+
+@pytest.mark.parametrize('statistic', ['mean', 'median', 'max'])
+def test_streaming_propagation_time_stat(stat_analyzer: StatisticalAnalyzer, statistic: str):
+    flood_wave_analyzer = stat_analyzer.get_flood_wave_analyzer(
+        lower_station=1.0,
+        upper_station=2.0,
+        with_equivalence=True
+    )
+
+    expected_stat = flood_wave_analyzer.get_propagation_time_stat(statistic=statistic)
+    streaming_stat = flood_wave_analyzer.get_streaming_propagation_time_stat(
+        statistic=statistic,
+        relative_accuracy=0.01
+    )
+
+    for frequency in ['yearly', 'quarterly']:
+        pd.testing.assert_frame_equal(
+            streaming_stat[frequency],
+            expected_stat[frequency].astype(float),
+            rtol=0.01
+        )
+
+
+@pytest.mark.parametrize('statistic', ['count', 'mean', 'median', 'std'])
+def test_period_engine_frequencies(statistic: str):
+    days = pd.date_range('1999-11-15', '2001-03-20', freq='9D')
+    df = pd.DataFrame(
+        data={'value': np.arange(len(days), dtype=float) % 7},
+        index=pd.Index(days, name='date')
+    )
+    df.iloc[::5] = np.nan
+
+    period_stats = StatCalculator.get_period_stats(
+        df=df,
+        statistic=statistic,
+        frequencies=('monthly', 'seasonal', 'hydrological')
+    )
+
+    for frequency, rule, period in [('monthly', 'ME', 'M'),
+                                    ('seasonal', 'QE-NOV', 'Q-NOV'),
+                                    ('hydrological', 'YE-OCT', 'Y-OCT')]:
+        expected = getattr(df.resample(rule), statistic)()
+        expected.index = expected.index.to_period(period)
+
+        pd.testing.assert_frame_equal(period_stats[frequency], expected, check_freq=False)
+
+
+@pytest.mark.parametrize('statistic', ['count', 'sum', 'median', 'std', 'prod', 'first', 'last', 'nunique'])
+def test_period_engine_missing_days(statistic: str):
+    days = pd.to_datetime(['2000-04-20', 'NaT', '2000-01-05', 'NaT', '2002-03-01', '2000-04-20'])
+    df = pd.DataFrame(
+        data={'value': [3.0, 2.0, 1.0, 4.0, 5.0, 6.0]},
+        index=pd.Index(days, name='date')
+    )
+
+    # records without a date are skipped and the others are ordered by date like in resample,
+    # 2001 is an empty period
+    period_stats = StatCalculator.get_period_stats(df=df, statistic=statistic)
+
+    for frequency, rule, period in [('yearly', 'YE', 'Y'), ('quarterly', 'QE', 'Q')]:
+        expected = getattr(df.resample(rule), statistic)()
+        expected.index = expected.index.to_period(period)
+
+        pd.testing.assert_frame_equal(period_stats[frequency], expected, check_freq=False)
+
+    rolling = PeriodRolling(
+        period_engine=PeriodEngine(days=days.to_numpy()),
+        frequency='quarterly',
+        window=2,
+        min_periods=1
+    )
+    np.testing.assert_array_equal(
+        rolling.aggregate_values(values=df['value'].to_numpy(), statistic='sum'),
+        [1.0, 10.0, 9.0, 0.0, 0.0, 0.0, 0.0, 0.0, 5.0]
+    )
+
+
+@pytest.mark.parametrize('statistic', ['mean', 'median'])
+def test_propagation_time_intervals(stat_analyzer: StatisticalAnalyzer, statistic: str):
+    flood_wave_analyzer = stat_analyzer.get_flood_wave_analyzer()
+    intervals = flood_wave_analyzer.get_propagation_time_intervals(statistic=statistic, seed=0)
+    prop_time_stat = flood_wave_analyzer.get_propagation_time_stat(statistic=statistic)
+
+    column = f'{statistic} propagation time'
+    for frequency, df in intervals.items():
+        assert df.columns.tolist() == [column, f'{column} lower', f'{column} upper']
+        pd.testing.assert_frame_equal(df[[column]], prop_time_stat[frequency])
+        assert (df[f'{column} lower'] <= df[column]).all()
+        assert (df[column] <= df[f'{column} upper']).all()
+
+    # the waves of June propagate for 1 and 2 days
+    assert intervals['quarterly'].iloc[1].tolist() == [1.5, 1.0, 2.0]
+
+    # the replicates are drawn from one stream, so the block size does not matter
+    period_engine = flood_wave_analyzer.get_period_engine()
+    propagation_days = flood_wave_analyzer.get_flood_wave_interface().get_wave_features()['propagation_days']
+    replicate_stats = [
+        PeriodBootstrap(period_engine=period_engine, replicates=50, seed=1, max_block_size=block_size)
+        .get_replicate_stats(values=propagation_days.to_numpy(), statistic=statistic, frequency='quarterly')
+        for block_size in (1, 1 << 20)
+    ]
+    np.testing.assert_array_equal(replicate_stats[0], replicate_stats[1])
+
+
+@pytest.mark.parametrize('statistic', ['sum', 'mean', 'max', 'median', 'std'])
+def test_rolling_period_stats(statistic: str):
+    days = pd.date_range('1990-03-01', '2009-11-30', freq='11D')
+    df = pd.DataFrame(
+        data={'value': (np.arange(len(days)) * 7) % 13},
+        index=pd.Index(days, name='date')
+    )
+
+    rolling_stats = StatCalculator.get_rolling_period_stats(
+        df=df,
+        statistic=statistic,
+        window=5,
+        frequency='yearly',
+        min_periods=2
+    )['yearly']
+
+    # one resample for each window
+    years = df.index.year
+    expected = [
+        getattr(df[(years > year - 5) & (years <= year)], statistic)()['value'] if year > 1990 else np.nan
+        for year in range(1990, 2010)
+    ]
+
+    assert rolling_stats.index.equals(pd.period_range('1990', '2009', freq='Y', name='date'))
+    np.testing.assert_allclose(rolling_stats['value'].to_numpy(dtype=float), expected)
+
+
+@pytest.mark.parametrize('statistic', ['var', 'std'])
+def test_rolling_constant_windows(statistic: str):
+    days = pd.date_range('1990-01-01', '2009-12-31', freq='3D')
+    values = np.random.default_rng(2).integers(0, 1000, len(days)).astype(float)
+    # the windows of 2003-2005 only contain the same value
+    values[(days.year >= 2001) & (days.year <= 2005)] = 123456.0
+    df = pd.DataFrame(data={'value': values}, index=pd.Index(days, name='date'))
+
+    rolling_stats = StatCalculator.get_rolling_period_stats(
+        df=df,
+        statistic=statistic,
+        window=3,
+        frequency='yearly'
+    )['yearly']['value']
+
+    assert (rolling_stats.loc['2003':'2005'] == 0).all()
+    assert (rolling_stats.loc['1992':'2002'] > 0).all()
+
+
+def test_travel_time_table(tmp_path, stat_analyzer: StatisticalAnalyzer):
+    # a wave through three gauges, and a wave sharing its first arrival
+    flood_wave_interface = stat_analyzer.flood_wave_interface
+    flood_wave_interface.flood_waves = flood_wave_interface.flood_waves + [
+        [('1.0', '2000-01-01'), ('2.0', '2000-01-03'), ('3.0', '2000-01-05')],
+        [('1.0', '2000-01-01'), ('2.0', '2000-01-03'), ('3.0', '2000-01-06')]
+    ]
+    stat_analyzer.vertex_interface.vertices['3.0'] = {
+        '2000-01-05': {'value': 9, 'color': 'red'},
+        '2000-01-06': {'value': 1, 'color': 'yellow'}
+    }
+    table = stat_analyzer.get_travel_time_table(quantiles=(0.0, 0.5, 1.0))
+    assert flood_wave_interface.vertex_interface is stat_analyzer.vertex_interface
+
+    vertices = stat_analyzer.vertex_interface.vertices
+    arrivals = {
+        (u, v)
+        for wave in flood_wave_interface.flood_waves
+        for i, u in enumerate(wave)
+        for v in wave[i + 1:]
+    }
+    for band in TravelTimeTable.BANDS:
+        for source, target in {(float(u[0]), float(v[0])) for u, v in arrivals}:
+            selected = [
+                (u, v) for u, v in arrivals
+                if float(u[0]) == source and float(v[0]) == target and
+                band in ('all', vertices[u[0]][u[1]]['color'])
+            ]
+            lags = [(np.datetime64(v[1]) - np.datetime64(u[1])).astype(int) for u, v in selected]
+            level_changes = [vertices[v[0]][v[1]]['value'] - vertices[u[0]][u[1]]['value'] for u, v in selected]
+
+            assert table.get_pair_count(source_station=source, target_station=target, band=band) == len(selected)
+            histogram = table.get_lag_histogram(source_station=source, target_station=target, band=band)
+            assert histogram.tolist() == np.bincount(lags, minlength=len(histogram)).tolist()
+            np.testing.assert_allclose(
+                table.get_level_change_quantiles(source_station=source, target_station=target, band=band),
+                np.quantile(level_changes, [0.0, 0.5, 1.0]) if selected else np.full(3, np.nan)
+            )
+
+    # red peaks at 1.0: 2000-01-01 (arrivals at 2.0 after 0-3 days and at 3.0 after 4 and 5 days)
+    arrivals_table = table.get_arrivals(source_station=1.0, band='red')
+    assert arrivals_table.index.tolist() == [2.0, 3.0]
+    assert arrivals_table['pair_count'].tolist() == [4, 2]
+    assert arrivals_table['mean_lag'].tolist() == [1.5, 4.5]
+    assert arrivals_table['level_change_q0.5'].tolist() == [-2.0, -3.0]
+    assert table.get_arrivals(source_station=5.0).empty
+    assert table.get_pair_count(source_station=3.0, target_station=1.0) == 0
+
+    table.save(file_path=tmp_path / 'travel_times.npz')
+    loaded_table = TravelTimeTable.load(file_path=tmp_path / 'travel_times.npz')
+    pd.testing.assert_frame_equal(loaded_table.get_arrivals(source_station=1.0), table.get_arrivals(source_station=1.0))
+
+    with pytest.raises(ValueError):
+        table.get_lag_histogram(source_station=1.0, target_station=2.0, band='green')
+
+
+def test_run_batch(stat_analyzer: StatisticalAnalyzer):
+    specs = [
+        {'analyzer': 'flood_wave', 'method': 'get_flood_wave_count', 'params': {'frequencies': ('yearly', 'monthly')}},
+        {'analyzer': 'slope', 'method': 'get_slope_distribution'},
+        {'analyzer': 'flood_wave', 'analyzer_params': {'lower_station': 1.0, 'upper_station': 1.5},
+         'method': 'get_flood_wave_count'},
+        {'analyzer': 'high_water_level', 'analyzer_params': {'target_station': 2.0},
+         'method': 'get_red_wave_count_at_station'},
+        {'analyzer': 'flood_wave', 'method': 'get_propagation_time_stat', 'params': {'statistic': 'median'}},
+        {'analyzer': 'slope', 'method': 'get_slope_error_ratios_by_station_pair'}
+    ]
+    expected = [
+        getattr(stat_analyzer.get_analyzer(kind=spec['analyzer'], **spec.get('analyzer_params', dict())),
+                spec['method'])(**spec.get('params', dict()))
+        for spec in specs
+    ]
+    results = stat_analyzer.run_batch(specs=specs, workers=4)
+    assert len(results) == len(expected)
+    for result, expected_result in zip(results, expected):
+        if isinstance(expected_result, dict):
+            assert result.keys() == expected_result.keys()
+            result, expected_result = list(result.values()), list(expected_result.values())
+        else:
+            result, expected_result = [result], [expected_result]
+        for value, expected_value in zip(result, expected_result):
+            if isinstance(expected_value, pd.DataFrame):
+                pd.testing.assert_frame_equal(value, expected_value)
+            else:
+                assert value == expected_value
+
+    # the snapshot is read-only, and the original graph is not changed
+    snapshot = stat_analyzer.get_snapshot()
+    fwg = stat_analyzer.flood_wave_interface.extracted_graph
+    assert nx.is_frozen(snapshot.fwg) and not nx.is_frozen(fwg)
+    with pytest.raises(nx.NetworkXError):
+        snapshot.fwg.add_edge(('1.0', '2000-01-01'), ('2.0', '2000-06-03'))
+    assert snapshot.fwg.graph.keys() & snapshot.GRAPH_KEYS
+    for key in snapshot.fwg.graph.keys() & snapshot.GRAPH_KEYS:
+        for name, value in vars(snapshot.fwg.graph[key]).items():
+            if isinstance(value, np.ndarray):
+                assert not value.flags.writeable
+                if key in fwg.graph:
+                    assert getattr(fwg.graph[key], name).flags.writeable
+
+    with pytest.raises(ValueError):
+        stat_analyzer.run_batch(specs=[{'analyzer': 'slope', 'method': 'fwg'}])
+    with pytest.raises(ValueError):
+        stat_analyzer.run_batch(specs=[{'analyzer': 'wave', 'method': 'get_flood_wave_count'}])
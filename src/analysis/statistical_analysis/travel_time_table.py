@@ -0,0 +1,286 @@
+import numpy as np
+import pandas as pd
+
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+from src.graph_manipulation.interfaces.flood_wave_interface import FloodWaveInterface
+
+
+class TravelTimeTable:
+    """
+    Lookup table of the historical arrival lags and level changes of flood waves
+    between gauges. Every pair of a wave node (the source) and a later node of the same wave
+    (the target) is a historical arrival, counted once however many waves contain it.
+    For every (source station, target station, band) group the table stores the histogram
+    of the lags in days and quantiles of the level changes. The band is the color of
+    the source peak ('yellow' or 'red'), 'all' contains the arrivals of every source peak.
+    Everything is calculated when the table is built, so a query is a dictionary lookup
+    and a row of an array.
+    """
+    ARRAY_KEYS = (
+        'stations', 'group_sources', 'group_targets', 'group_bands',
+        'pair_counts', 'lag_counts', 'quantiles', 'level_change_quantiles'
+    )
+    BANDS = ('all', 'yellow', 'red')
+    QUANTILES = (0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95)
+
+    def __init__(self, data: dict = None):
+        """
+        Constructor.
+        :param dict data: Dictionary: the keys represent the data structures (see ARRAY_KEYS).
+        The expected keys are:
+        - 'stations': sorted river kms of the gauges
+        - 'group_sources', 'group_targets': positions of the source and target station of every group
+        - 'group_bands': position of the band of every group in BANDS
+        - 'pair_counts': the number of arrivals of every group
+        - 'lag_counts': the number of arrivals of every group (rows) by lag in days (columns)
+        - 'quantiles': the quantile levels of the level changes
+        - 'level_change_quantiles': the level change quantiles of every group (rows),
+          NaN if no level is known
+        """
+        self.stations = np.zeros(0, dtype=np.float64)
+        self.group_sources = np.zeros(0, dtype=np.int64)
+        self.group_targets = np.zeros(0, dtype=np.int64)
+        self.group_bands = np.zeros(0, dtype=np.int64)
+        self.pair_counts = np.zeros(0, dtype=np.int64)
+        self.lag_counts = np.zeros((0, 1), dtype=np.int64)
+        self.quantiles = np.array(self.QUANTILES)
+        self.level_change_quantiles = np.zeros((0, len(self.QUANTILES)), dtype=np.float64)
+
+        if data is not None:
+            for key, value in data.items():
+                setattr(self, key, value)
+
+        # (source station, target station, band) -> group, built on first query
+        self.group_ids: dict = None
+
+    @classmethod
+    def from_flood_wave_interface(cls,
+                                  flood_wave_interface: FloodWaveInterface,
+                                  vertex_interface: VertexDataInterface = None,
+                                  quantiles: tuple = QUANTILES
+                                  ) -> 'TravelTimeTable':
+        """
+        Builds the table of the flood waves of an interface (from their node table).
+        Levels and bands are only available with vertex data.
+        :param FloodWaveInterface flood_wave_interface: interface containing the flood waves
+        :param VertexDataInterface vertex_interface: interface containing vertex data,
+                                                     the one of the flood waves is used if None
+        :param tuple quantiles: the quantile levels of the level changes
+        :return TravelTimeTable: the table
+        """
+        wave_nodes = flood_wave_interface.get_wave_nodes(vertex_interface=vertex_interface)
+        quantiles = np.asarray(quantiles, dtype=np.float64)
+
+        stations = wave_nodes['station'].to_numpy(dtype=np.float64)
+        days = wave_nodes['day'].to_numpy().astype('datetime64[D]')
+        levels = wave_nodes['level'].to_numpy(dtype=np.float64)
+        # a level is known if and only if the color is known
+        bands = np.where(np.isnan(levels), 0, np.where(wave_nodes['is_red'].to_numpy(dtype=bool), 2, 1))
+        wave_ids = wave_nodes['wave_id'].to_numpy(dtype=np.int64)
+
+        # every node with every later node of its wave
+        sources, targets = [], []
+        for offset in range(1, int(wave_nodes['seq'].to_numpy(dtype=np.int64).max(initial=0)) + 1):
+            source = np.flatnonzero(wave_ids[:-offset] == wave_ids[offset:])
+            sources.append(source)
+            targets.append(source + offset)
+        sources = np.concatenate(sources, dtype=np.int64) if sources else np.zeros(0, dtype=np.int64)
+        targets = np.concatenate(targets, dtype=np.int64) if targets else np.zeros(0, dtype=np.int64)
+
+        # waves only go forward in time, so the lags are never negative
+        is_known = ~np.isnan(stations[sources]) & ~np.isnan(stations[targets]) & \
+            ~np.isnat(days[sources]) & ~np.isnat(days[targets]) & (days[targets] >= days[sources])
+        sources, targets = sources[is_known], targets[is_known]
+
+        # the same arrival in several waves is counted once
+        day_numbers = days.astype(np.int64)
+        _, first = np.unique(
+            np.column_stack((
+                stations[sources], day_numbers[sources].astype(np.float64),
+                stations[targets], day_numbers[targets].astype(np.float64)
+            )),
+            axis=0,
+            return_index=True
+        )
+        sources, targets = sources[np.sort(first)], targets[np.sort(first)]
+
+        unique_stations, station_codes = np.unique(stations, return_inverse=True)
+        station_codes = station_codes.reshape(-1)
+        lags = day_numbers[targets] - day_numbers[sources]
+        level_changes = levels[targets] - levels[sources]
+
+        # the arrivals of the 'all' band, then the ones of the band of their source
+        pair_codes = (station_codes[sources] * len(unique_stations) + station_codes[targets]) * len(cls.BANDS)
+        is_banded = bands[sources] > 0
+        group_codes = np.concatenate((pair_codes, pair_codes[is_banded] + bands[sources][is_banded]))
+        lags = np.concatenate((lags, lags[is_banded]))
+        level_changes = np.concatenate((level_changes, level_changes[is_banded]))
+
+        codes, group_ids, pair_counts = np.unique(group_codes, return_inverse=True, return_counts=True)
+        group_ids = group_ids.reshape(-1)
+
+        lag_counts = np.zeros((len(codes), int(lags.max(initial=0)) + 1), dtype=np.int64)
+        np.add.at(lag_counts, (group_ids, lags), 1)
+
+        return cls(data={
+            'stations': unique_stations,
+            'group_sources': codes // len(cls.BANDS) // len(unique_stations),
+            'group_targets': codes // len(cls.BANDS) % len(unique_stations),
+            'group_bands': codes % len(cls.BANDS),
+            'pair_counts': pair_counts,
+            'lag_counts': lag_counts,
+            'quantiles': quantiles,
+            'level_change_quantiles': cls.get_group_quantiles(
+                values=level_changes,
+                group_ids=group_ids,
+                group_count=len(codes),
+                quantiles=quantiles
+            )
+        })
+
+    @staticmethod
+    def get_group_quantiles(values: np.ndarray, group_ids: np.ndarray,
+                            group_count: int, quantiles: np.ndarray) -> np.ndarray:
+        """
+        Calculates quantiles of the values of every group at once
+        (with linear interpolation like np.quantile, NaN values are skipped).
+        :param np.ndarray values: the values
+        :param np.ndarray group_ids: the group of every value
+        :param int group_count: the number of groups
+        :param np.ndarray quantiles: the quantile levels
+        :return np.ndarray: the quantiles of every group (rows), NaN for groups without values
+        """
+        is_valid = ~np.isnan(values)
+        values, group_ids = values[is_valid], group_ids[is_valid]
+
+        order = np.lexsort((values, group_ids))
+        values = values[order]
+        counts = np.bincount(group_ids, minlength=group_count)
+        starts = np.cumsum(counts) - counts
+
+        positions = quantiles[np.newaxis, :] * (counts[:, np.newaxis] - 1)
+        lower = np.floor(positions).astype(np.int64)
+        upper = np.minimum(lower + 1, counts[:, np.newaxis] - 1)
+        fractions = positions - lower
+
+        result = np.full((group_count, len(quantiles)), np.nan)
+        has_values = counts > 0
+        lower_values = values[(starts[:, np.newaxis] + lower)[has_values]]
+        upper_values = values[(starts[:, np.newaxis] + upper)[has_values]]
+        result[has_values] = lower_values + (upper_values - lower_values) * fractions[has_values]
+
+        return result
+
+    def get_group_id(self, source_station: float, target_station: float, band: str = 'all') -> int:
+        """
+        Finds the group of a query.
+        :param float source_station: river km of the gauge of the observed peak
+        :param float target_station: river km of the gauge of the arrival
+        :param str band: 'all', 'yellow' or 'red'
+        :return int: the group (None if there was no such arrival)
+        """
+        if self.group_ids is None:
+            self.group_ids = {
+                (source, target, self.BANDS[band_code]): group_id
+                for group_id, (source, target, band_code) in enumerate(zip(
+                    self.stations[self.group_sources].tolist(),
+                    self.stations[self.group_targets].tolist(),
+                    self.group_bands.tolist()
+                ))
+            }
+        if band not in self.BANDS:
+            raise ValueError(f'Band must be one of {self.BANDS}')
+
+        return self.group_ids.get((float(source_station), float(target_station), band))
+
+    def get_pair_count(self, source_station: float, target_station: float, band: str = 'all') -> int:
+        """
+        Returns the number of historical arrivals between two gauges.
+        :param float source_station: river km of the gauge of the observed peak
+        :param float target_station: river km of the gauge of the arrival
+        :param str band: the band of the observed peak ('all', 'yellow' or 'red')
+        :return int: the number of arrivals
+        """
+        group_id = self.get_group_id(source_station=source_station, target_station=target_station, band=band)
+        return 0 if group_id is None else int(self.pair_counts[group_id])
+
+    def get_lag_histogram(self, source_station: float, target_station: float, band: str = 'all') -> np.ndarray:
+        """
+        Returns the histogram of the arrival lags between two gauges.
+        :param float source_station: river km of the gauge of the observed peak
+        :param float target_station: river km of the gauge of the arrival
+        :param str band: the band of the observed peak ('all', 'yellow' or 'red')
+        :return np.ndarray: the number of arrivals by lag in days (zeros if there was no arrival)
+        """
+        group_id = self.get_group_id(source_station=source_station, target_station=target_station, band=band)
+        if group_id is None:
+            return np.zeros(self.lag_counts.shape[1], dtype=np.int64)
+        return self.lag_counts[group_id]
+
+    def get_level_change_quantiles(self,
+                                   source_station: float,
+                                   target_station: float,
+                                   band: str = 'all'
+                                   ) -> np.ndarray:
+        """
+        Returns the quantiles (see the quantiles attribute) of the level changes between two gauges.
+        :param float source_station: river km of the gauge of the observed peak
+        :param float target_station: river km of the gauge of the arrival
+        :param str band: the band of the observed peak ('all', 'yellow' or 'red')
+        :return np.ndarray: the quantiles (NaN if no level is known)
+        """
+        group_id = self.get_group_id(source_station=source_station, target_station=target_station, band=band)
+        if group_id is None:
+            return np.full(len(self.quantiles), np.nan)
+        return self.level_change_quantiles[group_id]
+
+    def get_arrivals(self, source_station: float, band: str = 'all') -> pd.DataFrame:
+        """
+        Summarizes the arrivals at every gauge reached from a gauge.
+        :param float source_station: river km of the gauge of the observed peak
+        :param str band: the band of the observed peak ('all', 'yellow' or 'red')
+        :return pd.DataFrame: one row per target station: the number of arrivals,
+                              the mean and the most frequent lag, and the level change quantiles
+        """
+        if band not in self.BANDS:
+            raise ValueError(f'Band must be one of {self.BANDS}')
+
+        code = np.searchsorted(self.stations, float(source_station))
+        if code == len(self.stations) or self.stations[code] != float(source_station):
+            is_selected = np.zeros(len(self.pair_counts), dtype=bool)
+        else:
+            is_selected = (self.group_sources == code) & (self.group_bands == self.BANDS.index(band))
+
+        lag_counts = self.lag_counts[is_selected]
+        pair_counts = self.pair_counts[is_selected]
+        lag_days = np.arange(lag_counts.shape[1])
+        arrivals = pd.DataFrame(
+            data={
+                'pair_count': pair_counts,
+                'mean_lag': lag_counts @ lag_days / np.maximum(pair_counts, 1),
+                'most_frequent_lag': lag_counts.argmax(axis=1) if len(lag_counts) else np.zeros(0, dtype=np.int64)
+            },
+            index=pd.Index(self.stations[self.group_targets[is_selected]], name='target_station')
+        )
+        for q, column in zip(self.quantiles.tolist(), self.level_change_quantiles[is_selected].T):
+            arrivals[f'level_change_q{q:g}'] = column
+
+        return arrivals
+
+    def save(self, file_path: str):
+        """
+        Saves the arrays of the table into an npz file.
+        :param str file_path: path of the file
+        """
+        with open(file_path, 'wb') as f:
+            np.savez(f, **{key: getattr(self, key) for key in self.ARRAY_KEYS})
+
+    @classmethod
+    def load(cls, file_path: str) -> 'TravelTimeTable':
+        """
+        Loads a table saved by save.
+        :param str file_path: path of the file
+        :return TravelTimeTable: the table
+        """
+        with np.load(file_path, allow_pickle=False) as arrays:
+            return cls(data={key: arrays[key] for key in cls.ARRAY_KEYS})
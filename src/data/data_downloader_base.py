@@ -1,7 +1,5 @@
 import os
 
-import gdown
-
 from src import ROOT_DIR
 
 
@@ -25,5 +23,8 @@ class DataDownloaderBase:
     def download_data(self):
         """
         Downloads all data from Google Drive.
+        gdown (and requests) is imported here, so it is not loaded if the data is on disk.
         """
+        import gdown
+
         gdown.download_folder(url=self.folder_link, output=self.data_folder_path)
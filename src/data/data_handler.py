@@ -1,25 +1,39 @@
+import numpy as np
 import pandas as pd
 
 from src.data.data_loader import DataLoader
 from src.data.interfaces.data_interface import DataInterface
+from src.data.interfaces.ragged_series_interface import RaggedSeriesInterface
 
 
 class DataHandler:
     """
     This class preprocesses the data for use.
     """
-    def __init__(self, data_loader: DataLoader):
+    STORAGE_MODES = ('dense', 'ragged')
+
+    def __init__(self, data_loader: DataLoader, storage: str = 'dense'):
         """
         Constructor. We create the following data structures:
         - time_series: Pandas DataFrame containing all water level time series data.
         The indices are dates and the column names are station regional numbers.
+        Only created in 'dense' storage mode, it is left empty in 'ragged' storage mode.
+        - ragged_series: RaggedSeriesInterface containing the series of every gauge
+        over its lifetime. Only created in 'ragged' storage mode, straight from the chunks
+        of the measurements (see DataLoader.get_measurement_chunks), so the dense series
+        is not built if the DataLoader does not load the measurements.
         - meta: Pandas DataFrame containing regional numbers, station names and kilometers.
         - gauges: List of gauges (regional numbers).
         - station_info: Dictionary: keys are regional numbers, values are dictionaries like
         {'life_interval': {'start': '1876-01-01', 'end': '2019-12-31'}, 'null_point': 73.7, 'level_group': 570}
         (for Szeged)
         :param DataLoader data_loader: a DataLoader instance
+        :param str storage: 'dense' or 'ragged'
         """
+        if storage not in self.STORAGE_MODES:
+            raise ValueError(f'Storage mode must be one of {self.STORAGE_MODES}')
+
+        self.storage = storage
         self.data_if = DataInterface()
 
         self.run(data_loader=data_loader)
@@ -31,19 +45,28 @@ class DataHandler:
         """
         gauges = list(map(str, data_loader.meta_data.index.tolist()))
 
-        time_series = data_loader.measurement_data
-        time_series.index = pd.to_datetime(time_series.index, format='ISO8601')
-        time_series.index = time_series.index.strftime('%Y-%m-%d')
+        station_info = self.get_station_info(
+            data_loader=data_loader,
+            gauges=gauges
+        )
 
         data = {
-            'time_series': time_series,
             'meta': data_loader.meta_data,
             'gauges': gauges,
-            'station_info': self.get_station_info(
-                data_loader=data_loader,
+            'station_info': station_info
+        }
+
+        if self.storage == 'ragged':
+            data['ragged_series'] = self.get_ragged_series(
+                time_series=data_loader.get_measurement_chunks(),
+                station_info=station_info,
                 gauges=gauges
             )
-        }
+        else:
+            time_series = data_loader.measurement_data
+            time_series.index = pd.to_datetime(time_series.index, format='ISO8601')
+            time_series.index = time_series.index.strftime('%Y-%m-%d')
+            data['time_series'] = time_series
 
         self.data_if = DataInterface(data=data)
 
@@ -65,3 +88,48 @@ class DataHandler:
             }
 
         return station_info
+
+    @staticmethod
+    def get_ragged_series(time_series,
+                          station_info: dict,
+                          gauges: list
+                          ) -> RaggedSeriesInterface:
+        """
+        We store the series of every gauge over its lifetime in one contiguous float32 array.
+        The array is filled chunk by chunk, days missing from the time series are filled with NaN.
+        :param time_series: the dense time series or an iterable of its chunks, indexed by dates
+        :param dict station_info: dictionary of relevant station information
+        :param list gauges: list of gauges (regional numbers)
+        :return RaggedSeriesInterface: the ragged time series
+        """
+        if isinstance(time_series, pd.DataFrame):
+            time_series = [time_series]
+
+        start_days = np.array(
+            [station_info[gauge]['life_interval']['start'] for gauge in gauges],
+            dtype='datetime64[D]'
+        )
+        end_days = np.array(
+            [station_info[gauge]['life_interval']['end'] for gauge in gauges],
+            dtype='datetime64[D]'
+        )
+        lengths = np.maximum((end_days - start_days).astype(np.int64) + 1, 0)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+        values = np.full(offsets[-1], np.nan, dtype=np.float32)
+        for chunk in time_series:
+            days = pd.to_datetime(chunk.index, format='ISO8601').values.astype('datetime64[D]')
+
+            for i, gauge in enumerate(gauges):
+                is_alive = (days >= start_days[i]) & (days <= end_days[i])
+                positions = (days[is_alive] - start_days[i]).astype(np.int64)
+                values[offsets[i] + positions] = chunk[gauge].to_numpy()[is_alive]
+
+        data = {
+            'values': values,
+            'offsets': offsets,
+            'start_days': start_days,
+            'gauges': list(gauges)
+        }
+
+        return RaggedSeriesInterface(data=data)
@@ -1,6 +1,7 @@
 import json
 import os
 
+import numpy as np
 import pandas as pd
 
 from src.data.data_downloader import DataDownloader
@@ -10,12 +11,33 @@ class DataLoader:
     """
     This class is for loading all necessary data.
     """
-    def __init__(self, data_downloader: DataDownloader):
+    def __init__(self,
+                 data_downloader: DataDownloader,
+                 gauges: list = None,
+                 start_date: str = None,
+                 end_date: str = None,
+                 chunk_size: int = 10000,
+                 dtype: type = np.float32,
+                 load_measurements: bool = True
+                 ):
         """
         Constructor.
         :param DataDownloader data_downloader: a DataDownloader instance
+        :param list gauges: the gauges (regional numbers) to load, all gauges if None
+        :param str start_date: the first date to load, from the beginning if None
+        :param str end_date: the last date to load, until the end if None
+        :param int chunk_size: the number of rows read at once from the measurement file
+        :param type dtype: the type of the measurement values
+        :param bool load_measurements: whether to load the measurements into measurement_data,
+        if False they are only read chunk by chunk by get_measurement_chunks (e.g. for ragged storage)
         """
         self.data_folder_path = data_downloader.data_folder_path
+        self.gauges = None if gauges is None else list(map(str, gauges))
+        self.start_date = None if start_date is None else pd.Timestamp(start_date)
+        self.end_date = None if end_date is None else pd.Timestamp(end_date)
+        self.chunk_size = chunk_size
+        self.dtype = dtype
+        self.load_measurements = load_measurements
 
         self.file_name_dict = {
             'level_groups_file_name': 'level_groups.json',
@@ -41,15 +63,20 @@ class DataLoader:
             file_name=self.file_name_dict['level_groups_file_name']
         )
 
-        self.measurement_data = self.load_csv(
-            file_name=self.file_name_dict['measurement_file_name'],
-            sep=','
-        )
+        if self.load_measurements:
+            self.measurement_data = self.load_measurement_csv(
+                file_name=self.file_name_dict['measurement_file_name'],
+                sep=','
+            )
 
         self.meta_data = self.load_csv(
             file_name=self.file_name_dict['meta_file_name'],
             sep=';'
         )
+        if self.gauges is not None:
+            self.meta_data = self.meta_data[
+                self.meta_data.index.map(str).isin(self.gauges)
+            ]
 
         self.null_points = self.load_json(
             file_name=self.file_name_dict['null_points_file_name']
@@ -82,3 +109,78 @@ class DataLoader:
             sep=sep,
             index_col=0
         )
+
+    def get_measurement_chunks(self):
+        """
+        Yields the selected measurements chunk by chunk. If the measurements are loaded,
+        measurement_data is the only chunk, otherwise the measurement file is read.
+        :return: generator of the selected measurements as pandas DataFrames, indexed by dates
+        """
+        if self.load_measurements:
+            yield self.measurement_data
+        else:
+            yield from self.iter_measurement_csv(
+                file_name=self.file_name_dict['measurement_file_name'],
+                sep=','
+            )
+
+    def load_measurement_csv(self, file_name: str, sep: str) -> pd.DataFrame:
+        """
+        We load the measurement CSV file chunk by chunk, keeping only
+        the selected gauges and dates.
+        :param str file_name: the name of the CSV file
+        :param str sep: the used seperator character
+        :return pd.DataFrame: the selected measurements as a pandas DataFrame
+        """
+        return pd.concat(list(self.iter_measurement_csv(file_name=file_name, sep=sep)))
+
+    def iter_measurement_csv(self, file_name: str, sep: str):
+        """
+        We read the measurement CSV file chunk by chunk, keeping only
+        the selected gauges and dates.
+        Chunks after the end date are not read if the file is ordered by date.
+        If no measurement is selected, one empty chunk is yielded.
+        :param str file_name: the name of the CSV file
+        :param str sep: the used seperator character
+        :return: generator of the selected measurements as pandas DataFrames
+        """
+        file_path = os.path.join(self.data_folder_path, file_name)
+
+        header = pd.read_csv(file_path, sep=sep, nrows=0)
+        index_column = header.columns[0]
+        value_columns = [
+            column for column in header.columns[1:]
+            if self.gauges is None or column in self.gauges
+        ]
+
+        is_empty = True
+        for chunk in pd.read_csv(
+            file_path,
+            sep=sep,
+            index_col=0,
+            usecols=[index_column] + value_columns,
+            dtype={column: self.dtype for column in value_columns},
+            chunksize=self.chunk_size
+        ):
+            dates = pd.to_datetime(chunk.index, format='ISO8601')
+
+            is_selected = np.ones(len(chunk), dtype=bool)
+            if self.start_date is not None:
+                is_selected &= dates >= self.start_date
+            if self.end_date is not None:
+                is_selected &= dates <= self.end_date
+
+            if is_selected.any():
+                is_empty = False
+                yield chunk[is_selected]
+
+            if self.end_date is not None and dates.is_monotonic_increasing \
+                    and len(dates) and dates[-1] > self.end_date:
+                break
+
+        if is_empty:
+            yield pd.DataFrame(
+                columns=value_columns,
+                index=pd.Index([], name=index_column),
+                dtype=self.dtype
+            )
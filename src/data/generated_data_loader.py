@@ -1,20 +1,36 @@
+import json
 import os
 import pickle
 
 import networkx as nx
+import numpy as np
 
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.graph_cache import GraphCache
+from src.graph_building.interfaces.component_interface import ComponentInterface
 from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+from src.graph_manipulation.wave_index import WaveIndex
 
 
 class GeneratedDataLoader:
     """
     Class for writing and reading pickle files.
+    Graphs can also be stored in time shards: every weakly connected component is
+    stored in the shard of its first date, so no edge crosses two shards.
+    The vertex data of a shard contains the delta-peaks dated in its years,
+    and the vertices of its components reaching over them.
     """
+    MANIFEST_FILE = 'manifest.json'
+    VERTEX_SUFFIX = '_vertices.pkl'
+    WAVE_INDEX_SUFFIX = '_wave_index.npz'
+    UNDATED_SHARD = 'undated'
+
     @staticmethod
     def save_pickle(folder_path: str,
                     file_name: str,
                     graph: nx.DiGraph,
-                    vertex_interface: VertexDataInterface
+                    vertex_interface: VertexDataInterface,
+                    components: ComponentInterface = None
                     ):
         """
         Method for saving a graph into a pickle file.
@@ -23,6 +39,8 @@ class GeneratedDataLoader:
         :param nx.DiGraph graph: a directed graph
         :param VertexDataInterface vertex_interface: interface containing vertex data
                                                      necessary for analysis
+        :param ComponentInterface components: the components of the graph if they are known
+                                              (e.g. tracked by GraphBuilder), saved with the graph
         """
         os.makedirs(
             os.path.join(folder_path, 'generated'),
@@ -33,11 +51,23 @@ class GeneratedDataLoader:
             'graph': graph,
             'vertex_interface': vertex_interface
         }
+        if components is not None:
+            data['components'] = components
 
-        with open(os.path.join(
-                folder_path, 'generated', f'{file_name}.pkl'
-        ), 'wb') as f:
-            pickle.dump(data, f)
+        # data derived from the graph (e.g. its adjacency arrays) is recalculated after loading
+        derived_data = {
+            key: graph.graph.pop(key)
+            for key in GraphCache.KEYS + (GraphCache.OWNER_KEY, )
+            if key in graph.graph
+        }
+
+        try:
+            with open(os.path.join(
+                    folder_path, 'generated', f'{file_name}.pkl'
+            ), 'wb') as f:
+                pickle.dump(data, f)
+        finally:
+            graph.graph.update(derived_data)
 
     @staticmethod
     def read_pickle(folder_path: str,
@@ -47,7 +77,7 @@ class GeneratedDataLoader:
         Method for loading a graph from a pickle file.
         :param str folder_path: path of the target folder
         :param str file_name: name of the file
-        :return dict: the loaded graph and vertex data
+        :return dict: the loaded graph and vertex data (and its components if they were saved)
         """
         with open(os.path.join(
                 folder_path, f'{file_name}.pkl'
@@ -55,3 +85,358 @@ class GeneratedDataLoader:
             data = pickle.load(f)
 
         return data
+
+    @classmethod
+    def save_wave_index(cls,
+                        folder_path: str,
+                        file_name: str,
+                        wave_index: WaveIndex
+                        ):
+        """
+        Method for saving the index of flood waves next to the graph of the waves.
+        :param str folder_path: path of the data folder
+        :param str file_name: name of the graph file
+        :param WaveIndex wave_index: index of the flood waves
+        """
+        os.makedirs(
+            os.path.join(folder_path, 'generated'),
+            exist_ok=True
+        )
+
+        wave_index.save(file_path=os.path.join(
+            folder_path, 'generated', f'{file_name}{cls.WAVE_INDEX_SUFFIX}'
+        ))
+
+    @classmethod
+    def read_wave_index(cls, folder_path: str, file_name: str) -> WaveIndex:
+        """
+        Method for loading the index of flood waves saved next to a graph.
+        :param str folder_path: path of the target folder
+        :param str file_name: name of the graph file
+        :return WaveIndex: the index
+        """
+        return WaveIndex.load(file_path=os.path.join(
+            folder_path, f'{file_name}{cls.WAVE_INDEX_SUFFIX}'
+        ))
+
+    @classmethod
+    def save_shards(cls,
+                    folder_path: str,
+                    file_name: str,
+                    graph: nx.DiGraph,
+                    vertex_interface: VertexDataInterface = None,
+                    years_per_shard: int = 10
+                    ):
+        """
+        Method for saving a graph into time shards (e.g. one pickle per decade)
+        with a manifest of the date spans of the shards.
+        :param str folder_path: path of the data folder
+        :param str file_name: name of the sharded artifact (a folder)
+        :param nx.DiGraph graph: a directed graph
+        :param VertexDataInterface vertex_interface: interface containing vertex data
+                                                     necessary for analysis
+        :param int years_per_shard: the length of the shards in years
+        """
+        shard_path = cls.get_shard_path(
+            folder_path=folder_path,
+            file_name=file_name,
+            years_per_shard=years_per_shard
+        )
+
+        components = ComponentTracker.get_components(fwg=graph)
+        shard_keys = cls.get_shard_keys(
+            first_dates=components.date_spans[:, 0],
+            years_per_shard=years_per_shard
+        )
+        vertex_shards = dict()
+        if vertex_interface is not None:
+            vertex_shards = cls.get_vertex_shards(
+                vertices=vertex_interface.vertices,
+                years_per_shard=years_per_shard
+            )
+
+        shards = []
+        for shard_key in sorted(set(shard_keys.tolist()) | set(vertex_shards)):
+            shard_graph = cls.get_shard_graph(
+                graph=graph,
+                components=components,
+                is_selected=shard_keys == shard_key
+            )
+            shard_vertices = None
+            if vertex_interface is not None:
+                shard_vertices = cls.get_shard_vertices(
+                    shard_key=shard_key,
+                    shard_graph=shard_graph,
+                    vertex_shards=vertex_shards,
+                    years_per_shard=years_per_shard
+                )
+            shards.append(cls.save_shard(
+                shard_path=shard_path,
+                shard_key=shard_key,
+                shard_graph=shard_graph,
+                vertices=shard_vertices
+            ))
+
+        cls.save_manifest(
+            shard_path=shard_path,
+            shards=shards,
+            gauges=None if vertex_interface is None else list(vertex_interface.vertices),
+            river_kms=None if vertex_interface is None else vertex_interface.river_kms,
+            years_per_shard=years_per_shard
+        )
+
+    @staticmethod
+    def get_shard_path(folder_path: str, file_name: str, years_per_shard: int) -> str:
+        """
+        Creates the folder of a sharded artifact.
+        :param str folder_path: path of the data folder
+        :param str file_name: name of the sharded artifact
+        :param int years_per_shard: the length of the shards in years
+        :return str: path of the folder of the shards
+        """
+        if years_per_shard < 1:
+            raise ValueError('A shard must contain at least one year')
+
+        shard_path = os.path.join(folder_path, 'generated', file_name)
+        os.makedirs(shard_path, exist_ok=True)
+
+        return shard_path
+
+    @staticmethod
+    def get_shard_keys(first_dates: np.ndarray, years_per_shard: int) -> np.ndarray:
+        """
+        Assigns components to shards by their first date.
+        :param np.ndarray first_dates: the first dates of the components as datetime64[D]
+        :param int years_per_shard: the length of the shards in years
+        :return np.ndarray: the first year of the shard of each component (-1 if undated)
+        """
+        years = first_dates.astype('datetime64[Y]').astype(np.int64) + 1970
+
+        return np.where(np.isnat(first_dates), -1, years // years_per_shard * years_per_shard)
+
+    @classmethod
+    def get_vertex_shards(cls, vertices: dict, years_per_shard: int) -> dict:
+        """
+        Splits vertex data into the shards of the dates of the delta-peaks.
+        :param dict vertices: the vertex data (see VertexDataInterface)
+        :param int years_per_shard: the length of the shards in years
+        :return dict: shard key -> the vertex data of the delta-peaks dated in the shard
+        """
+        vertex_shards = dict()
+        for gauge, gauge_vertices in vertices.items():
+            dates = list(gauge_vertices)
+            shard_keys = cls.get_shard_keys(
+                first_dates=ComponentTracker.get_days(nodes=[(gauge, date) for date in dates]),
+                years_per_shard=years_per_shard
+            )
+            for date, shard_key in zip(dates, shard_keys.tolist()):
+                vertex_shards.setdefault(shard_key, dict()).setdefault(gauge, dict())[date] = gauge_vertices[date]
+
+        return vertex_shards
+
+    @classmethod
+    def get_shard_vertices(cls,
+                           shard_key: int,
+                           shard_graph: nx.DiGraph,
+                           vertex_shards: dict,
+                           years_per_shard: int
+                           ) -> dict:
+        """
+        Collects the vertex data of a shard: the delta-peaks dated in the shard,
+        and the vertices of its graph dated in later shards.
+        :param int shard_key: the first year of the shard (-1 if undated)
+        :param nx.DiGraph shard_graph: the graph of the shard
+        :param dict vertex_shards: the vertex data of the shards (see get_vertex_shards),
+                                   at least of the shard and the later ones
+        :param int years_per_shard: the length of the shards in years
+        :return dict: the vertex data of the shard
+        """
+        shard_vertices = {
+            gauge: dict(gauge_vertices)
+            for gauge, gauge_vertices in vertex_shards.get(shard_key, dict()).items()
+        }
+
+        nodes = list(shard_graph.nodes)
+        node_keys = cls.get_shard_keys(
+            first_dates=ComponentTracker.get_days(nodes=nodes),
+            years_per_shard=years_per_shard
+        )
+        for (gauge, date), node_key in zip(nodes, node_keys.tolist()):
+            gauge_vertices = vertex_shards.get(node_key, dict()).get(gauge, dict())
+            if node_key != shard_key and date in gauge_vertices:
+                shard_vertices.setdefault(gauge, dict())[date] = gauge_vertices[date]
+
+        return shard_vertices
+
+    @classmethod
+    def save_shard(cls,
+                   shard_path: str,
+                   shard_key: int,
+                   shard_graph: nx.DiGraph,
+                   vertices: dict = None
+                   ) -> dict:
+        """
+        Saves the graph of one shard, with its components stored in the graph,
+        and its vertex data next to it.
+        :param str shard_path: path of the folder of the shards
+        :param int shard_key: the first year of the shard (-1 if undated)
+        :param nx.DiGraph shard_graph: the graph of the shard
+        :param dict vertices: the vertex data of the shard (see get_shard_vertices), not saved if None
+        :return dict: the manifest entry of the shard
+        """
+        name = cls.UNDATED_SHARD if shard_key < 0 else str(shard_key)
+        with open(os.path.join(shard_path, f'{name}.pkl'), 'wb') as f:
+            pickle.dump(shard_graph, f)
+
+        dates = shard_graph.graph[ComponentTracker.GRAPH_KEY].date_spans.astype(str).ravel().tolist()
+        if vertices is not None:
+            with open(os.path.join(shard_path, f'{name}{cls.VERTEX_SUFFIX}'), 'wb') as f:
+                pickle.dump(vertices, f)
+            dates.extend(date for gauge_vertices in vertices.values() for date in gauge_vertices)
+
+        return {
+            'name': name,
+            'start_date': None if shard_key < 0 else min(dates),
+            'end_date': None if shard_key < 0 else max(dates),
+            'node_count': shard_graph.number_of_nodes(),
+            'edge_count': shard_graph.number_of_edges()
+        }
+
+    @classmethod
+    def save_manifest(cls,
+                      shard_path: str,
+                      shards: list,
+                      gauges: list = None,
+                      river_kms: list = None,
+                      years_per_shard: int = 10
+                      ):
+        """
+        Saves the manifest of the shards. The vertex data is saved with the shards,
+        the manifest only contains its gauges and their river kilometers.
+        :param str shard_path: path of the folder of the shards
+        :param list shards: the manifest entries of the shards
+        :param list gauges: the gauges of the vertex data, None if the vertex data is not saved
+        :param list river_kms: the river kilometers of the gauges
+        :param int years_per_shard: the length of the shards in years
+        """
+        manifest = {
+            'years_per_shard': years_per_shard,
+            'shards': sorted(shards, key=lambda shard: shard['start_date'] or ''),
+            'gauges': gauges,
+            'river_kms': None if river_kms is None else list(river_kms)
+        }
+        with open(os.path.join(shard_path, cls.MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def get_shard_graph(cls,
+                        graph: nx.DiGraph,
+                        components: ComponentInterface,
+                        is_selected: np.ndarray
+                        ) -> nx.DiGraph:
+        """
+        Copies the selected components of the graph into a new graph,
+        together with their component metadata.
+        :param nx.DiGraph graph: the whole graph
+        :param ComponentInterface components: the components of the graph
+        :param np.ndarray is_selected: mask of the selected components
+        :return nx.DiGraph: the graph of the shard
+        """
+        selected_ids = np.flatnonzero(is_selected)
+        nodes = [node for i in selected_ids for node in components.members[i]]
+        subgraph = graph.subgraph(nodes=nodes)
+
+        shard_graph = nx.DiGraph()
+        # data derived from the whole graph is not copied into the shards
+        shard_graph.graph.update(GraphCache.get_attributes(fwg=graph))
+        shard_graph.add_nodes_from(subgraph.nodes(data=True))
+        shard_graph.add_edges_from(subgraph.edges(data=True))
+
+        shard_graph.graph[ComponentTracker.GRAPH_KEY] = ComponentInterface(data={
+            'members': [components.members[i] for i in selected_ids],
+            'sizes': components.sizes[is_selected],
+            'station_spans': components.station_spans[is_selected],
+            'date_spans': components.date_spans[is_selected],
+            'node_count': shard_graph.number_of_nodes(),
+            'edge_count': shard_graph.number_of_edges()
+        })
+
+        return shard_graph
+
+    @classmethod
+    def read_manifest(cls, folder_path: str, file_name: str) -> dict:
+        """
+        Method for loading the manifest of a sharded graph.
+        :param str folder_path: path of the target folder
+        :param str file_name: name of the sharded artifact
+        :return dict: the manifest
+        """
+        with open(os.path.join(folder_path, file_name, cls.MANIFEST_FILE)) as f:
+            return json.load(f)
+
+    @classmethod
+    def read_shards(cls,
+                    folder_path: str,
+                    file_name: str,
+                    start_date: str = None,
+                    end_date: str = None
+                    ) -> dict:
+        """
+        Method for loading a sharded graph. Only the shards overlapping the date range
+        are opened, and they are merged into a single graph. The graph contains every
+        component overlapping the range completely; it can be cut to the range with
+        FWGFilter.get_date_section, which reuses the merged components if they are passed.
+        :param str folder_path: path of the target folder
+        :param str file_name: name of the sharded artifact
+        :param str start_date: the start of the date range (unbounded if None)
+        :param str end_date: the end of the date range (unbounded if None)
+        :return dict: the loaded graph, its components and the vertex data of the opened shards
+                      (None if the vertex data was not saved)
+        """
+        shard_path = os.path.join(folder_path, file_name)
+        manifest = cls.read_manifest(folder_path=folder_path, file_name=file_name)
+
+        graph = nx.DiGraph()
+        components = []
+        vertices = None if manifest['gauges'] is None else {gauge: dict() for gauge in manifest['gauges']}
+        for shard in manifest['shards']:
+            # undated components cannot be placed in time, so they are always loaded
+            if shard['start_date'] is not None and (
+                    start_date is not None and shard['end_date'] < start_date or
+                    end_date is not None and shard['start_date'] > end_date):
+                continue
+
+            with open(os.path.join(shard_path, f"{shard['name']}.pkl"), 'rb') as f:
+                shard_graph = pickle.load(f)
+
+            components.append(shard_graph.graph.pop(ComponentTracker.GRAPH_KEY))
+            for key, value in shard_graph.graph.items():
+                graph.graph.setdefault(key, value)
+            graph.add_nodes_from(shard_graph.nodes(data=True))
+            graph.add_edges_from(shard_graph.edges(data=True))
+
+            if vertices is not None:
+                with open(os.path.join(shard_path, f"{shard['name']}{cls.VERTEX_SUFFIX}"), 'rb') as f:
+                    for gauge, gauge_vertices in pickle.load(f).items():
+                        vertices[gauge].update(gauge_vertices)
+
+        if components:
+            components = ComponentTracker.merge_components(components=components)
+        else:
+            components = ComponentInterface()
+
+        vertex_interface = None
+        if vertices is not None:
+            vertex_interface = VertexDataInterface(data={
+                'vertices': {
+                    gauge: {date: gauge_vertices[date] for date in sorted(gauge_vertices)}
+                    for gauge, gauge_vertices in vertices.items()
+                },
+                'river_kms': manifest['river_kms']
+            })
+
+        return {
+            'graph': graph,
+            'components': components,
+            'vertex_interface': vertex_interface
+        }
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from src.data.interfaces.ragged_series_interface import RaggedSeriesInterface
+
 
 class DataInterface:
     """
@@ -10,15 +12,17 @@ class DataInterface:
         Constructor.
         :param dict data: Dictionary: the keys represent the data structures.
         The expected keys are:
-        - 'time_series'
+        - 'time_series' (left empty in ragged storage mode)
         - 'meta'
         - 'gauges'
         - 'station_info'
+        - 'ragged_series' (optional)
         """
         self.time_series = pd.DataFrame()
         self.meta = pd.DataFrame()
         self.gauges = list()
         self.station_info = dict()
+        self.ragged_series: RaggedSeriesInterface = None
 
         if data is not None:
             for key, value in data.items():
@@ -0,0 +1,50 @@
+import numpy as np
+
+
+class RaggedSeriesInterface:
+    """
+    Class for storing the time series of every gauge only over its lifetime.
+    All series are stored in one contiguous array, one after the other.
+    """
+    def __init__(self, data: dict = None):
+        """
+        Constructor.
+        :param dict data: Dictionary: the keys represent the data structures.
+        The expected keys are:
+        - 'values': float32 array containing the daily series of all gauges
+        - 'offsets': the position of the first value of each gauge in values (and the end)
+        - 'start_days': the first day of each series as datetime64[D]
+        - 'gauges': list of gauges (regional numbers) in the order of storage
+        """
+        self.values = np.zeros(0, dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.start_days = np.zeros(0, dtype='datetime64[D]')
+        self.gauges = list()
+
+        if data is not None:
+            for key, value in data.items():
+                setattr(self, key, value)
+
+        self.positions = {gauge: i for i, gauge in enumerate(self.gauges)}
+
+    def get_values(self, gauge: str) -> np.ndarray:
+        """
+        Returns the series of a gauge as a view of the contiguous array.
+        :param str gauge: the gauge
+        :return np.ndarray: the daily values over the lifetime of the gauge
+        """
+        position = self.positions[gauge]
+        return self.values[self.offsets[position]:self.offsets[position + 1]]
+
+    def get_days(self, gauge: str, indices: np.ndarray = None) -> np.ndarray:
+        """
+        Returns the days belonging to (selected) values of a gauge.
+        :param str gauge: the gauge
+        :param np.ndarray indices: positions in the series of the gauge, all if None
+        :return np.ndarray: the days as datetime64[D]
+        """
+        position = self.positions[gauge]
+        if indices is None:
+            indices = np.arange(self.offsets[position + 1] - self.offsets[position])
+
+        return self.start_days[position] + indices
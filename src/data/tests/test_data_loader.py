@@ -1,8 +1,22 @@
+import json
+import os
+import subprocess
+import sys
+
+import networkx as nx
+import numpy as np
 import pandas as pd
 import pytest
 
+from src import ROOT_DIR
 from src.data.data_downloader import DataDownloader
+from src.data.data_downloader_base import DataDownloaderBase
+from src.data.data_handler import DataHandler
 from src.data.data_loader import DataLoader
+from src.data.generated_data_loader import GeneratedDataLoader
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.graph_cache import GraphCache
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
 
 
 @pytest.fixture
@@ -48,3 +62,162 @@ def test_station_lifetimes(data_loader: DataLoader):
 
     assert isinstance(station_lifetimes, dict)
     assert len(station_lifetimes) == 22
+
+
+@pytest.fixture
+def local_downloader(tmp_path) -> DataDownloaderBase:
+    gauges = ['3.0', '2.0', '1.0']
+    dates = pd.date_range('2000-01-01', periods=40).strftime('%Y-%m-%d')
+
+    pd.DataFrame(
+        data=np.arange(len(dates) * len(gauges)).reshape(len(dates), len(gauges)),
+        index=pd.Index(dates, name='date'),
+        columns=gauges
+    ).to_csv(tmp_path / 'measurement_data.csv', sep=',')
+    pd.DataFrame(
+        data={'river_km': list(map(float, gauges))},
+        index=pd.Index(list(map(float, gauges)), name='regional_number')
+    ).to_csv(tmp_path / 'meta_data.csv', sep=';')
+    for file_name in ('level_groups.json', 'null_points.json', 'station_lifetimes.json'):
+        with open(tmp_path / file_name, 'w') as f:
+            json.dump({gauge: None for gauge in gauges}, f)
+
+    return DataDownloaderBase(folder_link='', data_folder_path=str(tmp_path))
+
+
+def test_selective_measurement_loading(local_downloader: DataDownloaderBase):
+    full_loader = DataLoader(data_downloader=local_downloader)
+    loader = DataLoader(
+        data_downloader=local_downloader,
+        gauges=[1.0, 3.0],
+        start_date='2000-01-05',
+        end_date='2000-01-27',
+        chunk_size=7
+    )
+
+    df = loader.measurement_data
+    expected = full_loader.measurement_data.loc['2000-01-05':'2000-01-27', ['3.0', '1.0']]
+
+    assert df.dtypes.eq(np.float32).all()
+    assert df.shape == (23, 2)
+    pd.testing.assert_frame_equal(df, expected)
+    assert loader.meta_data.index.tolist() == [3.0, 1.0]
+
+
+def test_streamed_ragged_series(local_downloader: DataDownloaderBase):
+    with open(os.path.join(local_downloader.data_folder_path, 'station_lifetimes.json'), 'w') as f:
+        json.dump({
+            '3.0': {'start': '1999-12-25', 'end': '2000-01-10'},
+            '2.0': {'start': '2000-01-08', 'end': '2000-01-31'},
+            '1.0': {'start': '2000-02-05', 'end': '2000-02-20'}
+        }, f)
+
+    dense_handler = DataHandler(data_loader=DataLoader(data_downloader=local_downloader), storage='dense')
+    loader = DataLoader(data_downloader=local_downloader, chunk_size=7, load_measurements=False)
+    ragged_series = DataHandler(data_loader=loader, storage='ragged').data_if.ragged_series
+
+    expected = DataHandler.get_ragged_series(
+        time_series=dense_handler.data_if.time_series,
+        station_info=dense_handler.data_if.station_info,
+        gauges=dense_handler.data_if.gauges
+    )
+
+    assert loader.measurement_data.empty
+    np.testing.assert_array_equal(ragged_series.values, expected.values)
+    np.testing.assert_array_equal(ragged_series.offsets, expected.offsets)
+    # days outside the measurements are missing
+    assert np.isnan(ragged_series.get_values(gauge='3.0')[:7]).all()
+    assert ragged_series.get_values(gauge='2.0')[0] == 7 * 3 + 1
+
+
+def test_lazy_downloader_import():
+    # gdown is only needed if the data has to be downloaded
+    completed = subprocess.run(
+        [sys.executable, '-c',
+         'import sys, src.data.data_loader; print("gdown" in sys.modules)'],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    assert completed.stdout.strip() == 'False'
+
+
+def test_sharded_graph_storage(tmp_path):
+    fwg = nx.DiGraph()
+    fwg.add_edges_from([
+        (('2.0', '1999-12-30'), ('1.0', '2000-01-02'), {'slope': 1.0}),
+        (('2.0', '2005-05-01'), ('1.0', '2005-05-02'), {'slope': 0.0}),
+        (('2.0', '2012-03-01'), ('1.0', '2012-03-03'), {'slope': -1.0})
+    ])
+
+    vertices = {
+        gauge: {date: {'value': 1.0, 'color': 'red'} for node_gauge, date in sorted(fwg.nodes) if node_gauge == gauge}
+        for gauge in ('2.0', '1.0')
+    }
+    # a peak without edges
+    vertices['1.0']['2007-07-07'] = {'value': 2.0, 'color': 'yellow'}
+    vertex_interface = VertexDataInterface(data={'vertices': vertices, 'river_kms': [2.0, 1.0]})
+
+    GeneratedDataLoader.save_shards(
+        folder_path=str(tmp_path),
+        file_name='fwg',
+        graph=fwg,
+        vertex_interface=vertex_interface,
+        years_per_shard=10
+    )
+    folder_path = os.path.join(tmp_path, 'generated')
+
+    # the component crossing the year 2000 stays in the shard of its first date,
+    # the spans of the shards also cover the peaks dated in them
+    manifest = GeneratedDataLoader.read_manifest(folder_path=folder_path, file_name='fwg')
+    spans = [(shard['name'], shard['start_date'], shard['end_date']) for shard in manifest['shards']]
+    assert spans == [
+        ('1990', '1999-12-30', '2000-01-02'),
+        ('2000', '2000-01-02', '2007-07-07'),
+        ('2010', '2012-03-01', '2012-03-03')
+    ]
+
+    data = GeneratedDataLoader.read_shards(folder_path=folder_path, file_name='fwg')
+    assert sorted(data['graph'].edges(data=True)) == sorted(fwg.edges(data=True))
+    assert data['vertex_interface'].vertices == vertices
+
+    data = GeneratedDataLoader.read_shards(
+        folder_path=folder_path,
+        file_name='fwg',
+        start_date='2000-01-01',
+        end_date='2009-12-31'
+    )
+    assert sorted(data['graph'].nodes) == [
+        ('1.0', '2000-01-02'), ('1.0', '2005-05-02'),
+        ('2.0', '1999-12-30'), ('2.0', '2005-05-01')
+    ]
+    assert ComponentTracker.get_components(fwg=data['graph']).sizes.tolist() == [2, 2]
+    assert data['components'].sizes.tolist() == [2, 2]
+    # the vertex data of the nodes dated before the range is loaded with their shard
+    assert data['vertex_interface'].vertices == {
+        '2.0': {date: vertices['2.0'][date] for date in ('1999-12-30', '2005-05-01')},
+        '1.0': {date: vertices['1.0'][date] for date in ('2000-01-02', '2005-05-02', '2007-07-07')}
+    }
+    assert data['vertex_interface'].river_kms == [2.0, 1.0]
+
+    # data derived from the graph is not saved
+    frozen_fwg = GraphCache.freeze(fwg=fwg.copy())
+    components = ComponentTracker.get_components(fwg=frozen_fwg)
+    GeneratedDataLoader.save_pickle(folder_path=str(tmp_path), file_name='fwg', graph=frozen_fwg, vertex_interface=None)
+    data = GeneratedDataLoader.read_pickle(folder_path=folder_path, file_name='fwg')
+    assert set(data['graph'].graph).isdisjoint(GraphCache.KEYS)
+    assert ComponentTracker.get_components(fwg=frozen_fwg) is components
+    assert 'components' not in data
+
+    # known components are saved with the graph
+    GeneratedDataLoader.save_pickle(
+        folder_path=str(tmp_path),
+        file_name='fwg',
+        graph=fwg,
+        vertex_interface=None,
+        components=components
+    )
+    data = GeneratedDataLoader.read_pickle(folder_path=folder_path, file_name='fwg')
+    assert data['components'].members == components.members
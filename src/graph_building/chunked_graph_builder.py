@@ -0,0 +1,418 @@
+import bisect
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from src.data.data_loader import DataLoader
+from src.data.generated_data_loader import GeneratedDataLoader
+from src.data.interfaces.data_interface import DataInterface
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.graph_builder import GraphBuilder
+from src.graph_building.interfaces.fwg_interface import FWGInterface
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+
+
+class ChunkedGraphBuilder(GraphBuilder):
+    """
+    This class builds the FWG in time chunks. The measurements are read chunk by chunk
+    (see DataLoader.get_measurement_chunks), and only the rows of the window of one chunk
+    are held: its days, beta days after it, and delta records around them.
+    Edges belong to the chunk of their upstream date, and the peaks of the window
+    are searched like in the single-shot build, so the boundaries are stitched exactly:
+    the graph and the vertex data are the same as the single-shot ones.
+    Only the edges of the components still open at the end of a chunk are held in the open graph.
+    With sharded output (see GeneratedDataLoader.save_shards), the closed components and the vertex data
+    are saved with their shard once it is complete. Shards are saved in order, so the vertex data
+    of a shard is held until the components of the earlier shards are closed.
+    Otherwise the graph and the vertex data are assembled in memory.
+    """
+    def __init__(self,
+                 data_interface: DataInterface,
+                 delta: int = 2,
+                 beta: int = 2,
+                 alpha: int = 1,
+                 chunk_days: int = 3650,
+                 data_loader: DataLoader = None,
+                 folder_path: str = None,
+                 file_name: str = None,
+                 years_per_shard: int = 10
+                 ):
+        """
+        Constructor.
+        :param DataInterface data_interface: the DataInterface instance containing required data,
+                                             the time series is only read if there is no DataLoader
+        :param int beta: the number of days allowed after a vertex for continuation
+        :param int delta: the number of days that a record is required to be greater
+                          than the records before, and to be greater or equal to after
+                          to be considered a peak
+        :param int alpha: the number of days minimally needed to consider an edge
+        :param int chunk_days: the number of days in a chunk
+        :param DataLoader data_loader: the DataLoader reading the measurements
+                                       (e.g. with load_measurements=False)
+        :param str folder_path: path of the data folder of the sharded output
+        :param str file_name: name of the sharded artifact, the graph is assembled in memory if None
+        :param int years_per_shard: the length of the shards in years
+        """
+        super().__init__(
+            data_interface=data_interface,
+            delta=delta,
+            beta=beta,
+            alpha=alpha
+        )
+
+        if chunk_days < 1:
+            raise ValueError('A chunk must contain at least one day')
+
+        self.chunk_days = chunk_days
+        self.data_loader = data_loader
+        self.folder_path = folder_path
+        self.file_name = file_name
+        self.years_per_shard = years_per_shard
+
+        self.vertex_interface: VertexDataInterface = None
+        # edges of the components that can still grow
+        self.open_graph = nx.DiGraph()
+        # shard key -> (closed graph, list of its components)
+        self.closed_graphs = dict()
+        # shard key -> vertex data of the delta-peaks dated in the shard, not saved yet
+        self.vertex_shards = dict()
+        self.shard_path: str = None
+        self.shards = list()
+
+    def run(self, vertex_interface: VertexDataInterface = None):
+        """
+        Runs the operations for building the graph chunk by chunk.
+        If a file name is given, closed components and the vertex data are streamed into
+        a sharded artifact as soon as their shard is complete, and fwg_interface is left empty.
+        :param VertexDataInterface vertex_interface: already found delta-peaks
+                                                     (e.g. from MultiDeltaPeakFinder),
+                                                     searched for chunk by chunk if None
+        """
+        self.shard_path = None
+        if self.file_name is not None:
+            self.shard_path = GeneratedDataLoader.get_shard_path(
+                folder_path=self.folder_path,
+                file_name=self.file_name,
+                years_per_shard=self.years_per_shard
+            )
+
+        gauges = self.data_interface.gauges
+        vertices = {gauge: dict() for gauge in gauges}
+
+        self.open_graph = nx.DiGraph()
+        self.closed_graphs = dict()
+        self.vertex_shards = dict()
+        self.shards = list()
+
+        if vertex_interface is None:
+            chunk_peaks = self.get_chunk_peaks()
+        else:
+            chunk_peaks = self.get_given_peaks(vertex_interface=vertex_interface)
+
+        for chunk_start, chunk_end, chunk_vertices in chunk_peaks:
+            end_date = str(chunk_end)
+            own_vertices = {
+                gauge: {date: data for date, data in chunk_vertices[gauge].items() if date < end_date}
+                for gauge in gauges
+            }
+            if self.shard_path is None:
+                for gauge in gauges:
+                    vertices[gauge].update(own_vertices[gauge])
+            else:
+                self.add_vertex_shards(vertices=own_vertices)
+
+            self.open_graph.add_edges_from(
+                self.get_chunk_edges(chunk_vertices=chunk_vertices, end_date=end_date)
+            )
+            # later edges start after the chunk, so components ending before it are closed
+            self.close_components(chunk_end=chunk_end)
+
+        self.close_components(chunk_end=None)
+
+        river_kms = self.data_interface.meta['river_km'].tolist()
+        if self.shard_path is not None:
+            GeneratedDataLoader.save_manifest(
+                shard_path=self.shard_path,
+                shards=self.shards,
+                gauges=list(gauges),
+                river_kms=river_kms,
+                years_per_shard=self.years_per_shard
+            )
+            return
+
+        self.vertex_interface = VertexDataInterface(data={
+            'vertices': vertices,
+            'river_kms': river_kms
+        })
+        self.delta_peak_finder.vertex_interface = self.vertex_interface
+
+        fwg, components = self.closed_graphs.pop(0, (nx.DiGraph(), []))
+        self.fwg_interface = FWGInterface(
+            fwg=fwg,
+            components=self.get_merged_components(fwg=fwg, components=components)
+        )
+
+    def get_chunks(self) -> list:
+        """
+        Splits the lifetimes of the gauges into chunks.
+        :return list: (first day, day after the last day) pairs as datetime64[D]
+        """
+        station_info = self.data_interface.station_info
+        gauges = self.data_interface.gauges
+        if not gauges:
+            return []
+
+        first_day = min(
+            np.datetime64(station_info[gauge]['life_interval']['start'], 'D') for gauge in gauges
+        )
+        last_day = max(
+            np.datetime64(station_info[gauge]['life_interval']['end'], 'D') for gauge in gauges
+        )
+
+        chunk_starts = np.arange(first_day, last_day + 1, self.chunk_days)
+
+        return [(chunk_start, chunk_start + self.chunk_days) for chunk_start in chunk_starts]
+
+    def get_measurement_chunks(self):
+        """
+        We read the measurements with the DataLoader, or take the loaded time series
+        as the only chunk if there is no DataLoader.
+        :return: iterable of the measurements as pandas DataFrames, indexed by dates
+        """
+        if self.data_loader is not None:
+            return self.data_loader.get_measurement_chunks()
+
+        time_series = self.data_interface.time_series
+        if not set(self.data_interface.gauges).issubset(time_series.columns):
+            raise ValueError('The time series is not loaded, a DataLoader is needed to read the measurements')
+
+        return [time_series]
+
+    def get_chunk_windows(self):
+        """
+        We read the measurements until the window of the next chunk is complete,
+        and drop the rows before the window of the chunk after it.
+        The measurements must be ordered by date.
+        :return: generator of (first day, day after the last day, window) tuples,
+                 the window contains the days and the values (one column per gauge) of its rows,
+                 and the rows of the days of the chunk and beta days after it
+                 (first row, row after the last one)
+        """
+        gauges = self.data_interface.gauges
+        measurement_chunks = iter(self.get_measurement_chunks())
+
+        days = np.zeros(0, dtype='datetime64[D]')
+        values = np.zeros((0, len(gauges)), dtype=np.float32)
+        is_read = False
+        for chunk_start, chunk_end in self.get_chunks():
+            last_day = chunk_end + self.beta - 1
+
+            # delta records after the last day are needed for its peaks
+            while not is_read and len(days) - np.searchsorted(days, last_day, side='right') < max(self.delta, 1):
+                measurements = next(measurement_chunks, None)
+                if measurements is None:
+                    is_read = True
+                    continue
+                days = np.concatenate((
+                    days,
+                    pd.to_datetime(measurements.index, format='ISO8601').values.astype('datetime64[D]')
+                ))
+                values = np.concatenate((values, measurements[gauges].to_numpy()))
+
+            rows = tuple(np.searchsorted(days, [chunk_start, last_day + 1], side='left').tolist())
+            yield chunk_start, chunk_end, {'days': days, 'values': values, 'rows': rows}
+
+            # the window of the next chunk starts delta records before it
+            first_kept = max(int(np.searchsorted(days, chunk_end, side='left')) - self.delta, 0)
+            days, values = days[first_kept:], values[first_kept:]
+
+    def get_chunk_peaks(self):
+        """
+        We find the delta-peaks of every chunk and beta days after it.
+        :return: generator of (first day, day after the last day, peak data of the gauges) tuples
+        """
+        for chunk_start, chunk_end, window in self.get_chunk_windows():
+            yield chunk_start, chunk_end, {
+                gauge: self.get_window_peaks(gauge=gauge, window=window)
+                for gauge in self.data_interface.gauges
+            }
+
+    def get_window_peaks(self, gauge: str, window: dict) -> dict:
+        """
+        We find the delta-peaks of a gauge in the window of a chunk.
+        The window is cut at the ends of the lifetime of the gauge, like in the single-shot build.
+        :param str gauge: the current gauge
+        :param dict window: the window of the chunk (see get_chunk_windows)
+        :return dict: peak data of the found delta-peaks (see DeltaPeakFinder.get_peak_data)
+        """
+        life_interval = self.data_interface.station_info[gauge]['life_interval']
+        life_start = np.searchsorted(window['days'], np.datetime64(life_interval['start'], 'D'), side='left')
+        life_end = np.searchsorted(window['days'], np.datetime64(life_interval['end'], 'D'), side='right')
+
+        first, end = np.clip(window['rows'], life_start, life_end).tolist()
+        if first == end:
+            return self.delta_peak_finder.get_peak_data(gauge=gauge, peak_series=pd.Series(dtype=np.float64))
+
+        window_start = max(first - self.delta, life_start)
+        window_end = min(end + self.delta, life_end)
+
+        values = window['values'][:, self.data_interface.gauges.index(gauge)]
+        positions = window_start + np.flatnonzero(
+            self.delta_peak_finder.get_peak_mask(values=values[window_start:window_end])
+        )
+        positions = positions[(positions >= first) & (positions < end)]
+
+        peak_series = pd.Series(
+            data=values[positions],
+            index=np.datetime_as_string(window['days'][positions], unit='D')
+        )
+
+        return self.delta_peak_finder.get_peak_data(gauge=gauge, peak_series=peak_series)
+
+    def get_given_peaks(self, vertex_interface: VertexDataInterface):
+        """
+        We split already found delta-peaks into chunks (and beta days after them).
+        :param VertexDataInterface vertex_interface: the delta-peaks
+        :return: generator of (first day, day after the last day, peak data of the gauges) tuples
+        """
+        dates = {gauge: sorted(vertex_interface.vertices[gauge]) for gauge in self.data_interface.gauges}
+
+        for chunk_start, chunk_end in self.get_chunks():
+            first_date, end_date = str(chunk_start), str(chunk_end + self.beta)
+            chunk_vertices = dict()
+            for gauge, gauge_dates in dates.items():
+                first = bisect.bisect_left(gauge_dates, first_date)
+                end = bisect.bisect_left(gauge_dates, end_date)
+                chunk_vertices[gauge] = {
+                    date: vertex_interface.vertices[gauge][date] for date in gauge_dates[first:end]
+                }
+
+            yield chunk_start, chunk_end, chunk_vertices
+
+    def add_vertex_shards(self, vertices: dict):
+        """
+        We add the vertex data of a chunk to the shards of its dates, until the shards are saved.
+        :param dict vertices: the vertex data of the chunk
+        """
+        vertex_shards = GeneratedDataLoader.get_vertex_shards(
+            vertices=vertices,
+            years_per_shard=self.years_per_shard
+        )
+        for shard_key, shard_vertices in vertex_shards.items():
+            held_vertices = self.vertex_shards.setdefault(shard_key, dict())
+            for gauge, gauge_vertices in shard_vertices.items():
+                held_vertices.setdefault(gauge, dict()).update(gauge_vertices)
+
+    def get_chunk_edges(self, chunk_vertices: dict, end_date: str) -> list:
+        """
+        We find the edges starting in the chunk between neighboring gauges.
+        :param dict chunk_vertices: the delta-peaks of the chunk (and beta days after it)
+        :param str end_date: the day after the chunk
+        :return list: the edges with their slopes
+        """
+        gauges = self.data_interface.gauges
+
+        edges = []
+        for upstream, downstream in zip(gauges[:-1], gauges[1:]):
+            upstream_vertices = {
+                date: data for date, data in chunk_vertices[upstream].items() if date < end_date
+            }
+            found_edges = self.edge_finder.find_edges(
+                upstream=upstream,
+                downstream=downstream,
+                vertices={upstream: upstream_vertices, downstream: chunk_vertices[downstream]}
+            )
+            edges.extend(
+                ((upstream, start_date), (downstream, end_date), {'slope': slope})
+                for (start_date, end_date), slope in found_edges
+            )
+
+        return edges
+
+    def close_components(self, chunk_end: np.datetime64 = None):
+        """
+        We move the components ending before the end of the chunk out of the open graph.
+        Complete shards are saved in order if the output is sharded.
+        :param np.datetime64 chunk_end: the day after the chunk, all components are closed if None
+        """
+        components = ComponentTracker.from_graph(fwg=self.open_graph)
+        if chunk_end is None:
+            is_closed = np.ones(len(components.members), dtype=bool)
+        else:
+            is_closed = components.date_spans[:, 1] < chunk_end
+
+        if self.shard_path is None:
+            shard_keys = np.zeros(len(components.members), dtype=np.int64)
+        else:
+            shard_keys = GeneratedDataLoader.get_shard_keys(
+                first_dates=components.date_spans[:, 0],
+                years_per_shard=self.years_per_shard
+            )
+
+        for shard_key in np.unique(shard_keys[is_closed]).tolist():
+            shard_graph = GeneratedDataLoader.get_shard_graph(
+                graph=self.open_graph,
+                components=components,
+                is_selected=is_closed & (shard_keys == shard_key)
+            )
+            closed_graph, closed_components = self.closed_graphs.setdefault(
+                shard_key, (nx.DiGraph(), [])
+            )
+            closed_components.append(shard_graph.graph.pop(ComponentTracker.GRAPH_KEY))
+            closed_graph.add_edges_from(shard_graph.edges(data=True))
+
+        self.open_graph.remove_nodes_from(
+            node for i in np.flatnonzero(is_closed) for node in components.members[i]
+        )
+
+        if self.shard_path is None:
+            return
+
+        open_keys = set(shard_keys[~is_closed].tolist())
+        for shard_key in sorted(set(self.closed_graphs) | set(self.vertex_shards)):
+            if chunk_end is not None and shard_key < 0:
+                # undated components are saved at the end
+                continue
+            is_complete = chunk_end is None or (
+                shard_key not in open_keys and
+                np.datetime64(str(shard_key + self.years_per_shard), 'Y') <= chunk_end
+            )
+            if not is_complete:
+                # the components of the shard may need the vertex data of the later ones
+                break
+
+            shard_graph, shard_components = self.closed_graphs.pop(shard_key, (nx.DiGraph(), []))
+            shard_graph.graph[ComponentTracker.GRAPH_KEY] = self.get_merged_components(
+                fwg=shard_graph,
+                components=shard_components
+            )
+            self.shards.append(GeneratedDataLoader.save_shard(
+                shard_path=self.shard_path,
+                shard_key=shard_key,
+                shard_graph=shard_graph,
+                vertices=GeneratedDataLoader.get_shard_vertices(
+                    shard_key=shard_key,
+                    shard_graph=shard_graph,
+                    vertex_shards=self.vertex_shards,
+                    years_per_shard=self.years_per_shard
+                )
+            ))
+            self.vertex_shards.pop(shard_key, None)
+
+    @staticmethod
+    def get_merged_components(fwg: nx.DiGraph, components: list):
+        """
+        We merge the components closed in different chunks.
+        :param nx.DiGraph fwg: the graph the components belong to
+        :param list components: list of ComponentInterface instances
+        :return ComponentInterface: the components of the graph
+        """
+        if not components:
+            return ComponentTracker.from_graph(fwg=fwg)
+
+        merged = ComponentTracker.merge_components(components=components)
+        merged.node_count = fwg.number_of_nodes()
+        merged.edge_count = fwg.number_of_edges()
+
+        return merged
@@ -0,0 +1,279 @@
+import networkx as nx
+import numpy as np
+
+from src.graph_building.graph_cache import GraphCache
+from src.graph_building.interfaces.component_interface import ComponentInterface
+
+
+class ComponentTracker:
+    """
+    Vectorized union-find structure for tracking the weakly connected components of the FWG.
+    """
+    GRAPH_KEY = 'components'
+
+    def __init__(self, node_count: int = 0):
+        """
+        Constructor. Every node starts as its own component.
+        :param int node_count: the number of nodes to track
+        """
+        self.parent = np.arange(node_count, dtype=np.int64)
+
+    def compress(self):
+        """
+        Points every node directly to the root of its component (pointer doubling).
+        """
+        while True:
+            grandparent = self.parent[self.parent]
+            if np.array_equal(grandparent, self.parent):
+                break
+            self.parent = grandparent
+
+    def find(self, nodes: np.ndarray) -> np.ndarray:
+        """
+        Finds the roots of the given nodes.
+        :param np.ndarray nodes: node indices
+        :return np.ndarray: root indices
+        """
+        self.compress()
+        return self.parent[nodes]
+
+    def union(self, u: np.ndarray, v: np.ndarray):
+        """
+        Merges the components of the node pairs (u[i], v[i]) at once.
+        Roots are always hooked onto the smaller root, so no cycles can form.
+        :param np.ndarray u: indices of the first nodes
+        :param np.ndarray v: indices of the second nodes
+        """
+        u = np.asarray(u, dtype=np.int64)
+        v = np.asarray(v, dtype=np.int64)
+
+        while u.size:
+            root_u = self.find(nodes=u)
+            root_v = self.find(nodes=v)
+
+            differ = root_u != root_v
+            if not differ.any():
+                break
+
+            u, v = u[differ], v[differ]
+            root_u, root_v = root_u[differ], root_v[differ]
+
+            np.minimum.at(
+                self.parent,
+                np.maximum(root_u, root_v),
+                np.minimum(root_u, root_v)
+            )
+
+        self.compress()
+
+    def get_labels(self) -> np.ndarray:
+        """
+        Returns the root of every node, nodes with equal labels are in the same component.
+        :return np.ndarray: component labels
+        """
+        self.compress()
+        return self.parent.copy()
+
+    @staticmethod
+    def get_component_interface(nodes: list,
+                                labels: np.ndarray,
+                                edge_count: int
+                                ) -> ComponentInterface:
+        """
+        We group the nodes by their labels, and calculate the component metadata.
+        :param list nodes: (gauge, date) nodes
+        :param np.ndarray labels: component label of each node
+        :param int edge_count: number of edges among the nodes
+        :return ComponentInterface: the components of the nodes
+        """
+        if not nodes:
+            return ComponentInterface(data={'edge_count': edge_count})
+
+        order = np.array(sorted(range(len(nodes)), key=nodes.__getitem__), dtype=np.int64)
+
+        # components are numbered by the position of their first node in the sorted order
+        _, first_positions, inverse = np.unique(
+            labels[order], return_index=True, return_inverse=True
+        )
+        rank = np.empty(len(first_positions), dtype=np.int64)
+        rank[np.argsort(first_positions)] = np.arange(len(first_positions))
+        component_ids = rank[inverse]
+
+        member_indices = order[np.argsort(component_ids, kind='stable')]
+        sizes = np.bincount(component_ids)
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+        member_nodes = [nodes[i] for i in member_indices]
+        members = [
+            member_nodes[start:start + size]
+            for start, size in zip(starts.tolist(), sizes.tolist())
+        ]
+
+        stations = ComponentTracker.get_river_kms(nodes=member_nodes)
+        dates = ComponentTracker.get_days(nodes=member_nodes)
+
+        data = {
+            'members': members,
+            'sizes': sizes,
+            'station_spans': np.column_stack((
+                np.minimum.reduceat(stations, starts),
+                np.maximum.reduceat(stations, starts)
+            )),
+            'date_spans': np.column_stack((
+                np.minimum.reduceat(dates, starts),
+                np.maximum.reduceat(dates, starts)
+            )),
+            'node_count': len(nodes),
+            'edge_count': edge_count
+        }
+
+        return ComponentInterface(data=data)
+
+    @staticmethod
+    def get_river_kms(nodes: list) -> np.ndarray:
+        """
+        Converts the gauges of the nodes to river kilometers.
+        Gauges that are not river kilometers are mapped to NaN.
+        :param list nodes: (gauge, date) nodes
+        :return np.ndarray: river kilometers
+        """
+        try:
+            return np.array([node[0] for node in nodes], dtype=np.float64)
+        except ValueError:
+            river_kms = np.full(len(nodes), np.nan)
+            for i, node in enumerate(nodes):
+                try:
+                    river_kms[i] = float(node[0])
+                except ValueError:
+                    continue
+            return river_kms
+
+    @staticmethod
+    def get_days(nodes: list) -> np.ndarray:
+        """
+        Converts the dates of the nodes to datetime64[D].
+        Dates that cannot be parsed are mapped to NaT.
+        :param list nodes: (gauge, date) nodes
+        :return np.ndarray: dates
+        """
+        try:
+            return np.array([node[1] for node in nodes], dtype='datetime64[D]')
+        except ValueError:
+            days = np.full(len(nodes), np.datetime64('NaT'), dtype='datetime64[D]')
+            for i, node in enumerate(nodes):
+                try:
+                    days[i] = np.datetime64(node[1], 'D')
+                except ValueError:
+                    continue
+            return days
+
+    @classmethod
+    def from_graph(cls, fwg: nx.DiGraph) -> ComponentInterface:
+        """
+        Finds the components of an arbitrary graph.
+        :param nx.DiGraph fwg: the graph
+        :return ComponentInterface: the components of the graph
+        """
+        nodes = list(fwg.nodes)
+        node_ids = {node: i for i, node in enumerate(nodes)}
+
+        tracker = cls(node_count=len(nodes))
+        if fwg.number_of_edges():
+            u, v = zip(*((node_ids[u], node_ids[v]) for u, v in fwg.edges))
+            tracker.union(u=np.array(u), v=np.array(v))
+
+        return cls.get_component_interface(
+            nodes=nodes,
+            labels=tracker.get_labels(),
+            edge_count=fwg.number_of_edges()
+        )
+
+    @classmethod
+    def get_components(cls, fwg: nx.DiGraph) -> ComponentInterface:
+        """
+        Returns the components of the graph. The components of a frozen graph
+        are stored alongside it and reused, the ones of a mutable graph are
+        recalculated (see GraphCache).
+        :param nx.DiGraph fwg: the graph
+        :return ComponentInterface: the components of the graph
+        """
+        return GraphCache.get(fwg=fwg, key=cls.GRAPH_KEY, compute=cls.from_graph)
+
+    @classmethod
+    def restrict_components(cls,
+                            fwg: nx.DiGraph,
+                            components: ComponentInterface,
+                            is_inside: np.ndarray,
+                            is_partial: np.ndarray,
+                            node_filter
+                            ) -> tuple:
+        """
+        Restricts the components to a node filter. Components completely inside
+        are reused, components partially inside are split again with the union-find.
+        The restricted graph is a copy, or a read-only view if the original graph is frozen.
+        :param nx.DiGraph fwg: the original graph
+        :param ComponentInterface components: the components of the original graph
+        :param np.ndarray is_inside: mask of the components completely kept
+        :param np.ndarray is_partial: mask of the components partially kept
+        :param node_filter: function deciding whether a node is kept
+        :return tuple: the kept nodes, the restricted graph and its components
+        """
+        kept_nodes = [
+            node
+            for component_id in np.flatnonzero(is_inside)
+            for node in components.members[component_id]
+        ]
+        partial_nodes = [
+            node
+            for component_id in np.flatnonzero(is_partial)
+            for node in components.members[component_id]
+            if node_filter(node)
+        ]
+
+        if nx.is_frozen(fwg):
+            # a read-only graph is not copied, the view gets its own graph attributes
+            filtered_graph = fwg.subgraph(nodes=kept_nodes + partial_nodes)
+        else:
+            filtered_graph = nx.DiGraph(fwg.subgraph(nodes=kept_nodes + partial_nodes))
+        filtered_graph.graph = GraphCache.get_attributes(fwg=fwg)
+
+        inside = ComponentInterface(data={
+            'members': [components.members[i] for i in np.flatnonzero(is_inside)],
+            'sizes': components.sizes[is_inside],
+            'station_spans': components.station_spans[is_inside],
+            'date_spans': components.date_spans[is_inside]
+        })
+        partial = cls.from_graph(fwg=filtered_graph.subgraph(nodes=partial_nodes))
+
+        filtered_components = cls.merge_components(components=[inside, partial])
+        filtered_components.node_count = filtered_graph.number_of_nodes()
+        filtered_components.edge_count = filtered_graph.number_of_edges()
+
+        GraphCache.set(fwg=filtered_graph, key=cls.GRAPH_KEY, data=filtered_components)
+
+        return kept_nodes + partial_nodes, filtered_graph, filtered_components
+
+    @staticmethod
+    def merge_components(components: list) -> ComponentInterface:
+        """
+        Merges the components of disjoint graphs.
+        :param list components: list of ComponentInterface instances
+        :return ComponentInterface: the merged components
+        """
+        members = [member for interface in components for member in interface.members]
+        order = sorted(range(len(members)), key=lambda i: members[i][0])
+
+        sizes = np.concatenate([interface.sizes for interface in components])
+        station_spans = np.concatenate([interface.station_spans for interface in components])
+        date_spans = np.concatenate([interface.date_spans for interface in components])
+
+        data = {
+            'members': [members[i] for i in order],
+            'sizes': sizes[order],
+            'station_spans': station_spans[order],
+            'date_spans': date_spans[order],
+            'node_count': sum(interface.node_count for interface in components),
+            'edge_count': sum(interface.edge_count for interface in components)
+        }
+
+        return ComponentInterface(data=data)
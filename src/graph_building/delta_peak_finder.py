@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 from src.data.interfaces.data_interface import DataInterface
@@ -32,8 +33,7 @@ class DeltaPeakFinder:
 
         vertices = dict()
         for gauge in gauges:
-            series = self.get_series(gauge=gauge)
-            peak_series = self.get_peak_series(series=series)
+            peak_series = self.get_gauge_peaks(gauge=gauge)
 
             vertices[gauge] = self.get_peak_data(
                 gauge=gauge,
@@ -49,6 +49,49 @@ class DeltaPeakFinder:
 
         self.vertex_interface = VertexDataInterface(data=data)
 
+    def get_gauge_peaks(self, gauge: str) -> pd.Series:
+        """
+        We find the delta-peaks of a gauge.
+        :param str gauge: the current gauge
+        :return pd.Series: found delta-peaks indexed by dates
+        """
+        values = self.get_gauge_values(gauge=gauge)
+        positions = np.flatnonzero(self.get_peak_mask(values=values))
+
+        return pd.Series(
+            data=values[positions],
+            index=self.get_gauge_dates(gauge=gauge, positions=positions)
+        )
+
+    def get_gauge_values(self, gauge: str) -> np.ndarray:
+        """
+        We get the measurements of a gauge over its lifetime. In ragged storage mode
+        the series is read directly from the contiguous array without copying.
+        :param str gauge: the current gauge
+        :return np.ndarray: the existing measurements
+        """
+        ragged_series = self.data_interface.ragged_series
+        if ragged_series is None:
+            return self.get_series(gauge=gauge).to_numpy()
+
+        return ragged_series.get_values(gauge=gauge)
+
+    def get_gauge_dates(self, gauge: str, positions: np.ndarray) -> np.ndarray:
+        """
+        We get the dates of selected measurements of a gauge.
+        :param str gauge: the current gauge
+        :param np.ndarray positions: positions in the series of the gauge
+        :return np.ndarray: the dates as strings
+        """
+        ragged_series = self.data_interface.ragged_series
+        if ragged_series is None:
+            return self.get_series(gauge=gauge).index.to_numpy()[positions]
+
+        return np.datetime_as_string(
+            ragged_series.get_days(gauge=gauge, indices=positions),
+            unit='D'
+        )
+
     def get_series(self, gauge: str) -> pd.Series:
         """
         We filter for the measurements when the station was active.
@@ -70,22 +113,66 @@ class DeltaPeakFinder:
         :param pd.Series series: the original time series
         :return pd.Series: found delta-peaks
         """
-        before_max = series.rolling(
-            window=self.delta,
-            min_periods=self.delta
-        ).max().shift(periods=1)
+        is_peak = self.get_peak_mask(values=series.to_numpy())
 
-        after_max = series[::-1].rolling(
-            window=self.delta,
-            min_periods=self.delta
-        ).max().shift(periods=1)[::-1]
+        return series[is_peak]
 
-        cond_before = series > before_max
-        cond_after = series >= after_max
+    def get_peak_mask(self, values: np.ndarray) -> np.ndarray:
+        """
+        We mark the delta-peaks of a series. A record is a peak if it is greater than
+        the delta records before, and greater or equal to the delta records after.
+        Windows containing missing values or reaching over the ends never qualify.
+        :param np.ndarray values: the original time series
+        :return np.ndarray: boolean mask of the delta-peaks
+        """
+        length = len(values)
+        is_peak = np.zeros(length, dtype=bool)
+        if length < 2 * self.delta + 1:
+            return is_peak
 
-        is_peak = cond_before & cond_after
+        # window_max[i] = max(values[i:i + delta])
+        window_max = np.lib.stride_tricks.sliding_window_view(values, self.delta).max(axis=1)
 
-        return series[is_peak]
+        centre = values[self.delta:length - self.delta]
+        before_max = window_max[:length - 2 * self.delta]
+        after_max = window_max[self.delta + 1:]
+
+        is_peak[self.delta:length - self.delta] = (centre > before_max) & (centre >= after_max)
+
+        return is_peak
+
+    @staticmethod
+    def get_peak_radii(values: np.ndarray) -> np.ndarray:
+        """
+        We calculate the peak radius of every record: the largest delta for which
+        it is a delta-peak (0 if it is not a peak for any delta).
+        The previous greater or equal and the next greater records are found
+        with one monotonic stack in a single pass. Missing values block every window.
+        :param np.ndarray values: the original time series
+        :return np.ndarray: the peak radius of each record
+        """
+        length = len(values)
+        is_missing = np.isnan(values)
+        records = np.where(is_missing, np.inf, values).tolist()
+
+        previous = [-1] * length
+        following = [length] * length
+        stack = list()
+        for i, value in enumerate(records):
+            while stack and records[stack[-1]] < value:
+                following[stack.pop()] = i
+            if stack:
+                previous[i] = stack[-1]
+            stack.append(i)
+
+        indices = np.arange(length)
+        radii = np.minimum(
+            indices - np.array(previous, dtype=np.int64) - 1,
+            np.array(following, dtype=np.int64) - indices - 1
+        )
+        radii[is_missing] = 0
+
+        return radii
 
     def get_peak_data(self, gauge: str, peak_series: pd.Series) -> dict:
         """
@@ -97,22 +184,59 @@ class DeltaPeakFinder:
         """
         station_info = self.data_interface.station_info
 
-        null_point = station_info[gauge]['null_point']
-        level_group = station_info[gauge]['level_group']
-
-        null_corrected_series = peak_series.apply(
-            lambda value: round(value + null_point * 100, 2)
-        )
-        color_values = peak_series.apply(
-            lambda value: 'yellow' if value < level_group else 'red'
+        values, is_red = self.get_peak_levels(
+            values=peak_series.to_numpy(dtype=np.float64),
+            null_point=station_info[gauge]['null_point'],
+            level_group=station_info[gauge]['level_group']
         )
 
-        peak_data = {
+        return self.get_peak_dict(dates=peak_series.index, values=values, is_red=is_red)
+
+    @staticmethod
+    def get_peak_levels(values: np.ndarray, null_point: float, level_group: float) -> tuple:
+        """
+        We null-correct and color the water levels of all peaks of a gauge at once
+        (see get_null_corrected_value and get_color).
+        :param np.ndarray values: the measured water levels of the peaks
+        :param float null_point: the null point of the gauge (m)
+        :param float level_group: the high water level of the gauge
+        :return tuple: the null-corrected water levels and the mask of the red peaks
+        """
+        return np.round(values + null_point * 100, 2), ~(values < level_group)
+
+    @staticmethod
+    def get_peak_dict(dates, values: np.ndarray, is_red: np.ndarray) -> dict:
+        """
+        We construct the peak data dictionary of a gauge (see get_peak_data).
+        :param dates: the dates of the peaks
+        :param np.ndarray values: the null-corrected water levels of the peaks
+        :param np.ndarray is_red: the mask of the red peaks
+        :return dict: dictionary of peak data
+        """
+        return {
             date: {
                 'value': value,
-                'color': color_values[date]
+                'color': 'red' if red else 'yellow'
             }
-            for date, value in null_corrected_series.items()
+            for date, value, red in zip(dates, values.tolist(), is_red.tolist())
         }
 
-        return peak_data
+    @staticmethod
+    def get_null_corrected_value(value: float, null_point: float) -> float:
+        """
+        We correct a water level with the null point of the gauge.
+        :param float value: the measured water level (cm)
+        :param float null_point: the null point of the gauge (m)
+        :return float: the null-corrected water level
+        """
+        return round(value + null_point * 100, 2)
+
+    @staticmethod
+    def get_color(value: float, level_group: float) -> str:
+        """
+        We color a water level by the level group of the gauge.
+        :param float value: the measured water level
+        :param float level_group: the high water level of the gauge
+        :return str: 'red' for high water levels, 'yellow' otherwise
+        """
+        return 'yellow' if value < level_group else 'red'
@@ -0,0 +1,58 @@
+import networkx as nx
+import numpy as np
+
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.graph_cache import GraphCache
+from src.graph_building.interfaces.edge_array_interface import EdgeArrayInterface
+
+
+class EdgeArrayCollector:
+    """
+    Collects the edges of the FWG into NumPy arrays once per graph.
+    """
+    GRAPH_KEY = 'edge_arrays'
+
+    @staticmethod
+    def from_graph(fwg: nx.DiGraph) -> EdgeArrayInterface:
+        """
+        Collects the gauges, dates and slopes of the edges of a graph.
+        :param nx.DiGraph fwg: the graph
+        :return EdgeArrayInterface: the edge arrays of the graph
+        """
+        edge_count = fwg.number_of_edges()
+        if not edge_count:
+            return EdgeArrayInterface(data={'node_count': fwg.number_of_nodes()})
+
+        upstream_nodes, downstream_nodes, slopes = zip(*(
+            (u, v, data.get('slope'))
+            for u, v, data in fwg.edges(data=True)
+        ))
+
+        river_kms = ComponentTracker.get_river_kms(nodes=upstream_nodes + downstream_nodes)
+        gauges, gauge_ids = np.unique(river_kms, return_inverse=True)
+        gauge_ids = gauge_ids.reshape(-1)
+
+        data = {
+            'gauges': gauges,
+            'upstream_ids': gauge_ids[:edge_count].astype(np.int64),
+            'downstream_ids': gauge_ids[edge_count:].astype(np.int64),
+            'days': ComponentTracker.get_days(nodes=upstream_nodes),
+            # missing slopes become NaN
+            'slopes': np.array(slopes, dtype=np.float64),
+            'node_count': fwg.number_of_nodes(),
+            'edge_count': edge_count
+        }
+
+        return EdgeArrayInterface(data=data)
+
+    @classmethod
+    def get_edge_arrays(cls, fwg: nx.DiGraph, collect=None) -> EdgeArrayInterface:
+        """
+        Returns the edge arrays of the graph. The arrays of a frozen graph
+        are stored alongside it and reused, the ones of a mutable graph are
+        collected again (see GraphCache).
+        :param nx.DiGraph fwg: the graph
+        :param collect: function collecting the edge arrays of the graph (from_graph if None)
+        :return EdgeArrayInterface: the edge arrays of the graph
+        """
+        return GraphCache.get(fwg=fwg, key=cls.GRAPH_KEY, compute=collect or cls.from_graph)
@@ -1,5 +1,7 @@
-import pandas as pd
+import numpy as np
 
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.interfaces.component_interface import ComponentInterface
 from src.graph_building.interfaces.edge_interface import EdgeInterface
 from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
 
@@ -24,63 +26,114 @@ class EdgeFinder:
         self.alpha = alpha
 
         self.edge_interface: EdgeInterface = None
+        self.component_interface: ComponentInterface = None
 
     def run(self, vertex_interface: VertexDataInterface):
         """
         We take neighboring gauges and find all edges going between them.
+        The components of the graph are tracked with a union-find structure
+        while the edges are generated.
         :param VertexDataInterface vertex_interface: interface with vertices
         """
+        vertices = vertex_interface.vertices
+
+        nodes = [(gauge, date) for gauge in self.gauges for date in vertices[gauge]]
+        sizes = [len(vertices[gauge]) for gauge in self.gauges]
+        offsets = dict(zip(self.gauges, np.cumsum([0] + sizes[:-1]).tolist()))
+
+        tracker = ComponentTracker(node_count=len(nodes))
+        has_edge = np.zeros(len(nodes), dtype=bool)
+        days = {
+            gauge: np.array(list(vertices[gauge].keys()), dtype='datetime64[D]')
+            for gauge in self.gauges
+        }
+
         edges = dict()
         for upstream, downstream in zip(self.gauges[:-1], self.gauges[1:]):
+            up_idx, down_idx = self.get_edge_indices(
+                upstream_days=days[upstream],
+                downstream_days=days[downstream]
+            )
             edges[(upstream, downstream)] = self.find_edges(
                 upstream=upstream,
                 downstream=downstream,
-                vertices=vertex_interface.vertices
+                vertices=vertices,
+                up_idx=up_idx,
+                down_idx=down_idx
             )
 
+            up_nodes = offsets[upstream] + up_idx
+            down_nodes = offsets[downstream] + down_idx
+            tracker.union(u=up_nodes, v=down_nodes)
+            has_edge[up_nodes] = True
+            has_edge[down_nodes] = True
+
         self.edge_interface = EdgeInterface(edges=edges)
 
+        # only vertices with edges become nodes of the graph
+        node_indices = np.flatnonzero(has_edge)
+        self.component_interface = ComponentTracker.get_component_interface(
+            nodes=[nodes[i] for i in node_indices],
+            labels=tracker.get_labels()[node_indices],
+            edge_count=sum(map(len, edges.values()))
+        )
+
+    def get_edge_indices(self,
+                         upstream_days: np.ndarray,
+                         downstream_days: np.ndarray
+                         ) -> tuple:
+        """
+        We find the index pairs of vertices connected by an edge:
+        alpha + up_date <= down_date <= beta + up_date.
+        :param np.ndarray upstream_days: sorted dates of the upstream vertices
+        :param np.ndarray downstream_days: sorted dates of the downstream vertices
+        :return tuple: upstream and downstream indices of the edges
+        """
+        lower = np.searchsorted(downstream_days, upstream_days + self.alpha, side='left')
+        upper = np.searchsorted(downstream_days, upstream_days + self.beta, side='right')
+        counts = np.maximum(upper - lower, 0)
+
+        up_idx = np.repeat(np.arange(len(upstream_days)), counts)
+        down_idx = np.repeat(lower, counts) + \
+            np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        return up_idx, down_idx
+
     def find_edges(self,
                    upstream: str,
                    downstream: str,
-                   vertices: dict
+                   vertices: dict,
+                   up_idx: np.ndarray = None,
+                   down_idx: np.ndarray = None
                    ) -> list:
         """
         We find the edges between two stations.
         :param str upstream: the start station
         :param str downstream: the end station
         :param dict vertices: potential vertices of the graph
+        :param np.ndarray up_idx: upstream indices of the edges (calculated if not given)
+        :param np.ndarray down_idx: downstream indices of the edges (calculated if not given)
         :return list: found edges
         """
         upstream_vertices = vertices[upstream]
         downstream_vertices = vertices[downstream]
 
-        upstream_dates = pd.to_datetime(
-            list(upstream_vertices.keys()),
-            format='ISO8601'
-        )
-        downstream_dates = pd.to_datetime(
-            list(downstream_vertices.keys()),
-            format='ISO8601'
-        )
+        if up_idx is None or down_idx is None:
+            up_idx, down_idx = self.get_edge_indices(
+                upstream_days=np.array(list(upstream_vertices.keys()), dtype='datetime64[D]'),
+                downstream_days=np.array(list(downstream_vertices.keys()), dtype='datetime64[D]')
+            )
+
+        up_dates = list(upstream_vertices.keys())
+        down_dates = list(downstream_vertices.keys())
+
+        up_levels = np.array([data['value'] for data in upstream_vertices.values()], dtype=np.float64)
+        down_levels = np.array([data['value'] for data in downstream_vertices.values()], dtype=np.float64)
+
+        distance = float(downstream) - float(upstream)
+        slopes = (down_levels[down_idx] - up_levels[up_idx]) / distance
 
-        found_edges = list()
-        for up_date in upstream_dates:
-            # alpha + up_date <= down_date <= beta + up_date
-            cond = (downstream_dates >= up_date + pd.Timedelta(days=self.alpha)) & \
-                   (downstream_dates <= up_date + pd.Timedelta(days=self.beta))
-            down_dates = downstream_dates[cond]
-            for down_date in down_dates:
-                up_date_str = up_date.strftime('%Y-%m-%d')
-                down_date_str = down_date.strftime('%Y-%m-%d')
-
-                up_level = upstream_vertices[up_date_str]['value']
-                down_level = downstream_vertices[down_date_str]['value']
-                distance = float(downstream) - float(upstream)
-                slope = (down_level - up_level) / distance
-
-                found_edges.append(
-                    ((up_date_str, down_date_str), slope)
-                )
-
-        return found_edges
+        return [
+            ((up_dates[i], down_dates[j]), slope)
+            for i, j, slope in zip(up_idx.tolist(), down_idx.tolist(), slopes.tolist())
+        ]
@@ -4,6 +4,10 @@ from src.data.interfaces.data_interface import DataInterface
 from src.graph_building.delta_peak_finder import DeltaPeakFinder
 from src.graph_building.edge_finder import EdgeFinder
 from src.graph_building.interfaces.fwg_interface import FWGInterface
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+from src.graph_building.parallel_delta_peak_finder import ParallelDeltaPeakFinder
+from src.graph_engine.engine_registry import EngineRegistry
+from src.graph_engine.graph_engine import GraphEngine
 
 
 class GraphBuilder:
@@ -15,6 +19,8 @@ class GraphBuilder:
                  delta: int = 2,
                  beta: int = 2,
                  alpha: int = 1,
+                 workers: int = 1,
+                 engine: GraphEngine | str = None
                  ):
         """
         Constructor.
@@ -24,16 +30,27 @@ class GraphBuilder:
                           than the records before, and to be greater or equal to after
                           to be considered a peak
         :param int alpha: the number of days minimally needed to consider an edge
+        :param int workers: the number of processes finding the delta-peaks
+                            (see ParallelDeltaPeakFinder)
+        :param GraphEngine | str engine: the graph engine building the graph (see EngineRegistry)
         """
         self.data_interface = data_interface
         self.delta = delta
         self.beta = beta
         self.alpha = alpha
+        self.engine = EngineRegistry.get_engine(engine=engine)
 
-        self.delta_peak_finder = DeltaPeakFinder(
-            data_interface=self.data_interface,
-            delta=self.delta
-        )
+        if workers == 1:
+            self.delta_peak_finder = DeltaPeakFinder(
+                data_interface=self.data_interface,
+                delta=self.delta
+            )
+        else:
+            self.delta_peak_finder = ParallelDeltaPeakFinder(
+                data_interface=self.data_interface,
+                delta=self.delta,
+                workers=workers
+            )
         self.edge_finder = EdgeFinder(
             gauges=self.data_interface.gauges,
             beta=self.beta,
@@ -42,23 +59,32 @@ class GraphBuilder:
 
         self.fwg_interface: FWGInterface = None
 
-    def run(self):
+    def run(self, vertex_interface: VertexDataInterface = None):
         """
         Runs the operations for building the graph.
+        :param VertexDataInterface vertex_interface: already found delta-peaks
+                                                     (e.g. from MultiDeltaPeakFinder),
+                                                     searched for if None
         """
-        self.delta_peak_finder.run()
+        if vertex_interface is None:
+            self.delta_peak_finder.run()
+        else:
+            self.delta_peak_finder.vertex_interface = vertex_interface
+
         self.edge_finder.run(vertex_interface=self.delta_peak_finder.vertex_interface)
 
         fwg = self.build_graph()
-        self.fwg_interface = FWGInterface(fwg=fwg)
+        self.fwg_interface = FWGInterface(
+            fwg=fwg,
+            components=self.edge_finder.component_interface
+        )
 
     def build_graph(self) -> nx.DiGraph:
         """
-        We create the directed graph.
+        We create the directed graph. The components tracked during edge finding
+        are kept in the FWGInterface, not in the graph: the graph can be edited afterwards.
         :return nx.DiGraph: the FWG
         """
-        fwg = nx.DiGraph()
-
         edges = self.edge_finder.edge_interface.edges
 
         final_edges = []
@@ -70,6 +96,4 @@ class GraphBuilder:
                     {'slope': slope}
                 ))
 
-        fwg.add_edges_from(ebunch_to_add=final_edges)
-
-        return fwg
+        return self.engine.build_graph(edges=final_edges)
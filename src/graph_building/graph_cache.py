@@ -0,0 +1,109 @@
+import networkx as nx
+
+
+class GraphCache:
+    """
+    Stores data derived from a graph (its components, edge arrays...) in its graph attributes.
+    The data is only reused on frozen graphs (see nx.freeze): a mutable graph can be edited
+    in place without a trace (e.g. an edge rewired, keeping the node and edge counts),
+    so the data of a mutable graph is recalculated on every call.
+    The stored data records the graph it belongs to, so copies of a frozen graph and views
+    sharing its graph attributes never reuse it. Node and edge attributes of a frozen graph
+    can still be edited, the data of such a graph has to be dropped with invalidate.
+    """
+    # keys of the data derived from the graph
+    KEYS = ('components', 'edge_arrays', 'graph_arrays', 'fingerprint')
+    # key of the id of the graph the stored data belongs to
+    OWNER_KEY = 'cache_owner'
+
+    @classmethod
+    def get(cls, fwg: nx.DiGraph, key: str, compute):
+        """
+        Returns the data stored alongside a frozen graph, or calculates it.
+        The data of a frozen graph is stored, unless its graph attributes belong to another graph.
+        :param nx.DiGraph fwg: the graph
+        :param str key: the key of the data
+        :param compute: function calculating the data of a graph (called with fwg=)
+        :return: the data
+        """
+        if not nx.is_frozen(fwg):
+            return compute(fwg=fwg)
+
+        if cls.is_owner(fwg=fwg) and key in fwg.graph:
+            return fwg.graph[key]
+
+        data = compute(fwg=fwg)
+        cls.set(fwg=fwg, key=key, data=data)
+
+        return data
+
+    @classmethod
+    def set(cls, fwg: nx.DiGraph, key: str, data):
+        """
+        Stores data alongside a frozen graph. Nothing is stored on a mutable graph,
+        or if the graph attributes belong to another graph (e.g. the graph of a view).
+        :param nx.DiGraph fwg: the graph
+        :param str key: the key of the data
+        :param data: the data
+        """
+        owner = fwg.graph.get(cls.OWNER_KEY)
+        if not nx.is_frozen(fwg) or owner not in (None, id(fwg)) or cls.is_view(fwg=fwg):
+            return
+
+        fwg.graph[cls.OWNER_KEY] = id(fwg)
+        fwg.graph[key] = data
+
+    @classmethod
+    def is_owner(cls, fwg: nx.DiGraph) -> bool:
+        """
+        Checks whether the data stored in the graph attributes belongs to the graph.
+        :param nx.DiGraph fwg: the graph
+        :return bool: True if the data was stored for this graph
+        """
+        return fwg.graph.get(cls.OWNER_KEY) == id(fwg)
+
+    @staticmethod
+    def is_view(fwg: nx.DiGraph) -> bool:
+        """
+        Checks whether the graph is a view sharing the graph attributes of another graph
+        (networkx views keep the viewed graph in _graph, see nx.subgraph_view).
+        :param nx.DiGraph fwg: the graph
+        :return bool: True if the graph attributes are shared
+        """
+        viewed_graph = getattr(fwg, '_graph', None)
+
+        return viewed_graph is not None and viewed_graph.graph is fwg.graph
+
+    @classmethod
+    def invalidate(cls, fwg: nx.DiGraph):
+        """
+        Drops the data stored alongside a graph, e.g. after its edge attributes were edited.
+        :param nx.DiGraph fwg: the graph
+        """
+        for key in cls.KEYS + (cls.OWNER_KEY, ):
+            fwg.graph.pop(key, None)
+
+    @classmethod
+    def freeze(cls, fwg: nx.DiGraph) -> nx.DiGraph:
+        """
+        Freezes a graph, so its derived data is stored and reused.
+        Data stored before (e.g. in a copied graph) is dropped.
+        :param nx.DiGraph fwg: the graph
+        :return nx.DiGraph: the frozen graph
+        """
+        cls.invalidate(fwg=fwg)
+
+        return nx.freeze(fwg)
+
+    @classmethod
+    def get_attributes(cls, fwg: nx.DiGraph) -> dict:
+        """
+        Returns the graph attributes without the derived data (e.g. for saving or copying).
+        :param nx.DiGraph fwg: the graph
+        :return dict: the graph attributes
+        """
+        return {
+            key: value
+            for key, value in fwg.graph.items()
+            if key not in cls.KEYS + (cls.OWNER_KEY, )
+        }
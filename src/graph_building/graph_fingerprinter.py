@@ -0,0 +1,233 @@
+import hashlib
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.graph_cache import GraphCache
+from src.graph_building.interfaces.fingerprint_interface import FingerprintInterface
+from src.graph_building.interfaces.graph_diff_interface import GraphDiffInterface
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+
+
+class GraphFingerprinter:
+    """
+    Calculates order-independent 64-bit hashes of the nodes, edges and components of the FWG,
+    and compares graphs by them. Gauges and dates are hashed with pandas (vectorized, with a fixed key),
+    and combined with the splitmix64 finalizer. Components are hashed by summing the hashes
+    of their nodes and edges, so no hash depends on the order the graph was built in.
+    The digest of a frozen graph can be used as a cache key.
+    """
+    GRAPH_KEY = 'fingerprint'
+
+    @staticmethod
+    def mix(values: np.ndarray) -> np.ndarray:
+        """
+        Scrambles 64-bit values (the finalizer of splitmix64).
+        :param np.ndarray values: uint64 values
+        :return np.ndarray: the scrambled values
+        """
+        values = np.asarray(values, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return values ^ (values >> np.uint64(31))
+
+    @staticmethod
+    def hash_strings(values) -> np.ndarray:
+        """
+        Hashes strings, equal strings get equal hashes in every process.
+        :param values: the strings
+        :return np.ndarray: uint64 hashes
+        """
+        return pd.util.hash_array(np.array(values, dtype=object))
+
+    @classmethod
+    def hash_floats(cls, values) -> np.ndarray:
+        """
+        Hashes floats by their bits. Missing values (None or NaN) are equal to each other,
+        and so are 0.0 and -0.0.
+        :param values: the floats
+        :return np.ndarray: uint64 hashes
+        """
+        values = np.array(values, dtype=np.float64) + 0.0
+        values[np.isnan(values)] = np.nan
+        return cls.mix(values.view(np.uint64))
+
+    @classmethod
+    def get_node_keys(cls, nodes: list) -> np.ndarray:
+        """
+        Hashes the gauges and dates of the nodes.
+        :param list nodes: (gauge, date) nodes
+        :return np.ndarray: uint64 keys
+        """
+        if not nodes:
+            return np.zeros(0, dtype=np.uint64)
+
+        gauges = cls.hash_strings(values=[node[0] for node in nodes])
+        dates = cls.hash_strings(values=[node[1] for node in nodes])
+        return cls.mix(gauges ^ cls.mix(dates))
+
+    @classmethod
+    def get_node_hashes(cls, nodes: list, node_keys: np.ndarray,
+                        vertex_interface: VertexDataInterface = None) -> np.ndarray:
+        """
+        Adds the levels and colors of the nodes to their keys.
+        :param list nodes: (gauge, date) nodes
+        :param np.ndarray node_keys: keys of the nodes
+        :param VertexDataInterface vertex_interface: interface containing vertex data
+                                                     (the keys are returned if None)
+        :return np.ndarray: uint64 hashes
+        """
+        if vertex_interface is None or not nodes:
+            return node_keys
+
+        vertices = vertex_interface.vertices
+        levels = np.full(len(nodes), np.nan)
+        colors = [''] * len(nodes)
+        for i, (gauge, date) in enumerate(nodes):
+            vertex = vertices.get(gauge, dict()).get(date)
+            if vertex is not None:
+                levels[i] = vertex['value']
+                colors[i] = vertex['color']
+
+        return cls.mix(node_keys ^ cls.mix(cls.hash_floats(values=levels) ^ cls.hash_strings(values=colors)))
+
+    @classmethod
+    def from_graph(cls, fwg: nx.DiGraph, vertex_interface: VertexDataInterface = None) -> FingerprintInterface:
+        """
+        Calculates the fingerprint of a graph. Edges are hashed with their slopes,
+        nodes with their levels and colors if vertex data is given.
+        :param nx.DiGraph fwg: the graph
+        :param VertexDataInterface vertex_interface: interface containing vertex data
+        :return FingerprintInterface: the fingerprint of the graph
+        """
+        nodes = list(fwg.nodes)
+        node_ids = {node: i for i, node in enumerate(nodes)}
+        node_keys = cls.get_node_keys(nodes=nodes)
+        node_hashes = cls.get_node_hashes(nodes=nodes, node_keys=node_keys, vertex_interface=vertex_interface)
+
+        edges = list(fwg.edges.data('slope'))
+        upstream_ids = np.fromiter((node_ids[u] for u, _, _ in edges), dtype=np.int64, count=len(edges))
+        downstream_ids = np.fromiter((node_ids[v] for _, v, _ in edges), dtype=np.int64, count=len(edges))
+        # missing slopes become NaN
+        slopes = np.array([slope for _, _, slope in edges], dtype=np.float64)
+
+        # mixing the upstream key first makes the edge keys depend on the direction
+        edge_keys = cls.mix(cls.mix(node_keys[upstream_ids]) + node_keys[downstream_ids])
+        edge_hashes = cls.mix(edge_keys ^ cls.hash_floats(values=slopes))
+
+        components = ComponentTracker.get_components(fwg=fwg)
+        component_ids = np.zeros(len(nodes), dtype=np.int64)
+        component_ids[[node_ids[node] for members in components.members for node in members]] = \
+            np.repeat(np.arange(len(components.members)), components.sizes)
+
+        component_hashes = np.zeros(len(components.members), dtype=np.uint64)
+        np.add.at(component_hashes, component_ids, node_hashes)
+        np.add.at(component_hashes, component_ids[upstream_ids], edge_hashes)
+        component_keys = node_keys[[node_ids[members[0]] for members in components.members]] \
+            if components.members else np.zeros(0, dtype=np.uint64)
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.array([len(nodes), len(edge_hashes)], dtype=np.int64).tobytes())
+        digest.update(np.sort(node_hashes).tobytes())
+        digest.update(np.sort(edge_hashes).tobytes())
+
+        data = {
+            'nodes': nodes,
+            'node_keys': node_keys,
+            'node_hashes': node_hashes,
+            'upstream_ids': upstream_ids,
+            'downstream_ids': downstream_ids,
+            'edge_keys': edge_keys,
+            'edge_hashes': edge_hashes,
+            'component_keys': component_keys,
+            'component_hashes': cls.mix(component_hashes),
+            'digest': digest.hexdigest(),
+            'node_count': len(nodes),
+            'edge_count': len(edge_hashes)
+        }
+
+        return FingerprintInterface(data=data)
+
+    @classmethod
+    def get_fingerprint(cls, fwg: nx.DiGraph, vertex_interface: VertexDataInterface = None) -> FingerprintInterface:
+        """
+        Returns the fingerprint of the graph. The fingerprint without vertex data of a frozen graph
+        is stored alongside it and reused (see GraphCache), every other one is recalculated,
+        since slopes and vertex data can change without a trace in the graph.
+        :param nx.DiGraph fwg: the graph
+        :param VertexDataInterface vertex_interface: interface containing vertex data
+                                                     (nodes are hashed without levels and colors if None)
+        :return FingerprintInterface: the fingerprint of the graph
+        """
+        if vertex_interface is not None:
+            return cls.from_graph(fwg=fwg, vertex_interface=vertex_interface)
+
+        return GraphCache.get(fwg=fwg, key=cls.GRAPH_KEY, compute=cls.from_graph)
+
+    @staticmethod
+    def match(old_keys: np.ndarray, old_hashes: np.ndarray,
+              new_keys: np.ndarray, new_hashes: np.ndarray) -> tuple:
+        """
+        Matches items of two graphs by their keys.
+        :param np.ndarray old_keys: keys of the old items
+        :param np.ndarray old_hashes: hashes of the old items
+        :param np.ndarray new_keys: keys of the new items
+        :param np.ndarray new_hashes: hashes of the new items
+        :return tuple: positions of the removed old items, of the added new items,
+                       and (old position, new position) pairs of the changed items
+        """
+        _, old_ids, new_ids = np.intersect1d(old_keys, new_keys, assume_unique=True, return_indices=True)
+
+        is_removed = np.ones(len(old_keys), dtype=bool)
+        is_removed[old_ids] = False
+        is_added = np.ones(len(new_keys), dtype=bool)
+        is_added[new_ids] = False
+        is_changed = old_hashes[old_ids] != new_hashes[new_ids]
+        changed = np.column_stack((old_ids[is_changed], new_ids[is_changed])).astype(np.int64)
+
+        return np.flatnonzero(is_removed), np.flatnonzero(is_added), changed[np.argsort(changed[:, 1])]
+
+    @classmethod
+    def diff(cls, old: FingerprintInterface, new: FingerprintInterface) -> GraphDiffInterface:
+        """
+        Finds the added, removed and changed nodes, edges and components of a graph.
+        Items are matched by sorting their keys, nothing of the graphs is compared directly.
+        :param FingerprintInterface old: fingerprint of the old graph
+        :param FingerprintInterface new: fingerprint of the new graph
+        :return GraphDiffInterface: the differences (in the order of the new graph, removed ones of the old one)
+        """
+        if old.digest == new.digest:
+            return GraphDiffInterface(data={'is_identical': True})
+
+        def get_edges(fingerprint: FingerprintInterface, edge_ids: np.ndarray) -> list:
+            return [
+                (fingerprint.nodes[u], fingerprint.nodes[v])
+                for u, v in zip(fingerprint.upstream_ids[edge_ids].tolist(),
+                                fingerprint.downstream_ids[edge_ids].tolist())
+            ]
+
+        removed_nodes, added_nodes, changed_nodes = cls.match(
+            old.node_keys, old.node_hashes, new.node_keys, new.node_hashes
+        )
+        removed_edges, added_edges, changed_edges = cls.match(
+            old.edge_keys, old.edge_hashes, new.edge_keys, new.edge_hashes
+        )
+        removed_components, added_components, changed_components = cls.match(
+            old.component_keys, old.component_hashes, new.component_keys, new.component_hashes
+        )
+
+        data = {
+            'added_nodes': [new.nodes[i] for i in added_nodes.tolist()],
+            'removed_nodes': [old.nodes[i] for i in removed_nodes.tolist()],
+            'changed_nodes': [new.nodes[i] for i in changed_nodes[:, 1].tolist()],
+            'added_edges': get_edges(fingerprint=new, edge_ids=added_edges),
+            'removed_edges': get_edges(fingerprint=old, edge_ids=removed_edges),
+            'changed_edges': get_edges(fingerprint=new, edge_ids=changed_edges[:, 1]),
+            'added_component_ids': added_components,
+            'removed_component_ids': removed_components,
+            'changed_component_ids': changed_components
+        }
+
+        return GraphDiffInterface(data=data)
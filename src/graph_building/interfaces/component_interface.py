@@ -0,0 +1,31 @@
+import numpy as np
+
+
+class ComponentInterface:
+    """
+    Class for storing the weakly connected components of the FWG.
+    The id of a component is its position in the stored arrays,
+    components are ordered by their first (smallest) node.
+    """
+    def __init__(self, data: dict = None):
+        """
+        Constructor.
+        :param dict data: Dictionary: the keys represent the data structures.
+        The expected keys are:
+        - 'members': list of sorted node lists, one for each component
+        - 'sizes': number of nodes in each component
+        - 'station_spans': (lowest, highest) river km of each component
+        - 'date_spans': (first, last) date of each component as datetime64[D]
+        - 'node_count': number of nodes in the graph the components belong to
+        - 'edge_count': number of edges in the graph the components belong to
+        """
+        self.members = list()
+        self.sizes = np.zeros(0, dtype=np.int64)
+        self.station_spans = np.zeros((0, 2), dtype=np.float64)
+        self.date_spans = np.zeros((0, 2), dtype='datetime64[D]')
+        self.node_count = 0
+        self.edge_count = 0
+
+        if data is not None:
+            for key, value in data.items():
+                setattr(self, key, value)
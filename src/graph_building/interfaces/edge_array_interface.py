@@ -0,0 +1,32 @@
+import numpy as np
+
+
+class EdgeArrayInterface:
+    """
+    Class for storing the edges of the FWG as NumPy arrays.
+    The position of an edge is the same in every array.
+    """
+    def __init__(self, data: dict = None):
+        """
+        Constructor.
+        :param dict data: Dictionary: the keys represent the data structures.
+        The expected keys are:
+        - 'gauges': sorted river kms of the gauges appearing in the edges
+        - 'upstream_ids': position of the upstream gauge of each edge in gauges
+        - 'downstream_ids': position of the downstream gauge of each edge in gauges
+        - 'days': date of the upstream node of each edge as datetime64[D]
+        - 'slopes': slope of each edge (NaN if missing)
+        - 'node_count': number of nodes in the graph the edges belong to
+        - 'edge_count': number of edges in the graph
+        """
+        self.gauges = np.zeros(0, dtype=np.float64)
+        self.upstream_ids = np.zeros(0, dtype=np.int64)
+        self.downstream_ids = np.zeros(0, dtype=np.int64)
+        self.days = np.zeros(0, dtype='datetime64[D]')
+        self.slopes = np.zeros(0, dtype=np.float64)
+        self.node_count = 0
+        self.edge_count = 0
+
+        if data is not None:
+            for key, value in data.items():
+                setattr(self, key, value)
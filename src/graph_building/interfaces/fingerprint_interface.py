@@ -0,0 +1,42 @@
+import numpy as np
+
+
+class FingerprintInterface:
+    """
+    Class for storing the fingerprint of the FWG created in GraphFingerprinter.
+    Keys identify nodes, edges and components (they do not depend on their data),
+    hashes also cover their data. Every hash is independent of the order of the graph.
+    """
+    def __init__(self, data: dict = None):
+        """
+        Constructor.
+        :param dict data: Dictionary: the keys represent the data structures.
+        The expected keys are:
+        - 'nodes': the nodes of the graph in graph order
+        - 'node_keys': hash of the gauge and the date of each node
+        - 'node_hashes': hash of each node with its levels and colors (if vertex data was given)
+        - 'upstream_ids', 'downstream_ids': position of the end nodes of each edge in nodes
+        - 'edge_keys': hash of the end nodes of each edge
+        - 'edge_hashes': hash of each edge with its slope
+        - 'component_keys': key of the first (smallest) node of each component
+        - 'component_hashes': hash of the nodes and edges of each component
+        - 'digest': hex digest of the whole graph
+        - 'node_count': number of nodes in the graph
+        - 'edge_count': number of edges in the graph
+        """
+        self.nodes = list()
+        self.node_keys = np.zeros(0, dtype=np.uint64)
+        self.node_hashes = np.zeros(0, dtype=np.uint64)
+        self.upstream_ids = np.zeros(0, dtype=np.int64)
+        self.downstream_ids = np.zeros(0, dtype=np.int64)
+        self.edge_keys = np.zeros(0, dtype=np.uint64)
+        self.edge_hashes = np.zeros(0, dtype=np.uint64)
+        self.component_keys = np.zeros(0, dtype=np.uint64)
+        self.component_hashes = np.zeros(0, dtype=np.uint64)
+        self.digest = ''
+        self.node_count = 0
+        self.edge_count = 0
+
+        if data is not None:
+            for key, value in data.items():
+                setattr(self, key, value)
@@ -1,13 +1,17 @@
 import networkx as nx
 
+from src.graph_building.interfaces.component_interface import ComponentInterface
+
 
 class FWGInterface:
     """
     Class used to store the FWG.
     """
-    def __init__(self, fwg: nx.DiGraph):
+    def __init__(self, fwg: nx.DiGraph, components: ComponentInterface = None):
         """
         Constructor.
         :param nx.DiGraph fwg: the generated flood wave graph
+        :param ComponentInterface components: the weakly connected components of the graph
         """
         self.fwg = fwg
+        self.components = components
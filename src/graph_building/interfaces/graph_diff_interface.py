@@ -0,0 +1,34 @@
+import numpy as np
+
+
+class GraphDiffInterface:
+    """
+    Class for storing the differences of two FWGs found in GraphFingerprinter.
+    """
+    def __init__(self, data: dict = None):
+        """
+        Constructor.
+        :param dict data: Dictionary: the keys represent the data structures.
+        The expected keys are:
+        - 'is_identical': whether the digests of the graphs are equal
+        - 'added_nodes', 'removed_nodes', 'changed_nodes': lists of nodes
+        - 'added_edges', 'removed_edges', 'changed_edges': lists of (upstream node, downstream node) pairs
+        - 'added_component_ids': positions of the new components in the components of the new graph
+        - 'removed_component_ids': positions of the old components in the components of the old graph
+        - 'changed_component_ids': (old position, new position) pairs of components
+                                   starting at the same node with different content
+        """
+        self.is_identical = False
+        self.added_nodes = list()
+        self.removed_nodes = list()
+        self.changed_nodes = list()
+        self.added_edges = list()
+        self.removed_edges = list()
+        self.changed_edges = list()
+        self.added_component_ids = np.zeros(0, dtype=np.int64)
+        self.removed_component_ids = np.zeros(0, dtype=np.int64)
+        self.changed_component_ids = np.zeros((0, 2), dtype=np.int64)
+
+        if data is not None:
+            for key, value in data.items():
+                setattr(self, key, value)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from src.data.interfaces.data_interface import DataInterface
+from src.graph_building.delta_peak_finder import DeltaPeakFinder
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+
+
+class MultiDeltaPeakFinder:
+    """
+    This class finds delta-peaks for every delta at once.
+    The delta-peaks for a larger delta are a subset of the ones for a smaller delta,
+    so it is enough to store the largest delta (peak radius) of every record.
+    """
+    def __init__(self, data_interface: DataInterface):
+        """
+        Constructor.
+        :param DataInterface data_interface: the DataInterface instance containing required data
+        """
+        self.data_interface = data_interface
+
+        self.peak_finder = DeltaPeakFinder(
+            data_interface=self.data_interface,
+            delta=1
+        )
+
+        self.peak_radii = dict()
+
+    def run(self):
+        """
+        Calculates and stores the peak radius of every record that is a peak for delta = 1.
+        For each gauge we store a DataFrame indexed by dates with 'value' and 'radius' columns.
+        """
+        for gauge in self.data_interface.gauges:
+            values = self.peak_finder.get_gauge_values(gauge=gauge)
+            radii = self.peak_finder.get_peak_radii(values=values)
+
+            positions = np.flatnonzero(radii > 0)
+
+            self.peak_radii[gauge] = pd.DataFrame(
+                data={
+                    'value': values[positions],
+                    'radius': radii[positions]
+                },
+                index=self.peak_finder.get_gauge_dates(gauge=gauge, positions=positions)
+            )
+
+    def get_peak_series(self, gauge: str, delta: int) -> pd.Series:
+        """
+        Returns the delta-peaks of a gauge for the given delta.
+        :param str gauge: the current gauge
+        :param int delta: the delta of the peaks
+        :return pd.Series: found delta-peaks
+        """
+        peak_radii = self.peak_radii[gauge]
+
+        return peak_radii['value'][peak_radii['radius'] >= delta]
+
+    def get_vertex_interface(self, delta: int) -> VertexDataInterface:
+        """
+        Returns the vertex data for the given delta without searching the series again.
+        :param int delta: the delta of the peaks
+        :return VertexDataInterface: interface with the delta-peaks
+        """
+        vertices = {
+            gauge: self.peak_finder.get_peak_data(
+                gauge=gauge,
+                peak_series=self.get_peak_series(gauge=gauge, delta=delta)
+            )
+            for gauge in self.data_interface.gauges
+        }
+
+        data = {
+            'vertices': vertices,
+            'river_kms': self.data_interface.meta['river_km'].tolist()
+        }
+
+        return VertexDataInterface(data=data)
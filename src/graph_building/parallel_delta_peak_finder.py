@@ -0,0 +1,291 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from src.data.interfaces.data_interface import DataInterface
+from src.graph_building.delta_peak_finder import DeltaPeakFinder
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+
+# the shared series of a worker process (see attach_shared_values and set_shared_values)
+_shared = dict()
+
+
+def find_peaks(values: np.ndarray,
+               bounds: np.ndarray,
+               null_points: np.ndarray,
+               level_groups: np.ndarray,
+               delta: int
+               ) -> tuple:
+    """
+    Finds the delta-peaks of several series stored one after the other,
+    and null-corrects and colors them (see DeltaPeakFinder.get_peak_levels).
+    :param np.ndarray values: the series of all gauges
+    :param np.ndarray bounds: (start, end) positions of the series of each gauge
+    :param np.ndarray null_points: the null point of each gauge
+    :param np.ndarray level_groups: the high water level of each gauge
+    :param int delta: the delta of the peaks
+    :return tuple: the peak positions relative to the series, the number of peaks of each series,
+                   the null-corrected water levels and the mask of the red peaks (concatenated)
+    """
+    peak_finder = DeltaPeakFinder(data_interface=None, delta=delta)
+
+    positions, levels, red_masks = list(), list(), list()
+    for (start, end), null_point, level_group in zip(bounds.tolist(), null_points.tolist(), level_groups.tolist()):
+        gauge_values = values[start:end]
+        gauge_positions = np.flatnonzero(peak_finder.get_peak_mask(values=gauge_values))
+        gauge_levels, is_red = DeltaPeakFinder.get_peak_levels(
+            values=gauge_values[gauge_positions].astype(np.float64),
+            null_point=null_point,
+            level_group=level_group
+        )
+        positions.append(gauge_positions)
+        levels.append(gauge_levels)
+        red_masks.append(is_red)
+    counts = np.array([len(gauge_positions) for gauge_positions in positions], dtype=np.int64)
+
+    return (
+        np.concatenate(positions + [np.zeros(0, dtype=np.int64)]),
+        counts,
+        np.concatenate(levels + [np.zeros(0)]),
+        np.concatenate(red_masks + [np.zeros(0, dtype=bool)])
+    )
+
+
+def attach_shared_values(name: str, dtype: str, length: int, delta: int):
+    """
+    Pool initializer: attaches the shared series once in every worker.
+    :param str name: name of the shared memory block
+    :param str dtype: type of the values
+    :param int length: number of values
+    :param int delta: the delta of the peaks
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    _shared['memory'] = memory
+    _shared['values'] = np.ndarray(shape=(length, ), dtype=np.dtype(dtype), buffer=memory.buf)
+    _shared['delta'] = delta
+
+
+def set_shared_values(values: np.ndarray, delta: int):
+    """
+    Pool initializer of forked workers: the series are inherited from the parent process,
+    not copied (the pages of the array are only read).
+    :param np.ndarray values: the series of all gauges
+    :param int delta: the delta of the peaks
+    """
+    _shared['values'] = values
+    _shared['delta'] = delta
+
+
+def find_shared_peaks(bounds: np.ndarray, null_points: np.ndarray, level_groups: np.ndarray) -> tuple:
+    """
+    Finds the delta-peaks of a range of gauges in the shared series of a worker.
+    :param np.ndarray bounds: (start, end) positions of the series of each gauge
+    :param np.ndarray null_points: the null point of each gauge
+    :param np.ndarray level_groups: the high water level of each gauge
+    :return tuple: see find_peaks
+    """
+    return find_peaks(
+        values=_shared['values'],
+        bounds=bounds,
+        null_points=null_points,
+        level_groups=level_groups,
+        delta=_shared['delta']
+    )
+
+
+class ParallelDeltaPeakFinder(DeltaPeakFinder):
+    """
+    This class finds delta-peaks with several processes.
+    Workers receive ranges of gauges: the positions of their series, their null points
+    and level groups. They search the peaks and null-correct and color them,
+    and return the peak positions, levels and colors as arrays. This process only
+    assembles the peak data dictionaries, which is not parallel (about half of the run time
+    for 64 gauges over 100000 days). In ragged storage mode the series already
+    are one contiguous array: forked workers inherit it, nothing is copied.
+    Otherwise (dense storage, or no fork on the platform) the series of the gauges
+    (over their lifetimes) are copied once into shared memory.
+    By default every worker gets four ranges of gauges, so that a few slow gauges
+    do not keep the other workers waiting, see benchmarks/benchmark_parallel_peaks.py.
+    """
+    def __init__(self,
+                 data_interface: DataInterface,
+                 delta: int,
+                 workers: int = 1,
+                 gauges_per_task: int = None
+                 ):
+        """
+        Constructor.
+        :param DataInterface data_interface: the DataInterface instance containing required data
+        :param int delta: the number of days that a record is required to be greater
+                          than the records before, and to be greater or equal to after
+                          to be considered a peak
+        :param int workers: the number of processes (the number of CPUs if None),
+                            one by default: the peaks are found in this process
+        :param int gauges_per_task: the number of gauges sent to a worker at once,
+                                    four tasks per worker if None
+        """
+        super().__init__(data_interface=data_interface, delta=delta)
+
+        if workers is not None and workers < 1:
+            raise ValueError('At least one worker is needed')
+        if gauges_per_task is not None and gauges_per_task < 1:
+            raise ValueError('A task must contain at least one gauge')
+
+        self.workers = workers or os.cpu_count() or 1
+        self.gauges_per_task = gauges_per_task
+
+    def run(self):
+        """
+        Finds and stores delta-peaks alongside gauge distances.
+        """
+        gauges = self.data_interface.gauges
+        station_info = self.data_interface.station_info
+        null_points = np.array([station_info[gauge]['null_point'] for gauge in gauges], dtype=np.float64)
+        level_groups = np.array([station_info[gauge]['level_group'] for gauge in gauges], dtype=np.float64)
+
+        ragged_series = self.data_interface.ragged_series
+        if ragged_series is not None and self.can_fork():
+            storage_positions = np.array([ragged_series.positions[gauge] for gauge in gauges], dtype=np.int64)
+            bounds = np.column_stack((
+                ragged_series.offsets[storage_positions],
+                ragged_series.offsets[storage_positions + 1]
+            )).astype(np.int64)
+            peaks = self.get_peaks(
+                values=ragged_series.values,
+                bounds=bounds,
+                null_points=null_points,
+                level_groups=level_groups
+            )
+        else:
+            peaks = self.get_shared_peaks(
+                series=[self.get_gauge_values(gauge=gauge) for gauge in gauges],
+                null_points=null_points,
+                level_groups=level_groups
+            )
+        positions, counts, levels, is_red = peaks
+
+        starts = np.concatenate(([0], np.cumsum(counts)))
+        vertices = dict()
+        for i, gauge in enumerate(gauges):
+            start, end = starts[i], starts[i + 1]
+            vertices[gauge] = self.get_peak_dict(
+                dates=self.get_gauge_dates(gauge=gauge, positions=positions[start:end]),
+                values=levels[start:end],
+                is_red=is_red[start:end]
+            )
+
+        river_kms = self.data_interface.meta['river_km'].tolist()
+
+        data = {
+            'vertices': vertices,
+            'river_kms': river_kms
+        }
+
+        self.vertex_interface = VertexDataInterface(data=data)
+
+    @staticmethod
+    def can_fork() -> bool:
+        """
+        Checks whether worker processes can be forked (so they inherit the series).
+        :return bool: True if the fork start method is available
+        """
+        return 'fork' in multiprocessing.get_all_start_methods()
+
+    def get_shared_peaks(self, series: list, null_points: np.ndarray, level_groups: np.ndarray) -> tuple:
+        """
+        We copy the series once into a shared memory block, and find their peaks in it.
+        :param list series: the series of the gauges
+        :param np.ndarray null_points: the null point of each gauge
+        :param np.ndarray level_groups: the high water level of each gauge
+        :return tuple: see find_peaks
+        """
+        lengths = np.array([len(values) for values in series], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        bounds = np.column_stack((offsets[:-1], offsets[1:]))
+        dtype = np.result_type(*[values.dtype for values in series]) if series else np.float64
+
+        memory = shared_memory.SharedMemory(create=True, size=max(int(offsets[-1]) * dtype.itemsize, 1))
+        try:
+            shared_values = np.ndarray(shape=(offsets[-1], ), dtype=dtype, buffer=memory.buf)
+            for values, (start, end) in zip(series, bounds.tolist()):
+                shared_values[start:end] = values
+
+            return self.get_peaks(
+                values=shared_values,
+                bounds=bounds,
+                null_points=null_points,
+                level_groups=level_groups,
+                memory=memory
+            )
+        finally:
+            # the block can only be closed if no array uses its buffer
+            shared_values = None
+            memory.close()
+            memory.unlink()
+
+    def get_peaks(self,
+                  values: np.ndarray,
+                  bounds: np.ndarray,
+                  null_points: np.ndarray,
+                  level_groups: np.ndarray,
+                  memory: shared_memory.SharedMemory = None
+                  ) -> tuple:
+        """
+        We distribute the gauges among the workers in ranges.
+        With one worker the peaks are found in this process.
+        :param np.ndarray values: the series of all gauges
+        :param np.ndarray bounds: (start, end) positions of the series of each gauge
+        :param np.ndarray null_points: the null point of each gauge
+        :param np.ndarray level_groups: the high water level of each gauge
+        :param shared_memory.SharedMemory memory: the shared memory block of the values,
+                                                  forked workers inherit the values if None
+        :return tuple: see find_peaks
+        """
+        gauges_per_task = self.gauges_per_task or max(-(-len(bounds) // (4 * self.workers)), 1)
+        tasks = [
+            (
+                bounds[first:first + gauges_per_task],
+                null_points[first:first + gauges_per_task],
+                level_groups[first:first + gauges_per_task]
+            )
+            for first in range(0, len(bounds), gauges_per_task)
+        ]
+        if not tasks:
+            return find_peaks(
+                values=values,
+                bounds=bounds,
+                null_points=null_points,
+                level_groups=level_groups,
+                delta=self.delta
+            )
+
+        if self.workers == 1 or len(tasks) == 1:
+            results = [
+                find_peaks(
+                    values=values,
+                    bounds=task_bounds,
+                    null_points=task_null_points,
+                    level_groups=task_level_groups,
+                    delta=self.delta
+                )
+                for task_bounds, task_null_points, task_level_groups in tasks
+            ]
+        else:
+            if memory is None:
+                context = multiprocessing.get_context('fork')
+                initializer, initargs = set_shared_values, (values, self.delta)
+            else:
+                context = multiprocessing.get_context()
+                initializer = attach_shared_values
+                initargs = (memory.name, values.dtype.str, len(values), self.delta)
+
+            with context.Pool(processes=min(self.workers, len(tasks)),
+                              initializer=initializer,
+                              initargs=initargs
+                              ) as pool:
+                results = pool.starmap(find_shared_peaks, tasks)
+
+        return tuple(np.concatenate(arrays) for arrays in zip(*results))
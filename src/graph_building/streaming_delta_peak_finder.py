@@ -0,0 +1,178 @@
+from collections import deque
+
+import numpy as np
+
+from src.graph_building.delta_peak_finder import DeltaPeakFinder
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+
+
+class GaugeStreamState:
+    """
+    Class for storing the state of the delta-peak search of one gauge.
+    """
+    def __init__(self):
+        """
+        Constructor. We store:
+        - index: the number of readings received so far
+        - last_day: the day of the last reading
+        - last_missing: the index of the last missing reading
+        - window: monotonic deque of (index, value) pairs, its front is the maximum
+        of the last delta readings
+        - candidates: deque of (index, day, value) readings that are greater than
+        the delta readings before them, waiting for delta more readings
+        """
+        self.index = -1
+        self.last_day = None
+        self.last_missing = -1
+        self.window = deque()
+        self.candidates = deque()
+
+
+class StreamingDeltaPeakFinder:
+    """
+    This class finds delta-peaks in measurements received one day (or one batch) at a time.
+    A peak is confirmed exactly delta days after it was measured.
+    """
+    def __init__(self, delta: int, station_info: dict = None):
+        """
+        Constructor.
+        :param int delta: the number of days that a record is required to be greater
+                          than the records before, and to be greater or equal to after
+                          to be considered a peak
+        :param dict station_info: dictionary of relevant station information,
+                                  if given, confirmed peaks are collected as vertices
+        """
+        self.delta = delta
+        self.station_info = station_info
+
+        self.states = dict()
+        self.vertices = dict()
+
+    def update(self, gauge: str, date: str, value: float) -> list:
+        """
+        Processes one daily reading of a gauge. Skipped days count as missing readings.
+        :param str gauge: the gauge of the reading
+        :param str date: the date of the reading
+        :param float value: the water level, NaN if missing
+        :return list: (date, value) pairs of the peaks confirmed by this reading
+        """
+        state = self.states.get(gauge)
+        if state is None:
+            state = self.states[gauge] = GaugeStreamState()
+            self.vertices[gauge] = dict()
+
+        day = np.datetime64(date, 'D')
+
+        confirmed_peaks = list()
+        if state.last_day is not None:
+            gap = int((day - state.last_day).astype(np.int64))
+            if gap <= 0:
+                raise ValueError('Readings of a gauge must be in chronological order')
+
+            for missing_day in range(1, gap):
+                confirmed_peaks.extend(self.push(
+                    gauge=gauge,
+                    state=state,
+                    day=state.last_day + missing_day,
+                    value=np.nan
+                ))
+
+        confirmed_peaks.extend(self.push(gauge=gauge, state=state, day=day, value=value))
+        state.last_day = day
+
+        return confirmed_peaks
+
+    def update_batch(self, gauge: str, dates: list, values: list) -> list:
+        """
+        Processes consecutive readings of a gauge.
+        :param str gauge: the gauge of the readings
+        :param list dates: the dates of the readings
+        :param list values: the water levels, NaN if missing
+        :return list: (date, value) pairs of the peaks confirmed by these readings
+        """
+        confirmed_peaks = list()
+        for date, value in zip(dates, values):
+            confirmed_peaks.extend(self.update(gauge=gauge, date=date, value=value))
+
+        return confirmed_peaks
+
+    def push(self,
+             gauge: str,
+             state: GaugeStreamState,
+             day: np.datetime64,
+             value: float
+             ) -> list:
+        """
+        We add a reading to the state of a gauge in O(1) amortized time.
+        :param str gauge: the gauge of the reading
+        :param GaugeStreamState state: the state of the gauge
+        :param np.datetime64 day: the day of the reading
+        :param float value: the water level, NaN if missing
+        :return list: (date, value) pair of the confirmed peak, if there is one
+        """
+        state.index += 1
+        index = state.index
+        is_missing = value != value
+
+        # the window currently holds the delta readings before this one
+        while state.window and state.window[0][0] < index - self.delta:
+            state.window.popleft()
+        if not is_missing and index >= self.delta and state.last_missing < index - self.delta \
+                and value > state.window[0][1]:
+            state.candidates.append((index, day, value))
+
+        if is_missing:
+            state.last_missing = index
+        else:
+            while state.window and state.window[-1][1] <= value:
+                state.window.pop()
+            state.window.append((index, value))
+        while state.window and state.window[0][0] <= index - self.delta:
+            state.window.popleft()
+
+        # the window now holds the delta readings after the candidate
+        if not state.candidates or state.candidates[0][0] != index - self.delta:
+            return list()
+
+        _, candidate_day, candidate_value = state.candidates.popleft()
+        if state.last_missing > index - self.delta or candidate_value < state.window[0][1]:
+            return list()
+
+        date = str(candidate_day)
+        self.add_vertex(gauge=gauge, date=date, value=candidate_value)
+
+        return [(date, candidate_value)]
+
+    def add_vertex(self, gauge: str, date: str, value: float):
+        """
+        Stores a confirmed peak in the same format as DeltaPeakFinder.
+        :param str gauge: the gauge of the peak
+        :param str date: the date of the peak
+        :param float value: the water level of the peak
+        """
+        if self.station_info is None:
+            return
+
+        null_point = self.station_info[gauge]['null_point']
+        level_group = self.station_info[gauge]['level_group']
+
+        self.vertices[gauge][date] = {
+            'value': DeltaPeakFinder.get_null_corrected_value(
+                value=float(value),
+                null_point=null_point
+            ),
+            'color': DeltaPeakFinder.get_color(value=value, level_group=level_group)
+        }
+
+    def get_vertex_interface(self, river_kms: list = None) -> VertexDataInterface:
+        """
+        Returns the confirmed peaks collected so far.
+        :param list river_kms: the river kilometers of the gauges
+        :return VertexDataInterface: interface with the confirmed vertices
+        """
+        data = {
+            'vertices': {gauge: dict(vertices) for gauge, vertices in self.vertices.items()},
+            'river_kms': list() if river_kms is None else river_kms
+        }
+
+        return VertexDataInterface(data=data)
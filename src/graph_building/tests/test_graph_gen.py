@@ -1,8 +1,23 @@
+import json
+import os
+
+import networkx as nx
+import numpy as np
 import pandas as pd
 import pytest
 
+from src.data.data_downloader_base import DataDownloaderBase
+from src.data.data_handler import DataHandler
+from src.data.data_loader import DataLoader
+from src.data.generated_data_loader import GeneratedDataLoader
 from src.data.interfaces.data_interface import DataInterface
+from src.graph_building.chunked_graph_builder import ChunkedGraphBuilder
 from src.graph_building.graph_builder import GraphBuilder
+from src.graph_building.graph_cache import GraphCache
+from src.graph_building.graph_fingerprinter import GraphFingerprinter
+from src.graph_building.multi_delta_peak_finder import MultiDeltaPeakFinder
+from src.graph_building.parallel_delta_peak_finder import ParallelDeltaPeakFinder
+from src.graph_building.streaming_delta_peak_finder import StreamingDeltaPeakFinder
 
 mock_data = {
     '5.0': [1, 2, 3, 4, 5, 6, 7, 8, 7, 6],
@@ -39,6 +54,21 @@ mock_info = {
 }
 
 
+def get_local_downloader(folder_path: str, time_series: pd.DataFrame, station_info: dict) -> DataDownloaderBase:
+    time_series.rename_axis('date').to_csv(os.path.join(folder_path, 'measurement_data.csv'), sep=',')
+    pd.DataFrame(
+        data={'river_km': list(map(float, time_series.columns))},
+        index=pd.Index(list(map(float, time_series.columns)), name='regional_number')
+    ).to_csv(os.path.join(folder_path, 'meta_data.csv'), sep=';')
+    for file_name, key in (('station_lifetimes.json', 'life_interval'),
+                           ('null_points.json', 'null_point'),
+                           ('level_groups.json', 'level_group')):
+        with open(os.path.join(folder_path, file_name), 'w') as f:
+            json.dump({gauge: info[key] for gauge, info in station_info.items()}, f)
+
+    return DataDownloaderBase(folder_link='', data_folder_path=str(folder_path))
+
+
 @pytest.fixture
 def data_interface() -> DataInterface:
     data = {
@@ -101,6 +131,141 @@ def test_delta_peak_detection(data_interface: DataInterface,
         assert vertex_interface.vertices[gauge] == expected_peaks[gauge]
 
 
+def test_multi_delta_peak_detection(data_interface: DataInterface):
+    multi_finder = MultiDeltaPeakFinder(data_interface=data_interface)
+    multi_finder.run()
+
+    assert multi_finder.peak_radii['1.0']['radius'].to_dict() == {
+        '2020-01-05': 2,
+        '2020-01-08': 2
+    }
+    assert multi_finder.peak_radii['4.0']['radius'].to_dict() == {
+        '2020-01-05': 4,
+        '2020-01-08': 1
+    }
+
+    for delta in [1, 2, 3, 4]:
+        data_gen = GraphBuilder(
+            data_interface=data_interface,
+            delta=delta
+        )
+        data_gen.run()
+
+        vertex_interface = multi_finder.get_vertex_interface(delta=delta)
+        assert vertex_interface.vertices == data_gen.delta_peak_finder.vertex_interface.vertices
+
+        derived_gen = GraphBuilder(
+            data_interface=data_interface,
+            delta=delta
+        )
+        derived_gen.run(vertex_interface=vertex_interface)
+        assert list(derived_gen.fwg_interface.fwg.edges(data=True)) == \
+            list(data_gen.fwg_interface.fwg.edges(data=True))
+
+
+@pytest.mark.parametrize('delta', [1, 2, 3])
+def test_streaming_delta_peak_detection(data_interface: DataInterface, delta: int):
+    data_gen = GraphBuilder(
+        data_interface=data_interface,
+        delta=delta
+    )
+    data_gen.run()
+
+    streaming_finder = StreamingDeltaPeakFinder(
+        delta=delta,
+        station_info=data_interface.station_info
+    )
+    for gauge in data_interface.gauges:
+        series = mock_measurements[gauge]
+        # the first half arrives day by day, the rest in one batch
+        for date, value in series.iloc[:5].items():
+            confirmed_peaks = streaming_finder.update(gauge=gauge, date=date, value=value)
+            assert all(
+                dates.index(peak_date) == dates.index(date) - delta
+                for peak_date, _ in confirmed_peaks
+            )
+        streaming_finder.update_batch(
+            gauge=gauge,
+            dates=series.index[5:].tolist(),
+            values=series.iloc[5:].tolist()
+        )
+
+    assert streaming_finder.get_vertex_interface().vertices == \
+        data_gen.delta_peak_finder.vertex_interface.vertices
+
+
+@pytest.mark.parametrize('delta', [1, 2, 3])
+def test_ragged_storage(data_interface: DataInterface, delta: int):
+    lifetimes = {
+        gauge: {
+            **info,
+            'life_interval': {'start': dates[i % 3], 'end': dates[-1 - i % 2]}
+        }
+        for i, (gauge, info) in enumerate(mock_info.items())
+    }
+    data_interface.station_info = lifetimes
+
+    ragged_interface = DataInterface(data={
+        'meta': mock_meta,
+        'gauges': data_interface.gauges,
+        'station_info': lifetimes,
+        'ragged_series': DataHandler.get_ragged_series(
+            time_series=mock_measurements,
+            station_info=lifetimes,
+            gauges=data_interface.gauges
+        )
+    })
+
+    dense_gen = GraphBuilder(data_interface=data_interface, delta=delta)
+    dense_gen.run()
+    ragged_gen = GraphBuilder(data_interface=ragged_interface, delta=delta)
+    ragged_gen.run()
+
+    assert ragged_gen.delta_peak_finder.vertex_interface.vertices == \
+        dense_gen.delta_peak_finder.vertex_interface.vertices
+    assert list(ragged_gen.fwg_interface.fwg.edges(data=True)) == \
+        list(dense_gen.fwg_interface.fwg.edges(data=True))
+
+    ragged_series = ragged_interface.ragged_series
+    assert ragged_series.values.dtype == np.float32
+    assert np.shares_memory(ragged_series.get_values(gauge='3.0'), ragged_series.values)
+
+
+@pytest.mark.parametrize('workers, gauges_per_task', [(1, 1), (2, 1), (3, 4), (2, None)])
+@pytest.mark.parametrize('storage', DataHandler.STORAGE_MODES)
+def test_parallel_delta_peak_detection(data_interface: DataInterface,
+                                       workers: int,
+                                       gauges_per_task: int,
+                                       storage: str,
+                                       monkeypatch
+                                       ):
+    if storage == 'ragged':
+        data_interface.ragged_series = DataHandler.get_ragged_series(
+            time_series=data_interface.time_series,
+            station_info=data_interface.station_info,
+            gauges=data_interface.gauges
+        )
+        if ParallelDeltaPeakFinder.can_fork():
+            # forked workers read the ragged array itself, it is not copied into shared memory
+            monkeypatch.setattr(
+                'src.graph_building.parallel_delta_peak_finder.shared_memory.SharedMemory',
+                None
+            )
+
+    data_gen = GraphBuilder(data_interface=data_interface)
+    data_gen.delta_peak_finder.run()
+
+    peak_finder = ParallelDeltaPeakFinder(
+        data_interface=data_interface,
+        delta=2,
+        workers=workers,
+        gauges_per_task=gauges_per_task
+    )
+    peak_finder.run()
+
+    assert peak_finder.vertex_interface.vertices == data_gen.delta_peak_finder.vertex_interface.vertices
+
+
 @pytest.mark.parametrize('beta, expected_edges, expected_graph_data', [
     (2, {
         ('5.0', '4.0'): [],
@@ -156,3 +321,236 @@ def test_edge_finding(data_interface: DataInterface,
 
     fwg = data_gen.fwg_interface.fwg
     assert list(fwg.edges(data=True)) == expected_graph_data
+
+
+@pytest.mark.parametrize('beta, expected_members', [
+    (2, [
+        [('1.0', '2020-01-05'), ('2.0', '2020-01-04'), ('3.0', '2020-01-03')]
+    ]),
+    (5, [
+        [('1.0', '2020-01-05'), ('1.0', '2020-01-08'), ('2.0', '2020-01-04'), ('3.0', '2020-01-03')],
+        [('3.0', '2020-01-08'), ('4.0', '2020-01-05')]
+    ])
+])
+def test_component_tracking(data_interface: DataInterface,
+                            beta: int,
+                            expected_members: list
+                            ):
+    data_gen = GraphBuilder(
+        data_interface=data_interface,
+        beta=beta
+    )
+    data_gen.run()
+
+    fwg = data_gen.fwg_interface.fwg
+    components = data_gen.fwg_interface.components
+
+    assert components.members == sorted(map(sorted, nx.weakly_connected_components(fwg)))
+    assert components.members == expected_members
+    assert components.sizes.tolist() == list(map(len, expected_members))
+    assert components.station_spans.tolist() == [
+        [min(float(gauge) for gauge, _ in members), max(float(gauge) for gauge, _ in members)]
+        for members in expected_members
+    ]
+    assert components.date_spans[:, 0].astype(str).tolist() == [
+        min(date for _, date in members) for members in expected_members
+    ]
+    # the graph can be edited, so its components are not stored alongside it
+    assert 'components' not in fwg.graph
+
+
+@pytest.mark.parametrize('chunk_days', [1, 3, 20])
+@pytest.mark.parametrize('delta, beta', [(1, 2), (2, 5)])
+def test_chunked_graph_building(data_interface: DataInterface,
+                                chunk_days: int,
+                                delta: int,
+                                beta: int
+                                ):
+    data_gen = GraphBuilder(data_interface=data_interface, delta=delta, beta=beta)
+    data_gen.run()
+
+    chunked_data_gen = ChunkedGraphBuilder(
+        data_interface=data_interface,
+        delta=delta,
+        beta=beta,
+        chunk_days=chunk_days
+    )
+    chunked_data_gen.run()
+
+    fwg = data_gen.fwg_interface.fwg
+    chunked_fwg = chunked_data_gen.fwg_interface.fwg
+
+    assert sorted(chunked_fwg.edges(data=True)) == sorted(fwg.edges(data=True))
+    assert chunked_data_gen.fwg_interface.components.members == data_gen.fwg_interface.components.members
+    assert chunked_data_gen.vertex_interface.vertices == data_gen.delta_peak_finder.vertex_interface.vertices
+
+    # already found peaks are only split into the chunks
+    chunked_data_gen.run(vertex_interface=data_gen.delta_peak_finder.vertex_interface)
+    assert sorted(chunked_data_gen.fwg_interface.fwg.edges(data=True)) == sorted(fwg.edges(data=True))
+
+
+@pytest.mark.parametrize('chunk_days', [1, 3])
+@pytest.mark.parametrize('chunk_size', [1, 4, 100])
+def test_chunked_graph_building_lifetimes(data_interface: DataInterface,
+                                          chunk_days: int,
+                                          chunk_size: int,
+                                          tmp_path
+                                          ):
+    data_interface.station_info = {
+        gauge: {
+            **info,
+            'life_interval': {'start': dates[i % 4], 'end': dates[-1 - 3 * (i % 3)]}
+        }
+        for i, (gauge, info) in enumerate(mock_info.items())
+    }
+
+    data_gen = GraphBuilder(data_interface=data_interface, delta=1)
+    data_gen.run()
+
+    # the measurements are read chunk by chunk from the file, they are not loaded
+    loader = DataLoader(
+        data_downloader=get_local_downloader(
+            folder_path=tmp_path,
+            time_series=mock_measurements,
+            station_info=data_interface.station_info
+        ),
+        chunk_size=chunk_size,
+        load_measurements=False
+    )
+    chunked_data_gen = ChunkedGraphBuilder(
+        data_interface=DataHandler(data_loader=loader).data_if,
+        delta=1,
+        chunk_days=chunk_days,
+        data_loader=loader
+    )
+    chunked_data_gen.run()
+
+    assert loader.measurement_data.empty
+    assert sorted(chunked_data_gen.fwg_interface.fwg.edges(data=True)) == \
+        sorted(data_gen.fwg_interface.fwg.edges(data=True))
+    assert chunked_data_gen.vertex_interface.vertices == data_gen.delta_peak_finder.vertex_interface.vertices
+
+    # only the window of a chunk is held
+    windows = [window for _, _, window in chunked_data_gen.get_chunk_windows()]
+    assert max(len(window['days']) for window in windows) <= chunk_days + chunked_data_gen.beta + 2 + chunk_size
+
+
+def test_chunked_graph_sharding(tmp_path):
+    rng = np.random.default_rng(seed=0)
+    gauges = ['3.0', '2.0', '1.0']
+    days = pd.date_range('2018-10-01', periods=900).strftime('%Y-%m-%d')
+    time_series = pd.DataFrame(
+        data=np.round(np.cumsum(rng.normal(size=(len(days), len(gauges))), axis=0), 1),
+        index=days,
+        columns=gauges
+    )
+    # a wave crossing the new year
+    for gauge, date in zip(gauges, ['2019-12-30', '2019-12-31', '2020-01-01']):
+        time_series.loc[date, gauge] += 100
+    station_info = {
+        gauge: {
+            'life_interval': {'start': days[0], 'end': days[-1]},
+            'null_point': 0.5,
+            'level_group': 0.0
+        }
+        for gauge in gauges
+    }
+    data_downloader = get_local_downloader(folder_path=tmp_path, time_series=time_series, station_info=station_info)
+
+    data_gen = GraphBuilder(data_interface=DataHandler(data_loader=DataLoader(data_downloader=data_downloader)).data_if)
+    data_gen.run()
+    vertices = data_gen.delta_peak_finder.vertex_interface.vertices
+
+    loader = DataLoader(data_downloader=data_downloader, chunk_size=50, load_measurements=False)
+    chunked_data_gen = ChunkedGraphBuilder(
+        data_interface=DataHandler(data_loader=loader).data_if,
+        chunk_days=30,
+        data_loader=loader,
+        folder_path=str(tmp_path),
+        file_name='fwg',
+        years_per_shard=1
+    )
+    chunked_data_gen.run()
+
+    assert chunked_data_gen.fwg_interface is None
+    folder_path = os.path.join(tmp_path, 'generated')
+    manifest = GeneratedDataLoader.read_manifest(folder_path=folder_path, file_name='fwg')
+    assert [shard['name'] for shard in manifest['shards']] == ['2018', '2019', '2020', '2021']
+
+    data = GeneratedDataLoader.read_shards(folder_path=folder_path, file_name='fwg')
+    assert sorted(data['graph'].edges(data=True)) == sorted(data_gen.fwg_interface.fwg.edges(data=True))
+    assert data['vertex_interface'].vertices == vertices
+    assert data['vertex_interface'].river_kms == [3.0, 2.0, 1.0]
+
+    # the vertex data of a shard covers its components reaching into the next year
+    data = GeneratedDataLoader.read_shards(
+        folder_path=folder_path,
+        file_name='fwg',
+        start_date='2019-01-01',
+        end_date='2019-12-31'
+    )
+    shard_vertices = data['vertex_interface'].vertices
+    assert all(date in shard_vertices[gauge] for gauge, date in data['graph'].nodes)
+    assert any(date > '2019-12-31' for _, date in data['graph'].nodes)
+    for gauge in gauges:
+        assert {date for date in vertices[gauge] if date.startswith('2019')} <= set(shard_vertices[gauge])
+
+
+def test_graph_fingerprint(data_interface: DataInterface):
+    graphs = dict()
+    for beta in (2, 5):
+        data_gen = GraphBuilder(data_interface=data_interface, beta=beta)
+        data_gen.run()
+        graphs[beta] = data_gen.fwg_interface.fwg
+    vertex_interface = data_gen.delta_peak_finder.vertex_interface
+    old = GraphFingerprinter.get_fingerprint(fwg=graphs[2])
+    new = GraphFingerprinter.get_fingerprint(fwg=graphs[5])
+
+    assert 'fingerprint' not in graphs[2].graph
+    graph_diff = GraphFingerprinter.diff(old=old, new=new)
+    assert not graph_diff.is_identical
+    assert set(graph_diff.added_nodes) == set(graphs[5].nodes) - set(graphs[2].nodes)
+    assert set(graph_diff.added_edges) == set(graphs[5].edges) - set(graphs[2].edges)
+    assert graph_diff.removed_nodes == graph_diff.removed_edges == graph_diff.changed_edges == []
+    assert graph_diff.changed_component_ids.tolist() == [[0, 0]]
+    assert graph_diff.added_component_ids.tolist() == [1]
+    assert graph_diff.removed_component_ids.tolist() == []
+
+    # the same graph built in another order
+    edges = list(graphs[5].edges(data=True))
+    shuffled_graph = nx.DiGraph()
+    shuffled_graph.add_edges_from([edges[i] for i in np.random.default_rng(0).permutation(len(edges))])
+    shuffled = GraphFingerprinter.from_graph(fwg=shuffled_graph)
+    assert shuffled.digest == new.digest
+    assert shuffled.component_hashes.tolist() == new.component_hashes.tolist()
+    assert GraphFingerprinter.diff(old=new, new=shuffled).is_identical
+
+    # corrected slopes and levels
+    uncorrected = GraphFingerprinter.from_graph(fwg=graphs[5], vertex_interface=vertex_interface)
+    u, v, _ = edges[0]
+    shuffled_graph.edges[u, v]['slope'] = 100.0
+    vertex_interface.vertices[u[0]][u[1]] = dict(vertex_interface.vertices[u[0]][u[1]], value=1000)
+    corrected_diff = GraphFingerprinter.diff(
+        old=uncorrected,
+        new=GraphFingerprinter.from_graph(fwg=shuffled_graph, vertex_interface=vertex_interface)
+    )
+    assert corrected_diff.changed_edges == [(u, v)]
+    assert corrected_diff.changed_nodes == [u]
+    assert corrected_diff.added_edges == corrected_diff.removed_edges == []
+    assert len(corrected_diff.changed_component_ids) == 1
+    assert GraphFingerprinter.get_fingerprint(fwg=shuffled_graph, vertex_interface=vertex_interface).digest == \
+        GraphFingerprinter.from_graph(fwg=shuffled_graph, vertex_interface=vertex_interface).digest
+
+    # slopes edited in place keep the node and edge counts
+    digest = GraphFingerprinter.get_fingerprint(fwg=graphs[5]).digest
+    graphs[5].edges[u, v]['slope'] = 5.0
+    assert GraphFingerprinter.get_fingerprint(fwg=graphs[5]).digest != digest
+    assert GraphFingerprinter.get_fingerprint(fwg=graphs[5]).digest == \
+        GraphFingerprinter.from_graph(fwg=graphs[5]).digest
+
+    # the fingerprint of a frozen graph is reused until it is invalidated
+    frozen_graph = GraphCache.freeze(fwg=graphs[2].copy())
+    fingerprint = GraphFingerprinter.get_fingerprint(fwg=frozen_graph)
+    assert GraphFingerprinter.get_fingerprint(fwg=frozen_graph) is fingerprint
+    GraphCache.invalidate(fwg=frozen_graph)
+    assert GraphFingerprinter.get_fingerprint(fwg=frozen_graph) is not fingerprint
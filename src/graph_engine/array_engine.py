@@ -0,0 +1,458 @@
+from bisect import bisect_left, bisect_right
+from itertools import chain
+
+import networkx as nx
+import numpy as np
+
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.edge_array_collector import EdgeArrayCollector
+from src.graph_building.graph_cache import GraphCache
+from src.graph_building.interfaces.component_interface import ComponentInterface
+from src.graph_building.interfaces.edge_array_interface import EdgeArrayInterface
+from src.graph_engine.graph_engine import GraphEngine
+from src.graph_engine.interfaces.graph_array_interface import GraphArrayInterface
+
+
+class ArrayEngine(GraphEngine):
+    """
+    Engine running on the adjacency arrays of the graph (see GraphArrayInterface).
+    The arrays are collected once per call, or once per frozen graph (see GraphCache).
+    The flood waves of all components are extracted together: one breadth-first search
+    from every start node at once, level by level, finds the end nodes reachable
+    from each start node, and the predecessors on their shortest paths.
+    So unreachable pairs are never searched, and the end nodes of a start node share
+    one search instead of one search per pair. The searches visit the successors
+    in the order of networkx, so the waves (and the path chosen with equivalence)
+    are the same as the ones of NetworkxEngine.
+    """
+    NAME = 'numpy'
+    GRAPH_KEY = 'graph_arrays'
+
+    @staticmethod
+    def from_graph(fwg: nx.DiGraph) -> GraphArrayInterface:
+        """
+        Collects the adjacency of a graph into arrays.
+        :param nx.DiGraph fwg: the graph
+        :return GraphArrayInterface: the adjacency arrays
+        """
+        nodes = list(fwg.nodes)
+        node_ids = {node: i for i, node in enumerate(nodes)}
+        edge_count = fwg.number_of_edges()
+
+        def get_offsets(adjacency) -> np.ndarray:
+            degrees = np.fromiter((len(adjacency[node]) for node in nodes), dtype=np.int64, count=len(nodes))
+            return np.concatenate(([0], np.cumsum(degrees)))
+
+        succ_targets = np.fromiter(
+            (node_ids[v] for u in nodes for v in fwg.succ[u]), dtype=np.int64, count=edge_count
+        )
+        pred_sources = np.fromiter(
+            (node_ids[u] for v in nodes for u in fwg.pred[v]), dtype=np.int64, count=edge_count
+        )
+        # missing slopes become NaN
+        slopes = np.array([data.get('slope') for u in nodes for data in fwg.succ[u].values()], dtype=np.float64)
+
+        data = {
+            'nodes': nodes,
+            'node_ids': node_ids,
+            'succ_offsets': get_offsets(adjacency=fwg.succ),
+            'succ_targets': succ_targets,
+            'pred_offsets': get_offsets(adjacency=fwg.pred),
+            'pred_sources': pred_sources,
+            'slopes': slopes,
+            'node_count': len(nodes),
+            'edge_count': edge_count
+        }
+
+        return GraphArrayInterface(data=data)
+
+    @classmethod
+    def get_graph_arrays(cls, fwg: nx.DiGraph) -> GraphArrayInterface:
+        """
+        Returns the adjacency arrays of the graph. The arrays of a frozen graph
+        are stored alongside it and reused, the ones of a mutable graph are
+        collected again (see GraphCache).
+        :param nx.DiGraph fwg: the graph
+        :return GraphArrayInterface: the adjacency arrays of the graph
+        """
+        return GraphCache.get(fwg=fwg, key=cls.GRAPH_KEY, compute=cls.from_graph)
+
+    def prepare_graph(self, fwg: nx.DiGraph):
+        """
+        Calculates the components, the edge arrays and the adjacency arrays of a graph.
+        :param nx.DiGraph fwg: the graph
+        """
+        super().prepare_graph(fwg=fwg)
+        self.get_graph_arrays(fwg=fwg)
+
+    def get_edge_arrays(self, fwg: nx.DiGraph) -> EdgeArrayInterface:
+        """
+        Returns the edge arrays stored alongside the graph, or collects them
+        from the adjacency arrays (in the order of EdgeArrayCollector.from_graph).
+        :param nx.DiGraph fwg: the graph
+        :return EdgeArrayInterface: the edge arrays
+        """
+        return EdgeArrayCollector.get_edge_arrays(fwg=fwg, collect=self.collect_edge_arrays)
+
+    def collect_edge_arrays(self, fwg: nx.DiGraph) -> EdgeArrayInterface:
+        """
+        Converts the adjacency arrays of a graph to edge arrays.
+        :param nx.DiGraph fwg: the graph
+        :return EdgeArrayInterface: the edge arrays
+        """
+        graph_arrays = self.get_graph_arrays(fwg=fwg)
+        if not graph_arrays.edge_count:
+            return EdgeArrayInterface(data={'node_count': graph_arrays.node_count})
+
+        upstream_ids = np.repeat(np.arange(graph_arrays.node_count), np.diff(graph_arrays.succ_offsets))
+        river_kms = ComponentTracker.get_river_kms(nodes=graph_arrays.nodes)
+        gauges, gauge_ids = np.unique(
+            np.concatenate((river_kms[upstream_ids], river_kms[graph_arrays.succ_targets])),
+            return_inverse=True
+        )
+        gauge_ids = gauge_ids.reshape(-1)
+
+        data = {
+            'gauges': gauges,
+            'upstream_ids': gauge_ids[:graph_arrays.edge_count].astype(np.int64),
+            'downstream_ids': gauge_ids[graph_arrays.edge_count:].astype(np.int64),
+            'days': ComponentTracker.get_days(nodes=graph_arrays.nodes)[upstream_ids],
+            'slopes': graph_arrays.slopes,
+            'node_count': graph_arrays.node_count,
+            'edge_count': graph_arrays.edge_count
+        }
+
+        return EdgeArrayInterface(data=data)
+
+    def get_flood_waves(self,
+                        fwg: nx.DiGraph,
+                        with_equivalence: bool,
+                        components: ComponentInterface = None
+                        ) -> list:
+        """
+        Extracts the flood waves of all components at once.
+        :param nx.DiGraph fwg: the graph
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :param ComponentInterface components: the components of the graph (calculated if None)
+        :return list: found flood waves
+        """
+        if components is None:
+            components = ComponentTracker.get_components(fwg=fwg)
+
+        return self.find_waves(
+            graph_arrays=self.get_graph_arrays(fwg=fwg),
+            components=components.members,
+            with_equivalence=with_equivalence
+        )
+
+    def get_component_waves(self, fwg: nx.DiGraph, nodes: list, with_equivalence: bool) -> list:
+        """
+        Extracts the flood waves of one weakly connected component.
+        :param nx.DiGraph fwg: the graph
+        :param list nodes: nodes in the component
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return list: found flood waves
+        """
+        return self.find_waves(
+            graph_arrays=self.get_graph_arrays(fwg=fwg),
+            components=[nodes],
+            with_equivalence=with_equivalence
+        )
+
+    def iter_component_waves(self, fwg: nx.DiGraph, components, with_equivalence: bool):
+        """
+        Yields the flood waves of the components one by one.
+        The adjacency arrays are collected once, before the first component.
+        :param nx.DiGraph fwg: the graph
+        :param components: iterable of node lists of the components
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return: generator of the lists of flood waves of the components
+        """
+        graph_arrays = None
+        for nodes in components:
+            if graph_arrays is None:
+                graph_arrays = self.get_graph_arrays(fwg=fwg)
+            yield self.find_waves(
+                graph_arrays=graph_arrays,
+                components=[nodes],
+                with_equivalence=with_equivalence
+            )
+
+    def find_pair_waves(self, fwg: nx.DiGraph, possible_pairs: list, with_equivalence: bool) -> list:
+        """
+        Finds the shortest paths (one of them with equivalence) between the pairs
+        with one search from every distinct start node.
+        :param nx.DiGraph fwg: the graph
+        :param list possible_pairs: possible (start node, end node) pairs
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return list: found waves
+        """
+        if not possible_pairs:
+            return []
+
+        graph_arrays = self.get_graph_arrays(fwg=fwg)
+        node_ids = graph_arrays.node_ids
+        pair_nodes = np.array([(node_ids[start], node_ids[end]) for start, end in possible_pairs], dtype=np.int64)
+        start_nodes, pair_starts = np.unique(pair_nodes[:, 0], return_inverse=True)
+
+        return self.get_paths(
+            graph_arrays=graph_arrays,
+            start_nodes=start_nodes,
+            pair_starts=pair_starts.reshape(-1),
+            pair_ends=pair_nodes[:, 1],
+            with_equivalence=with_equivalence
+        )
+
+    def find_waves(self, graph_arrays: GraphArrayInterface, components: list, with_equivalence: bool) -> list:
+        """
+        We pair the start and end nodes of every component (like itertools.product),
+        search from all start nodes at once, and build the paths of the reachable pairs.
+        :param GraphArrayInterface graph_arrays: the adjacency arrays
+        :param list components: node lists of the components
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return list: found flood waves
+        """
+        lengths = np.fromiter(map(len, components), dtype=np.int64, count=len(components))
+        node_ids = graph_arrays.node_ids
+        ids = np.fromiter(
+            (node_ids[node] for node in chain.from_iterable(components)),
+            dtype=np.int64,
+            count=int(lengths.sum())
+        )
+        labels = np.repeat(np.arange(len(components)), lengths)
+
+        is_start = np.diff(graph_arrays.pred_offsets)[ids] == 0
+        start_nodes, start_labels = ids[is_start], labels[is_start]
+        is_end = np.diff(graph_arrays.succ_offsets)[ids] == 0
+        end_nodes = ids[is_end]
+        end_offsets = np.searchsorted(labels[is_end], np.arange(len(components) + 1))
+
+        end_counts = np.diff(end_offsets)[start_labels]
+        pair_starts = np.repeat(np.arange(len(start_nodes)), end_counts)
+        pair_ends = end_nodes[self.get_ranges(firsts=end_offsets[start_labels], counts=end_counts)]
+        is_pair = start_nodes[pair_starts] != pair_ends
+
+        return self.get_paths(
+            graph_arrays=graph_arrays,
+            start_nodes=start_nodes,
+            pair_starts=pair_starts[is_pair],
+            pair_ends=pair_ends[is_pair],
+            with_equivalence=with_equivalence
+        )
+
+    def get_paths(self,
+                  graph_arrays: GraphArrayInterface,
+                  start_nodes: np.ndarray,
+                  pair_starts: np.ndarray,
+                  pair_ends: np.ndarray,
+                  with_equivalence: bool
+                  ) -> list:
+        """
+        Searches from all start nodes at once, and builds the paths of the reachable pairs
+        in the order of the pairs.
+        :param GraphArrayInterface graph_arrays: the adjacency arrays
+        :param np.ndarray start_nodes: ids of the distinct start nodes
+        :param np.ndarray pair_starts: position of the start node of every pair in start_nodes
+        :param np.ndarray pair_ends: id of the end node of every pair
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return list: found flood waves
+        """
+        visited_keys, pred_keys, pred_nodes = self.search(graph_arrays=graph_arrays, sources=start_nodes)
+        key_offsets = pair_starts * graph_arrays.node_count
+        is_reachable = self.is_in(keys=key_offsets + pair_ends, sorted_keys=visited_keys)
+
+        nodes = graph_arrays.nodes
+        waves = list()
+        for start, end, key_offset in zip(start_nodes[pair_starts[is_reachable]].tolist(),
+                                          pair_ends[is_reachable].tolist(),
+                                          key_offsets[is_reachable].tolist()):
+            if with_equivalence:
+                paths = [self.get_shortest_path(graph_arrays=graph_arrays, source=start, target=end)]
+            else:
+                paths = self.get_all_shortest_paths(
+                    pred_keys=pred_keys,
+                    pred_nodes=pred_nodes,
+                    key_offset=key_offset,
+                    source=start,
+                    target=end
+                )
+            waves.extend([nodes[node] for node in path] for path in paths)
+
+        return waves
+
+    def search(self, graph_arrays: GraphArrayInterface, sources: np.ndarray) -> tuple:
+        """
+        Breadth-first search from every source at once. A visited node of a search
+        is stored as the key source position * node count + node id.
+        A level expands the successors of the frontier in order, so the nodes of every
+        search are found in the order of networkx.predecessor, and so are the predecessors
+        of every node (the frontier nodes reaching it first on the same level).
+        :param GraphArrayInterface graph_arrays: the adjacency arrays
+        :param np.ndarray sources: ids of the source nodes
+        :return tuple: the sorted visited keys, and the sorted keys of the predecessor
+                       lists (lists) with the predecessors (lists)
+        """
+        node_count = graph_arrays.node_count
+        out_degrees = np.diff(graph_arrays.succ_offsets)
+
+        frontier_sources = np.arange(len(sources))
+        frontier_nodes = sources
+        visited_keys = np.sort(frontier_sources * node_count + frontier_nodes)
+        pred_keys, pred_nodes = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+        while frontier_nodes.size:
+            counts = out_degrees[frontier_nodes]
+            positions = self.get_ranges(firsts=graph_arrays.succ_offsets[frontier_nodes], counts=counts)
+            keys = np.repeat(frontier_sources, counts) * node_count + graph_arrays.succ_targets[positions]
+            parents = np.repeat(frontier_nodes, counts)
+
+            # nodes seen on earlier levels are not reached by shortest paths anymore
+            is_new = ~self.is_in(keys=keys, sorted_keys=visited_keys)
+            keys, parents = keys[is_new], parents[is_new]
+            pred_keys.append(keys)
+            pred_nodes.append(parents)
+
+            new_keys, first_positions = np.unique(keys, return_index=True)
+            frontier_sources, frontier_nodes = np.divmod(keys[np.sort(first_positions)], node_count)
+            visited_keys = np.sort(np.concatenate((visited_keys, new_keys)))
+
+        pred_keys = np.concatenate(pred_keys)
+        order = np.argsort(pred_keys, kind='stable')
+
+        return visited_keys, pred_keys[order].tolist(), np.concatenate(pred_nodes)[order].tolist()
+
+    @staticmethod
+    def get_all_shortest_paths(pred_keys: list,
+                               pred_nodes: list,
+                               key_offset: int,
+                               source: int,
+                               target: int
+                               ) -> list:
+        """
+        Builds the shortest paths from the predecessors of the search of the source,
+        in the order of networkx.all_shortest_paths (a depth-first search from the target).
+        :param list pred_keys: sorted keys of the predecessor lists
+        :param list pred_nodes: the predecessors
+        :param int key_offset: the key of the first node in the search of the source
+        :param int source: id of the source
+        :param int target: id of the target
+        :return list: the paths (node id lists)
+        """
+        def get_preds(node: int) -> list:
+            key = key_offset + node
+            return pred_nodes[bisect_left(pred_keys, key):bisect_right(pred_keys, key)]
+
+        paths = []
+        preds = {target: get_preds(node=target)}
+        seen = {target}
+        stack = [[target, 0]]
+        top = 0
+        while top >= 0:
+            node, i = stack[top]
+            if node == source:
+                paths.append([p for p, _ in reversed(stack[:top + 1])])
+            if len(preds[node]) > i:
+                stack[top][1] = i + 1
+                next_node = preds[node][i]
+                if next_node in seen:
+                    continue
+                seen.add(next_node)
+                if next_node not in preds:
+                    preds[next_node] = get_preds(node=next_node)
+                top += 1
+                if top == len(stack):
+                    stack.append([next_node, 0])
+                else:
+                    stack[top][:] = [next_node, 0]
+            else:
+                seen.discard(node)
+                top -= 1
+
+        return paths
+
+    @staticmethod
+    def get_shortest_path(graph_arrays: GraphArrayInterface, source: int, target: int) -> list:
+        """
+        Finds the shortest path of networkx.shortest_path: a bidirectional search
+        always expanding the smaller frontier, until the two searches meet.
+        :param GraphArrayInterface graph_arrays: the adjacency arrays
+        :param int source: id of the source
+        :param int target: id of the target (reachable from the source)
+        :return list: the path (node ids)
+        """
+        if source == target:
+            return [source]
+
+        succ_offsets, succ_targets = graph_arrays.succ_offsets, graph_arrays.succ_targets
+        pred_offsets, pred_sources = graph_arrays.pred_offsets, graph_arrays.pred_sources
+
+        pred = {source: None}
+        succ = {target: None}
+        forward_fringe = [source]
+        reverse_fringe = [target]
+        meeting_node = None
+        while meeting_node is None:
+            if len(forward_fringe) <= len(reverse_fringe):
+                this_level, forward_fringe = forward_fringe, []
+                for v in this_level:
+                    for w in succ_targets[succ_offsets[v]:succ_offsets[v + 1]].tolist():
+                        if w not in pred:
+                            forward_fringe.append(w)
+                            pred[w] = v
+                        if w in succ:
+                            meeting_node = w
+                            break
+                    if meeting_node is not None:
+                        break
+            else:
+                this_level, reverse_fringe = reverse_fringe, []
+                for v in this_level:
+                    for w in pred_sources[pred_offsets[v]:pred_offsets[v + 1]].tolist():
+                        if w not in succ:
+                            succ[w] = v
+                            reverse_fringe.append(w)
+                        if w in pred:
+                            meeting_node = w
+                            break
+                    if meeting_node is not None:
+                        break
+
+        path = []
+        node = meeting_node
+        while node is not None:
+            path.append(node)
+            node = pred[node]
+        path.reverse()
+        node = succ[meeting_node]
+        while node is not None:
+            path.append(node)
+            node = succ[node]
+
+        return path
+
+    @staticmethod
+    def get_ranges(firsts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """
+        Concatenates the ranges [first, first + count).
+        :param np.ndarray firsts: the first values of the ranges
+        :param np.ndarray counts: the lengths of the ranges
+        :return np.ndarray: the values of the ranges
+        """
+        ends = np.cumsum(counts)
+        total = int(ends[-1]) if ends.size else 0
+
+        return np.repeat(firsts - (ends - counts), counts) + np.arange(total)
+
+    @staticmethod
+    def is_in(keys: np.ndarray, sorted_keys: np.ndarray) -> np.ndarray:
+        """
+        Checks which keys are in a sorted array.
+        :param np.ndarray keys: the keys to check
+        :param np.ndarray sorted_keys: sorted array of keys
+        :return np.ndarray: mask of the keys found
+        """
+        if not sorted_keys.size:
+            return np.zeros(len(keys), dtype=bool)
+
+        positions = np.minimum(np.searchsorted(sorted_keys, keys), sorted_keys.size - 1)
+
+        return sorted_keys[positions] == keys
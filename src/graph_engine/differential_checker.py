@@ -0,0 +1,314 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from src.analysis.statistical_analysis.slope_analyzer import SlopeAnalyzer
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_engine.engine_registry import EngineRegistry
+from src.graph_engine.graph_engine import GraphEngine
+from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
+from src.graph_manipulation.fwg_filter import FWGFilter
+from src.graph_manipulation.interfaces.flood_wave_interface import FloodWaveInterface
+
+
+class DifferentialChecker:
+    """
+    Runs a graph engine and a reference engine on random synthetic graphs,
+    and compares everything the pipeline takes from them:
+    - the vertices and edges of the built graph (with their order and data)
+    - the edge arrays
+    - the flood waves with and without equivalence, of the whole graph,
+      of single components, and of graphs filtered by date and station
+    - the slope statistics and the wave features
+    The synthetic graphs connect random peaks of neighbouring gauges (sometimes
+    skipping a gauge, so paths between two nodes can have different lengths),
+    with missing and non-positive slopes, and their edges are added in random order.
+    After the first comparison, both graphs are edited in place (edges are rewired
+    keeping the node and edge counts, and slopes are changed), and compared again,
+    so results of the graph before the edits must not be reused.
+    """
+    def __init__(self,
+                 engine: GraphEngine | str,
+                 reference_engine: GraphEngine | str = 'networkx',
+                 gauge_count: int = 6,
+                 peak_count: int = 30,
+                 beta: int = 2,
+                 seed: int = None
+                 ):
+        """
+        Constructor.
+        :param GraphEngine | str engine: the engine to check
+        :param GraphEngine | str reference_engine: the engine giving the expected results
+        :param int gauge_count: the number of gauges of the synthetic graphs
+        :param int peak_count: the number of peaks of every gauge
+        :param int beta: the number of days an edge can span
+        :param int seed: seed of the random graphs (not reproducible if None)
+        """
+        self.engine = EngineRegistry.get_engine(engine=engine)
+        self.reference_engine = EngineRegistry.get_engine(engine=reference_engine)
+        self.gauge_count = gauge_count
+        self.peak_count = peak_count
+        self.beta = beta
+        self.seed = seed
+
+    def check(self, trials: int = 10):
+        """
+        Compares the engines on random graphs, and raises an AssertionError at the first difference.
+        :param int trials: the number of random graphs
+        """
+        rng = np.random.default_rng(seed=self.seed)
+        for trial in range(trials):
+            mismatches = self.get_mismatches(edges=self.get_random_edges(rng=rng), rng=rng)
+            if mismatches:
+                raise AssertionError(
+                    f'{self.engine.NAME} differs from {self.reference_engine.NAME} '
+                    f'in trial {trial}: ' + '; '.join(mismatches)
+                )
+
+    def get_random_edges(self, rng: np.random.Generator) -> list:
+        """
+        Creates the edges of a random FWG, like GraphBuilder.build_graph.
+        :param np.random.Generator rng: the random generator
+        :return list: (upstream node, downstream node, edge data) triples
+        """
+        gauges = [f'{float(km)}' for km in range(self.gauge_count, 0, -1)]
+        span = 4 * self.peak_count
+        peak_days = [
+            np.unique(rng.integers(0, span, size=self.peak_count)).tolist()
+            for _ in gauges
+        ]
+
+        edges = []
+        for upper in range(len(gauges) - 1):
+            # rarely, an edge skips the next gauge
+            lower = upper + 2 if upper + 2 < len(gauges) and rng.random() < 0.2 else upper + 1
+            for upper_day in peak_days[upper]:
+                for lower_day in peak_days[lower]:
+                    if not 0 <= lower_day - upper_day <= self.beta or rng.random() < 0.2:
+                        continue
+                    slope = rng.choice([None, 0.0, -1.0, float(rng.normal())], p=[0.05, 0.05, 0.1, 0.8])
+                    edges.append((
+                        (gauges[upper], str(np.datetime64('2000-01-01') + upper_day)),
+                        (gauges[lower], str(np.datetime64('2000-01-01') + lower_day)),
+                        {'slope': slope}
+                    ))
+
+        return [edges[i] for i in rng.permutation(len(edges))]
+
+    def get_random_edits(self, fwg: nx.DiGraph, rng: np.random.Generator) -> tuple:
+        """
+        Creates random in-place edits of a graph keeping its node and edge counts:
+        edges rewired to another peak downstream, and changed slopes.
+        :param nx.DiGraph fwg: the graph
+        :param np.random.Generator rng: the random generator
+        :return tuple: the removed edges, the added edges (triples), and the (u, v, slope) edits
+        """
+        edges = list(fwg.edges(data=True))
+        nodes = list(fwg.nodes)
+        if not edges:
+            return [], [], []
+
+        removed, added = [], []
+        for i in rng.choice(len(edges), size=max(1, len(edges) // 10), replace=False).tolist():
+            u, v, data = edges[i]
+            targets = [
+                node for node in nodes
+                if float(node[0]) < float(u[0]) and node != v and not fwg.has_edge(u, node)
+            ]
+            if not targets:
+                continue
+            w = targets[int(rng.integers(len(targets)))]
+            if (u, w) in (edge[:2] for edge in added):
+                continue
+            removed.append((u, v))
+            added.append((u, w, dict(data)))
+
+        kept = [(u, v) for u, v, _ in edges if (u, v) not in removed]
+        slope_edits = [
+            (*kept[i], float(rng.normal()))
+            for i in rng.choice(len(kept), size=min(len(kept), max(1, len(kept) // 10)), replace=False).tolist()
+        ]
+
+        return removed, added, slope_edits
+
+    @staticmethod
+    def edit_graph(fwg: nx.DiGraph, edits: tuple):
+        """
+        Applies the edits of get_random_edits to a graph in place.
+        :param nx.DiGraph fwg: the graph
+        :param tuple edits: the removed edges, the added edges, and the slope edits
+        """
+        removed, added, slope_edits = edits
+        fwg.remove_edges_from(ebunch=removed)
+        fwg.add_edges_from(ebunch_to_add=added)
+        for u, v, slope in slope_edits:
+            fwg.edges[u, v]['slope'] = slope
+
+    def get_mismatches(self, edges: list, rng: np.random.Generator = None) -> list:
+        """
+        Runs both engines on the graph of the edges, and (if a random generator is given)
+        on the graph again after random in-place edits.
+        :param list edges: (upstream node, downstream node, edge data) triples
+        :param np.random.Generator rng: the random generator of the edits (no edits if None)
+        :return list: descriptions of the differences (empty if the results are the same)
+        """
+        graph = self.engine.build_graph(edges=edges)
+        reference_graph = self.reference_engine.build_graph(edges=edges)
+
+        mismatches = self.get_graph_mismatches(graph=graph, reference_graph=reference_graph)
+        if mismatches or rng is None:
+            return mismatches
+
+        edits = self.get_random_edits(fwg=reference_graph, rng=rng)
+        for fwg in (graph, reference_graph):
+            self.edit_graph(fwg=fwg, edits=edits)
+
+        return [
+            f'{mismatch} after edits'
+            for mismatch in self.get_graph_mismatches(graph=graph, reference_graph=reference_graph)
+        ]
+
+    def get_graph_mismatches(self, graph: nx.DiGraph, reference_graph: nx.DiGraph) -> list:
+        """
+        Compares the graphs, and everything the engines take from them.
+        :param nx.DiGraph graph: the graph of the engine
+        :param nx.DiGraph reference_graph: the graph of the reference engine
+        :return list: descriptions of the differences
+        """
+        mismatches = []
+        if list(graph.nodes(data=True)) != list(reference_graph.nodes(data=True)):
+            mismatches.append('vertices')
+        if list(graph.edges(data=True)) != list(reference_graph.edges(data=True)):
+            mismatches.append('edges')
+        if mismatches:
+            return mismatches
+
+        edge_arrays = self.engine.get_edge_arrays(fwg=graph)
+        reference_edge_arrays = self.reference_engine.get_edge_arrays(fwg=reference_graph)
+        for key, value in vars(reference_edge_arrays).items():
+            if not self.is_equal(getattr(edge_arrays, key), value):
+                mismatches.append(f'edge arrays ({key})')
+
+        filtered_graphs = {
+            'whole graph': (graph, reference_graph),
+            'date range': tuple(
+                FWGFilter.filter_date_range(fwg=fwg, start_date='2000-01-10', end_date='2000-03-01')
+                for fwg in (graph, reference_graph)
+            ),
+            'stations': tuple(
+                FWGFilter.filter_stations(fwg=fwg, lower_station=2.0, upper_station=float(self.gauge_count - 1))
+                for fwg in (graph, reference_graph)
+            )
+        }
+        for name, (fwg, reference_fwg) in filtered_graphs.items():
+            for with_equivalence in (True, False):
+                mismatches.extend(self.get_wave_mismatches(
+                    fwg=fwg,
+                    reference_fwg=reference_fwg,
+                    with_equivalence=with_equivalence,
+                    name=f'{name}, {"with" if with_equivalence else "without"} equivalence'
+                ))
+        # the wave features are built from the waves (their edges may not even exist)
+        if any(mismatch.startswith(('flood waves', 'component waves', 'pair waves')) for mismatch in mismatches):
+            return mismatches
+
+        mismatches.extend(self.get_statistic_mismatches(graph=graph, reference_graph=reference_graph))
+
+        return mismatches
+
+    def get_wave_mismatches(self,
+                            fwg: nx.DiGraph,
+                            reference_fwg: nx.DiGraph,
+                            with_equivalence: bool,
+                            name: str
+                            ) -> list:
+        """
+        Compares the flood waves of the graph, and the waves of its largest component.
+        :param nx.DiGraph fwg: the graph of the engine
+        :param nx.DiGraph reference_fwg: the graph of the reference engine
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :param str name: name of the graph in the descriptions
+        :return list: descriptions of the differences
+        """
+        extractor = FloodWaveExtractor(fwg=fwg, engine=self.engine)
+        reference_extractor = FloodWaveExtractor(fwg=reference_fwg, engine=self.reference_engine)
+
+        flood_waves = extractor.get_flood_waves(with_equivalence=with_equivalence)
+        reference_waves = reference_extractor.get_flood_waves(with_equivalence=with_equivalence)
+        if flood_waves != reference_waves:
+            return [f'flood waves ({name})']
+
+        components = ComponentTracker.get_components(fwg=reference_fwg)
+        if not len(components.members):
+            return []
+        nodes = list(components.members[int(np.argmax(components.sizes))])
+        if extractor.get_component_waves(nodes=nodes, with_equivalence=with_equivalence) != \
+                reference_extractor.get_component_waves(nodes=nodes, with_equivalence=with_equivalence):
+            return [f'component waves ({name})']
+
+        # the pairs in reverse order, so the waves are not found component by component
+        possible_pairs = reference_extractor.get_possible_pairs(nodes=nodes)[::-1]
+        find_waves = 'find_waves_with_equivalence' if with_equivalence else 'find_waves'
+        if getattr(extractor, find_waves)(possible_pairs=possible_pairs) != \
+                getattr(reference_extractor, find_waves)(possible_pairs=possible_pairs):
+            return [f'pair waves ({name})']
+
+        return []
+
+    def get_statistic_mismatches(self, graph: nx.DiGraph, reference_graph: nx.DiGraph) -> list:
+        """
+        Compares the slope statistics and the wave features of the graphs.
+        :param nx.DiGraph graph: the graph of the engine
+        :param nx.DiGraph reference_graph: the graph of the reference engine
+        :return list: descriptions of the differences
+        """
+        slope_analyzer = SlopeAnalyzer(fwg=graph, engine=self.engine)
+        reference_slope_analyzer = SlopeAnalyzer(fwg=reference_graph, engine=self.reference_engine)
+
+        mismatches = []
+        statistics = {
+            'slope distribution': lambda analyzer: pd.Series(analyzer.get_slope_distribution()),
+            'slope error ratios': lambda analyzer: analyzer.get_slope_error_ratios_by_station_pair()['yearly'],
+            'slope quantiles': lambda analyzer: analyzer.get_slope_quantiles()
+        }
+        for name, get_statistic in statistics.items():
+            if not self.is_equal(get_statistic(slope_analyzer), get_statistic(reference_slope_analyzer)):
+                mismatches.append(name)
+
+        wave_features = []
+        for fwg, engine in ((graph, self.engine), (reference_graph, self.reference_engine)):
+            extractor = FloodWaveExtractor(fwg=fwg, engine=engine)
+            flood_waves = extractor.get_flood_waves(with_equivalence=False)
+            wave_features.append(FloodWaveInterface(data={
+                'flood_waves': flood_waves,
+                'extracted_graph': extractor.build_wave_graph(flood_waves=flood_waves)
+            }).get_wave_features())
+        if not self.is_equal(*wave_features):
+            mismatches.append('wave features')
+
+        return mismatches
+
+    @staticmethod
+    def is_equal(value, reference) -> bool:
+        """
+        Compares two results exactly, missing values are equal to each other.
+        :param value: a result of the engine
+        :param reference: a result of the reference engine
+        :return bool: whether the results are equal
+        """
+        if isinstance(reference, (pd.DataFrame, pd.Series)):
+            try:
+                if isinstance(reference, pd.DataFrame):
+                    pd.testing.assert_frame_equal(value, reference, check_exact=True)
+                else:
+                    pd.testing.assert_series_equal(value, reference, check_exact=True)
+            except AssertionError:
+                return False
+            return True
+
+        if isinstance(reference, np.ndarray):
+            return isinstance(value, np.ndarray) and value.dtype == reference.dtype and \
+                value.shape == reference.shape and bool(np.all((value == reference) | (
+                    pd.isna(value) & pd.isna(reference))))
+
+        return value == reference
@@ -0,0 +1,42 @@
+from src.graph_engine.array_engine import ArrayEngine
+from src.graph_engine.graph_engine import GraphEngine
+from src.graph_engine.networkx_engine import NetworkxEngine
+
+
+class EngineRegistry:
+    """
+    Selects the graph engine of a call. Classes running graph algorithms take
+    an engine (or its name), and use the default engine if none is given.
+    """
+    ENGINES = {
+        NetworkxEngine.NAME: NetworkxEngine,
+        ArrayEngine.NAME: ArrayEngine
+    }
+    default_engine = NetworkxEngine.NAME
+
+    @classmethod
+    def get_engine(cls, engine: GraphEngine | str = None) -> GraphEngine:
+        """
+        Returns an engine.
+        :param GraphEngine | str engine: an engine, or the name of one (the default engine if None)
+        :return GraphEngine: the engine
+        """
+        if isinstance(engine, GraphEngine):
+            return engine
+        if engine is None:
+            engine = cls.default_engine
+        if engine not in cls.ENGINES:
+            raise ValueError(f'Engine must be one of {tuple(cls.ENGINES)}')
+
+        return cls.ENGINES[engine]()
+
+    @classmethod
+    def set_default_engine(cls, engine: str):
+        """
+        Sets the engine used when no engine is given.
+        :param str engine: the name of the engine
+        """
+        if engine not in cls.ENGINES:
+            raise ValueError(f'Engine must be one of {tuple(cls.ENGINES)}')
+
+        cls.default_engine = engine
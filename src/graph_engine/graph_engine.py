@@ -0,0 +1,130 @@
+from itertools import product
+
+import networkx as nx
+import numpy as np
+
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.interfaces.component_interface import ComponentInterface
+from src.graph_building.interfaces.edge_array_interface import EdgeArrayInterface
+
+
+class GraphEngine:
+    """
+    Base class of the engines running the graph algorithms of the pipeline.
+    The FWG itself is always a networkx DiGraph (it is pickled, filtered and drawn
+    as one), the engines differ in how they build it, extract its flood waves
+    and collect its edges. Every engine must give the same results as NetworkxEngine,
+    see DifferentialChecker.
+    """
+    NAME = None
+
+    def build_graph(self, edges: list) -> nx.DiGraph:
+        """
+        Creates the directed graph of the edges.
+        :param list edges: (upstream node, downstream node, edge data) triples
+        :return nx.DiGraph: the graph
+        """
+        fwg = nx.DiGraph()
+        fwg.add_edges_from(ebunch_to_add=edges)
+
+        return fwg
+
+    def get_flood_waves(self,
+                        fwg: nx.DiGraph,
+                        with_equivalence: bool,
+                        components: ComponentInterface = None
+                        ) -> list:
+        """
+        Extracts the flood waves of every component, component by component.
+        :param nx.DiGraph fwg: the graph
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :param ComponentInterface components: the components of the graph (calculated if None)
+        :return list: found flood waves
+        """
+        if components is None:
+            components = ComponentTracker.get_components(fwg=fwg)
+
+        return [
+            wave
+            for component in components.members
+            for wave in self.get_component_waves(fwg=fwg, nodes=list(component), with_equivalence=with_equivalence)
+        ]
+
+    def get_component_waves(self, fwg: nx.DiGraph, nodes: list, with_equivalence: bool) -> list:
+        """
+        Extracts the flood waves of one weakly connected component: the shortest paths
+        (one of them with equivalence) from every node without predecessors
+        to every node without successors, in the order of the nodes.
+        :param nx.DiGraph fwg: the graph
+        :param list nodes: nodes in the component
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return list: found flood waves
+        """
+        raise NotImplementedError
+
+    def iter_component_waves(self, fwg: nx.DiGraph, components, with_equivalence: bool):
+        """
+        Yields the flood waves of the components one by one, so the components
+        are only extracted when their waves are needed.
+        :param nx.DiGraph fwg: the graph
+        :param components: iterable of node lists of the components
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return: generator of the lists of flood waves of the components
+        """
+        for nodes in components:
+            yield self.get_component_waves(fwg=fwg, nodes=nodes, with_equivalence=with_equivalence)
+
+    @staticmethod
+    def get_possible_pairs(fwg: nx.DiGraph, nodes: list) -> list:
+        """
+        We find potential start and end nodes to form paths.
+        :param nx.DiGraph fwg: the graph
+        :param list nodes: nodes in the component
+        :return list: possible (start node, end node) pairs
+        """
+        in_deg_pairs = list(fwg.in_degree(nodes))
+        out_deg_pairs = list(fwg.out_degree(nodes))
+
+        in_nodes, in_values = zip(*in_deg_pairs)
+        out_nodes, out_values = zip(*out_deg_pairs)
+
+        in_nodes = np.array(in_nodes)
+        in_values = np.array(in_values)
+        out_nodes = np.array(out_nodes)
+        out_values = np.array(out_values)
+
+        possible_start_nodes = [(str(row[0]), str(row[1])) for row in in_nodes[in_values == 0]]
+        possible_end_nodes = [(str(row[0]), str(row[1])) for row in out_nodes[out_values == 0]]
+
+        return [
+            (start, end) for start, end in product(possible_start_nodes, possible_end_nodes)
+            if start != end
+        ]
+
+    def find_pair_waves(self, fwg: nx.DiGraph, possible_pairs: list, with_equivalence: bool) -> list:
+        """
+        Finds the shortest paths (one of them with equivalence) between the pairs,
+        in the order of the pairs. Unreachable pairs are skipped.
+        :param nx.DiGraph fwg: the graph
+        :param list possible_pairs: possible (start node, end node) pairs
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return list: found waves
+        """
+        raise NotImplementedError
+
+    def get_edge_arrays(self, fwg: nx.DiGraph) -> EdgeArrayInterface:
+        """
+        Returns the edges of the graph as arrays (see EdgeArrayCollector).
+        :param nx.DiGraph fwg: the graph
+        :return EdgeArrayInterface: the edge arrays
+        """
+        raise NotImplementedError
+
+    def prepare_graph(self, fwg: nx.DiGraph):
+        """
+        Calculates the data the engine stores alongside a frozen graph (its components and edge arrays),
+        so it is ready before the graph is used (see GraphCache).
+        :param nx.DiGraph fwg: the graph
+        """
+        ComponentTracker.get_components(fwg=fwg)
+        self.get_edge_arrays(fwg=fwg)
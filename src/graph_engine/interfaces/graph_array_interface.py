@@ -0,0 +1,38 @@
+import numpy as np
+
+
+class GraphArrayInterface:
+    """
+    Class for storing the adjacency of the FWG as NumPy arrays (compressed sparse rows).
+    Nodes are numbered in the order of the graph, and the successors (predecessors)
+    of a node are stored in the order networkx iterates them, so searches
+    on the arrays visit the nodes in the same order as on the graph.
+    """
+    def __init__(self, data: dict = None):
+        """
+        Constructor.
+        :param dict data: Dictionary: the keys represent the data structures.
+        The expected keys are:
+        - 'nodes': list of the nodes, the id of a node is its position
+        - 'node_ids': dictionary of the ids of the nodes
+        - 'succ_offsets': the first successor of every node (and the edge count at the end)
+        - 'succ_targets': ids of the successors
+        - 'pred_offsets': the first predecessor of every node (and the edge count at the end)
+        - 'pred_sources': ids of the predecessors
+        - 'slopes': slope of the edge of every successor (NaN if missing)
+        - 'node_count': number of nodes in the graph
+        - 'edge_count': number of edges in the graph
+        """
+        self.nodes = list()
+        self.node_ids = dict()
+        self.succ_offsets = np.zeros(1, dtype=np.int64)
+        self.succ_targets = np.zeros(0, dtype=np.int64)
+        self.pred_offsets = np.zeros(1, dtype=np.int64)
+        self.pred_sources = np.zeros(0, dtype=np.int64)
+        self.slopes = np.zeros(0, dtype=np.float64)
+        self.node_count = 0
+        self.edge_count = 0
+
+        if data is not None:
+            for key, value in data.items():
+                setattr(self, key, value)
@@ -0,0 +1,86 @@
+import networkx as nx
+
+from src.graph_building.edge_array_collector import EdgeArrayCollector
+from src.graph_building.interfaces.edge_array_interface import EdgeArrayInterface
+from src.graph_engine.graph_engine import GraphEngine
+
+
+class NetworkxEngine(GraphEngine):
+    """
+    The reference engine: every algorithm runs on the networkx graph.
+    """
+    NAME = 'networkx'
+
+    def get_component_waves(self, fwg: nx.DiGraph, nodes: list, with_equivalence: bool) -> list:
+        """
+        Extracts the flood waves of one weakly connected component.
+        :param nx.DiGraph fwg: the graph
+        :param list nodes: nodes in the component
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return list: found flood waves
+        """
+        return self.find_pair_waves(
+            fwg=fwg,
+            possible_pairs=self.get_possible_pairs(fwg=fwg, nodes=nodes),
+            with_equivalence=with_equivalence
+        )
+
+    def find_pair_waves(self, fwg: nx.DiGraph, possible_pairs: list, with_equivalence: bool) -> list:
+        """
+        Finds the shortest paths (one of them with equivalence) between the pairs.
+        :param nx.DiGraph fwg: the graph
+        :param list possible_pairs: possible (start node, end node) pairs
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return list: found waves
+        """
+        if with_equivalence:
+            return self.find_waves_with_equivalence(fwg=fwg, possible_pairs=possible_pairs)
+        return self.find_waves(fwg=fwg, possible_pairs=possible_pairs)
+
+    @staticmethod
+    def find_waves_with_equivalence(fwg: nx.DiGraph, possible_pairs: list) -> list:
+        """
+        We find waves with equivalence.
+        :param nx.DiGraph fwg: the graph
+        :param list possible_pairs: possible (start node, end node) pairs
+        :return list: found waves
+        """
+        waves = list()
+        for start, end in possible_pairs:
+            try:
+                wave = nx.shortest_path(
+                    G=fwg,
+                    source=start,
+                    target=end
+                )
+                waves.append(wave)
+            except nx.NetworkXNoPath:
+                continue
+
+        return waves
+
+    @staticmethod
+    def find_waves(fwg: nx.DiGraph, possible_pairs: list) -> list:
+        """
+        We find all waves between start and end nodes.
+        :param nx.DiGraph fwg: the graph
+        :param list possible_pairs: possible (start node, end node) pairs
+        :return list: found waves
+        """
+        waves = list()
+        for start, end in possible_pairs:
+            try:
+                for wave in nx.all_shortest_paths(G=fwg, source=start, target=end):
+                    waves.append(wave)
+            except nx.NetworkXNoPath:
+                continue
+
+        return waves
+
+    def get_edge_arrays(self, fwg: nx.DiGraph) -> EdgeArrayInterface:
+        """
+        Returns the edge arrays stored alongside the graph, or collects them.
+        :param nx.DiGraph fwg: the graph
+        :return EdgeArrayInterface: the edge arrays
+        """
+        return EdgeArrayCollector.get_edge_arrays(fwg=fwg)
@@ -0,0 +1,95 @@
+import networkx as nx
+import pytest
+
+from src.analysis.statistical_analysis.slope_analyzer import SlopeAnalyzer
+from src.graph_engine.array_engine import ArrayEngine
+from src.graph_engine.differential_checker import DifferentialChecker
+from src.graph_engine.engine_registry import EngineRegistry
+from src.graph_engine.networkx_engine import NetworkxEngine
+from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
+
+
+@pytest.mark.parametrize('gauge_count, peak_count, beta', [(4, 10, 1), (6, 30, 2), (8, 60, 3)])
+def test_differential_check(gauge_count: int, peak_count: int, beta: int):
+    checker = DifferentialChecker(
+        engine='numpy',
+        gauge_count=gauge_count,
+        peak_count=peak_count,
+        beta=beta,
+        seed=gauge_count
+    )
+    checker.check(trials=5)
+
+
+def test_differential_check_finds_differences():
+    class ReorderingEngine(ArrayEngine):
+        NAME = 'reordering'
+
+        def find_waves(self, graph_arrays, components: list, with_equivalence: bool) -> list:
+            return sorted(super().find_waves(
+                graph_arrays=graph_arrays,
+                components=components,
+                with_equivalence=with_equivalence
+            ))
+
+    with pytest.raises(AssertionError, match='flood waves'):
+        DifferentialChecker(engine=ReorderingEngine(), seed=0).check(trials=5)
+
+
+def test_differential_check_finds_stale_results():
+    class StaleEngine(ArrayEngine):
+        NAME = 'stale'
+
+        def get_graph_arrays(self, fwg: nx.DiGraph):
+            # reuses the arrays while the counts of the graph are the same
+            graph_arrays = fwg.graph.get(self.GRAPH_KEY)
+            if graph_arrays is None or graph_arrays.edge_count != fwg.number_of_edges():
+                graph_arrays = fwg.graph[self.GRAPH_KEY] = self.from_graph(fwg=fwg)
+            return graph_arrays
+
+    with pytest.raises(AssertionError, match='after edits'):
+        DifferentialChecker(engine=StaleEngine(), seed=0).check(trials=5)
+
+
+@pytest.mark.parametrize('engine', ['networkx', 'numpy'])
+def test_edited_graph_waves(engine: str):
+    first, second, third = ('3.0', '2000-01-01'), ('2.0', '2000-01-02'), ('1.0', '2000-01-03')
+    graph = nx.DiGraph()
+    graph.add_edge(first, second, slope=1.0)
+    graph.add_edge(second, third, slope=1.0)
+
+    extractor = FloodWaveExtractor(fwg=graph, engine=engine)
+    assert extractor.get_flood_waves(with_equivalence=False) == [[first, second, third]]
+
+    # the node and edge counts stay the same
+    graph.remove_edge(second, third)
+    graph.add_edge(first, third, slope=1.0)
+
+    assert extractor.get_flood_waves(with_equivalence=False) == [[first, third], [first, second]]
+    assert list(extractor.iter_flood_waves(with_equivalence=True)) == [[first, third], [first, second]]
+
+    possible_pairs = extractor.get_possible_pairs(nodes=[first, second, third])
+    assert possible_pairs == [(first, second), (first, third)]
+    assert extractor.find_waves(possible_pairs=possible_pairs) == [[first, second], [first, third]]
+    assert extractor.find_waves_with_equivalence(possible_pairs=possible_pairs[::-1]) == \
+        [[first, third], [first, second]]
+
+
+def test_engine_selection():
+    graph = nx.DiGraph()
+    graph.add_edge(('2.0', '2000-01-01'), ('1.0', '2000-01-02'), slope=1.0)
+
+    assert isinstance(FloodWaveExtractor(fwg=graph).engine, NetworkxEngine)
+    assert isinstance(FloodWaveExtractor(fwg=graph, engine='numpy').engine, ArrayEngine)
+
+    try:
+        EngineRegistry.set_default_engine(engine='numpy')
+        assert isinstance(SlopeAnalyzer(fwg=graph).engine, ArrayEngine)
+        assert isinstance(SlopeAnalyzer(fwg=graph, engine='networkx').engine, NetworkxEngine)
+    finally:
+        EngineRegistry.set_default_engine(engine='networkx')
+
+    with pytest.raises(ValueError):
+        EngineRegistry.get_engine(engine='igraph')
+    with pytest.raises(ValueError):
+        EngineRegistry.set_default_engine(engine='igraph')
@@ -1,8 +1,12 @@
-from itertools import product
+from itertools import chain
 
 import networkx as nx
-import numpy as np
 
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.graph_cache import GraphCache
+from src.graph_building.interfaces.component_interface import ComponentInterface
+from src.graph_engine.engine_registry import EngineRegistry
+from src.graph_engine.graph_engine import GraphEngine
 from src.graph_manipulation.interfaces.flood_wave_interface import FloodWaveInterface
 
 
@@ -10,25 +14,42 @@ class FloodWaveExtractor:
     """
     This class finds all flood waves in the FWG.
     """
-    def __init__(self, fwg: nx.DiGraph):
+    def __init__(self,
+                 fwg: nx.DiGraph,
+                 engine: GraphEngine | str = None,
+                 components: ComponentInterface = None
+                 ):
         """
         Constructor.
         :param nx.DiGraph fwg: the graph to extract flood waves from
+        :param GraphEngine | str engine: the graph engine (see EngineRegistry)
+        :param ComponentInterface components: the components of the graph if they are known
+                                              (e.g. from FWGFilter.get_station_section),
+                                              they are calculated if None
         """
         self.fwg = fwg
+        self.engine = EngineRegistry.get_engine(engine=engine)
+        self.components = components
 
-    def __call__(self, with_equivalence: bool) -> FloodWaveInterface:
+    def __call__(self, with_equivalence: bool, as_view: bool = False) -> FloodWaveInterface:
         """
         Produces both a list of waves (node lists) for statistics,
         and a graph object for visualization.
         :param bool with_equivalence: whether to apply equivalence on paths
+        :param bool as_view: whether the graph object is a read-only view of the FWG
+                             instead of a frozen copy
         :return FloodWaveInterface: interface with extracted flood waves
         """
         flood_waves = self.get_flood_waves(with_equivalence=with_equivalence)
 
+        if as_view:
+            extracted_graph = self.get_wave_subgraph_view(flood_waves=flood_waves)
+        else:
+            extracted_graph = self.build_wave_graph(flood_waves=flood_waves)
+
         data = {
             'flood_waves': flood_waves,
-            'extracted_graph': self.build_wave_graph(flood_waves=flood_waves)
+            'extracted_graph': extracted_graph
         }
 
         return FloodWaveInterface(data=data)
@@ -39,26 +60,57 @@ class FloodWaveExtractor:
         :param bool with_equivalence: whether to apply equivalence on paths
         :return list: found flood waves
         """
-        components = sorted(map(
-            sorted,
-            list(nx.weakly_connected_components(G=self.fwg))
-        ))
+        return self.engine.get_flood_waves(
+            fwg=self.fwg,
+            with_equivalence=with_equivalence,
+            components=self.get_components()
+        )
+
+    def get_components(self) -> ComponentInterface:
+        """
+        Returns the components given to the extractor, or the ones of the graph
+        (see ComponentTracker.get_components).
+        :return ComponentInterface: the components
+        """
+        if self.components is None:
+            return ComponentTracker.get_components(fwg=self.fwg)
 
-        flood_waves = list()
-        for component in components:
-            nodes = list(component)
-            possible_pairs = self.get_possible_pairs(nodes=nodes)
+        return self.components
+
+    def iter_flood_waves(self, with_equivalence: bool):
+        """
+        Yields the flood waves of the FWG component by component,
+        so they can be consumed without storing all of them.
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return: generator of flood waves
+        """
+        components = (list(component) for component in self.get_components().members)
 
-            if with_equivalence:
-                flood_waves.extend(
-                    self.find_waves_with_equivalence(possible_pairs=possible_pairs)
-                )
-            else:
-                flood_waves.extend(
-                    self.find_waves(possible_pairs=possible_pairs)
-                )
+        for waves in self.iter_component_waves(components=components, with_equivalence=with_equivalence):
+            yield from waves
 
-        return flood_waves
+    def iter_component_waves(self, components, with_equivalence: bool):
+        """
+        Yields the flood waves of the given components one by one
+        (see GraphEngine.iter_component_waves).
+        :param components: iterable of node lists of the components
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return: generator of the lists of flood waves of the components
+        """
+        return self.engine.iter_component_waves(
+            fwg=self.fwg,
+            components=components,
+            with_equivalence=with_equivalence
+        )
+
+    def get_component_waves(self, nodes: list, with_equivalence: bool) -> list:
+        """
+        Extracts the flood waves of one weakly connected component.
+        :param list nodes: nodes in the component
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return list: found flood waves
+        """
+        return self.engine.get_component_waves(fwg=self.fwg, nodes=nodes, with_equivalence=with_equivalence)
 
     def get_possible_pairs(self, nodes: list) -> list:
         """
@@ -66,24 +118,7 @@ class FloodWaveExtractor:
         :param list nodes: nodes in the component
         :return list: possible (start node, end node) pairs
         """
-        in_deg_pairs = list(self.fwg.in_degree(nodes))
-        out_deg_pairs = list(self.fwg.out_degree(nodes))
-
-        in_nodes, in_values = zip(*in_deg_pairs)
-        out_nodes, out_values = zip(*out_deg_pairs)
-
-        in_nodes = np.array(in_nodes)
-        in_values = np.array(in_values)
-        out_nodes = np.array(out_nodes)
-        out_values = np.array(out_values)
-
-        possible_start_nodes = [(str(row[0]), str(row[1])) for row in in_nodes[in_values == 0]]
-        possible_end_nodes = [(str(row[0]), str(row[1])) for row in out_nodes[out_values == 0]]
-
-        return [
-            (start, end) for start, end in product(possible_start_nodes, possible_end_nodes)
-            if start != end
-        ]
+        return self.engine.get_possible_pairs(fwg=self.fwg, nodes=nodes)
 
     def find_waves_with_equivalence(self, possible_pairs: list) -> list:
         """
@@ -91,19 +126,7 @@ class FloodWaveExtractor:
         :param list possible_pairs: possible (start node, end node) pairs
         :return list: found waves
         """
-        waves = list()
-        for start, end in possible_pairs:
-            try:
-                wave = nx.shortest_path(
-                    G=self.fwg,
-                    source=start,
-                    target=end
-                )
-                waves.append(wave)
-            except nx.NetworkXNoPath:
-                continue
-
-        return waves
+        return self.engine.find_pair_waves(fwg=self.fwg, possible_pairs=possible_pairs, with_equivalence=True)
 
     def find_waves(self, possible_pairs: list) -> list:
         """
@@ -111,25 +134,42 @@ class FloodWaveExtractor:
         :param list possible_pairs: possible (start node, end node) pairs
         :return list: found waves
         """
-        waves = list()
-        for start, end in possible_pairs:
-            try:
-                for wave in nx.all_shortest_paths(G=self.fwg, source=start, target=end):
-                    waves.append(wave)
-            except nx.NetworkXNoPath:
-                continue
+        return self.engine.find_pair_waves(fwg=self.fwg, possible_pairs=possible_pairs, with_equivalence=False)
 
-        return waves
+    @staticmethod
+    def get_wave_edges(flood_waves: list) -> list:
+        """
+        Collects the distinct edges of the waves, in order of first appearance.
+        :param list flood_waves: extracted waves
+        :return list: distinct (u, v) edges
+        """
+        return list(dict.fromkeys(chain.from_iterable(
+            zip(wave[:-1], wave[1:]) for wave in flood_waves
+        )))
 
     def build_wave_graph(self, flood_waves: list) -> nx.DiGraph:
         """
         Build a graph object from the extracted waves.
+        Edges shared by several waves are looked up and inserted only once.
+        The graph is frozen, so the data derived from it (e.g. its edge arrays)
+        is calculated once (see GraphCache).
         :param list flood_waves: extracted waves
+        :return nx.DiGraph: graph of the waves
         """
+        adjacency = self.fwg.adj
+
         extracted_graph = nx.DiGraph()
-        for wave in flood_waves:
-            for u, v in zip(wave[:-1], wave[1:]):
-                edge_data = self.fwg.get_edge_data(u, v)
-                extracted_graph.add_edge(u, v, **edge_data)
+        extracted_graph.add_edges_from(
+            (u, v, adjacency[u][v]) for u, v in self.get_wave_edges(flood_waves=flood_waves)
+        )
+
+        return GraphCache.freeze(fwg=extracted_graph)
 
-        return extracted_graph
+    def get_wave_subgraph_view(self, flood_waves: list) -> nx.DiGraph:
+        """
+        Returns the edge-induced subgraph of the waves as a read-only view of the FWG.
+        Node and edge attributes are shared with the FWG, not copied.
+        :param list flood_waves: extracted waves
+        :return nx.DiGraph: view of the waves
+        """
+        return self.fwg.edge_subgraph(edges=self.get_wave_edges(flood_waves=flood_waves))
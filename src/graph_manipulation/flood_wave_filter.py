@@ -1,8 +1,11 @@
 import networkx as nx
+import numpy as np
+import pandas as pd
 
 from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
 from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
 from src.graph_manipulation.fwg_filter import FWGFilter
+from src.graph_manipulation.interfaces.flood_wave_interface import FloodWaveInterface
 
 
 class FloodWaveFilter:
@@ -23,16 +26,37 @@ class FloodWaveFilter:
         :param bool with_equivalence: whether to apply equivalence on paths
         :return list: list of filtered waves
         """
-        graph_section = FWGFilter.filter_stations(
+        return FloodWaveFilter.get_filtered_wave_interface(
+            extracted_graph=extracted_graph,
+            lower_station=lower_station,
+            upper_station=upper_station,
+            with_equivalence=with_equivalence
+        ).flood_waves
+
+    @staticmethod
+    def get_filtered_wave_interface(extracted_graph: nx.DiGraph,
+                                    lower_station: float = None,
+                                    upper_station: float = None,
+                                    with_equivalence: bool = True
+                                    ) -> FloodWaveInterface:
+        """
+        Finds flood waves between two stations, and returns them with their graph.
+        :param nx.DiGraph extracted_graph: graph object containing waves
+        :param float lower_station: the downstream station (river km)
+        :param float upper_station: the upstream station (river km)
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return FloodWaveInterface: interface with the filtered waves
+        """
+        graph_section, components = FWGFilter.get_station_section(
             fwg=extracted_graph,
             lower_station=lower_station,
             upper_station=upper_station
         )
 
-        extractor = FloodWaveExtractor(fwg=graph_section)
-        flood_waves = extractor(with_equivalence=with_equivalence).flood_waves
+        extractor = FloodWaveExtractor(fwg=graph_section, components=components)
 
-        return flood_waves
+        # the waves of a read-only graph are a view of it as well
+        return extractor(with_equivalence=with_equivalence, as_view=nx.is_frozen(graph_section))
 
     @staticmethod
     def get_red_waves(flood_waves: list,
@@ -51,21 +75,43 @@ class FloodWaveFilter:
                                              False if we only consider the one at the target station
         :return list: all high water level (red) waves at the target station
         """
-        vertices = vertex_interface.vertices
+        red_wave_features = FloodWaveFilter.get_red_wave_features(
+            flood_wave_interface=FloodWaveInterface(data={'flood_waves': flood_waves}),
+            vertex_interface=vertex_interface,
+            target_station=target_station,
+            is_full_wave_considered=is_full_wave_considered
+        )
+
+        return [flood_waves[wave_id] for wave_id in red_wave_features.index]
+
+    @staticmethod
+    def get_red_wave_features(flood_wave_interface: FloodWaveInterface,
+                              vertex_interface: VertexDataInterface,
+                              target_station: str,
+                              is_full_wave_considered: bool = False
+                              ) -> pd.DataFrame:
+        """
+        We select the rows of the wave feature table belonging to red waves
+        at the target station (see get_red_waves).
+        :param FloodWaveInterface flood_wave_interface: the flood waves to analyze
+        :param VertexDataInterface vertex_interface: interface containing necessary
+                                                     vertex data (colors)
+        :param str target_station: the station to filter for
+        :param bool is_full_wave_considered: True if we require all nodes in the wave to be red,
+                                             False if we only consider the one at the target station
+        :return pd.DataFrame: the features of the red waves
+        """
+        wave_features = flood_wave_interface.get_wave_features(vertex_interface=vertex_interface)
+        wave_nodes = flood_wave_interface.get_wave_nodes()
+
+        at_station = wave_nodes['station'].to_numpy() == float(target_station)
+        if not is_full_wave_considered:
+            at_station &= wave_nodes['is_red'].to_numpy()
+
+        is_selected = np.zeros(len(wave_features), dtype=bool)
+        is_selected[wave_nodes['wave_id'].to_numpy()[at_station]] = True
 
         if is_full_wave_considered:
-            return list(filter(
-                lambda wave: (
-                    any(station == target_station for station, _ in wave) and
-                    all(vertices[station][date]['color'] == 'red' for station, date in wave)
-                ),
-                flood_waves
-            ))
-        else:
-            return list(filter(
-                lambda wave: any(
-                    station == target_station and vertices[station][date]['color'] == 'red'
-                    for station, date in wave
-                ),
-                flood_waves
-            ))
+            is_selected &= (wave_features['red_node_count'] == wave_features['node_count']).to_numpy()
+
+        return wave_features[is_selected]
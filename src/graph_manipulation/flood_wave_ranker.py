@@ -0,0 +1,165 @@
+import heapq
+
+import networkx as nx
+import numpy as np
+
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.interfaces.component_interface import ComponentInterface
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+from src.graph_engine.graph_engine import GraphEngine
+from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
+
+
+class FloodWaveRanker:
+    """
+    This class finds the k best flood waves of the FWG without extracting all of them.
+    The score of a wave can not exceed an upper bound of its weakly connected component
+    (calculated from the component metadata), so the components are visited by
+    decreasing bound, and the visit stops when no remaining component can beat
+    the k-th best wave found so far (kept in a bounded heap).
+    Criteria:
+    - 'reach': the river km distance between the first and the last station of the wave
+      (bounded by the station span of the component)
+    - 'duration': the days between the first and the last node of the wave
+      (bounded by the date span of the component)
+    - 'peak_level': the level of the wave at the target station
+      (bounded by the highest level of the component at the target station)
+    """
+    CRITERIA = ('reach', 'duration', 'peak_level')
+
+    def __init__(self,
+                 fwg: nx.DiGraph,
+                 vertex_interface: VertexDataInterface = None,
+                 engine: GraphEngine | str = None
+                 ):
+        """
+        Constructor.
+        :param nx.DiGraph fwg: the graph to extract flood waves from
+        :param VertexDataInterface vertex_interface: interface containing vertex data
+                                                     (needed for 'peak_level')
+        :param GraphEngine | str engine: the graph engine extracting the waves (see EngineRegistry)
+        """
+        self.fwg = fwg
+        self.vertex_interface = vertex_interface
+        self.extractor = FloodWaveExtractor(fwg=fwg, engine=engine)
+
+        # the number of components whose waves were extracted in the last query
+        self.extracted_component_count = 0
+
+    def get_top_waves(self,
+                      k: int,
+                      criterion: str = 'reach',
+                      target_station: float = None,
+                      with_equivalence: bool = True
+                      ) -> tuple:
+        """
+        Finds the k flood waves with the highest scores.
+        Waves with equal scores are ordered like in FloodWaveExtractor.iter_flood_waves.
+        :param int k: the number of waves
+        :param str criterion: the score of the waves (see CRITERIA)
+        :param float target_station: the station of the peak level
+        :param bool with_equivalence: whether to apply equivalence on paths
+        :return tuple: the waves (best first) and their scores
+        """
+        if k < 1:
+            raise ValueError('k must be positive')
+        if criterion not in self.CRITERIA:
+            raise ValueError(f'Criterion must be one of {self.CRITERIA}')
+        if criterion == 'peak_level' and (target_station is None or self.vertex_interface is None):
+            raise ValueError('The target station and the vertex data are needed for peak levels')
+
+        components = ComponentTracker.get_components(fwg=self.fwg)
+        target_gauge = None if target_station is None else str(target_station)
+        bounds = self.get_component_bounds(
+            components=components,
+            criterion=criterion,
+            target_gauge=target_gauge
+        )
+
+        # min-heap of (score, -component id, -wave index, wave) of the best waves found so far,
+        # so the first waves in the order of FloodWaveExtractor win ties
+        heap = []
+        self.extracted_component_count = 0
+        order = np.argsort(-bounds, kind='stable').tolist()
+        # the waves of a component are only extracted when the loop asks for them
+        component_waves = self.extractor.iter_component_waves(
+            components=(list(components.members[component_id]) for component_id in order),
+            with_equivalence=with_equivalence
+        )
+        for component_id in order:
+            bound = bounds[component_id]
+            if bound == -np.inf:
+                break
+            # components with equal bounds are visited in the order of their ids
+            if len(heap) == k and (bound, -component_id) < heap[0][:2]:
+                break
+
+            self.extracted_component_count += 1
+            waves = next(component_waves)
+            for i, wave in enumerate(waves):
+                score = self.get_score(wave=wave, criterion=criterion, target_gauge=target_gauge)
+                if score is None:
+                    continue
+
+                item = (score, -component_id, -i, wave)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item[:3] > heap[0][:3]:
+                    heapq.heapreplace(heap, item)
+
+        ranked = sorted(heap, key=lambda item: item[:3], reverse=True)
+
+        return [item[3] for item in ranked], [item[0] for item in ranked]
+
+    def get_component_bounds(self,
+                             components: ComponentInterface,
+                             criterion: str,
+                             target_gauge: str = None
+                             ) -> np.ndarray:
+        """
+        We calculate an upper bound of the scores of the waves of every component.
+        Components without possible waves get -inf.
+        :param ComponentInterface components: the components of the graph
+        :param str criterion: the score of the waves
+        :param str target_gauge: the gauge of the peak level
+        :return np.ndarray: the bounds
+        """
+        if criterion == 'reach':
+            bounds = components.station_spans[:, 1] - components.station_spans[:, 0]
+        elif criterion == 'duration':
+            bounds = (components.date_spans[:, 1] - components.date_spans[:, 0]).astype(np.float64)
+        else:
+            levels = self.vertex_interface.vertices.get(target_gauge, dict())
+            bounds = np.array([
+                max(
+                    (levels[date]['value'] for gauge, date in members
+                     if gauge == target_gauge and date in levels),
+                    default=-np.inf
+                )
+                for members in components.members
+            ], dtype=np.float64)
+
+        return np.where(np.isnan(bounds), -np.inf, bounds)
+
+    def get_score(self, wave: list, criterion: str, target_gauge: str = None) -> float | None:
+        """
+        Calculates the score of a wave.
+        :param list wave: the nodes of the wave
+        :param str criterion: the score of the wave
+        :param str target_gauge: the gauge of the peak level
+        :return float | None: the score, None if the wave has none
+        """
+        if criterion == 'reach':
+            stations = ComponentTracker.get_river_kms(nodes=[wave[0], wave[-1]])
+            return None if np.isnan(stations).any() else float(abs(stations[0] - stations[1]))
+
+        if criterion == 'duration':
+            days = ComponentTracker.get_days(nodes=[wave[0], wave[-1]])
+            return None if np.isnat(days).any() else float((days[1] - days[0]).astype(np.int64))
+
+        levels = self.vertex_interface.vertices.get(target_gauge, dict())
+        for gauge, date in wave:
+            if gauge == target_gauge and date in levels:
+                return float(levels[date]['value'])
+
+        return None
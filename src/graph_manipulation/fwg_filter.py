@@ -2,6 +2,10 @@ import json
 import os
 
 import networkx as nx
+import numpy as np
+
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.interfaces.component_interface import ComponentInterface
 
 
 class FWGFilter:
@@ -32,11 +36,40 @@ class FWGFilter:
                           ) -> nx.DiGraph:
         """
         Filters the flood wave graph by date range.
+        Only components overlapping the range are visited, and only the ones
+        crossing its boundaries are split again.
         :param nx.DiGraph fwg: the flood wave graph
         :param str start_date: the start date
         :param str end_date: the end date
         :return nx.DiGraph: the filtered flood wave graph
         """
+        filtered_graph, _ = cls.get_date_section(
+            fwg=fwg,
+            start_date=start_date,
+            end_date=end_date
+        )
+
+        return filtered_graph
+
+    @classmethod
+    def get_date_section(cls,
+                         fwg: nx.DiGraph,
+                         start_date: str = None,
+                         end_date: str = None,
+                         components: ComponentInterface = None
+                         ) -> tuple:
+        """
+        Filters the flood wave graph by date range (see filter_date_range),
+        and returns the components of the filtered graph as well.
+        :param nx.DiGraph fwg: the flood wave graph
+        :param str start_date: the start date
+        :param str end_date: the end date
+        :param ComponentInterface components: the components of the graph if they are known
+                                              (e.g. from GeneratedDataLoader.read_shards),
+                                              they are calculated if None
+        :return tuple: the filtered flood wave graph and its components
+                       (the given ones if the range is the whole graph)
+        """
         config = cls.load_config()
 
         if start_date is None:
@@ -45,14 +78,28 @@ class FWGFilter:
             end_date = config['end_date']
 
         if start_date == config['start_date'] and end_date == config['end_date']:
-            return fwg
+            return fwg, components
+
+        if components is None:
+            components = ComponentTracker.get_components(fwg=fwg)
+
+        first_dates = components.date_spans[:, 0]
+        last_dates = components.date_spans[:, 1]
+        start_day = np.datetime64(start_date, 'D')
+        end_day = np.datetime64(end_date, 'D')
 
-        final_nodes = [
-            node for node in fwg.nodes
-            if start_date <= node[1] <= end_date
-        ]
+        is_inside = (first_dates >= start_day) & (last_dates <= end_day)
+        is_partial = ~is_inside & (first_dates <= end_day) & (last_dates >= start_day)
 
-        return nx.DiGraph(fwg.subgraph(nodes=final_nodes))
+        _, filtered_graph, filtered_components = ComponentTracker.restrict_components(
+            fwg=fwg,
+            components=components,
+            is_inside=is_inside,
+            is_partial=is_partial,
+            node_filter=lambda node: start_date <= node[1] <= end_date
+        )
+
+        return filtered_graph, filtered_components
 
     @classmethod
     def filter_stations(cls,
@@ -62,11 +109,39 @@ class FWGFilter:
                         ) -> nx.DiGraph:
         """
         Filters the flood wave graph between two stations.
+        Only components overlapping the section are visited, and only the ones
+        crossing its boundaries are split again.
         :param nx.DiGraph fwg: the flood wave graph
         :param float lower_station: the downstream station (river kilometer)
         :param float upper_station: the upstream station (river kilometer)
         :return nx.DiGraph: the filtered flood wave graph
         """
+        filtered_graph, _ = cls.get_station_section(
+            fwg=fwg,
+            lower_station=lower_station,
+            upper_station=upper_station
+        )
+
+        return filtered_graph
+
+    @classmethod
+    def get_station_section(cls,
+                            fwg: nx.DiGraph,
+                            lower_station: float = None,
+                            upper_station: float = None,
+                            components: ComponentInterface = None
+                            ) -> tuple:
+        """
+        Filters the flood wave graph between two stations (see filter_stations),
+        and returns the components of the filtered graph as well.
+        :param nx.DiGraph fwg: the flood wave graph
+        :param float lower_station: the downstream station (river kilometer)
+        :param float upper_station: the upstream station (river kilometer)
+        :param ComponentInterface components: the components of the graph if they are known,
+                                              they are calculated if None
+        :return tuple: the filtered flood wave graph and its components
+                       (the given ones if the section is the whole graph)
+        """
         config = cls.load_config()
 
         if lower_station is None:
@@ -74,15 +149,27 @@ class FWGFilter:
         if upper_station is None:
             upper_station = config['upper_station']
 
-        if lower_station == config['lower_station'] and upper_station == config['upper_station']:
-            return fwg
-
         if upper_station < lower_station:
             raise ValueError('Upper station must be upstream from the lower station')
 
-        final_nodes = [
-            node for node in fwg.nodes
-            if lower_station <= float(node[0]) <= upper_station
-        ]
+        if lower_station == config['lower_station'] and upper_station == config['upper_station']:
+            return fwg, components
+
+        if components is None:
+            components = ComponentTracker.get_components(fwg=fwg)
+
+        lowest = components.station_spans[:, 0]
+        highest = components.station_spans[:, 1]
+
+        is_inside = (lowest >= lower_station) & (highest <= upper_station)
+        is_partial = ~is_inside & (lowest <= upper_station) & (highest >= lower_station)
+
+        _, filtered_graph, filtered_components = ComponentTracker.restrict_components(
+            fwg=fwg,
+            components=components,
+            is_inside=is_inside,
+            is_partial=is_partial,
+            node_filter=lambda node: lower_station <= float(node[0]) <= upper_station
+        )
 
-        return nx.DiGraph(fwg.subgraph(nodes=final_nodes))
+        return filtered_graph, filtered_components
@@ -0,0 +1,86 @@
+import networkx as nx
+import numpy as np
+
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.edge_array_collector import EdgeArrayCollector
+from src.graph_building.graph_cache import GraphCache
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+from src.graph_engine.array_engine import ArrayEngine
+from src.graph_engine.engine_registry import EngineRegistry
+from src.graph_engine.graph_engine import GraphEngine
+from src.graph_manipulation.interfaces.flood_wave_interface import FloodWaveInterface
+
+
+class GraphSnapshot:
+    """
+    Read-only snapshot of extracted flood waves with their graph and vertex data,
+    shared by analyzers running in several threads without copying:
+    - the graph is copied once and frozen, the components, edge arrays
+      (and the adjacency arrays of the engine) are stored alongside it with read-only arrays
+    - the waves are stored in a tuple, their feature and node tables and their index are built
+    Nothing of the snapshot is written by the analyses: filtering a frozen graph gives a view
+    (see ComponentTracker.restrict_components), and the data stored alongside
+    a frozen graph is reused (see GraphCache).
+    """
+    # keys of the data stored alongside the graph by the engines
+    GRAPH_KEYS = (ComponentTracker.GRAPH_KEY, EdgeArrayCollector.GRAPH_KEY, ArrayEngine.GRAPH_KEY)
+
+    def __init__(self,
+                 flood_wave_interface: FloodWaveInterface,
+                 vertex_interface: VertexDataInterface = None,
+                 engine: GraphEngine | str = None
+                 ):
+        """
+        Constructor.
+        :param FloodWaveInterface flood_wave_interface: interface containing the flood waves and their graph
+        :param VertexDataInterface vertex_interface: interface containing vertex data,
+                                                     the one of the flood waves is used if None
+        :param GraphEngine | str engine: the graph engine whose data is prepared (see EngineRegistry)
+        """
+        self.engine = EngineRegistry.get_engine(engine=engine)
+        self.vertex_interface = vertex_interface or flood_wave_interface.vertex_interface
+        self.fwg = self.freeze_graph(fwg=flood_wave_interface.extracted_graph, engine=self.engine)
+
+        self.flood_wave_interface = FloodWaveInterface(data={
+            'flood_waves': tuple(flood_wave_interface.flood_waves),
+            'extracted_graph': self.fwg,
+            'vertex_interface': self.vertex_interface
+        })
+        self.flood_wave_interface.build_wave_tables()
+        self.flood_wave_interface.wave_index = self.get_read_only_copy(
+            interface=self.flood_wave_interface.get_wave_index()
+        )
+
+    @classmethod
+    def freeze_graph(cls, fwg: nx.DiGraph, engine: GraphEngine | str = None) -> nx.DiGraph:
+        """
+        Returns a frozen copy of a graph with the data of the engine stored alongside it.
+        Node and edge attributes are copied shallowly.
+        :param nx.DiGraph fwg: the graph
+        :param GraphEngine | str engine: the graph engine (see EngineRegistry)
+        :return nx.DiGraph: the frozen graph
+        """
+        frozen_graph = GraphCache.freeze(fwg=fwg.copy())
+        EngineRegistry.get_engine(engine=engine).prepare_graph(fwg=frozen_graph)
+
+        for key in cls.GRAPH_KEYS:
+            if key in frozen_graph.graph:
+                frozen_graph.graph[key] = cls.get_read_only_copy(interface=frozen_graph.graph[key])
+
+        return frozen_graph
+
+    @staticmethod
+    def get_read_only_copy(interface):
+        """
+        Copies an interface with read-only copies of its arrays (other attributes are shared).
+        :param interface: the interface
+        :return: the copy
+        """
+        data = dict()
+        for key, value in vars(interface).items():
+            if isinstance(value, np.ndarray):
+                value = value.copy()
+                value.setflags(write=False)
+            data[key] = value
+
+        return type(interface)(data=data)
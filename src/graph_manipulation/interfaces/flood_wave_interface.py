@@ -1,4 +1,10 @@
 import networkx as nx
+import pandas as pd
+
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+from src.graph_manipulation.record_exporter import RecordExporter
+from src.graph_manipulation.wave_feature_calculator import WaveFeatureCalculator
+from src.graph_manipulation.wave_index import WaveIndex
 
 
 class FloodWaveInterface:
@@ -12,10 +18,92 @@ class FloodWaveInterface:
         The expected keys are:
         - 'flood_waves'
         - 'extracted_graph'
+        - 'vertex_interface' (optional, needed for levels and colors)
+        - 'wave_index' (optional, built from the flood waves if missing)
         """
         self.flood_waves = list()
         self.extracted_graph = nx.DiGraph()
+        self.vertex_interface: VertexDataInterface = None
+
+        self.wave_features: pd.DataFrame = None
+        self.wave_nodes: pd.DataFrame = None
+        self.wave_index: WaveIndex = None
 
         if data is not None:
             for key, value in data.items():
                 setattr(self, key, value)
+
+    def get_wave_features(self, vertex_interface: VertexDataInterface = None) -> pd.DataFrame:
+        """
+        Returns the feature table of the flood waves (one row per wave).
+        The table is built on first use and cached.
+        :param VertexDataInterface vertex_interface: interface containing vertex data,
+                                                     the stored one is used if None
+        :return pd.DataFrame: the feature table
+        """
+        self.build_wave_tables(vertex_interface=vertex_interface)
+        return self.wave_features
+
+    def get_wave_nodes(self, vertex_interface: VertexDataInterface = None) -> pd.DataFrame:
+        """
+        Returns the node table of the flood waves (one row per wave node).
+        The table is built on first use and cached.
+        :param VertexDataInterface vertex_interface: interface containing vertex data,
+                                                     the stored one is used if None
+        :return pd.DataFrame: the node table
+        """
+        self.build_wave_tables(vertex_interface=vertex_interface)
+        return self.wave_nodes
+
+    def build_wave_tables(self, vertex_interface: VertexDataInterface = None):
+        """
+        Builds the wave tables if they are missing or the vertex data changed.
+        :param VertexDataInterface vertex_interface: interface containing vertex data
+        """
+        if vertex_interface is not None and vertex_interface is not self.vertex_interface:
+            self.vertex_interface = vertex_interface
+            self.wave_features = None
+
+        if self.wave_features is None:
+            self.wave_features, self.wave_nodes = WaveFeatureCalculator.get_wave_tables(
+                flood_waves=self.flood_waves,
+                extracted_graph=self.extracted_graph,
+                vertex_interface=self.vertex_interface
+            )
+
+    def get_wave_index(self) -> WaveIndex:
+        """
+        Returns the inverted index of the flood waves.
+        The index is built on first use and cached.
+        :return WaveIndex: the index
+        """
+        if self.wave_index is None:
+            self.wave_index = WaveIndex.from_flood_waves(flood_waves=self.flood_waves)
+        return self.wave_index
+
+    def select_waves(self, gauge: str = None, start_date: str = None, end_date: str = None) -> list:
+        """
+        Returns the flood waves touching a gauge in a time window (see WaveIndex.get_wave_ids).
+        :param str gauge: the gauge (every gauge if None)
+        :param str start_date: the start of the window (unbounded if None)
+        :param str end_date: the end of the window (unbounded if None)
+        :return list: the flood waves in their original order
+        """
+        wave_ids = self.get_wave_index().get_wave_ids(gauge=gauge, start_date=start_date, end_date=end_date)
+        return [self.flood_waves[wave_id] for wave_id in wave_ids.tolist()]
+
+    def export_records(self, file_path: str, file_format: str = None, chunk_size: int = 100000) -> int:
+        """
+        Writes one record for every node of every flood wave in chunks (see RecordExporter).
+        :param str file_path: path of the output file
+        :param str file_format: 'csv', 'npz' or 'parquet' (by the file extension if None)
+        :param int chunk_size: the number of records in a chunk
+        :return int: the number of records
+        """
+        return RecordExporter(chunk_size=chunk_size).export_waves(
+            flood_waves=self.flood_waves,
+            file_path=file_path,
+            extracted_graph=self.extracted_graph,
+            vertex_interface=self.vertex_interface,
+            file_format=file_format
+        )
@@ -0,0 +1,276 @@
+import os
+import zipfile
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+
+
+class RecordExporter:
+    """
+    Writes flood waves and the edges of the FWG as flat columnar records
+    for tools outside of Python. Records are collected into chunks of a fixed
+    number of rows, and every chunk is written before the next one is collected,
+    so the memory use does not depend on the size of the output:
+    - CSV: the chunks are appended to one table
+    - npz: every chunk of a column is a separate array named '<column>/<chunk number>'
+      (see read_npz)
+    - Parquet (needs pyarrow): every chunk is a row group
+    """
+    WAVE_COLUMNS = ('wave_id', 'seq', 'gauge', 'date', 'level', 'color', 'slope')
+    EDGE_COLUMNS = ('edge_id', 'upstream_gauge', 'upstream_date', 'downstream_gauge', 'downstream_date', 'slope')
+    FORMATS = {'.csv': 'csv', '.npz': 'npz', '.parquet': 'parquet', '.pq': 'parquet'}
+
+    def __init__(self, chunk_size: int = 100000):
+        """
+        Constructor.
+        :param int chunk_size: the number of records in a chunk
+        """
+        if chunk_size < 1:
+            raise ValueError('A chunk must contain at least one record')
+
+        self.chunk_size = chunk_size
+
+    def export_waves(self,
+                     flood_waves,
+                     file_path: str,
+                     extracted_graph: nx.DiGraph = None,
+                     vertex_interface: VertexDataInterface = None,
+                     file_format: str = None
+                     ) -> int:
+        """
+        Writes one record for every node of every wave.
+        :param flood_waves: the flood waves (node lists), any iterable (e.g. FloodWaveExtractor.iter_flood_waves)
+        :param str file_path: path of the output file
+        :param nx.DiGraph extracted_graph: graph object containing the waves (needed for slopes)
+        :param VertexDataInterface vertex_interface: interface containing vertex data
+                                                     (needed for levels and colors)
+        :param str file_format: 'csv', 'npz' or 'parquet' (by the file extension if None)
+        :return int: the number of records
+        """
+        return self.write(
+            chunks=self.iter_wave_chunks(
+                flood_waves=flood_waves,
+                extracted_graph=extracted_graph,
+                vertex_interface=vertex_interface
+            ),
+            file_path=file_path,
+            file_format=file_format
+        )
+
+    def export_edges(self, fwg: nx.DiGraph, file_path: str, file_format: str = None) -> int:
+        """
+        Writes one record for every edge of the graph.
+        :param nx.DiGraph fwg: the graph
+        :param str file_path: path of the output file
+        :param str file_format: 'csv', 'npz' or 'parquet' (by the file extension if None)
+        :return int: the number of records
+        """
+        return self.write(
+            chunks=self.iter_edge_chunks(fwg=fwg),
+            file_path=file_path,
+            file_format=file_format
+        )
+
+    def iter_wave_chunks(self,
+                         flood_waves,
+                         extracted_graph: nx.DiGraph = None,
+                         vertex_interface: VertexDataInterface = None
+                         ):
+        """
+        Yields the records of the wave nodes in chunks (at least one, maybe empty).
+        The slope of a node is the slope of the edge to the next node of the wave,
+        unknown levels and slopes are NaN, unknown colors are empty.
+        :param flood_waves: the flood waves (node lists)
+        :param nx.DiGraph extracted_graph: graph object containing the waves
+        :param VertexDataInterface vertex_interface: interface containing vertex data
+        :return: generator of chunks (dictionaries of columns)
+        """
+        adjacency = dict() if extracted_graph is None else extracted_graph.adj
+        vertices = dict() if vertex_interface is None else vertex_interface.vertices
+
+        records = []
+        is_empty = True
+        for wave_id, wave in enumerate(flood_waves):
+            for seq, node in enumerate(wave):
+                vertex = vertices.get(node[0], dict()).get(node[1])
+                next_node = wave[seq + 1] if seq + 1 < len(wave) else None
+                edge = adjacency[node].get(next_node) if node in adjacency else None
+
+                records.append((
+                    wave_id,
+                    seq,
+                    node[0],
+                    node[1],
+                    np.nan if vertex is None else vertex['value'],
+                    '' if vertex is None else vertex['color'],
+                    np.nan if edge is None else edge.get('slope')
+                ))
+                if len(records) == self.chunk_size:
+                    yield self.get_wave_chunk(records=records)
+                    records = []
+                    is_empty = False
+
+        if records or is_empty:
+            yield self.get_wave_chunk(records=records)
+
+    def iter_edge_chunks(self, fwg: nx.DiGraph):
+        """
+        Yields the records of the edges in chunks (at least one, maybe empty).
+        Missing slopes are NaN.
+        :param nx.DiGraph fwg: the graph
+        :return: generator of chunks (dictionaries of columns)
+        """
+        records = []
+        is_empty = True
+        for edge_id, (u, v, data) in enumerate(fwg.edges(data=True)):
+            records.append((edge_id, u[0], u[1], v[0], v[1], data.get('slope')))
+            if len(records) == self.chunk_size:
+                yield self.get_edge_chunk(records=records)
+                records = []
+                is_empty = False
+
+        if records or is_empty:
+            yield self.get_edge_chunk(records=records)
+
+    @classmethod
+    def get_wave_chunk(cls, records: list) -> dict:
+        """
+        Converts wave records to columns.
+        :param list records: (wave id, seq, gauge, date, level, color, slope) tuples
+        :return dict: the columns
+        """
+        columns = list(zip(*records)) if records else [()] * len(cls.WAVE_COLUMNS)
+        nodes = list(zip(columns[2], columns[3]))
+
+        return dict(zip(cls.WAVE_COLUMNS, (
+            np.array(columns[0], dtype=np.int64),
+            np.array(columns[1], dtype=np.int64),
+            np.array(columns[2], dtype=str),
+            ComponentTracker.get_days(nodes=nodes),
+            np.array(columns[4], dtype=np.float64),
+            np.array(columns[5], dtype=str),
+            np.array(columns[6], dtype=np.float64)
+        )))
+
+    @classmethod
+    def get_edge_chunk(cls, records: list) -> dict:
+        """
+        Converts edge records to columns.
+        :param list records: (edge id, upstream gauge, upstream date, downstream gauge,
+                             downstream date, slope) tuples
+        :return dict: the columns
+        """
+        columns = list(zip(*records)) if records else [()] * len(cls.EDGE_COLUMNS)
+
+        return dict(zip(cls.EDGE_COLUMNS, (
+            np.array(columns[0], dtype=np.int64),
+            np.array(columns[1], dtype=str),
+            ComponentTracker.get_days(nodes=list(zip(columns[1], columns[2]))),
+            np.array(columns[3], dtype=str),
+            ComponentTracker.get_days(nodes=list(zip(columns[3], columns[4]))),
+            np.array(columns[5], dtype=np.float64)
+        )))
+
+    def write(self, chunks, file_path: str, file_format: str = None) -> int:
+        """
+        Writes the chunks into a file.
+        :param chunks: iterable of chunks (dictionaries of columns, at least one)
+        :param str file_path: path of the output file
+        :param str file_format: 'csv', 'npz' or 'parquet' (by the file extension if None)
+        :return int: the number of records
+        """
+        if file_format is None:
+            file_format = self.FORMATS.get(os.path.splitext(file_path)[1].lower())
+        if file_format not in set(self.FORMATS.values()):
+            raise ValueError(f'File format must be one of {tuple(sorted(set(self.FORMATS.values())))}')
+
+        write_chunks = {
+            'csv': self.write_csv,
+            'npz': self.write_npz,
+            'parquet': self.write_parquet
+        }[file_format]
+
+        return write_chunks(chunks=chunks, file_path=file_path)
+
+    @staticmethod
+    def write_csv(chunks, file_path: str) -> int:
+        """
+        Appends the chunks to a CSV file (with one header).
+        :param chunks: iterable of chunks
+        :param str file_path: path of the output file
+        :return int: the number of records
+        """
+        record_count = 0
+        with open(file_path, 'w', newline='') as f:
+            for i, chunk in enumerate(chunks):
+                pd.DataFrame(chunk).to_csv(f, header=i == 0, index=False)
+                record_count += len(next(iter(chunk.values())))
+
+        return record_count
+
+    @staticmethod
+    def write_npz(chunks, file_path: str) -> int:
+        """
+        Writes every column of every chunk as an array into an npz file.
+        :param chunks: iterable of chunks
+        :param str file_path: path of the output file
+        :return int: the number of records
+        """
+        record_count = 0
+        with zipfile.ZipFile(file_path, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for i, chunk in enumerate(chunks):
+                for column, array in chunk.items():
+                    with zf.open(f'{column}/{i:06d}.npy', mode='w', force_zip64=True) as f:
+                        np.lib.format.write_array(f, array, allow_pickle=False)
+                record_count += len(next(iter(chunk.values())))
+
+        return record_count
+
+    @staticmethod
+    def write_parquet(chunks, file_path: str) -> int:
+        """
+        Writes every chunk as a row group into a Parquet file.
+        pyarrow is imported here, so it is only needed for Parquet files.
+        :param chunks: iterable of chunks
+        :param str file_path: path of the output file
+        :return int: the number of records
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError('Writing Parquet files needs pyarrow') from error
+
+        record_count = 0
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.table(chunk)
+                if writer is None:
+                    writer = pq.ParquetWriter(file_path, schema=table.schema)
+                writer.write_table(table)
+                record_count += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+
+        return record_count
+
+    @staticmethod
+    def read_npz(file_path: str) -> dict:
+        """
+        Reads an npz file of the exporter, and concatenates the chunks of every column.
+        :param str file_path: path of the file
+        :return dict: the columns
+        """
+        with np.load(file_path, allow_pickle=False) as arrays:
+            chunks = dict()
+            for name in arrays.files:
+                column, _ = name.split('/')
+                chunks.setdefault(column, []).append(arrays[name])
+
+        return {column: np.concatenate(arrays) for column, arrays in chunks.items()}
@@ -1,7 +1,17 @@
 import networkx as nx
+import numpy as np
+import pandas as pd
 import pytest
 
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.graph_cache import GraphCache
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
 from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
+from src.graph_manipulation.flood_wave_ranker import FloodWaveRanker
+from src.graph_manipulation.fwg_filter import FWGFilter
+from src.graph_manipulation.interfaces.flood_wave_interface import FloodWaveInterface
+from src.graph_manipulation.record_exporter import RecordExporter
+from src.graph_manipulation.wave_index import WaveIndex
 
 
 @pytest.fixture
@@ -54,3 +64,203 @@ def test_wave_extraction(mock_graph: nx.DiGraph,
             expected_graph.add_edge(u, v, **edge_data)
 
     assert nx.is_isomorphic(extracted_graph, expected_graph)
+
+    graph_view = extractor(with_equivalence=with_equivalence, as_view=True).extracted_graph
+
+    assert nx.is_frozen(graph_view)
+    assert sorted(graph_view.edges(data=True)) == sorted(extracted_graph.edges(data=True))
+    assert all(
+        graph_view.edges[u, v] is mock_graph.edges[u, v]
+        for u, v in graph_view.edges
+    )
+
+
+def test_component_reuse_in_filtering(monkeypatch):
+    graph = nx.DiGraph()
+    graph.add_edges_from([
+        (('4.0', '1'), ('3.0', '2'), {'slope': 1}),
+        (('3.0', '2'), ('2.0', '3'), {'slope': 1}),
+        (('2.0', '3'), ('1.0', '4'), {'slope': 1}),
+        (('3.0', '5'), ('2.0', '6'), {'slope': 1}),
+        (('4.0', '7'), ('3.0', '9'), {'slope': 1}),
+        (('5.0', '8'), ('4.0', '9'), {'slope': 1}),
+        (('4.0', '9'), ('3.0', '9'), {'slope': 1})
+    ])
+
+    filtered_graph, components = FWGFilter.get_station_section(
+        fwg=graph,
+        lower_station=2.0,
+        upper_station=3.0
+    )
+
+    expected_graph = nx.DiGraph(graph.subgraph(nodes=[
+        node for node in graph.nodes if 2.0 <= float(node[0]) <= 3.0
+    ]))
+
+    assert sorted(filtered_graph.edges) == sorted(expected_graph.edges)
+    assert sorted(filtered_graph.nodes) == sorted(expected_graph.nodes)
+
+    assert components.members == sorted(map(sorted, nx.weakly_connected_components(expected_graph)))
+    assert components.sizes.tolist() == [2, 2, 1]
+    assert components.station_spans.tolist() == [[2.0, 3.0], [2.0, 3.0], [3.0, 3.0]]
+
+    extractor = FloodWaveExtractor(fwg=filtered_graph, components=components)
+    waves = extractor(with_equivalence=False).flood_waves
+
+    assert sorted(waves) == [
+        [('3.0', '2'), ('2.0', '3')],
+        [('3.0', '5'), ('2.0', '6')]
+    ]
+    assert sorted(FWGFilter.filter_stations(fwg=graph, lower_station=2.0, upper_station=3.0).edges) == \
+        sorted(filtered_graph.edges)
+
+    # a frozen graph is filtered into a view, which keeps its components
+    frozen_section, frozen_components = FWGFilter.get_station_section(
+        fwg=GraphCache.freeze(fwg=graph.copy()),
+        lower_station=2.0,
+        upper_station=3.0
+    )
+    assert nx.is_frozen(frozen_section)
+    assert ComponentTracker.get_components(fwg=frozen_section) is frozen_components
+    assert frozen_components.members == components.members
+
+    # the whole graph is returned without searching its components
+    def fail(fwg: nx.DiGraph):
+        raise AssertionError('components searched')
+
+    monkeypatch.setattr(ComponentTracker, 'from_graph', fail)
+    assert FWGFilter.get_station_section(fwg=graph) == (graph, None)
+    assert FWGFilter.get_date_section(fwg=graph, components=components) == (graph, components)
+    assert FWGFilter.filter_stations(fwg=graph) is graph
+    assert FWGFilter.filter_date_range(fwg=graph) is graph
+
+
+def test_edited_graph_components():
+    a, b, c, d = ('3.0', '1'), ('2.0', '2'), ('1.0', '3'), ('0.0', '4')
+    graph = nx.DiGraph([(a, b), (c, d)])
+    assert FloodWaveExtractor(fwg=graph).get_flood_waves(with_equivalence=True) == [[c, d], [a, b]]
+
+    # the node and edge counts are kept
+    graph.remove_edge(c, d)
+    graph.add_edge(b, c)
+    assert FloodWaveExtractor(fwg=graph).get_flood_waves(with_equivalence=True) == [[a, b, c]]
+
+    frozen_graph = GraphCache.freeze(fwg=graph.copy())
+    components = ComponentTracker.get_components(fwg=frozen_graph)
+    assert ComponentTracker.get_components(fwg=frozen_graph) is components
+
+    # copies and views of a frozen graph do not reuse its components
+    copied_graph = frozen_graph.copy()
+    copied_graph.remove_edge(b, c)
+    assert len(ComponentTracker.get_components(fwg=copied_graph).members) == 3
+    assert len(ComponentTracker.get_components(fwg=nx.freeze(copied_graph)).members) == 3
+    assert ComponentTracker.get_components(fwg=frozen_graph.subgraph([a, b])).members == [[b, a]]
+    assert ComponentTracker.get_components(fwg=frozen_graph) is components
+
+
+@pytest.mark.parametrize('criterion, target_station', [('reach', None), ('duration', None), ('peak_level', 3.0)])
+def test_top_k_waves(criterion: str, target_station: float):
+    graph = nx.DiGraph()
+    vertices = {f'{float(km)}': dict() for km in range(1, 6)}
+    for event in range(20):
+        # events reach from the 5th gauge down to a different gauge
+        stations = range(5, event % 4, -1)
+        nodes = [(f'{float(km)}', f'2000-01-{event + i + 1:02d}') for i, km in enumerate(stations)]
+        graph.add_edges_from(zip(nodes[:-1], nodes[1:]), slope=1)
+        for gauge, date in nodes:
+            vertices[gauge][date] = {'value': (event * 7) % 11, 'color': 'red'}
+    vertex_interface = VertexDataInterface(data={'vertices': vertices})
+
+    ranker = FloodWaveRanker(fwg=graph, vertex_interface=vertex_interface)
+    waves, scores = ranker.get_top_waves(k=3, criterion=criterion, target_station=target_station)
+
+    all_waves = FloodWaveExtractor(fwg=graph).get_flood_waves(with_equivalence=True)
+    expected = sorted(
+        (wave for wave in all_waves if ranker.get_score(wave, criterion, str(target_station)) is not None),
+        key=lambda wave: -ranker.get_score(wave, criterion, str(target_station))
+    )[:3]
+
+    assert waves == expected
+    assert scores == [ranker.get_score(wave, criterion, str(target_station)) for wave in expected]
+    # components that can not enter the top k are not extracted
+    assert ranker.extracted_component_count < 20
+
+
+@pytest.mark.parametrize('gauge, start_date, end_date', [
+    (None, None, None),
+    ('2.0', None, None),
+    (None, '2000-01-05', '2000-01-09'),
+    ('3.0', '2000-01-05', '2000-01-09'),
+    ('3.0', None, '2000-01-04'),
+    (None, '2000-02-20', None),
+    ('9.0', '2000-01-01', '2000-12-31'),
+    (None, '2000-01-09', '2000-01-05')
+])
+def test_wave_index(tmp_path, gauge: str, start_date: str, end_date: str):
+    flood_waves = [
+        [(f'{float(km)}', str(np.datetime64('2000-01-01') + 3 * wave + wave % 5 * i))
+         for i, km in enumerate(range(5, wave % 3, -1))]
+        for wave in range(20)
+    ]
+    flood_waves.append([('1.0', 'unknown')])
+    flood_wave_interface = FloodWaveInterface(data={'flood_waves': flood_waves})
+
+    def is_selected(node: tuple) -> bool:
+        return ((gauge is None or node[0] == gauge) and
+                (start_date is None or node[1] >= start_date) and
+                (end_date is None or node[1] <= end_date))
+
+    if gauge is None and start_date is not None:
+        # waves overlapping the window, not only the ones with a node in it
+        expected = [
+            wave for wave in flood_waves[:-1]
+            if wave[0][1] <= (end_date or wave[0][1]) and wave[-1][1] >= start_date
+        ]
+    else:
+        expected = [wave for wave in flood_waves if any(map(is_selected, wave))]
+
+    assert flood_wave_interface.select_waves(gauge=gauge, start_date=start_date, end_date=end_date) == expected
+
+    wave_index = flood_wave_interface.get_wave_index()
+    wave_index.save(file_path=tmp_path / 'wave_index.npz')
+    loaded_index = WaveIndex.load(file_path=tmp_path / 'wave_index.npz')
+    wave_ids = loaded_index.get_wave_ids(gauge=gauge, start_date=start_date, end_date=end_date)
+
+    assert loaded_index.get_waves(wave_ids=wave_ids) == expected
+
+
+@pytest.mark.parametrize('file_format, chunk_size', [('csv', 2), ('npz', 2), ('npz', 100), ('csv', 100)])
+def test_record_export(tmp_path, mock_graph: nx.DiGraph, file_format: str, chunk_size: int):
+    vertex_interface = VertexDataInterface(data={
+        'vertices': {'A': {'1': {'value': 500, 'color': 'red'}}, 'D': {'4': {'value': 300, 'color': 'yellow'}}}
+    })
+    flood_wave_interface = FloodWaveExtractor(fwg=mock_graph)(with_equivalence=False)
+    flood_wave_interface.vertex_interface = vertex_interface
+    expected_nodes = flood_wave_interface.get_wave_nodes()
+
+    file_path = tmp_path / f'waves.{file_format}'
+    assert flood_wave_interface.export_records(file_path=str(file_path), chunk_size=chunk_size) == 6
+    if file_format == 'csv':
+        records = pd.read_csv(file_path, dtype={'gauge': str, 'date': str}, keep_default_na=False, na_values=[''])
+        records['color'] = records['color'].fillna('')
+    else:
+        records = pd.DataFrame(RecordExporter.read_npz(file_path=file_path))
+        assert len(np.load(file_path).files) == len(RecordExporter.WAVE_COLUMNS) * -(-6 // chunk_size)
+
+    assert list(records.columns) == list(RecordExporter.WAVE_COLUMNS)
+    assert records['wave_id'].tolist() == [0, 0, 0, 1, 1, 1]
+    assert records['seq'].tolist() == [0, 1, 2, 0, 1, 2]
+    assert list(zip(records['gauge'], records['wave_id'])) == [
+        (node[0], wave_id) for wave_id, wave in enumerate(flood_wave_interface.flood_waves) for node in wave
+    ]
+    assert records['slope'].tolist()[:2] == [1.0, 1.0] and np.isnan(records['slope'].tolist()[2])
+    assert records['color'].tolist() == ['red', '', 'yellow', 'red', '', 'yellow']
+    np.testing.assert_array_equal(records['level'].to_numpy(), expected_nodes['level'].to_numpy())
+
+    edge_path = tmp_path / f'edges.{file_format}'
+    assert RecordExporter(chunk_size=chunk_size).export_edges(fwg=mock_graph, file_path=str(edge_path)) == 4
+
+    with pytest.raises(ValueError):
+        RecordExporter(chunk_size=0)
+    with pytest.raises(ValueError):
+        RecordExporter().export_edges(fwg=mock_graph, file_path=str(tmp_path / 'edges.json'))
@@ -0,0 +1,183 @@
+from itertools import chain
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from src.graph_building.component_tracker import ComponentTracker
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+
+
+class WaveFeatureCalculator:
+    """
+    This class calculates the features of flood waves in one vectorized pass.
+    """
+    FEATURE_COLUMNS = [
+        'start_day', 'end_day', 'propagation_days',
+        'start_station', 'end_station', 'node_count',
+        'start_level', 'end_level', 'attenuation',
+        'mean_slope', 'red_node_count'
+    ]
+    NODE_COLUMNS = ['wave_id', 'seq', 'station', 'day', 'level', 'is_red']
+
+    @staticmethod
+    def get_wave_tables(flood_waves: list,
+                        extracted_graph: nx.DiGraph = None,
+                        vertex_interface: VertexDataInterface = None
+                        ) -> tuple:
+        """
+        We flatten the waves, and calculate a feature table (one row per wave)
+        and a node table (one row per wave node). The index of the feature table
+        and the 'wave_id' column of the node table are positions in flood_waves.
+        Levels and colors are only available if vertex data is given,
+        slopes are only available if the graph of the waves is given.
+        :param list flood_waves: the flood waves (node lists)
+        :param nx.DiGraph extracted_graph: graph object containing the waves
+        :param VertexDataInterface vertex_interface: interface containing vertex data
+        :return tuple: the feature table and the node table
+        """
+        lengths = np.fromiter(map(len, flood_waves), dtype=np.int64, count=len(flood_waves))
+        if not lengths.size:
+            return (
+                WaveFeatureCalculator.get_empty_features(),
+                WaveFeatureCalculator.get_empty_nodes()
+            )
+
+        node_ids = dict()
+        flat_ids = np.fromiter(
+            (node_ids.setdefault(node, len(node_ids)) for node in chain.from_iterable(flood_waves)),
+            dtype=np.int64,
+            count=int(lengths.sum())
+        )
+        nodes = list(node_ids)
+
+        stations = ComponentTracker.get_river_kms(nodes=nodes)[flat_ids]
+        days = ComponentTracker.get_days(nodes=nodes)[flat_ids]
+        levels, is_red = WaveFeatureCalculator.get_vertex_data(
+            nodes=nodes,
+            vertex_interface=vertex_interface
+        )
+        levels, is_red = levels[flat_ids], is_red[flat_ids]
+
+        starts = np.cumsum(lengths) - lengths
+        ends = starts + lengths - 1
+
+        slopes = WaveFeatureCalculator.get_slopes(
+            flood_waves=flood_waves,
+            extracted_graph=extracted_graph
+        )
+        edge_counts = np.maximum(lengths - 1, 0)
+        slope_sums = np.bincount(
+            np.repeat(np.arange(len(lengths)), edge_counts),
+            weights=slopes,
+            minlength=len(lengths)
+        )
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_slopes = slope_sums / edge_counts
+
+        features = pd.DataFrame({
+            'start_day': days[starts].astype('datetime64[ns]'),
+            'end_day': days[ends].astype('datetime64[ns]'),
+            'propagation_days': (days[ends] - days[starts]).astype(np.int64),
+            'start_station': stations[starts],
+            'end_station': stations[ends],
+            'node_count': lengths,
+            'start_level': levels[starts],
+            'end_level': levels[ends],
+            'attenuation': levels[starts] - levels[ends],
+            'mean_slope': mean_slopes,
+            'red_node_count': np.add.reduceat(is_red.astype(np.int64), starts)
+        })
+
+        wave_ids = np.repeat(np.arange(len(lengths)), lengths)
+        wave_nodes = pd.DataFrame({
+            'wave_id': wave_ids,
+            'seq': np.arange(len(wave_ids)) - np.repeat(starts, lengths),
+            'station': stations,
+            'day': days.astype('datetime64[ns]'),
+            'level': levels,
+            'is_red': is_red
+        })
+
+        return features, wave_nodes
+
+    @staticmethod
+    def get_vertex_data(nodes: list, vertex_interface: VertexDataInterface) -> tuple:
+        """
+        We look up the level and the color of every distinct node once.
+        :param list nodes: distinct (gauge, date) nodes
+        :param VertexDataInterface vertex_interface: interface containing vertex data
+        :return tuple: levels (NaN if unknown) and red flags of the nodes
+        """
+        levels = np.full(len(nodes), np.nan)
+        is_red = np.zeros(len(nodes), dtype=bool)
+        if vertex_interface is None:
+            return levels, is_red
+
+        vertices = vertex_interface.vertices
+        for i, (station, date) in enumerate(nodes):
+            vertex = vertices.get(station, dict()).get(date)
+            if vertex is not None:
+                levels[i] = vertex['value']
+                is_red[i] = vertex['color'] == 'red'
+
+        return levels, is_red
+
+    @staticmethod
+    def get_slopes(flood_waves: list, extracted_graph: nx.DiGraph) -> np.ndarray:
+        """
+        We collect the slopes of consecutive node pairs of all waves.
+        :param list flood_waves: the flood waves (node lists)
+        :param nx.DiGraph extracted_graph: graph object containing the waves
+        :return np.ndarray: slopes (NaN if unknown) in wave order
+        """
+        edge_count = sum(max(len(wave) - 1, 0) for wave in flood_waves)
+        if extracted_graph is None:
+            return np.full(edge_count, np.nan)
+
+        adjacency = extracted_graph.adj
+        return np.fromiter(
+            (
+                adjacency[u][v].get('slope', np.nan) if v in adjacency.get(u, ()) else np.nan
+                for wave in flood_waves
+                for u, v in zip(wave[:-1], wave[1:])
+            ),
+            dtype=np.float64,
+            count=edge_count
+        )
+
+    @staticmethod
+    def get_empty_features() -> pd.DataFrame:
+        """
+        Returns a feature table without waves.
+        :return pd.DataFrame: the empty feature table
+        """
+        return pd.DataFrame({
+            'start_day': np.zeros(0, dtype='datetime64[ns]'),
+            'end_day': np.zeros(0, dtype='datetime64[ns]'),
+            'propagation_days': np.zeros(0, dtype=np.int64),
+            'start_station': np.zeros(0),
+            'end_station': np.zeros(0),
+            'node_count': np.zeros(0, dtype=np.int64),
+            'start_level': np.zeros(0),
+            'end_level': np.zeros(0),
+            'attenuation': np.zeros(0),
+            'mean_slope': np.zeros(0),
+            'red_node_count': np.zeros(0, dtype=np.int64)
+        })
+
+    @staticmethod
+    def get_empty_nodes() -> pd.DataFrame:
+        """
+        Returns a node table without waves.
+        :return pd.DataFrame: the empty node table
+        """
+        return pd.DataFrame({
+            'wave_id': np.zeros(0, dtype=np.int64),
+            'seq': np.zeros(0, dtype=np.int64),
+            'station': np.zeros(0),
+            'day': np.zeros(0, dtype='datetime64[ns]'),
+            'level': np.zeros(0),
+            'is_red': np.zeros(0, dtype=bool)
+        })
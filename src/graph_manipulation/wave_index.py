@@ -0,0 +1,195 @@
+from itertools import chain
+
+import numpy as np
+
+from src.graph_building.component_tracker import ComponentTracker
+
+
+class WaveIndex:
+    """
+    Inverted index of flood waves for station and time window lookups.
+    The id of a wave is its position in the indexed list.
+    - Every gauge has a posting list of (day, wave id) pairs sorted by day,
+      so the waves touching a gauge in a time window are found by bisection.
+    - The date spans of the waves are sorted by their first day. A wave overlapping a window
+      must start before the window ends, and not earlier than the longest wave before it
+      starts, so the candidates are found by bisection as well.
+    The nodes of the waves are stored as gauge and date codes, so the index can be saved
+    (without pickle) and the waves can be read back without the graph.
+    """
+    ARRAY_KEYS = (
+        'gauges', 'dates', 'wave_offsets', 'node_gauges', 'node_dates',
+        'posting_offsets', 'posting_days', 'posting_waves',
+        'span_waves', 'span_starts', 'span_ends', 'max_duration'
+    )
+    # days of posting lists and spans are int64, NaT is the smallest value
+    FIRST_DAY = np.iinfo(np.int64).min + 1
+    LAST_DAY = np.iinfo(np.int64).max
+
+    def __init__(self, data: dict = None):
+        """
+        Constructor.
+        :param dict data: Dictionary: the keys represent the data structures (see ARRAY_KEYS).
+        The expected keys are:
+        - 'gauges': sorted gauges of the waves
+        - 'dates': sorted dates of the waves
+        - 'wave_offsets': the first node of every wave (and the node count at the end)
+        - 'node_gauges', 'node_dates': codes of the gauges and dates of the nodes
+        - 'posting_offsets': the first posting of every gauge (and the posting count at the end)
+        - 'posting_days', 'posting_waves': the postings, sorted by gauge and day
+        - 'span_waves', 'span_starts', 'span_ends': the dated waves with their first and last day,
+          sorted by the first day
+        - 'max_duration': the longest span in days
+        """
+        self.gauges = np.zeros(0, dtype=str)
+        self.dates = np.zeros(0, dtype=str)
+        self.wave_offsets = np.zeros(1, dtype=np.int64)
+        self.node_gauges = np.zeros(0, dtype=np.int64)
+        self.node_dates = np.zeros(0, dtype=np.int64)
+        self.posting_offsets = np.zeros(1, dtype=np.int64)
+        self.posting_days = np.zeros(0, dtype=np.int64)
+        self.posting_waves = np.zeros(0, dtype=np.int64)
+        self.span_waves = np.zeros(0, dtype=np.int64)
+        self.span_starts = np.zeros(0, dtype=np.int64)
+        self.span_ends = np.zeros(0, dtype=np.int64)
+        self.max_duration = np.int64(0)
+
+        if data is not None:
+            for key, value in data.items():
+                setattr(self, key, value)
+
+    @property
+    def wave_count(self) -> int:
+        """
+        :return int: the number of indexed waves
+        """
+        return len(self.wave_offsets) - 1
+
+    @classmethod
+    def from_flood_waves(cls, flood_waves: list) -> 'WaveIndex':
+        """
+        Builds the index of a list of flood waves.
+        :param list flood_waves: the flood waves (node lists)
+        :return WaveIndex: the index
+        """
+        lengths = np.fromiter(map(len, flood_waves), dtype=np.int64, count=len(flood_waves))
+        wave_offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+        node_ids = dict()
+        flat_ids = np.fromiter(
+            (node_ids.setdefault(node, len(node_ids)) for node in chain.from_iterable(flood_waves)),
+            dtype=np.int64,
+            count=int(wave_offsets[-1])
+        )
+        nodes = list(node_ids)
+
+        gauges, node_gauges = np.unique(np.array([node[0] for node in nodes], dtype=str), return_inverse=True)
+        dates, node_dates = np.unique(np.array([node[1] for node in nodes], dtype=str), return_inverse=True)
+        days = ComponentTracker.get_days(nodes=nodes).astype(np.int64)
+        node_gauges, node_dates, days = node_gauges[flat_ids], node_dates[flat_ids], days[flat_ids]
+        wave_ids = np.repeat(np.arange(len(lengths)), lengths)
+
+        order = np.lexsort((wave_ids, days, node_gauges))
+        posting_offsets = np.searchsorted(node_gauges[order], np.arange(len(gauges) + 1))
+
+        # the first and last day of the waves, undated nodes are skipped
+        is_dated = days >= cls.FIRST_DAY
+        starts = np.full(len(lengths), cls.LAST_DAY)
+        ends = np.full(len(lengths), cls.FIRST_DAY - 1)
+        np.minimum.at(starts, wave_ids[is_dated], days[is_dated])
+        np.maximum.at(ends, wave_ids[is_dated], days[is_dated])
+        span_waves = np.flatnonzero(ends >= starts)
+        span_waves = span_waves[np.argsort(starts[span_waves], kind='stable')]
+
+        return cls(data={
+            'gauges': gauges,
+            'dates': dates,
+            'wave_offsets': wave_offsets,
+            'node_gauges': node_gauges,
+            'node_dates': node_dates,
+            'posting_offsets': posting_offsets,
+            'posting_days': days[order],
+            'posting_waves': wave_ids[order],
+            'span_waves': span_waves,
+            'span_starts': starts[span_waves],
+            'span_ends': ends[span_waves],
+            'max_duration': (ends[span_waves] - starts[span_waves]).max(initial=0)
+        })
+
+    def get_wave_ids(self, gauge: str = None, start_date: str = None, end_date: str = None) -> np.ndarray:
+        """
+        Finds the waves touching a gauge in a time window (both ends included).
+        Without a gauge, the waves whose date span overlaps the window are found.
+        Waves without dates only match if neither end of the window is given.
+        :param str gauge: the gauge (every gauge if None)
+        :param str start_date: the start of the window (unbounded if None)
+        :param str end_date: the end of the window (unbounded if None)
+        :return np.ndarray: the sorted ids of the waves
+        """
+        if start_date is None and end_date is None:
+            if gauge is None:
+                return np.arange(self.wave_count)
+            start_day, end_day = self.FIRST_DAY - 1, self.LAST_DAY
+        else:
+            start_day = self.FIRST_DAY if start_date is None else np.datetime64(start_date, 'D').astype(np.int64)
+            end_day = self.LAST_DAY if end_date is None else np.datetime64(end_date, 'D').astype(np.int64)
+        if start_day > end_day:
+            return np.zeros(0, dtype=np.int64)
+
+        if gauge is not None:
+            code = np.searchsorted(self.gauges, gauge)
+            if code == len(self.gauges) or self.gauges[code] != gauge:
+                return np.zeros(0, dtype=np.int64)
+
+            first, last = self.posting_offsets[code], self.posting_offsets[code + 1]
+            days = self.posting_days[first:last]
+            lower = first + np.searchsorted(days, start_day, side='left')
+            upper = first + np.searchsorted(days, end_day, side='right')
+
+            return np.unique(self.posting_waves[lower:upper])
+
+        # no span is longer than max_duration, so earlier waves end before the window
+        lower = 0 if start_date is None else np.searchsorted(
+            self.span_starts, start_day - self.max_duration, side='left'
+        )
+        upper = np.searchsorted(self.span_starts, end_day, side='right')
+        is_overlapping = self.span_ends[lower:upper] >= start_day
+
+        return np.sort(self.span_waves[lower:upper][is_overlapping])
+
+    def get_waves(self, wave_ids: np.ndarray) -> list:
+        """
+        Reads waves back from the index.
+        :param np.ndarray wave_ids: ids of the waves
+        :return list: the waves (node lists)
+        """
+        gauges = self.gauges.tolist()
+        dates = self.dates.tolist()
+
+        waves = []
+        for wave_id in np.asarray(wave_ids, dtype=np.int64).tolist():
+            first, last = self.wave_offsets[wave_id], self.wave_offsets[wave_id + 1]
+            waves.append([
+                (gauges[gauge], dates[date])
+                for gauge, date in zip(self.node_gauges[first:last].tolist(), self.node_dates[first:last].tolist())
+            ])
+
+        return waves
+
+    def save(self, file_path: str):
+        """
+        Saves the arrays of the index into an npz file.
+        :param str file_path: path of the file
+        """
+        with open(file_path, 'wb') as f:
+            np.savez(f, **{key: getattr(self, key) for key in self.ARRAY_KEYS})
+
+    @classmethod
+    def load(cls, file_path: str) -> 'WaveIndex':
+        """
+        Loads an index saved by save.
+        :param str file_path: path of the file
+        :return WaveIndex: the index
+        """
+        with np.load(file_path, allow_pickle=False) as arrays:
+            return cls(data={key: arrays[key] for key in cls.ARRAY_KEYS})
@@ -0,0 +1,202 @@
+import os
+
+from src.analysis.statistical_analysis.statistical_analyzer import StatisticalAnalyzer
+from src.data.data_downloader_base import DataDownloaderBase
+from src.data.data_handler import DataHandler
+from src.data.data_loader import DataLoader
+from src.data.interfaces.data_interface import DataInterface
+from src.graph_building.graph_builder import GraphBuilder
+from src.graph_manipulation.flood_wave_extractor import FloodWaveExtractor
+from src.graph_manipulation.fwg_filter import FWGFilter
+from src.graph_manipulation.interfaces.flood_wave_interface import FloodWaveInterface
+from src.pipeline.stage_cache import StageCache
+
+
+class PipelineRunner:
+    """
+    This class runs the pipeline (data loading, graph building, flood wave extraction)
+    with every stage cached in a StageCache. A stage is only recomputed if
+    the data files or the parameters it depends on changed.
+    """
+    DATA_FILES = (
+        'level_groups.json',
+        'measurement_data.csv',
+        'meta_data.csv',
+        'null_points.json',
+        'station_lifetimes.json'
+    )
+
+    def __init__(self,
+                 data_folder: str,
+                 stage_cache: StageCache,
+                 delta: int = 2,
+                 beta: int = 2,
+                 alpha: int = 1,
+                 storage: str = 'dense',
+                 start_date: str = None,
+                 end_date: str = None,
+                 lower_station: float = None,
+                 upper_station: float = None,
+                 with_equivalence: bool = True
+                 ):
+        """
+        Constructor.
+        :param str data_folder: the folder of the input data
+        :param StageCache stage_cache: the cache of the stage outputs
+        :param int delta: the delta of the delta-peaks (see GraphBuilder)
+        :param int beta: the number of days allowed after a vertex for continuation
+        :param int alpha: the number of days minimally needed to consider an edge
+        :param str storage: the storage mode of the time series (see DataHandler)
+        :param str start_date: the first date of the measurements to use
+        :param str end_date: the last date of the measurements to use
+        :param float lower_station: the downstream station of the extracted flood waves
+        :param float upper_station: the upstream station of the extracted flood waves
+        :param bool with_equivalence: whether to apply equivalence on paths
+        """
+        self.data_folder = data_folder
+        self.stage_cache = stage_cache
+        self.delta = delta
+        self.beta = beta
+        self.alpha = alpha
+        self.storage = storage
+        self.start_date = start_date
+        self.end_date = end_date
+        self.lower_station = lower_station
+        self.upper_station = upper_station
+        self.with_equivalence = with_equivalence
+
+        # stage -> whether its output was loaded from the cache in the last run
+        self.cached = dict()
+
+    def get_stage_definition(self, stage: str) -> tuple:
+        """
+        Returns what the output of a stage depends on. The inputs of a stage
+        are the keys of the previous stages, so they are known without running them.
+        :param str stage: the name of the stage ('data', 'graph' or 'flood_waves')
+        :return tuple: the parameters and the inputs of the stage
+        """
+        if stage == 'data':
+            params = {'storage': self.storage, 'start_date': self.start_date, 'end_date': self.end_date}
+            inputs = [
+                self.stage_cache.hash_file(file_path=os.path.join(self.data_folder, file_name))
+                for file_name in self.DATA_FILES
+            ]
+        elif stage == 'graph':
+            params = {'delta': self.delta, 'beta': self.beta, 'alpha': self.alpha}
+            inputs = [self.get_key(stage='data')]
+        elif stage == 'flood_waves':
+            params = {
+                'lower_station': self.lower_station,
+                'upper_station': self.upper_station,
+                'with_equivalence': self.with_equivalence
+            }
+            inputs = [self.get_key(stage='graph')]
+        else:
+            raise ValueError(f'Unknown stage: {stage}')
+
+        return params, inputs
+
+    def get_key(self, stage: str) -> str:
+        """
+        Fingerprints a stage.
+        :param str stage: the name of the stage
+        :return str: the key of the output of the stage
+        """
+        params, inputs = self.get_stage_definition(stage=stage)
+
+        return StageCache.get_key(stage=stage, params=params, inputs=inputs)
+
+    def run_stage(self, stage: str, function):
+        """
+        Runs a stage through the cache.
+        :param str stage: the name of the stage
+        :param function: function without arguments computing the output
+        :return: the output of the stage
+        """
+        params, inputs = self.get_stage_definition(stage=stage)
+        _, value, self.cached[stage] = self.stage_cache.get_or_compute(
+            stage=stage,
+            params=params,
+            inputs=inputs,
+            function=function
+        )
+
+        return value
+
+    def get_data_interface(self) -> DataInterface:
+        """
+        Loads and preprocesses the data.
+        :return DataInterface: the preprocessed data
+        """
+        def load() -> DataInterface:
+            data_loader = DataLoader(
+                data_downloader=DataDownloaderBase(folder_link='', data_folder_path=self.data_folder),
+                start_date=self.start_date,
+                end_date=self.end_date,
+                load_measurements=self.storage == 'dense'
+            )
+            return DataHandler(data_loader=data_loader, storage=self.storage).data_if
+
+        return self.run_stage(stage='data', function=load)
+
+    def get_graph_data(self) -> dict:
+        """
+        Builds the FWG. The data is only loaded if the graph is not cached.
+        :return dict: the graph, the vertex data and the components of the graph
+                      (like GeneratedDataLoader.read_pickle)
+        """
+        def build() -> dict:
+            graph_builder = GraphBuilder(
+                data_interface=self.get_data_interface(),
+                delta=self.delta,
+                beta=self.beta,
+                alpha=self.alpha
+            )
+            graph_builder.run()
+
+            return {
+                'graph': graph_builder.fwg_interface.fwg,
+                'vertex_interface': graph_builder.delta_peak_finder.vertex_interface,
+                'components': graph_builder.fwg_interface.components
+            }
+
+        return self.run_stage(stage='graph', function=build)
+
+    def get_flood_wave_interface(self) -> FloodWaveInterface:
+        """
+        Extracts the flood waves of the selected section of the FWG.
+        The graph is only built (or loaded) if the flood waves are not cached.
+        :return FloodWaveInterface: the extracted flood waves with the vertex data
+        """
+        def extract() -> FloodWaveInterface:
+            graph_data = self.get_graph_data()
+            # the components tracked while building are passed on instead of being searched again
+            fwg, components = FWGFilter.get_station_section(
+                fwg=graph_data['graph'],
+                lower_station=self.lower_station,
+                upper_station=self.upper_station,
+                components=graph_data.get('components')
+            )
+            flood_wave_interface = FloodWaveExtractor(
+                fwg=fwg,
+                components=components
+            )(with_equivalence=self.with_equivalence)
+            flood_wave_interface.vertex_interface = graph_data['vertex_interface']
+            # the index is cached with the waves
+            flood_wave_interface.get_wave_index()
+
+            return flood_wave_interface
+
+        return self.run_stage(stage='flood_waves', function=extract)
+
+    def get_statistical_analyzer(self) -> StatisticalAnalyzer:
+        """
+        Returns a StatisticalAnalyzer of the extracted flood waves.
+        :return StatisticalAnalyzer: the analyzer
+        """
+        flood_wave_interface = self.get_flood_wave_interface()
+
+        return StatisticalAnalyzer(
+            flood_wave_interface=flood_wave_interface,
+            vertex_interface=flood_wave_interface.vertex_interface
+        )
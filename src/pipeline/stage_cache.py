@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+
+
+class StageCache:
+    """
+    Content-addressed cache of pipeline stage outputs on disk.
+    The key of an output is the hash of the name of the stage, its parameters
+    and the keys of its inputs (file hashes or keys of previous stages),
+    so a stage is recomputed exactly when something it depends on changes.
+    Entries are evicted by age and by the total size of the cache
+    (least recently used first).
+    """
+    FILE_HASH_INDEX = 'file_hashes.json'
+    ENTRY_SUFFIX = '.pkl'
+
+    def __init__(self,
+                 cache_folder: str,
+                 max_size: int = None,
+                 max_age: float = None
+                 ):
+        """
+        Constructor.
+        :param str cache_folder: the folder of the cached artifacts
+        :param int max_size: the maximal total size of the entries in bytes (unlimited if None)
+        :param float max_age: the maximal time since the last use of an entry in seconds
+                              (unlimited if None)
+        """
+        self.cache_folder = cache_folder
+        self.max_size = max_size
+        self.max_age = max_age
+
+        os.makedirs(self.cache_folder, exist_ok=True)
+
+    @staticmethod
+    def get_key(stage: str, params: dict = None, inputs: list = None) -> str:
+        """
+        Fingerprints a stage.
+        :param str stage: the name of the stage
+        :param dict params: the parameters of the stage (JSON serializable)
+        :param list inputs: the keys or hashes of the inputs of the stage
+        :return str: the key of the output of the stage
+        """
+        description = json.dumps(
+            {'stage': stage, 'params': params or dict(), 'inputs': inputs or list()},
+            sort_keys=True,
+            default=str
+        )
+
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def hash_file(self, file_path: str, block_size: int = 1 << 20) -> str:
+        """
+        Hashes the content of a file. Hashes are remembered by the size
+        and modification time of the files, so unchanged files are not read again.
+        :param str file_path: path of the file
+        :param int block_size: the number of bytes read at once
+        :return str: the SHA-256 hash of the file
+        """
+        stat = os.stat(file_path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+
+        index_path = os.path.join(self.cache_folder, self.FILE_HASH_INDEX)
+        index = dict()
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+
+        path = os.path.abspath(file_path)
+        entry = index.get(path)
+        if entry is not None and entry['signature'] == signature:
+            return entry['hash']
+
+        file_hash = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                file_hash.update(block)
+
+        index[path] = {'signature': signature, 'hash': file_hash.hexdigest()}
+        self.write_atomically(
+            path=index_path,
+            content=json.dumps(index, indent=2).encode()
+        )
+
+        return index[path]['hash']
+
+    def get_entry_path(self, stage: str, key: str) -> str:
+        """
+        Returns the path of a cache entry.
+        :param str stage: the name of the stage
+        :param str key: the key of the entry
+        :return str: path of the entry
+        """
+        return os.path.join(self.cache_folder, f'{stage}-{key}{self.ENTRY_SUFFIX}')
+
+    def load(self, stage: str, key: str):
+        """
+        Loads a cached output, and marks it as recently used.
+        :param str stage: the name of the stage
+        :param str key: the key of the output
+        :return: the output, None if it is not cached
+        """
+        entry_path = self.get_entry_path(stage=stage, key=key)
+        try:
+            with open(entry_path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+        os.utime(entry_path)
+
+        return value
+
+    def save(self, stage: str, key: str, value):
+        """
+        Saves an output, then evicts old entries if needed.
+        :param str stage: the name of the stage
+        :param str key: the key of the output
+        :param value: the output (picklable)
+        """
+        self.write_atomically(
+            path=self.get_entry_path(stage=stage, key=key),
+            content=pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        )
+        self.evict()
+
+    def get_or_compute(self, stage: str, params: dict, inputs: list, function) -> tuple:
+        """
+        Returns the cached output of a stage, or computes and caches it.
+        :param str stage: the name of the stage
+        :param dict params: the parameters of the stage
+        :param list inputs: the keys or hashes of the inputs of the stage
+        :param function: function without arguments computing the output
+        :return tuple: the key of the output, the output, and whether it was cached
+        """
+        key = self.get_key(stage=stage, params=params, inputs=inputs)
+
+        value = self.load(stage=stage, key=key)
+        if value is not None:
+            return key, value, True
+
+        value = function()
+        self.save(stage=stage, key=key, value=value)
+
+        return key, value, False
+
+    def get_entries(self) -> list:
+        """
+        Lists the cache entries.
+        :return list: (path, size, time of last use) of every entry, least recently used first
+        """
+        entries = list()
+        for file_name in os.listdir(self.cache_folder):
+            if not file_name.endswith(self.ENTRY_SUFFIX):
+                continue
+            path = os.path.join(self.cache_folder, file_name)
+            stat = os.stat(path)
+            entries.append((path, stat.st_size, stat.st_mtime))
+
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        """
+        Removes the entries not used for max_age seconds, then the least recently
+        used entries until the cache is not larger than max_size.
+        """
+        entries = self.get_entries()
+
+        if self.max_age is not None:
+            now = time.time()
+            for path, _, last_used in entries:
+                if now - last_used > self.max_age:
+                    os.remove(path)
+            entries = [entry for entry in entries if now - entry[2] <= self.max_age]
+
+        if self.max_size is not None:
+            total_size = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total_size <= self.max_size:
+                    break
+                os.remove(path)
+                total_size -= size
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        for path, _, _ in self.get_entries():
+            os.remove(path)
+
+    def write_atomically(self, path: str, content: bytes):
+        """
+        Writes a file through a temporary file, so interrupted writes leave no partial entry.
+        :param str path: path of the file
+        :param bytes content: the content
+        """
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.cache_folder, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(content)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
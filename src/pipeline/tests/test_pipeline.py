@@ -0,0 +1,85 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.pipeline.pipeline_runner import PipelineRunner
+from src.pipeline.stage_cache import StageCache
+
+
+@pytest.fixture
+def data_folder(tmp_path) -> str:
+    gauges = ['30.0', '20.0', '10.0']
+    dates = pd.date_range('2000-01-01', '2001-12-31').strftime('%Y-%m-%d')
+    rng = np.random.default_rng(seed=0)
+
+    pd.DataFrame(
+        data=300 + np.cumsum(rng.normal(size=(len(dates), len(gauges))), axis=0).round(),
+        index=pd.Index(dates, name='date'),
+        columns=gauges
+    ).to_csv(tmp_path / 'measurement_data.csv', sep=',')
+    pd.DataFrame(
+        data={'river_km': list(map(float, gauges))},
+        index=pd.Index(list(map(float, gauges)), name='regional_number')
+    ).to_csv(tmp_path / 'meta_data.csv', sep=';')
+    json_data = {
+        'level_groups.json': {gauge: 320 for gauge in gauges},
+        'null_points.json': {gauge: 1.0 for gauge in gauges},
+        'station_lifetimes.json': {gauge: {'start': dates[0], 'end': dates[-1]} for gauge in gauges}
+    }
+    for file_name, content in json_data.items():
+        with open(tmp_path / file_name, 'w') as f:
+            json.dump(content, f)
+
+    return str(tmp_path)
+
+
+def test_pipeline_stage_cache(data_folder: str, tmp_path, monkeypatch):
+    stage_cache = StageCache(cache_folder=os.path.join(tmp_path, 'cache'))
+
+    runner = PipelineRunner(data_folder=data_folder, stage_cache=stage_cache)
+    flood_waves = runner.get_statistical_analyzer().flood_wave_interface.flood_waves
+    assert runner.cached == {'data': False, 'graph': False, 'flood_waves': False}
+    assert len(flood_waves) > 0
+
+    # unchanged stages are loaded without running the previous ones
+    monkeypatch.setattr(PipelineRunner, 'get_graph_data', lambda self: pytest.fail('graph was loaded'))
+    runner = PipelineRunner(data_folder=data_folder, stage_cache=stage_cache)
+    assert runner.get_statistical_analyzer().flood_wave_interface.flood_waves == flood_waves
+    assert runner.cached == {'flood_waves': True}
+    monkeypatch.undo()
+
+    # only the stages after a changed parameter are recomputed
+    runner = PipelineRunner(data_folder=data_folder, stage_cache=stage_cache, delta=3)
+    runner.get_flood_wave_interface()
+    assert runner.cached == {'data': True, 'graph': False, 'flood_waves': False}
+
+    # changed data files change every key
+    keys = {stage: runner.get_key(stage=stage) for stage in ('data', 'graph', 'flood_waves')}
+    with open(os.path.join(data_folder, 'null_points.json'), 'a') as f:
+        f.write('\n')
+    assert all(runner.get_key(stage=stage) != key for stage, key in keys.items())
+
+
+def test_stage_cache_eviction(tmp_path):
+    stage_cache = StageCache(cache_folder=str(tmp_path))
+    for i in range(4):
+        stage_cache.save(stage='stage', key=str(i), value=np.zeros(1000))
+        os.utime(stage_cache.get_entry_path(stage='stage', key=str(i)), (i, i))
+    # loading marks an entry as recently used
+    assert stage_cache.load(stage='stage', key='0') is not None
+    entry_size = stage_cache.get_entries()[0][1]
+
+    stage_cache.max_size = 2 * entry_size
+    stage_cache.evict()
+    assert [os.path.basename(path) for path, _, _ in stage_cache.get_entries()] == ['stage-3.pkl', 'stage-0.pkl']
+
+    stage_cache.max_size = None
+    stage_cache.max_age = 60
+    os.utime(stage_cache.get_entry_path(stage='stage', key='3'), (time.time() - 120, time.time() - 120))
+    stage_cache.evict()
+    assert stage_cache.load(stage='stage', key='3') is None
+    assert stage_cache.load(stage='stage', key='0') is not None
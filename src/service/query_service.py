@@ -0,0 +1,357 @@
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from src.analysis.statistical_analysis.statistical_analyzer import StatisticalAnalyzer
+
+
+class QueryService:
+    """
+    This class answers statistical queries about resident flood waves.
+    The graph, the vertex data and the extracted waves are loaded once, and the analyzers
+    (with their cached feature tables and period codes) of the recently used configurations
+    are kept between queries. The tables of an analyzer are built once, when it is created,
+    so queries of the same configuration are computed in parallel afterwards.
+    Queries run in a thread pool, and identical queries arriving while one is
+    computed wait for its result instead of computing it again.
+    The queries are served over HTTP (GET /query?analysis=...) on TCP or a Unix socket.
+    """
+    ANALYSES = (
+        'flood-wave-count',
+        'propagation-time',
+        'red-wave-count',
+        'red-propagation-time',
+        'slope-distribution',
+        'slope-error-ratios'
+    )
+    DEFAULT_QUERY = {
+        'statistic': 'mean',
+        'frequencies': ('yearly', 'quarterly'),
+        'lower_station': None,
+        'upper_station': None,
+        'with_equivalence': True,
+        'target_station': None,
+        'full_wave': False
+    }
+    STATUS_TEXTS = {
+        200: 'OK',
+        400: 'Bad Request',
+        404: 'Not Found',
+        405: 'Method Not Allowed',
+        431: 'Request Header Fields Too Large',
+        500: 'Internal Server Error'
+    }
+    # the longest request or header line in bytes, and the most header lines of a request
+    MAX_LINE_LENGTH = 8192
+    MAX_HEADER_COUNT = 100
+
+    def __init__(self, stat_analyzer: StatisticalAnalyzer, workers: int = None, max_analyzers: int = 32):
+        """
+        Constructor.
+        :param StatisticalAnalyzer stat_analyzer: analyzer of the extracted flood waves
+        :param int workers: the number of threads computing the queries (see ThreadPoolExecutor)
+        :param int max_analyzers: the number of analyzers kept, the least recently used one is dropped
+        """
+        if max_analyzers < 1:
+            raise ValueError('At least one analyzer must be kept')
+
+        self.stat_analyzer = stat_analyzer
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.max_analyzers = max_analyzers
+
+        # analyzer key -> [analyzer (None until it is built), lock of its creation], least recently used first
+        self.analyzers = OrderedDict()
+        self.analyzers_lock = threading.Lock()
+        # query key -> future of the result
+        self.in_flight = dict()
+        self.counts = {'queries': 0, 'computed': 0, 'merged': 0}
+
+    @classmethod
+    def get_query(cls, params: dict) -> dict:
+        """
+        Completes a query with the default parameters.
+        Values can be given as strings (like in a URL), frequencies separated by commas.
+        :param dict params: the analysis and its parameters
+        :return dict: the complete query
+        """
+        unknown = set(params) - set(cls.DEFAULT_QUERY) - {'analysis'}
+        if unknown:
+            raise ValueError(f'Unknown parameters: {sorted(unknown)}')
+        if params.get('analysis') not in cls.ANALYSES:
+            raise ValueError(f'Analysis must be one of {cls.ANALYSES}')
+
+        query = dict(cls.DEFAULT_QUERY, **params)
+
+        frequencies = query['frequencies']
+        if isinstance(frequencies, str):
+            frequencies = frequencies.split(',')
+        query['frequencies'] = tuple(frequencies)
+
+        for name in ('lower_station', 'upper_station', 'target_station'):
+            if query[name] is not None:
+                query[name] = float(query[name])
+        for name in ('with_equivalence', 'full_wave'):
+            if isinstance(query[name], str):
+                query[name] = query[name].lower() in ('1', 'true', 'yes')
+
+        return query
+
+    @staticmethod
+    def get_query_key(query: dict) -> str:
+        """
+        Returns a key identifying a complete query.
+        :param dict query: the query (see get_query)
+        :return str: the key
+        """
+        return json.dumps(query, sort_keys=True)
+
+    def get_analyzer(self, kind: str, **params):
+        """
+        Returns the analyzer of a configuration. It is created (and its tables are built)
+        on first use, while the other queries of the configuration wait for it.
+        :param str kind: 'flood_wave', 'high_water_level' or 'slope'
+        :param params: the parameters of the analyzer
+        :return: the analyzer
+        """
+        key = (kind, ) + tuple(sorted(params.items()))
+        with self.analyzers_lock:
+            entry = self.analyzers.get(key)
+            if entry is None:
+                entry = self.analyzers[key] = [None, threading.Lock()]
+                if len(self.analyzers) > self.max_analyzers:
+                    self.analyzers.popitem(last=False)
+            else:
+                self.analyzers.move_to_end(key)
+
+        with entry[1]:
+            if entry[0] is None:
+                entry[0] = self.create_analyzer(kind=kind, **params)
+
+        return entry[0]
+
+    def create_analyzer(self, kind: str, **params):
+        """
+        Creates the analyzer of a configuration, and builds the tables it caches,
+        so its queries only read them.
+        :param str kind: 'flood_wave', 'high_water_level' or 'slope'
+        :param params: the parameters of the analyzer
+        :return: the analyzer
+        """
+        analyzer = self.stat_analyzer.get_analyzer(kind=kind, **params)
+        if kind in ('flood_wave', 'high_water_level'):
+            analyzer.get_period_engine()
+
+        return analyzer
+
+    def compute(self, query: dict) -> dict:
+        """
+        Calculates the result of a query.
+        :param dict query: the query (see get_query)
+        :return dict: keys are frequencies, values are the respective data
+        """
+        analysis = query['analysis']
+        frequencies = query['frequencies']
+
+        if analysis in ('flood-wave-count', 'propagation-time'):
+            analyzer = self.get_analyzer(
+                kind='flood_wave',
+                lower_station=query['lower_station'],
+                upper_station=query['upper_station'],
+                with_equivalence=query['with_equivalence']
+            )
+            if analysis == 'flood-wave-count':
+                return analyzer.get_flood_wave_count(frequencies=frequencies)
+            return analyzer.get_propagation_time_stat(
+                statistic=query['statistic'],
+                frequencies=frequencies
+            )
+
+        if analysis in ('red-wave-count', 'red-propagation-time'):
+            if query['target_station'] is None:
+                raise ValueError('The target station must be given for high water level analysis')
+
+            analyzer = self.get_analyzer(
+                kind='high_water_level',
+                target_station=query['target_station'],
+                is_full_wave_considered=query['full_wave']
+            )
+            if analysis == 'red-wave-count':
+                return analyzer.get_red_wave_count_at_station(frequencies=frequencies)
+            return analyzer.get_red_wave_propagation_time_stat(
+                statistic=query['statistic'],
+                frequencies=frequencies
+            )
+
+        analyzer = self.get_analyzer(kind='slope')
+        if analysis == 'slope-distribution':
+            return {'total': pd.Series(analyzer.get_slope_distribution(), name='ratio').to_frame()}
+        return analyzer.get_slope_error_ratios_between_stations(
+            lower_station=query['lower_station'],
+            upper_station=query['upper_station'],
+            frequencies=frequencies
+        )
+
+    async def query(self, params: dict) -> dict:
+        """
+        Answers a query in the thread pool. Identical queries in flight share one computation.
+        :param dict params: the analysis and its parameters (see get_query)
+        :return dict: keys are frequencies, values are the respective data
+        """
+        query = self.get_query(params=params)
+        key = self.get_query_key(query=query)
+        self.counts['queries'] += 1
+
+        future = self.in_flight.get(key)
+        if future is None:
+            self.counts['computed'] += 1
+            future = asyncio.get_running_loop().run_in_executor(self.executor, self.compute, query)
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.counts['merged'] += 1
+
+        # a disconnected client does not cancel the computation for the others
+        return await asyncio.shield(future)
+
+    @staticmethod
+    def get_result_json(result: dict) -> dict:
+        """
+        Converts the frames of a result to JSON objects.
+        :param dict result: keys are frequencies, values are the respective data
+        :return dict: keys are frequencies, values are {'index', 'columns', 'data'}
+        """
+        return {
+            frequency: json.loads(df.to_json(orient='split', date_format='iso', double_precision=15, default_handler=str))
+            for frequency, df in result.items()
+        }
+
+    async def get_response(self, method: str, target: str) -> tuple:
+        """
+        Answers an HTTP request.
+        :param str method: the method of the request
+        :param str target: the path and query string of the request
+        :return tuple: the status code and the JSON content
+        """
+        if method != 'GET':
+            return 405, {'error': 'Only GET requests are supported'}
+
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, dict(self.counts, status='ok', in_flight=len(self.in_flight))
+        if url.path != '/query':
+            return 404, {'error': f'Unknown path: {url.path}'}
+
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            result = await self.query(params=params)
+        except ValueError as error:
+            return 400, {'error': str(error)}
+        except Exception as error:
+            return 500, {'error': repr(error)}
+
+        return 200, self.get_result_json(result=result)
+
+    async def read_request(self, reader: asyncio.StreamReader) -> tuple:
+        """
+        Reads the request line and the headers of a request.
+        Lines longer than MAX_LINE_LENGTH and more than MAX_HEADER_COUNT headers are refused.
+        :param asyncio.StreamReader reader: the reader of the connection
+        :return tuple: the request line (split, empty at the end of the connection),
+                       the headers, and the status of a refused request (None if it is accepted)
+        """
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+        except ValueError:
+            # the line is longer than the limit of the reader
+            return [], dict(), 400
+        if len(request_line) != 3:
+            return request_line, dict(), None
+
+        headers = dict()
+        for header_count in range(self.MAX_HEADER_COUNT + 1):
+            try:
+                line = await reader.readline()
+            except ValueError:
+                return request_line, headers, 431
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if header_count == self.MAX_HEADER_COUNT:
+                return request_line, headers, 431
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+
+        return request_line, headers, None
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serves the requests of a connection (kept alive for HTTP/1.1 clients).
+        The connection is closed after a refused request.
+        :param asyncio.StreamReader reader: the reader of the connection
+        :param asyncio.StreamWriter writer: the writer of the connection
+        """
+        try:
+            while True:
+                request_line, headers, status = await self.read_request(reader=reader)
+                if status is not None:
+                    content = {'error': 'Request line too long' if status == 400 else 'Request headers too large'}
+                    keep_alive = False
+                elif len(request_line) != 3:
+                    break
+                else:
+                    method, target, version = request_line
+                    status, content = await self.get_response(method=method, target=target)
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection') != 'close'
+
+                body = json.dumps(content).encode()
+                writer.write(
+                    f'HTTP/1.1 {status} {self.STATUS_TEXTS[status]}\r\n'
+                    f'Content-Type: application/json\r\n'
+                    f'Content-Length: {len(body)}\r\n'
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start_server(self,
+                           host: str = '127.0.0.1',
+                           port: int = 8765,
+                           unix_path: str = None
+                           ) -> asyncio.AbstractServer:
+        """
+        Starts listening on a TCP port or on a Unix socket.
+        :param str host: the host of the TCP server
+        :param int port: the port of the TCP server (0 for any free port)
+        :param str unix_path: path of the Unix socket, TCP is used if None
+        :return asyncio.AbstractServer: the started server
+        """
+        # readline raises a ValueError for lines longer than the limit of the reader
+        if unix_path is not None:
+            return await asyncio.start_unix_server(
+                self.handle_connection,
+                path=unix_path,
+                limit=self.MAX_LINE_LENGTH
+            )
+
+        return await asyncio.start_server(self.handle_connection, host=host, port=port, limit=self.MAX_LINE_LENGTH)
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765, unix_path: str = None):
+        """
+        Serves the queries until cancelled.
+        :param str host: the host of the TCP server
+        :param int port: the port of the TCP server
+        :param str unix_path: path of the Unix socket, TCP is used if None
+        """
+        server = await self.start_server(host=host, port=port, unix_path=unix_path)
+        async with server:
+            await server.serve_forever()
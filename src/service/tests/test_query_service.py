@@ -0,0 +1,142 @@
+import asyncio
+import json
+
+import networkx as nx
+import pandas as pd
+import pytest
+
+from src.analysis.statistical_analysis.statistical_analyzer import StatisticalAnalyzer
+from src.graph_building.interfaces.vertex_data_interface import VertexDataInterface
+from src.graph_manipulation.interfaces.flood_wave_interface import FloodWaveInterface
+from src.service.query_service import QueryService
+
+
+@pytest.fixture
+def query_service() -> QueryService:
+    vertex_interface = VertexDataInterface()
+    vertex_interface.vertices = {
+        '1.0': {'2000-01-01': {'value': 8, 'color': 'red'}, '2000-06-01': {'value': 6, 'color': 'yellow'}},
+        '2.0': {'2000-01-02': {'value': 6, 'color': 'yellow'}, '2000-06-03': {'value': 10, 'color': 'red'}}
+    }
+    flood_waves = [
+        [('1.0', '2000-01-01'), ('2.0', '2000-01-02')],
+        [('1.0', '2000-06-01'), ('2.0', '2000-06-03')]
+    ]
+    extracted_graph = nx.DiGraph()
+    extracted_graph.add_edge(*flood_waves[0], slope=2)
+    extracted_graph.add_edge(*flood_waves[1], slope=-4)
+
+    stat_analyzer = StatisticalAnalyzer(
+        flood_wave_interface=FloodWaveInterface(data={
+            'flood_waves': flood_waves,
+            'extracted_graph': extracted_graph
+        }),
+        vertex_interface=vertex_interface
+    )
+
+    return QueryService(stat_analyzer=stat_analyzer, workers=2)
+
+
+async def request(port: int, targets: list) -> list:
+    """
+    Sends GET requests on one kept-alive connection, and returns the statuses and JSON contents.
+    """
+    reader, writer = await asyncio.open_connection(host='127.0.0.1', port=port)
+    responses = []
+    for target in targets:
+        writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        await writer.drain()
+
+        status = int((await reader.readline()).split()[1])
+        headers = dict()
+        while (line := await reader.readline()) != b'\r\n':
+            name, _, value = line.decode().partition(':')
+            headers[name.lower()] = value.strip()
+        body = await reader.readexactly(int(headers['content-length']))
+        responses.append((status, json.loads(body)))
+    writer.close()
+
+    return responses
+
+
+def test_query_service(query_service: QueryService):
+    async def run() -> tuple:
+        results = await asyncio.gather(*[
+            query_service.query(params={'analysis': 'propagation-time', 'frequencies': 'yearly'})
+            for _ in range(5)
+        ])
+
+        server = await query_service.start_server(port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            responses = await asyncio.gather(
+                request(port=port, targets=[
+                    '/query?analysis=red-wave-count&target_station=2.0&frequencies=yearly,quarterly',
+                    '/query?analysis=slope-distribution'
+                ]),
+                request(port=port, targets=['/query?analysis=unknown'])
+            )
+            responses.append(await request(port=port, targets=['/health']))
+
+        return results, responses
+
+    results, ((red_waves, slopes), (error, ), (health, )) = asyncio.run(run())
+
+    # identical queries in flight are computed once
+    assert query_service.counts == {'queries': 7, 'computed': 3, 'merged': 4}
+    assert all(result is results[0] for result in results)
+    pd.testing.assert_frame_equal(
+        results[0]['yearly'],
+        query_service.stat_analyzer.get_flood_wave_analyzer().get_propagation_time_stat(
+            frequencies=('yearly', )
+        )['yearly']
+    )
+
+    assert red_waves == (200, {
+        'yearly': {'columns': ['flood wave count'], 'index': ['2000'], 'data': [[1]]},
+        'quarterly': {'columns': ['flood wave count'], 'index': ['2000Q2'], 'data': [[1]]}
+    })
+    assert slopes[1]['total']['data'] == [[0.5], [0.0], [0.5]]
+    assert error[0] == 400
+    assert health == (200, {'queries': 7, 'computed': 3, 'merged': 4, 'status': 'ok', 'in_flight': 0})
+
+
+def test_analyzer_eviction(query_service: QueryService):
+    query_service.max_analyzers = 2
+    analyzer = query_service.get_analyzer(kind='flood_wave', lower_station=1.0)
+
+    assert query_service.get_analyzer(kind='flood_wave', lower_station=1.0) is analyzer
+    assert analyzer.period_engine is not None
+    for station in (2.0, 3.0):
+        query_service.get_analyzer(kind='flood_wave', lower_station=station)
+
+    # the least recently used analyzers are dropped
+    assert [key[1] for key in query_service.analyzers] == [('lower_station', 2.0), ('lower_station', 3.0)]
+    assert query_service.get_analyzer(kind='flood_wave', lower_station=1.0) is not analyzer
+
+    with pytest.raises(ValueError):
+        QueryService(stat_analyzer=query_service.stat_analyzer, max_analyzers=0)
+
+
+@pytest.mark.parametrize('request_head, expected_status', [
+    (f'GET /query?analysis={"x" * QueryService.MAX_LINE_LENGTH} HTTP/1.1\r\n\r\n', 400),
+    (f'GET /health HTTP/1.1\r\nX-Long: {"x" * QueryService.MAX_LINE_LENGTH}\r\n\r\n', 431),
+    ('GET /health HTTP/1.1\r\n' + 'X-Header: x\r\n' * (QueryService.MAX_HEADER_COUNT + 1) + '\r\n', 431)
+], ids=['request line', 'header line', 'header count'])
+def test_request_limits(query_service: QueryService, request_head: str, expected_status: int):
+    async def run() -> tuple:
+        server = await query_service.start_server(port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection(host='127.0.0.1', port=port)
+            writer.write(request_head.encode())
+            await writer.drain()
+            # the connection is closed after the response
+            response = await asyncio.wait_for(reader.read(), timeout=10)
+            writer.close()
+
+        return response
+
+    status_line, _, _ = asyncio.run(run()).partition(b'\r\n')
+
+    assert int(status_line.split()[1]) == expected_status